@@ -35,6 +35,74 @@ class Settings:
         
         # Настройки кеширования
         self.CACHE_TTL: int = 300  # 5 минут
+        self.CACHE_MAX_SIZE: int = int(os.getenv("CACHE_MAX_SIZE", "10000"))  # записей в одном кеше
+        
+        # Планировщик запросов к Telegram (на каждого клиента)
+        self.RPC_CONCURRENCY: int = int(os.getenv("RPC_CONCURRENCY", "4"))  # одновременных запросов
+        self.RPC_INTERACTIVE_SLOTS: int = int(os.getenv("RPC_INTERACTIVE_SLOTS", "1"))  # слотов только для интерактивных запросов
+        self.RPC_RATE: float = float(os.getenv("RPC_RATE", "5"))  # запросов в секунду на метод по умолчанию
+        self.RPC_BURST: int = int(os.getenv("RPC_BURST", "10"))
+        self.RPC_FLOOD_RETRIES: int = int(os.getenv("RPC_FLOOD_RETRIES", "3"))
+        self.RPC_MAX_FLOOD_WAIT: int = int(os.getenv("RPC_MAX_FLOOD_WAIT", "300"))  # секунды; при большем ожидании ошибка возвращается сразу
+        
+        # Каналов, опрашиваемых одновременно при поиске сообщений
+        self.SEARCH_CONCURRENCY: int = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+        
+        # Инкрементальная синхронизация сообщений каналов
+        self.SYNC_MIN_INTERVAL: float = float(os.getenv("SYNC_MIN_INTERVAL", "30"))  # секунды между запросами к одному каналу
+        self.SYNC_REFRESH_WINDOW: int = int(os.getenv("SYNC_REFRESH_WINDOW", "100"))  # последних сообщений, обновляемых за синхронизацию
+        self.SYNC_MAX_NEW: int = int(os.getenv("SYNC_MAX_NEW", "1000"))  # новых сообщений за одну синхронизацию
+        
+        # Одновременных заданий полной загрузки истории одной сессии
+        self.BACKFILL_CONCURRENCY: int = int(os.getenv("BACKFILL_CONCURRENCY", "2"))
+        
+        # Сообщений одного канала в экспорте
+        self.EXPORT_MAX_MESSAGES: int = int(os.getenv("EXPORT_MAX_MESSAGES", "10000"))
+        
+        # Одновременных запросов комментариев для сообщений без сведений об ответах
+        self.REPLIES_FALLBACK_CONCURRENCY: int = int(os.getenv("REPLIES_FALLBACK_CONCURRENCY", "4"))
+        
+        # Диалогов, загружаемых в кеш сущностей и индекс каналов после входа (0 — все диалоги без ограничения)
+        self.ENTITY_WARM_DIALOGS: int = int(os.getenv("ENTITY_WARM_DIALOGS", "200"))
+        self.DIALOG_INDEX_TTL: int = int(os.getenv("DIALOG_INDEX_TTL", "21600"))  # секунды до полной перестройки индекса
+        self.GLOBAL_SEARCH_MIN_LENGTH: int = int(os.getenv("GLOBAL_SEARCH_MIN_LENGTH", "3"))  # символов запроса
+        self.RESOLVE_CONCURRENCY: int = int(os.getenv("RESOLVE_CONCURRENCY", "4"))  # каналов вне диалогов, разрешаемых по одному одновременно
+        
+        # Кеш количества подписчиков каналов
+        self.SUBSCRIBERS_CACHE_TTL: int = int(os.getenv("SUBSCRIBERS_CACHE_TTL", "3600"))  # секунды
+        self.SUBSCRIBERS_CONCURRENCY: int = int(os.getenv("SUBSCRIBERS_CONCURRENCY", "4"))
+        
+        # Время жизни кеша авторов комментариев
+        self.USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "3600"))  # секунды
+        
+        # Настройки хранилища данных
+        self.DATA_DIR: str = os.getenv("DATA_DIR", "data")
+        self.STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "json")  # json, sqlite, segment или partitioned
+        self.PARTITION_GRANULARITY: str = os.getenv("PARTITION_GRANULARITY", "day")  # day или month
+        self.STORAGE_COMPRESSION: str = os.getenv("STORAGE_COMPRESSION", "json")  # json (без сжатия), zlib или lzma
+        
+        # Настройки фоновой записи
+        self.WRITE_QUEUE_SIZE: int = int(os.getenv("WRITE_QUEUE_SIZE", "10000"))
+        self.WRITE_BATCH_SIZE: int = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+        self.WRITE_FLUSH_INTERVAL: float = float(os.getenv("WRITE_FLUSH_INTERVAL", "0.5"))  # секунды
+        self.WRITE_WAIT_TIMEOUT: float = float(os.getenv("WRITE_WAIT_TIMEOUT", "5"))  # секунды ожидания записи из очереди
+        
+        # Пул потоков для файловых операций асинхронного API данных
+        self.DATA_IO_WORKERS: int = int(os.getenv("DATA_IO_WORKERS", "8"))
+        
+        # Политика хранения исходных записей по умолчанию (0 — хранить бессрочно)
+        self.RETENTION_RAW_DAYS: int = int(os.getenv("RETENTION_RAW_DAYS", "0"))
+        self.RETENTION_ACTION: str = os.getenv("RETENTION_ACTION", "delete")  # delete или archive
+        self.RETENTION_INTERVAL: float = float(os.getenv("RETENTION_INTERVAL", "3600"))  # секунды
+        self.RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+        self.RETENTION_BATCH_PAUSE: float = float(os.getenv("RETENTION_BATCH_PAUSE", "0.5"))  # секунды
+        
+        # Фоновой полосе планировщика должен оставаться хотя бы один слот
+        if not 0 <= self.RPC_INTERACTIVE_SLOTS < self.RPC_CONCURRENCY:
+            raise ValueError(
+                f"RPC_INTERACTIVE_SLOTS ({self.RPC_INTERACTIVE_SLOTS}) должно быть не меньше 0 "
+                f"и меньше RPC_CONCURRENCY ({self.RPC_CONCURRENCY})"
+            )
 
 # Создаем глобальный экземпляр настроек
 settings = Settings()
@@ -1,5 +1,27 @@
 import logging
 from services.telegram_service import TelegramService
+from services.data_service import DataService
+from services.write_queue import BackgroundWriter
+from services.async_data_service import AsyncDataService
+from services.retention import RetentionPruner
+from services.channel_sync import ChannelSync
+from services.backfill import BackfillManager
 
 # Инициализация глобального экземпляра Telegram-сервиса
-telegram_service = TelegramService()
\ No newline at end of file
+telegram_service = TelegramService()
+
+# Инициализация глобального сервиса данных и фоновой записи в него
+data_service = DataService()
+data_writer = BackgroundWriter(data_service)
+
+# Асинхронный доступ к данным для обработчиков в цикле событий
+async_data_service = AsyncDataService(data_service)
+
+# Фоновое применение политик хранения исходных записей
+retention_pruner = RetentionPruner(data_service)
+
+# Инкрементальная синхронизация сообщений каналов с хранилищем
+channel_sync = ChannelSync(telegram_service, async_data_service)
+
+# Полная загрузка истории каналов с возобновлением
+backfill_manager = BackfillManager(telegram_service, async_data_service, channel_sync)
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from config import settings
-from routers import auth, channels, messages, comments, analysis, export, user, websocket
+from routers import auth, channels, messages, comments, analysis, export, user, websocket, retention, backfill
 
 from services.telegram_service import TelegramService
 
@@ -16,19 +16,28 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Инициализация глобального экземпляра Telegram-сервиса
-from dependencies import telegram_service
+from dependencies import telegram_service, data_service, data_writer, async_data_service, retention_pruner, channel_sync, backfill_manager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Код, выполняемый при запуске приложения
     logger.info("Инициализация приложения Telegram News API")
+    data_writer.start()
+    retention_pruner.start()
     
     yield
     
     # Код, выполняемый при остановке приложения
     logger.info("Завершение работы приложения")
-    # Закрываем все активные клиенты Telegram
+    # Останавливаем загрузку истории (задания возобновятся после запуска) и закрываем все активные клиенты Telegram
+    await backfill_manager.close()
     await telegram_service.close_all_clients()
+    # Останавливаем удаление устаревших записей, сохраняем накопленные записи и закрываем хранилище
+    retention_pruner.close()
+    channel_sync.close()
+    data_writer.close()
+    async_data_service.close()
+    data_service.close()
 
 # Создание экземпляра FastAPI
 app = FastAPI(
@@ -57,6 +66,8 @@ app.include_router(comments.router, prefix=f"{settings.API_PREFIX}/comments", ta
 app.include_router(analysis.router, prefix=f"{settings.API_PREFIX}/analysis", tags=["Анализ"])
 app.include_router(export.router, prefix=f"{settings.API_PREFIX}/export", tags=["Экспорт"])
 app.include_router(user.router, prefix=f"{settings.API_PREFIX}/user", tags=["Пользователь"])
+app.include_router(retention.router, prefix=f"{settings.API_PREFIX}/retention", tags=["Хранение"])
+app.include_router(backfill.router, prefix=f"{settings.API_PREFIX}/backfill", tags=["Загрузка истории"])
 app.include_router(websocket.router, prefix=f"{settings.API_PREFIX}/ws", tags=["WebSocket"])
 
 @app.get("/", tags=["Статус"])
@@ -69,6 +80,31 @@ async def health_check():
     """Endpoint для проверки работоспособности API."""
     return {"status": "healthy"}
 
+@app.get("/stats/storage", tags=["Статус"])
+async def storage_stats():
+    """Endpoint с метриками фоновой записи, пула ввода-вывода, кеша, пропущенных записей и политик хранения."""
+    return {
+        "write_queue": data_writer.get_stats(),
+        "io_pool": async_data_service.get_stats(),
+        "cache": data_service.cache.get_stats(),
+        "upserts": data_service.hashes.get_stats(),
+        "retention": retention_pruner.get_stats()
+    }
+
+@app.get("/stats/telegram", tags=["Статус"])
+async def telegram_stats():
+    """Endpoint с метриками кешей и планировщиков запросов Telegram, источников количества комментариев, синхронизации и загрузки истории."""
+    return {
+        "cache": telegram_service.cache.get_stats(),
+        "entities": telegram_service.entities.get_stats(),
+        "users": telegram_service.users.get_stats(),
+        "subscribers": telegram_service.subscribers.get_stats(),
+        "replies": dict(telegram_service.replies_stats),
+        "rpc": telegram_service.get_rpc_stats(),
+        "sync": channel_sync.get_stats(),
+        "backfill": backfill_manager.get_stats()
+    }
+
 # Запуск приложения при прямом вызове файла
 if __name__ == "__main__":
     import uvicorn
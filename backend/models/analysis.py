@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class SentimentAnalysisRequest(BaseModel):
     """Запрос на анализ тональности текста."""
@@ -17,4 +17,51 @@ class KeywordExtractionRequest(BaseModel):
 
 class KeywordExtractionResponse(BaseModel):
     """Результат извлечения ключевых слов из текста."""
-    keywords: List[str]
\ No newline at end of file
+    keywords: List[str]
+
+class EngagementBucket(BaseModel):
+    """Интервал временного ряда вовлеченности."""
+    start: int  # начало интервала, миллисекунды UTC
+    samples: int
+    messages: int
+    total: float
+    growth: float
+    rate: float  # прирост в час
+    percentiles: Dict[str, float]
+
+class EngagementSeriesResponse(BaseModel):
+    """Временной ряд вовлеченности канала."""
+    channel_id: str
+    metric: str
+    bucket: str
+    buckets: List[EngagementBucket]
+
+class AuthorCount(BaseModel):
+    """Количество комментариев автора."""
+    user_id: str
+    count: int
+
+class SummaryStatistics(BaseModel):
+    """Сводная статистика по каналу, сообщению или группе каналов."""
+    messages: int = 0
+    comments: int = 0
+    views_sum: int = 0
+    forwards_sum: int = 0
+    reactions_total: int = 0
+    comments_with_reactions: int = 0
+    text_length_sum: int = 0
+    message_date_min: Optional[str] = None
+    message_date_max: Optional[str] = None
+    comment_date_min: Optional[str] = None
+    comment_date_max: Optional[str] = None
+    avg_views: float = 0.0
+    avg_comment_length: float = 0.0
+    sentiment: Dict[str, int] = {}
+    comments_by_hour: List[int] = []  # 24 значения, часы по дате комментария
+    unique_authors: int = 0
+    top_authors: List[AuthorCount] = []
+
+class ChannelStatsResponse(BaseModel):
+    """Сводная статистика по каналам и итог по всем выбранным каналам."""
+    channels: Dict[str, SummaryStatistics]
+    total: SummaryStatistics
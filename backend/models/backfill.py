@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class BackfillStart(BaseModel):
+    """Запрос на полную загрузку истории канала."""
+    channel_id: str
+
+class BackfillJob(BaseModel):
+    """Задание полной загрузки истории канала."""
+    job_id: str
+    channel_id: str
+    status: str  # queued, running, waiting, completed, failed или cancelled
+    offset_id: int  # контрольная точка: сообщения новее нее уже сохранены
+    fetched: int
+    total: Optional[int] = None  # количество сообщений в канале по данным Telegram
+    progress: Optional[float] = None  # доля от 0 до 1
+    active: bool = False  # задание выполняется в этом процессе
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
@@ -43,6 +43,13 @@ class CommentList(BaseModel):
     """Модель для списка комментариев."""
     comments: List[CommentInfo]
     total: int
+    next_cursor: Optional[str] = None  # Курсор следующей страницы, None на последней
+
+class CommentAuthor(BaseModel):
+    """Модель для сведений об авторе комментария."""
+    user_id: str
+    name: Optional[str] = None
+    username: Optional[str] = None
 
 class CommentMetadataUpdate(BaseModel):
     """Модель для обновления метаданных комментария."""
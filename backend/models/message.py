@@ -26,4 +26,7 @@ class MessageSearch(BaseModel):
 class MessageList(BaseModel):
     """Модель для списка сообщений."""
     messages: List[MessageInfo]
-    total: int
\ No newline at end of file
+    total: int
+    next_cursor: Optional[str] = None  # Курсор следующей страницы, None на последней
+    channel_status: Optional[Dict[str, str]] = None  # Статус каждого канала: ok, not_found или error
+    partial: bool = False  # True, если часть каналов не удалось опросить
\ No newline at end of file
@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class RetentionPolicy(BaseModel):
+    """Политика хранения исходных записей канала."""
+    raw_days: Optional[int] = Field(None, ge=1)  # срок хранения в днях, None — бессрочно
+    action: str = Field("delete", regex="^(delete|archive)$")
+
+class RetentionPoliciesResponse(BaseModel):
+    """Политика по умолчанию и собственные политики каналов."""
+    default: RetentionPolicy
+    channels: Dict[str, RetentionPolicy]
+
+class RetentionRunResponse(BaseModel):
+    """Результат однократного применения политик хранения."""
+    messages: int
+    comments: int
+
+class DailyRollup(BaseModel):
+    """Дневная сводка по удаленным записям канала."""
+    day: str  # YYYY-MM-DD, UTC
+    messages: int
+    comments: int
+    views_sum: int
+    forwards_sum: int
+    reactions_total: int
+    comments_with_reactions: int
+    text_length_sum: int
+    sentiment: Dict[str, int]
+
+class DailyRollupsResponse(BaseModel):
+    """Дневные сводки канала."""
+    channel_id: str
+    rollups: List[DailyRollup]
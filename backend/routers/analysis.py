@@ -1,9 +1,12 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Query, Body
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Body, Path
+from typing import Dict, Any, List, Optional
+from datetime import datetime
 
 from models.analysis import SentimentAnalysisRequest, SentimentAnalysisResponse, KeywordExtractionRequest, KeywordExtractionResponse
+from models.analysis import EngagementSeriesResponse, ChannelStatsResponse, SummaryStatistics
 from services.analysis_service import AnalysisService
+from dependencies import async_data_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -71,4 +74,53 @@ async def categorize_text(
         }
     except Exception as e:
         logger.error(f"Ошибка определения категории: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Ошибка определения категории: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка определения категории: {str(e)}")
+
+@router.get("/engagement/{channel_id}", response_model=EngagementSeriesResponse)
+async def get_engagement_series(
+    channel_id: str = Path(..., description="ID канала"),
+    metric: str = Query("views", description="Метрика: views, forwards, comments_count или reactions_total"),
+    bucket: str = Query("day", description="Интервал агрегации: hour или day"),
+    date_from: Optional[datetime] = Query(None, description="Начальная дата"),
+    date_to: Optional[datetime] = Query(None, description="Конечная дата"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Динамика вовлеченности канала по интервалам времени."""
+    try:
+        buckets = await async_data_service.get_engagement_series(channel_id, metric, bucket, date_from, date_to)
+        return EngagementSeriesResponse(
+            channel_id=channel_id,
+            metric=metric,
+            bucket=bucket,
+            buckets=buckets
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка получения динамики вовлеченности: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения динамики вовлеченности: {str(e)}")
+
+@router.get("/stats/channels", response_model=ChannelStatsResponse)
+async def get_channel_stats(
+    channel_ids: str = Query(..., description="Список ID каналов через запятую"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Сводная статистика по каналам без загрузки сообщений и комментариев."""
+    try:
+        channel_list = [channel_id for channel_id in channel_ids.split(',') if channel_id]
+        return await async_data_service.get_channel_stats(channel_list)
+    except Exception as e:
+        logger.error(f"Ошибка получения статистики каналов: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения статистики каналов: {str(e)}")
+
+@router.get("/stats/messages/{message_id}", response_model=SummaryStatistics)
+async def get_message_stats(
+    message_id: str = Path(..., description="ID сообщения"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Сводная статистика по сообщению и его комментариям."""
+    try:
+        return await async_data_service.get_message_stats(message_id)
+    except Exception as e:
+        logger.error(f"Ошибка получения статистики сообщения: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения статистики сообщения: {str(e)}")
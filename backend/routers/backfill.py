@@ -0,0 +1,72 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query, Path
+from typing import List
+
+from models.backfill import BackfillStart, BackfillJob
+from dependencies import telegram_service, backfill_manager
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _session_job(job_id: str, session_key: str):
+    """Возвращает задание сессии или 404."""
+    job = backfill_manager.get(job_id)
+    if job is None or job["session_key"] != session_key:
+        raise HTTPException(status_code=404, detail="Задание загрузки истории не найдено")
+    return job
+
+@router.post("/jobs", response_model=BackfillJob)
+async def start_backfill(
+    request: BackfillStart,
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Запуск полной загрузки истории канала (или возврат уже активного задания канала)."""
+    if not telegram_service.is_authorized(session_key):
+        raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
+    
+    try:
+        return backfill_manager.start(session_key, request.channel_id)
+    except Exception as e:
+        logger.error(f"Ошибка запуска загрузки истории: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка запуска загрузки истории: {str(e)}")
+
+@router.get("/jobs", response_model=List[BackfillJob])
+async def list_backfills(
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Задания загрузки истории сессии, новые первыми."""
+    return backfill_manager.list(session_key)
+
+@router.get("/jobs/{job_id}", response_model=BackfillJob)
+async def get_backfill(
+    job_id: str = Path(..., description="ID задания"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Состояние задания загрузки истории."""
+    return _session_job(job_id, session_key)
+
+@router.post("/jobs/{job_id}/resume", response_model=BackfillJob)
+async def resume_backfill(
+    job_id: str = Path(..., description="ID задания"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Возобновление задания с контрольной точки (в том числе после ошибки или отмены)."""
+    if not telegram_service.is_authorized(session_key):
+        raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
+    
+    _session_job(job_id, session_key)
+    resumed = backfill_manager.resume(session_key, job_id)
+    if not resumed:
+        raise HTTPException(status_code=400, detail="Задание уже завершено")
+    return resumed[0]
+
+@router.delete("/jobs/{job_id}")
+async def cancel_backfill(
+    job_id: str = Path(..., description="ID задания"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Отмена задания; загруженные сообщения остаются в хранилище."""
+    _session_job(job_id, session_key)
+    if not backfill_manager.cancel(job_id):
+        raise HTTPException(status_code=400, detail="Задание уже завершено")
+    return {"status": "success"}
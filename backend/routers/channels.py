@@ -9,7 +9,7 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Получаем глобальный экземпляр Telegram-сервиса
-from main import telegram_service
+from dependencies import telegram_service
 
 @router.get("/search", response_model=List[ChannelInfo])
 async def search_channels(
@@ -3,14 +3,23 @@ from fastapi import APIRouter, HTTPException, Depends, Query, Path, Body
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from models.comment import CommentInfo, CommentSearch, CommentList, CommentMetadataUpdate
+from config import settings
+from models.comment import CommentInfo, CommentSearch, CommentList, CommentMetadataUpdate, CommentAuthor
 from services.telegram_service import TelegramService
+from services.pagination import make_page, comment_key
+from services.records import to_dicts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Получаем глобальный экземпляр Telegram-сервиса
-from dependencies import telegram_service
+from dependencies import telegram_service, async_data_service, data_writer
+
+def _store_comments(comments: List[Any]) -> None:
+    """Ставит полученные из Telegram комментарии в очередь записи, чтобы их метаданные можно было изменять."""
+    for comment in comments:
+        if not data_writer.submit_comment(comment):
+            break
 
 @router.get("/channels/{channel_id}/messages/{message_id}/comments", response_model=List[CommentInfo])
 async def get_message_comments(
@@ -27,7 +36,8 @@ async def get_message_comments(
         comments = await telegram_service.get_message_comments(
             session_key, channel_id, message_id, limit
         )
-        return comments
+        _store_comments(comments)
+        return to_dicts(comments)
     except Exception as e:
         logger.error(f"Ошибка получения комментариев: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка получения комментариев: {str(e)}")
@@ -43,9 +53,16 @@ async def search_comments(
     user_tags: Optional[str] = Query(None, description="Список тегов через запятую"),
     limit: int = Query(100, ge=1, le=500, description="Максимальное количество результатов"),
     offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из next_cursor"),
+    source: str = Query("telegram", regex="^(telegram|local)$",
+                        description="Где искать: telegram — в обсуждениях Telegram, local — в сохраненных комментариях"),
     session_key: str = Query(..., description="Ключ сессии")
 ):
-    """Поиск комментариев по параметрам."""
+    """Поиск комментариев по параметрам.
+    
+    Поиск по сохраненным комментариям (source=local) выполняется по полнотекстовому
+    индексу с учетом словоформ и листается только курсором.
+    """
     if not telegram_service.is_authorized(session_key):
         raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
     
@@ -55,50 +72,119 @@ async def search_comments(
         message_list = messages.split(',') if messages else None
         tag_list = user_tags.split(',') if user_tags else None
         
-        # Пример реализации поиска комментариев
-        # В реальном приложении здесь будет более сложная логика
-        comments = []
+        if source == "local":
+            if offset:
+                raise ValueError("Поиск по сохраненным комментариям листается курсором, а не смещением")
+            page = await async_data_service.search_comments_page(
+                query=query, channel_ids=channel_list, message_ids=message_list,
+                date_from=date_from.isoformat() if date_from else None,
+                date_to=date_to.isoformat() if date_to else None,
+                sentiment=sentiment, user_tags=tag_list, limit=limit, cursor=cursor
+            )
+            return CommentList(
+                comments=page["comments"],
+                total=len(page["comments"]),
+                next_cursor=page["next_cursor"]
+            )
+        
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+        comments = await telegram_service.search_comments(
+            session_key, query, channel_list, message_list, date_from, date_to, sentiment, tag_list,
+            limit=limit + 1, offset=offset, cursor=cursor
+        )
+        comments, next_cursor = make_page(comments, limit, comment_key)
+        _store_comments(comments)
         
-        # Для демонстрации возвращаем пустой список
         return CommentList(
-            comments=comments,
-            total=len(comments)
+            comments=to_dicts(comments),
+            total=len(comments),
+            next_cursor=next_cursor
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка поиска комментариев: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка поиска комментариев: {str(e)}")
 
+@router.get("/saved", response_model=CommentList)
+async def search_saved_comments(
+    channels: Optional[str] = Query(None, description="Список ID каналов через запятую"),
+    sentiment: Optional[str] = Query(None, description="Тональность комментария"),
+    user_tags: Optional[str] = Query(None, description="Список тегов через запятую"),
+    is_bookmarked: Optional[bool] = Query(None, description="Только комментарии в закладках (true) или без закладки (false)"),
+    limit: int = Query(100, ge=1, le=500, description="Максимальное количество результатов"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из next_cursor"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Выборка сохраненных комментариев по тональности, тегам и закладкам.
+    
+    Фильтры вычисляются по индексу метаданных, поэтому выборка не читает
+    тексты всех комментариев.
+    """
+    if not telegram_service.is_authorized(session_key):
+        raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
+    
+    try:
+        channel_list = channels.split(',') if channels else None
+        tag_list = user_tags.split(',') if user_tags else None
+        
+        page = await async_data_service.search_comments_page(
+            channel_ids=channel_list, sentiment=sentiment, user_tags=tag_list,
+            is_bookmarked=is_bookmarked, limit=limit, cursor=cursor
+        )
+        return CommentList(
+            comments=page["comments"],
+            total=len(page["comments"]),
+            next_cursor=page["next_cursor"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка выборки сохраненных комментариев: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка выборки сохраненных комментариев: {str(e)}")
+
+@router.get("/authors", response_model=Dict[str, CommentAuthor])
+async def get_comment_authors(
+    user_ids: str = Query(..., description="Список ID авторов через запятую"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Имена авторов комментариев одним запросом."""
+    if not telegram_service.is_authorized(session_key):
+        raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
+    
+    try:
+        user_list = [user_id for user_id in user_ids.split(',') if user_id]
+        return await telegram_service.get_author_names(session_key, user_list)
+    except Exception as e:
+        logger.error(f"Ошибка получения авторов комментариев: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения авторов комментариев: {str(e)}")
+
 @router.patch("/{comment_id}/metadata", response_model=CommentInfo)
 async def update_comment_metadata(
     comment_id: str = Path(..., description="ID комментария"),
     update: CommentMetadataUpdate = Body(..., description="Данные для обновления метаданных"),
     session_key: str = Query(..., description="Ключ сессии")
 ):
-    """Обновление метаданных комментария."""
+    """Обновление метаданных комментария.
+    
+    Полученные из Telegram комментарии сохраняются через очередь записи,
+    поэтому комментарий, которого еще нет в хранилище, ищется повторно
+    после фиксации очереди.
+    """
     if not telegram_service.is_authorized(session_key):
         raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
     
     try:
-        # Пример реализации обновления метаданных
-        # В реальном приложении здесь будет более сложная логика
+        metadata = update.dict(exclude_none=True)
+        updated = await async_data_service.update_comment_metadata(comment_id, metadata)
+        if not updated and await data_writer.wait_flushed(settings.WRITE_WAIT_TIMEOUT):
+            updated = await async_data_service.update_comment_metadata(comment_id, metadata)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Комментарий не найден")
         
-        # Заглушка для примера
-        return {
-            "comment_id": comment_id,
-            "message_id": "m123456",
-            "channel_id": "ch789",
-            "user_id": "u456",
-            "text": "Пример комментария",
-            "date": datetime.now().isoformat(),
-            "reactions": [],
-            "media": [],
-            "is_edited": False,
-            "metadata": {
-                "sentiment": update.sentiment or "neutral",
-                "user_tags": update.user_tags or [],
-                "is_bookmarked": update.is_bookmarked or False
-            }
-        }
+        return await async_data_service.get_comment(comment_id)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка обновления метаданных комментария: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка обновления метаданных комментария: {str(e)}")
\ No newline at end of file
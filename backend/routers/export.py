@@ -7,6 +7,7 @@ from enum import Enum
 from models.export import ExportFormat, MessageExportOptions, CommentExportOptions
 from services.export_service import ExportService
 from services.telegram_service import TelegramService
+from services.records import to_dicts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -33,9 +34,8 @@ async def export_messages(
         # Преобразуем параметры
         channel_list = channel_ids.split(',')
         
-        # Получаем сообщения для экспорта
-        # В реальном приложении здесь будет логика получения сообщений из базы данных
-        messages = []
+        # Получаем сообщения за период из Telegram
+        messages = to_dicts(await telegram_service.get_messages_in_range(session_key, channel_list, date_from, date_to))
         
         # Экспортируем в выбранном формате
         if format.lower() == 'csv':
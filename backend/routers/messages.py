@@ -5,12 +5,14 @@ from datetime import datetime
 
 from models.message import MessageInfo, MessageSearch, MessageList
 from services.telegram_service import TelegramService
+from services.pagination import make_page, message_key
+from services.records import to_dicts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Получаем глобальный экземпляр Telegram-сервиса
-from dependencies import telegram_service
+from dependencies import telegram_service, async_data_service, channel_sync
 
 @router.get("/channels/{channel_id}/messages", response_model=List[MessageInfo])
 async def get_channel_messages(
@@ -19,15 +21,18 @@ async def get_channel_messages(
     limit: int = Query(50, ge=1, le=100, description="Максимальное количество сообщений"),
     offset_id: int = Query(0, ge=0, description="ID сообщения, с которого начинать")
 ):
-    """Получение сообщений канала."""
+    """Получение сообщений канала.
+    
+    Новые и недавно измененные сообщения синхронизируются с локальным
+    хранилищем, страницы уже синхронизированного диапазона отдаются из него.
+    """
     if not telegram_service.is_authorized(session_key):
         raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
     
     try:
-        messages = await telegram_service.get_channel_messages(
+        return await channel_sync.get_channel_messages(
             session_key, channel_id, limit, offset_id
         )
-        return messages
     except Exception as e:
         logger.error(f"Ошибка получения сообщений канала: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка получения сообщений канала: {str(e)}")
@@ -43,16 +48,12 @@ async def get_message_by_id(
         raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
     
     try:
-        # Получаем все сообщения и ищем нужное
-        messages = await telegram_service.get_channel_messages(
-            session_key, channel_id, limit=100
-        )
+        message = await telegram_service.get_message_by_id(session_key, channel_id, message_id)
         
-        for message in messages:
-            if message["message_id"] == message_id:
-                return message
+        if not message:
+            raise HTTPException(status_code=404, detail="Сообщение не найдено")
         
-        raise HTTPException(status_code=404, detail="Сообщение не найдено")
+        return message
     except HTTPException:
         raise
     except Exception as e:
@@ -67,9 +68,16 @@ async def search_messages(
     date_to: Optional[datetime] = Query(None, description="Конечная дата"),
     limit: int = Query(50, ge=1, le=100, description="Максимальное количество результатов"),
     offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из next_cursor"),
+    source: str = Query("telegram", regex="^(telegram|local)$",
+                        description="Где искать: telegram — в каналах Telegram, local — в сохраненных сообщениях"),
     session_key: str = Query(..., description="Ключ сессии")
 ):
-    """Поиск сообщений по параметрам."""
+    """Поиск сообщений по параметрам.
+    
+    Поиск по сохраненным сообщениям (source=local) выполняется по полнотекстовому
+    индексу с учетом словоформ и листается только курсором.
+    """
     if not telegram_service.is_authorized(session_key):
         raise HTTPException(status_code=401, detail="Требуется авторизация в Telegram")
     
@@ -77,15 +85,38 @@ async def search_messages(
         # Преобразуем параметры
         channel_list = channels.split(',') if channels else None
         
-        # Пример реализации поиска сообщений
-        # В реальном приложении здесь будет более сложная логика
-        messages = []
+        if source == "local":
+            if offset:
+                raise ValueError("Поиск по сохраненным сообщениям листается курсором, а не смещением")
+            page = await async_data_service.search_messages_page(
+                query=query, channel_ids=channel_list,
+                date_from=date_from.isoformat() if date_from else None,
+                date_to=date_to.isoformat() if date_to else None,
+                limit=limit, cursor=cursor
+            )
+            return MessageList(
+                messages=page["messages"],
+                total=len(page["messages"]),
+                next_cursor=page["next_cursor"]
+            )
+        
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+        channel_status: Dict[str, str] = {}
+        messages = await telegram_service.search_messages(
+            session_key, query, channel_list, date_from, date_to,
+            limit=limit + 1, offset=offset, cursor=cursor, channel_status=channel_status
+        )
+        messages, next_cursor = make_page(messages, limit, message_key)
         
-        # Для демонстрации возвращаем пустой список
         return MessageList(
-            messages=messages,
-            total=len(messages)
+            messages=to_dicts(messages),
+            total=len(messages),
+            next_cursor=next_cursor,
+            channel_status=channel_status or None,
+            partial=any(value != "ok" for value in channel_status.values())
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка поиска сообщений: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка поиска сообщений: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,68 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query, Path
+from typing import Optional
+
+from models.retention import RetentionPolicy, RetentionPoliciesResponse, RetentionRunResponse, DailyRollupsResponse
+from dependencies import async_data_service, retention_pruner
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/policies", response_model=RetentionPoliciesResponse)
+async def get_policies(
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Политика хранения по умолчанию и политики отдельных каналов."""
+    return {"default": retention_pruner.policies.default, "channels": retention_pruner.policies.get_all()}
+
+@router.put("/policies/{channel_id}", response_model=RetentionPolicy)
+async def set_policy(
+    policy: RetentionPolicy,
+    channel_id: str = Path(..., description="ID канала"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Задание политики хранения канала."""
+    try:
+        return retention_pruner.policies.set(channel_id, policy.raw_days, policy.action)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка сохранения политики хранения: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка сохранения политики хранения: {str(e)}")
+
+@router.delete("/policies/{channel_id}")
+async def delete_policy(
+    channel_id: str = Path(..., description="ID канала"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Удаление политики канала: к каналу применяется политика по умолчанию."""
+    if not retention_pruner.policies.remove(channel_id):
+        raise HTTPException(status_code=404, detail="Политика хранения канала не найдена")
+    return {"status": "success"}
+
+@router.post("/run", response_model=RetentionRunResponse)
+async def run_retention(
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Немедленное применение политик хранения."""
+    try:
+        removed = await async_data_service.apply_retention(retention_pruner)
+        return {"messages": removed["message"], "comments": removed["comment"]}
+    except Exception as e:
+        logger.error(f"Ошибка применения политик хранения: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка применения политик хранения: {str(e)}")
+
+@router.get("/rollups/{channel_id}", response_model=DailyRollupsResponse)
+async def get_rollups(
+    channel_id: str = Path(..., description="ID канала"),
+    date_from: Optional[str] = Query(None, description="Первый день (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Последний день (YYYY-MM-DD)"),
+    session_key: str = Query(..., description="Ключ сессии")
+):
+    """Дневные сводки по записям канала, удаленным политикой хранения."""
+    try:
+        rollups = await async_data_service.get_daily_rollups(channel_id, date_from, date_to)
+        return {"channel_id": channel_id, "rollups": rollups}
+    except Exception as e:
+        logger.error(f"Ошибка получения дневных сводок: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения дневных сводок: {str(e)}")
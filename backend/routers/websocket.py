@@ -11,7 +11,7 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Получаем глобальный экземпляр Telegram-сервиса
-from dependencies import telegram_service
+from dependencies import telegram_service, backfill_manager, data_writer
 
 # Хранилище активных WebSocket соединений
 active_connections: Dict[str, WebSocket] = {}
@@ -23,8 +23,10 @@ async def process_websocket_message(data: Dict[str, Any], session_key: str):
     if message_type == "start_monitoring":
         channel_ids = data.get("channels", [])
         
-        # Функция обратного вызова для отправки событий клиенту
+        # Функция обратного вызова: новые сообщения сохраняются и отправляются клиенту
         async def send_event(event_data: Dict[str, Any]):
+            if event_data.get("type") == "new_message":
+                data_writer.submit_message(event_data["data"])
             if session_key in active_connections:
                 await active_connections[session_key].send_text(json.dumps(event_data))
         
@@ -79,6 +81,12 @@ async def websocket_endpoint(websocket: WebSocket, session_key: str):
     # Сохраняем соединение
     active_connections[session_key] = websocket
     
+    # События заданий загрузки истории отправляются в это соединение
+    async def send_backfill_event(event_data: Dict[str, Any]):
+        await websocket.send_text(json.dumps(event_data))
+    
+    backfill_manager.set_listener(session_key, send_backfill_event)
+    
     try:
         # Отправляем подтверждение соединения
         await websocket.send_text(json.dumps({
@@ -87,6 +95,9 @@ async def websocket_endpoint(websocket: WebSocket, session_key: str):
             "timestamp": datetime.now().isoformat()
         }))
         
+        # Возобновляем задания загрузки истории, прерванные перезапуском
+        backfill_manager.resume(session_key)
+        
         # Обрабатываем сообщения от клиента
         while True:
             data = await websocket.receive_text()
@@ -109,6 +120,7 @@ async def websocket_endpoint(websocket: WebSocket, session_key: str):
         # Клиент отключился
         if session_key in active_connections:
             del active_connections[session_key]
+        backfill_manager.remove_listener(session_key)
         logger.info(f"Клиент отключился: {session_key}")
     
     except Exception as e:
@@ -116,4 +128,5 @@ async def websocket_endpoint(websocket: WebSocket, session_key: str):
         logger.error(f"Ошибка WebSocket соединения: {str(e)}")
         if session_key in active_connections:
             del active_connections[session_key]
+        backfill_manager.remove_listener(session_key)
         await websocket.close()
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Сравнение способов кодирования записей хранилища.
+
+Для каждого варианта (JSON с отступами, компактный JSON, zlib, zlib
+со словарем, обученным на выборке записей, и lzma) измеряет размер записи
+и время кодирования и декодирования, а затем записывает набор данных
+в хранилища json и sqlite и замеряет размер на диске, время записи
+и задержку чтения комментария по ID.
+
+Запуск из каталога backend:
+    python -m scripts.benchmark_compression --messages 2000 --comments 20000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Any, Callable, Tuple
+
+from services.storage import create_storage
+from services.storage.codec import RecordCodec
+from scripts.benchmark_storage import generate_dataset
+
+def make_codecs(sample: List[Dict[str, Any]]) -> Dict[str, Callable[[], RecordCodec]]:
+    """Возвращает фабрики кодеков по названию варианта."""
+    def zlib_with_dictionary() -> RecordCodec:
+        codec = RecordCodec("zlib")
+        codec.train(sample)
+        return codec
+    
+    return {
+        "json (отступы)": lambda: RecordCodec(indent=2),
+        "json": lambda: RecordCodec(),
+        "zlib": lambda: RecordCodec("zlib"),
+        "zlib + словарь": zlib_with_dictionary,
+        "lzma": lambda: RecordCodec("lzma"),
+    }
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+def disk_usage(path: str) -> Tuple[int, int]:
+    """Возвращает суммарный размер файлов и занятое ими место на диске в байтах."""
+    size = allocated = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            stat = os.stat(os.path.join(root, filename))
+            size += stat.st_size
+            allocated += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+    return size, allocated
+
+def measure_codec(codec: RecordCodec, records: List[Dict[str, Any]]) -> Dict[str, float]:
+    started = time.perf_counter()
+    encoded = [codec.encode(record) for record in records]
+    encode_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for raw in encoded:
+        codec.decode(raw)
+    decode_time = time.perf_counter() - started
+    
+    return {
+        "байт на запись": sum(map(len, encoded)) / len(records),
+        "кодирование, мкс": encode_time / len(records) * 1e6,
+        "декодирование, мкс": decode_time / len(records) * 1e6,
+    }
+
+def measure_storage(backend: str, codec: RecordCodec, dataset: Dict[str, List[Dict[str, Any]]],
+                    reads: int) -> Dict[str, float]:
+    data_dir = tempfile.mkdtemp(prefix="bench_codec_")
+    storage = create_storage(backend, data_dir, codec=codec)
+    try:
+        started = time.perf_counter()
+        storage.save_messages_bulk(dataset["messages"])
+        storage.save_comments_bulk(dataset["comments"])
+        write_time = time.perf_counter() - started
+        total = len(dataset["messages"]) + len(dataset["comments"])
+        
+        rnd = random.Random(1)
+        latencies = []
+        for _ in range(reads):
+            comment_id = rnd.choice(dataset["comments"])["comment_id"]
+            started = time.perf_counter()
+            storage.get_comment(comment_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        
+        size, allocated = disk_usage(data_dir)
+        return {
+            "данные, МБ": size / 1024 / 1024,
+            "на диске, МБ": allocated / 1024 / 1024,
+            "запись, мкс/запись": write_time / total * 1e6,
+            "чтение p50, мс": percentile(latencies, 0.5),
+            "чтение p95, мс": percentile(latencies, 0.95),
+        }
+    finally:
+        storage.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def print_table(title: str, results: Dict[str, Dict[str, float]]) -> None:
+    names = list(results)
+    print(f"\n{title}")
+    print(f"{'метрика':<22}" + "".join(f"{name:>16}" for name in names))
+    for metric in results[names[0]]:
+        print(f"{metric:<22}" + "".join(f"{results[name][metric]:>16.2f}" for name in names))
+
+def main():
+    parser = argparse.ArgumentParser(description="Размер и скорость вариантов кодирования записей")
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--sample", type=int, default=1000, help="Записей для обучения словаря")
+    parser.add_argument("--reads", type=int, default=2000, help="Чтений по ID на хранилище")
+    parser.add_argument("--backends", default="json,sqlite", help="Хранилища через запятую")
+    args = parser.parse_args()
+    
+    dataset = generate_dataset(args.channels, args.messages, args.comments)
+    records = dataset["messages"] + dataset["comments"]
+    sample = random.Random(0).sample(records, min(args.sample, len(records)))
+    codecs = make_codecs(sample)
+    
+    print_table("Кодек", {name: measure_codec(factory(), records) for name, factory in codecs.items()})
+    for backend in args.backends.split(","):
+        print_table(
+            f"Хранилище {backend}",
+            {name: measure_storage(backend, factory(), dataset, args.reads) for name, factory in codecs.items()}
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Задержка цикла событий при параллельных обращениях к DataService.
+
+Запускает в цикле событий «пульс» — корутину, которая каждую миллисекунду
+засыпает и измеряет, насколько позже запланированного она проснулась, —
+и параллельно выполняет смешанную нагрузку чтения и записи двумя способами:
+синхронными вызовами DataService прямо из корутин и через AsyncDataService.
+
+Запуск из каталога backend:
+    python -m scripts.benchmark_event_loop --backend json --tasks 50 --operations 20
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Any
+
+from services.async_data_service import AsyncDataService
+from services.data_service import DataService
+from services.storage import STORAGE_BACKENDS
+from scripts.benchmark_storage import generate_dataset
+
+HEARTBEAT_INTERVAL = 0.001
+
+async def heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    """Записывает опоздание пробуждения цикла событий в миллисекундах."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append((time.perf_counter() - started - HEARTBEAT_INTERVAL) * 1000)
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+def make_operations(dataset: Dict[str, List[Dict[str, Any]]], count: int, seed: int) -> List[tuple]:
+    """Формирует смешанный список операций: чтения, поиск и обновления метаданных."""
+    rnd = random.Random(seed)
+    channel_ids = [channel["channel_id"] for channel in dataset["channels"]]
+    operations = []
+    for _ in range(count):
+        roll = rnd.random()
+        if roll < 0.4:
+            operations.append(("get_message", (rnd.choice(dataset["messages"])["message_id"],)))
+        elif roll < 0.6:
+            operations.append(("get_message_comments", (rnd.choice(dataset["messages"])["message_id"],)))
+        elif roll < 0.8:
+            operations.append(("search_comments", (None, [rnd.choice(channel_ids)], None, None, None, "negative")))
+        else:
+            comment = rnd.choice(dataset["comments"])
+            operations.append(("update_comment_metadata", (comment["comment_id"], {"is_bookmarked": True})))
+    return operations
+
+async def run_load(service: Any, operations: List[List[tuple]], is_async: bool) -> Dict[str, float]:
+    """Выполняет нагрузку и возвращает задержки цикла событий."""
+    lags: List[float] = []
+    stop = asyncio.Event()
+    pulse = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.05)
+    
+    async def worker(task_operations: List[tuple]) -> None:
+        for name, args in task_operations:
+            if is_async:
+                await getattr(service, name)(*args)
+            else:
+                getattr(service, name)(*args)
+                # Даем циклу событий шанс переключиться, как в обычном обработчике
+                await asyncio.sleep(0)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(task_operations) for task_operations in operations))
+    elapsed = time.perf_counter() - started
+    
+    stop.set()
+    await pulse
+    
+    total = sum(len(task_operations) for task_operations in operations)
+    return {
+        "операций в секунду": total / elapsed,
+        "задержка p50, мс": percentile(lags, 0.5),
+        "задержка p95, мс": percentile(lags, 0.95),
+        "задержка p99, мс": percentile(lags, 0.99),
+        "задержка max, мс": max(lags) if lags else 0.0,
+    }
+
+async def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    dataset = generate_dataset(args.channels, args.messages, args.comments)
+    data_dir = tempfile.mkdtemp(prefix="bench_loop_")
+    data_service = DataService(data_dir, args.backend)
+    async_service = AsyncDataService(data_service, args.workers)
+    
+    try:
+        for channel in dataset["channels"]:
+            data_service.save_channel(channel)
+        data_service.save_messages_bulk(dataset["messages"])
+        data_service.save_comments_bulk(dataset["comments"])
+        
+        operations = [make_operations(dataset, args.operations, seed) for seed in range(args.tasks)]
+        results = {"синхронно": await run_load(data_service, operations, is_async=False)}
+        # Сбрасываем кеш, чтобы второй прогон не получал преимущества от прогретого кеша
+        data_service.cache.clear()
+        results["AsyncDataService"] = await run_load(async_service, operations, is_async=True)
+        return results
+    finally:
+        async_service.close()
+        data_service.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка цикла событий при работе с DataService")
+    parser.add_argument("--backend", default="json", choices=list(STORAGE_BACKENDS))
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=50, help="Параллельных корутин")
+    parser.add_argument("--operations", type=int, default=20, help="Операций на корутину")
+    parser.add_argument("--workers", type=int, default=8, help="Потоков в пуле AsyncDataService")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run_benchmark(args))
+    
+    modes = list(results)
+    print(f"{'метрика':<24}" + "".join(f"{mode:>20}" for mode in modes))
+    for metric in results[modes[0]]:
+        print(f"{metric:<24}" + "".join(f"{results[mode][metric]:>20.2f}" for mode in modes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Сравнение памяти, занимаемой комментариями в разных представлениях.
+
+Загружает синтетические комментарии из JSON-строк (как при чтении хранилища)
+и с помощью tracemalloc измеряет память, удерживаемую списком словарей,
+списком CommentRecord и списком моделей pydantic CommentInfo.
+
+Запуск из каталога backend:
+    python -m scripts.benchmark_records --comments 50000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Any
+
+from models.comment import CommentInfo
+from services.records import CommentRecord
+from scripts.benchmark_storage import generate_dataset
+
+def measure(build: Callable[[List[str]], List[Any]], lines: List[str]) -> Dict[str, float]:
+    """Строит список объектов и возвращает удерживаемую и пиковую память."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = build(lines)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    count = len(objects)
+    del objects
+    return {
+        "удерживается, МБ": current / 1024 / 1024,
+        "пик, МБ": peak / 1024 / 1024,
+        "байт на комментарий": current / count,
+        "построение, с": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Память комментариев: dict, CommentRecord, pydantic")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=50000)
+    args = parser.parse_args()
+    
+    dataset = generate_dataset(10, args.messages, args.comments)
+    # JSON-строки, чтобы каждое представление создавало собственные строки, как при чтении с диска
+    lines = [json.dumps(comment, ensure_ascii=False) for comment in dataset["comments"]]
+    del dataset
+    
+    variants = {
+        "dict": lambda source: [json.loads(line) for line in source],
+        "CommentRecord": lambda source: [CommentRecord.from_dict(json.loads(line)) for line in source],
+        "CommentInfo": lambda source: [CommentInfo(**json.loads(line)) for line in source],
+    }
+    results = {name: measure(build, lines) for name, build in variants.items()}
+    
+    names = list(results)
+    print(f"{'метрика':<24}" + "".join(f"{name:>16}" for name in names))
+    for metric in results[names[0]]:
+        print(f"{metric:<24}" + "".join(f"{results[name][metric]:>16.2f}" for name in names))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Сравнение производительности бэкендов хранилища DataService.
+
+Генерирует синтетический набор каналов, сообщений и комментариев,
+записывает его в каждый бэкенд и замеряет типичные запросы.
+
+Запуск из каталога backend:
+    python -m scripts.benchmark_storage --messages 2000 --comments 20000
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any
+
+from services.storage import STORAGE_BACKENDS
+
+SENTIMENTS = ["positive", "negative", "neutral"]
+TAGS = ["важное", "спам", "вопрос", "цитата", "проверить"]
+WORDS = ["выборы", "экономика", "бюджет", "матч", "новости", "президент", "рынок",
+         "инфляция", "технологии", "интернет", "культура", "наука", "погода", "город"]
+
+def generate_dataset(channels: int, messages: int, comments: int, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    """Генерирует синтетический набор данных."""
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    
+    channel_list = [
+        {"channel_id": str(1000 + i), "title": f"Канал {i}", "is_monitored": i % 2 == 0}
+        for i in range(channels)
+    ]
+    
+    message_list = []
+    for i in range(messages):
+        channel = channel_list[i % channels]
+        message_list.append({
+            "message_id": f"m{i}",
+            "channel_id": channel["channel_id"],
+            "date": (start + timedelta(minutes=i * 7)).isoformat(),
+            "text": " ".join(rnd.choice(WORDS) for _ in range(30)),
+            "media": [],
+            "views": rnd.randint(100, 100000),
+            "forwards": rnd.randint(0, 500),
+            "comments_count": 0,
+            "last_comment_date": None
+        })
+    
+    comment_list = []
+    for i in range(comments):
+        message = message_list[rnd.randrange(messages)]
+        comment_list.append({
+            "comment_id": f"c{i}",
+            "message_id": message["message_id"],
+            "channel_id": message["channel_id"],
+            "user_id": f"u{rnd.randint(1, 5000)}",
+            "reply_to_comment_id": None,
+            "text": " ".join(rnd.choice(WORDS) for _ in range(12)),
+            "date": (datetime.fromisoformat(message["date"]) + timedelta(seconds=rnd.randint(1, 86400))).isoformat(),
+            "reactions": [],
+            "media": [],
+            "is_edited": False,
+            "metadata": {
+                "sentiment": rnd.choice(SENTIMENTS),
+                "user_tags": rnd.sample(TAGS, rnd.randint(0, 2)),
+                "is_bookmarked": rnd.random() < 0.05
+            }
+        })
+    
+    return {"channels": channel_list, "messages": message_list, "comments": comment_list}
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """Возвращает среднее время выполнения в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def run_backend(name: str, dataset: Dict[str, List[Dict[str, Any]]], repeat: int) -> Dict[str, float]:
+    """Записывает набор данных в бэкенд и замеряет запросы."""
+    data_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    storage = STORAGE_BACKENDS[name](data_dir)
+    results = {}
+    
+    try:
+        started = time.perf_counter()
+        for channel in dataset["channels"]:
+            storage.save_channel(channel)
+        for message in dataset["messages"]:
+            storage.save_message(message)
+        for comment in dataset["comments"]:
+            storage.save_comment(comment)
+        results["запись всех записей, с"] = time.perf_counter() - started
+        
+        channel_id = dataset["channels"][0]["channel_id"]
+        message_id = dataset["messages"][len(dataset["messages"]) // 2]["message_id"]
+        middle_date = dataset["messages"][len(dataset["messages"]) // 2]["date"]
+        date_to = (datetime.fromisoformat(middle_date) + timedelta(days=1)).isoformat()
+        
+        results["get_message, мс"] = measure(lambda: storage.get_message(message_id), repeat * 10)
+        results["get_channel_messages, мс"] = measure(lambda: storage.get_channel_messages(channel_id), repeat)
+        results["get_message_comments, мс"] = measure(lambda: storage.get_message_comments(message_id), repeat)
+        results["search_messages (даты), мс"] = measure(
+            lambda: storage.search_messages(channel_ids=[channel_id], date_from=middle_date, date_to=date_to), repeat
+        )
+        results["search_comments (тональность+тег), мс"] = measure(
+            lambda: storage.search_comments(channel_ids=[channel_id], sentiment="negative", user_tags=["важное"]), repeat
+        )
+        results["search_comments (текст), мс"] = measure(
+            lambda: storage.search_comments(query="инфляция бюджет"), repeat
+        )
+    finally:
+        storage.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов хранилища")
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(STORAGE_BACKENDS), help="Бэкенды через запятую")
+    args = parser.parse_args()
+    
+    dataset = generate_dataset(args.channels, args.messages, args.comments)
+    backends = args.backends.split(",")
+    
+    all_results = {name: run_backend(name, dataset, args.repeat) for name in backends}
+    
+    metrics = list(next(iter(all_results.values())).keys())
+    print(f"{'метрика':<42}" + "".join(f"{name:>14}" for name in backends))
+    for metric in metrics:
+        print(f"{metric:<42}" + "".join(f"{all_results[name][metric]:>14.3f}" for name in backends))
+
+if __name__ == "__main__":
+    main()
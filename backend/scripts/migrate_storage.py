@@ -0,0 +1,39 @@
+"""Одноразовая миграция данных из дерева JSON-файлов в другое хранилище.
+
+Запуск из каталога backend:
+    python -m scripts.migrate_storage --data-dir data
+    python -m scripts.migrate_storage --data-dir data --target partitioned --granularity month
+"""
+import argparse
+import logging
+import time
+
+from services.storage.migration import migrate_json_to_sqlite, migrate_json_to_partitioned
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграция данных из JSON в SQLite или разделы по датам")
+    parser.add_argument("--data-dir", default="data", help="Директория с JSON-данными")
+    parser.add_argument("--target", choices=["sqlite", "partitioned"], default="sqlite", help="Целевое хранилище")
+    parser.add_argument("--db-path", default=None, help="Путь к файлу базы данных SQLite")
+    parser.add_argument("--granularity", choices=["day", "month"], default="day", help="Размер раздела")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Записей в одной транзакции")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    
+    started = time.perf_counter()
+    if args.target == "partitioned":
+        counts = migrate_json_to_partitioned(args.data_dir, args.granularity, args.batch_size)
+    else:
+        counts = migrate_json_to_sqlite(args.data_dir, args.db_path, args.batch_size)
+    elapsed = time.perf_counter() - started
+    
+    print(f"Каналов: {counts['channels']}, сообщений: {counts['messages']}, "
+          f"комментариев: {counts['comments']} за {elapsed:.1f} с")
+    if args.target == "partitioned":
+        print(f"Для переключения установите STORAGE_BACKEND=partitioned и PARTITION_GRANULARITY={args.granularity}")
+    else:
+        print("Для переключения установите STORAGE_BACKEND=sqlite")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Обучение словаря сжатия записей на выборке сохраненных данных.
+
+Требует STORAGE_COMPRESSION=zlib. После обучения новые записи сжимаются
+новым словарем; с флагом --recompress все сохраненные записи перезаписываются
+сразу.
+
+Запуск из каталога backend:
+    python -m scripts.train_compression_dictionary --sample 2000 --recompress
+"""
+import argparse
+import logging
+import time
+
+from services.data_service import DataService
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение словаря сжатия записей")
+    parser.add_argument("--data-dir", default=None, help="Директория данных (по умолчанию DATA_DIR)")
+    parser.add_argument("--sample", type=int, default=1000, help="Размер выборки записей")
+    parser.add_argument("--recompress", action="store_true", help="Перезаписать все записи новым словарем")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Записей в одной пакетной записи")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    
+    data_service = DataService(args.data_dir)
+    try:
+        started = time.perf_counter()
+        dictionary_id = data_service.train_compression_dictionary(args.sample)
+        print(f"Словарь {dictionary_id:08x} обучен за {time.perf_counter() - started:.1f} с")
+        
+        if args.recompress:
+            started = time.perf_counter()
+            counts = data_service.recompress_records(args.batch_size)
+            print(f"Перезаписано каналов: {counts['channels']}, сообщений: {counts['messages']}, "
+                  f"комментариев: {counts['comments']} за {time.perf_counter() - started:.1f} с")
+    finally:
+        data_service.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import logging
 import re
 import nltk
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable
 from textblob import TextBlob
 from collections import Counter
 
+from services.records import CommentRecord
+
 # Скачиваем необходимые ресурсы для NLTK
 try:
     nltk.data.find('tokenizers/punkt')
@@ -57,6 +59,31 @@ class AnalysisService:
             logger.error(f"Ошибка при анализе тональности: {str(e)}")
             return "neutral", 0.0
     
+    def analyze_comments(self, comments: Iterable[CommentRecord]) -> Dict[str, int]:
+        """Определяет тональность комментариев и считает их распределение.
+        
+        Тональность записывается в поле sentiment каждой записи. Одинаковые
+        тексты анализируются один раз.
+        
+        Args:
+            comments: Записи комментариев
+            
+        Returns:
+            Dict[str, int]: Количество комментариев по тональности
+        """
+        distribution = Counter()
+        known: Dict[str, str] = {}
+        
+        for comment in comments:
+            sentiment = known.get(comment.text)
+            if sentiment is None:
+                sentiment, _ = self.analyze_sentiment(comment.text)
+                known[comment.text] = sentiment
+            comment.sentiment = sentiment
+            distribution[sentiment] += 1
+        
+        return dict(distribution)
+    
     def extract_keywords(self, text: str, limit: int = 5) -> List[str]:
         """Извлекает ключевые слова из текста.
         
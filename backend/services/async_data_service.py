@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class AsyncDataService:
+    """Асинхронный фасад DataService.
+    
+    Файловые операции выполняются в отдельном ограниченном пуле потоков,
+    поэтому обработчики FastAPI и Telethon не блокируют цикл событий.
+    Записи в один канал выполняются последовательно: это исключает потерю
+    обновлений при чтении-изменении-записи (update_comment_metadata).
+    Чтения выполняются параллельно и не ждут блокировок каналов.
+    """
+    
+    def __init__(self, data_service, max_workers: Optional[int] = None):
+        """Инициализация фасада.
+        
+        Args:
+            data_service: Синхронный сервис данных
+            max_workers: Количество потоков ввода-вывода (по умолчанию settings.DATA_IO_WORKERS)
+        """
+        self.data_service = data_service
+        self.max_workers = max_workers or settings.DATA_IO_WORKERS
+        
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="data-io")
+        # Ограничивает число задач в пуле: остальные ждут в цикле событий, а не в очереди пула
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Блокировки записи по каналам: ID канала → [блокировка, число пользователей]
+        self._channel_locks: Dict[str, List[Any]] = {}
+        
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+    
+    def close(self) -> None:
+        """Дожидается завершения начатых операций и останавливает пул."""
+        self._executor.shutdown(wait=True)
+    
+    # Выполнение в пуле
+    
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет синхронный метод в пуле потоков."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._slots.release()
+    
+    async def _run_write(self, channel_ids: Iterable[Optional[str]], func: Callable, *args, **kwargs) -> Any:
+        """Выполняет запись, удерживая блокировки затронутых каналов.
+        
+        Блокировки берутся в порядке сортировки ID, поэтому пакетные записи
+        в несколько каналов не могут взаимно заблокироваться.
+        """
+        keys = sorted({str(channel_id) for channel_id in channel_ids if channel_id is not None})
+        
+        async with AsyncExitStack() as stack:
+            for key in keys:
+                await stack.enter_async_context(self._channel_lock(key))
+            return await self._run(func, *args, **kwargs)
+    
+    def _channel_lock(self, channel_id: str):
+        return _ChannelLock(self._channel_locks, channel_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики пула ввода-вывода."""
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "locked_channels": len(self._channel_locks),
+        }
+    
+    # Статистика
+    
+    async def get_channel_stats(self, channel_ids: List[str]) -> Dict[str, Any]:
+        return await self._run(self.data_service.get_channel_stats, channel_ids)
+    
+    async def get_message_stats(self, message_id: str) -> Dict[str, Any]:
+        return await self._run(self.data_service.get_message_stats, message_id)
+    
+    # Хранение
+    
+    async def get_daily_rollups(self, channel_id: str, date_from: Optional[str] = None,
+                                date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_daily_rollups, channel_id, date_from, date_to)
+    
+    async def apply_retention(self, pruner) -> Dict[str, int]:
+        """Однократно применяет политики хранения в пуле потоков."""
+        return await self._run(pruner.run_once)
+    
+    # Каналы
+    
+    async def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        return await self._run_write([channel_data.get("channel_id")], self.data_service.save_channel, channel_data)
+    
+    async def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.data_service.get_channel, channel_id)
+    
+    async def get_all_channels(self) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_all_channels)
+    
+    async def get_monitored_channels(self) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_monitored_channels)
+    
+    async def delete_channel(self, channel_id: str) -> bool:
+        return await self._run_write([channel_id], self.data_service.delete_channel, channel_id)
+    
+    # Сообщения
+    
+    async def save_message(self, message_data: Dict[str, Any]) -> bool:
+        return await self._run_write([message_data.get("channel_id")], self.data_service.save_message, message_data)
+    
+    async def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        channel_ids = [message_data.get("channel_id") for message_data in messages]
+        return await self._run_write(channel_ids, self.data_service.save_messages_bulk, messages)
+    
+    async def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.data_service.get_message, message_id)
+    
+    async def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_channel_messages, channel_id)
+    
+    async def get_engagement_series(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_engagement_series, *args, **kwargs)
+    
+    async def search_messages(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.search_messages, *args, **kwargs)
+    
+    async def search_messages_page(self, *args, **kwargs) -> Dict[str, Any]:
+        return await self._run(self.data_service.search_messages_page, *args, **kwargs)
+    
+    async def delete_message(self, message_id: str) -> bool:
+        message_data = await self.get_message(message_id)
+        channel_id = message_data.get("channel_id") if message_data else None
+        return await self._run_write([channel_id], self.data_service.delete_message, message_id)
+    
+    # Комментарии
+    
+    async def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        return await self._run_write([comment_data.get("channel_id")], self.data_service.save_comment, comment_data)
+    
+    async def save_comments_bulk(self, comments: List[Dict[str, Any]]) -> int:
+        channel_ids = [comment_data.get("channel_id") for comment_data in comments]
+        return await self._run_write(channel_ids, self.data_service.save_comments_bulk, comments)
+    
+    async def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.data_service.get_comment, comment_id)
+    
+    async def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.get_message_comments, message_id)
+    
+    async def search_comments(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self._run(self.data_service.search_comments, *args, **kwargs)
+    
+    async def search_comments_page(self, *args, **kwargs) -> Dict[str, Any]:
+        return await self._run(self.data_service.search_comments_page, *args, **kwargs)
+    
+    async def update_comment_metadata(self, comment_id: str, metadata: Dict[str, Any]) -> bool:
+        """Обновляет метаданные комментария под блокировкой его канала.
+        
+        Канал определяется предварительным чтением, а сам метод DataService
+        перечитывает комментарий уже под блокировкой, поэтому параллельные
+        обновления одного комментария не теряют изменения друг друга.
+        
+        Args:
+            comment_id: ID комментария
+            metadata: Новые метаданные
+        
+        Returns:
+            bool: True, если обновление успешно
+        """
+        comment_data = await self.get_comment(comment_id)
+        if not comment_data:
+            return False
+        
+        return await self._run_write(
+            [comment_data.get("channel_id")], self.data_service.update_comment_metadata, comment_id, metadata
+        )
+    
+    async def delete_comment(self, comment_id: str) -> bool:
+        comment_data = await self.get_comment(comment_id)
+        channel_id = comment_data.get("channel_id") if comment_data else None
+        return await self._run_write([channel_id], self.data_service.delete_comment, comment_id)
+
+class _ChannelLock:
+    """Блокировка канала, удаляемая из реестра после освобождения последним пользователем."""
+    
+    def __init__(self, registry: Dict[str, List[Any]], channel_id: str):
+        self._registry = registry
+        self._channel_id = channel_id
+    
+    async def __aenter__(self) -> None:
+        entry = self._registry.get(self._channel_id)
+        if entry is None:
+            entry = self._registry[self._channel_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_entry(entry)
+            raise
+    
+    async def __aexit__(self, *exc_info) -> None:
+        entry = self._registry[self._channel_id]
+        entry[0].release()
+        self._release_entry(entry)
+    
+    def _release_entry(self, entry: List[Any]) -> None:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._registry[self._channel_id]
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Tuple
+
+from telethon.errors import FloodWaitError
+
+from config import settings
+from services.records import telegram_id
+from services.rpc_scheduler import background_lane
+
+logger = logging.getLogger(__name__)
+
+# Состояния задания: активные задания возобновляются после перезапуска
+ACTIVE_STATUSES = ("queued", "running", "waiting")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    session_key TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    offset_id INTEGER NOT NULL DEFAULT 0,
+    top_id INTEGER,
+    fetched INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_key, status);
+"""
+
+COLUMNS = (
+    "job_id", "session_key", "channel_id", "status", "offset_id", "top_id",
+    "fetched", "total", "error", "created_at", "updated_at",
+)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class BackfillJobs:
+    """Задания полной загрузки истории и их контрольные точки.
+    
+    Контрольная точка задания — offset_id: все сообщения новее него уже
+    сохранены в хранилище, поэтому после перезапуска загрузка продолжается
+    с этого места.
+    """
+    
+    def __init__(self, jobs_path: str):
+        """Инициализация хранилища заданий.
+        
+        Args:
+            jobs_path: Путь к файлу базы заданий
+        """
+        self.jobs_path = jobs_path
+        os.makedirs(os.path.dirname(os.path.abspath(jobs_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(jobs_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает задание по ID."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+    
+    def list(self, session_key: Optional[str] = None, statuses: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """Возвращает задания, новые первыми.
+        
+        Args:
+            session_key: Ключ сессии (None — задания всех сессий)
+            statuses: Состояния заданий (None — любые)
+        """
+        sql = f"SELECT {', '.join(COLUMNS)} FROM jobs"
+        conditions, params = [], []
+        if session_key is not None:
+            conditions.append("session_key = ?")
+            params.append(session_key)
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC"
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+    
+    def put(self, job: Dict[str, Any]) -> None:
+        """Сохраняет задание (контрольную точку)."""
+        job["updated_at"] = _now()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                tuple(job.get(column) for column in COLUMNS)
+            )
+            self._conn.commit()
+
+class BackfillManager:
+    """Полная загрузка истории каналов с возобновлением.
+    
+    Задание обходит историю канала от новых сообщений к старым порциями
+    по 100 сообщений (максимум Telegram), сохраняет каждую порцию пакетной
+    записью и после нее фиксирует контрольную точку. Прогресс и оценка
+    оставшегося времени отправляются слушателю сессии (WebSocket).
+    
+    Запросы заданий выполняются в фоновой полосе планировщика клиента
+    и не вытесняют запросы пользователя. У каждого задания не больше одного
+    запроса в очереди, а очередь планировщика обслуживается по порядку,
+    поэтому одновременные задания делят лимит запросов клиента поровну.
+    Одновременно у сессии выполняется не больше settings.BACKFILL_CONCURRENCY
+    заданий, остальные ждут в очереди.
+    
+    FloodWait дольше допустимого планировщиком задание пережидает
+    в состоянии waiting и продолжает с контрольной точки. Задания,
+    прерванные остановкой приложения, возобновляются вызовом resume().
+    """
+    
+    def __init__(self, telegram_service, async_data_service, channel_sync=None,
+                 jobs: Optional[BackfillJobs] = None):
+        """Инициализация загрузки истории.
+        
+        Args:
+            telegram_service: Сервис Telegram
+            async_data_service: Асинхронный сервис данных
+            channel_sync: Синхронизация каналов, которой передается загруженный диапазон
+            jobs: Хранилище заданий (по умолчанию data_dir/backfill_jobs.sqlite3)
+        """
+        self.telegram_service = telegram_service
+        self.async_data_service = async_data_service
+        self.channel_sync = channel_sync
+        self.jobs = jobs or BackfillJobs(
+            os.path.join(async_data_service.data_service.data_dir, "backfill_jobs.sqlite3")
+        )
+        
+        # ID задания → задача загрузки
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Ключ сессии → ограничение одновременных заданий
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        # Ключ сессии → функция отправки событий
+        self._listeners: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+    
+    async def close(self) -> None:
+        """Останавливает выполняющиеся задания; они остаются активными и возобновятся после запуска."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.jobs.close()
+    
+    # Слушатели прогресса
+    
+    def set_listener(self, session_key: str, listener: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """Задает функцию, которой отправляются события заданий сессии."""
+        self._listeners[session_key] = listener
+    
+    def remove_listener(self, session_key: str) -> None:
+        """Удаляет функцию отправки событий сессии."""
+        self._listeners.pop(session_key, None)
+    
+    async def _emit(self, job: Dict[str, Any], event_type: str, **extra) -> None:
+        listener = self._listeners.get(job["session_key"])
+        if listener is None:
+            return
+        try:
+            await listener({"type": event_type, "job": self.describe(job), **extra, "timestamp": _now()})
+        except Exception as e:
+            logger.debug(f"Не удалось отправить событие загрузки истории: {str(e)}")
+    
+    # Управление заданиями
+    
+    def describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Возвращает задание с долей выполнения."""
+        progress = None
+        if job["status"] == "completed":
+            progress = 1.0
+        elif job.get("total"):
+            progress = round(min(job["fetched"] / job["total"], 1.0), 4)
+        return {**job, "progress": progress, "active": job["job_id"] in self._tasks}
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает задание по ID."""
+        job = self.jobs.get(job_id)
+        return self.describe(job) if job else None
+    
+    def list(self, session_key: str) -> List[Dict[str, Any]]:
+        """Возвращает задания сессии."""
+        return [self.describe(job) for job in self.jobs.list(session_key)]
+    
+    def start(self, session_key: str, channel_id: str) -> Dict[str, Any]:
+        """Создает задание загрузки истории канала.
+        
+        Если у сессии уже есть активное задание для канала, возвращается оно.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_id: ID канала
+        
+        Returns:
+            Dict[str, Any]: Задание
+        """
+        for job in self.jobs.list(session_key, ACTIVE_STATUSES):
+            if job["channel_id"] == channel_id:
+                self._launch(job)
+                return self.describe(job)
+        
+        job = {
+            "job_id": uuid.uuid4().hex, "session_key": session_key, "channel_id": channel_id,
+            "status": "queued", "offset_id": 0, "top_id": None, "fetched": 0, "total": None,
+            "error": None, "created_at": _now(),
+        }
+        self.jobs.put(job)
+        self._launch(job)
+        return self.describe(job)
+    
+    def resume(self, session_key: str, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Возобновляет задания сессии с их контрольных точек.
+        
+        Args:
+            session_key: Ключ сессии
+            job_id: ID задания (None — все активные задания сессии). Задание,
+                завершившееся ошибкой, возобновляется только по ID
+        
+        Returns:
+            List[Dict[str, Any]]: Возобновленные задания
+        """
+        if job_id is None:
+            jobs = self.jobs.list(session_key, ACTIVE_STATUSES)
+        else:
+            job = self.jobs.get(job_id)
+            jobs = [job] if job and job["session_key"] == session_key and job["status"] != "completed" else []
+        
+        for job in jobs:
+            if job["status"] in FINAL_STATUSES:
+                job["status"] = "queued"
+                job["error"] = None
+                self.jobs.put(job)
+            self._launch(job)
+        return [self.describe(job) for job in jobs]
+    
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задание; загруженные сообщения остаются в хранилище."""
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] in FINAL_STATUSES:
+            return False
+        
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        job["status"] = "cancelled"
+        self.jobs.put(job)
+        return True
+    
+    def _launch(self, job: Dict[str, Any]) -> None:
+        if job["job_id"] in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(partial(self._forget_task, job["job_id"]))
+    
+    def _forget_task(self, job_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(job_id) is task:
+            del self._tasks[job_id]
+    
+    # Выполнение
+    
+    async def _run(self, job: Dict[str, Any]) -> None:
+        slots = self._slots.setdefault(job["session_key"], asyncio.Semaphore(settings.BACKFILL_CONCURRENCY))
+        async with slots:
+            with background_lane():
+                await self._crawl(job)
+    
+    async def _crawl(self, job: Dict[str, Any]) -> None:
+        """Загружает историю канала порциями начиная с контрольной точки."""
+        job["status"] = "running"
+        self.jobs.put(job)
+        await self._emit(job, "backfill_started")
+        
+        started = time.monotonic()
+        fetched_at_start = job["fetched"]
+        
+        while True:
+            try:
+                chunk = await self.telegram_service.fetch_history_chunk(
+                    job["session_key"], job["channel_id"], job["offset_id"]
+                )
+            except FloodWaitError as e:
+                # Пережидаем ограничение и продолжаем с контрольной точки
+                job["status"] = "waiting"
+                self.jobs.put(job)
+                await self._emit(job, "backfill_waiting", retry_in=e.seconds)
+                await asyncio.sleep(e.seconds)
+                job["status"] = "running"
+                self.jobs.put(job)
+                continue
+            except Exception as e:
+                logger.error(f"Ошибка загрузки истории канала {job['channel_id']}: {str(e)}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self.jobs.put(job)
+                await self._emit(job, "backfill_failed")
+                return
+            
+            messages = chunk["messages"]
+            if messages:
+                await self.async_data_service.save_messages_bulk(messages)
+                if job["top_id"] is None:
+                    job["top_id"] = telegram_id(messages[0].message_id)
+            
+            # Контрольная точка фиксируется только после записи порции
+            job["fetched"] += len(messages)
+            job["total"] = chunk["total"] if chunk["total"] is not None else job["total"]
+            job["offset_id"] = chunk["next_offset_id"]
+            if not chunk["next_offset_id"]:
+                job["status"] = "completed"
+            self.jobs.put(job)
+            
+            if job["status"] == "completed":
+                await self._mark_synced(job)
+                await self._emit(job, "backfill_completed")
+                return
+            
+            # Оценка оставшегося времени по скорости текущего запуска
+            elapsed = time.monotonic() - started
+            rate = (job["fetched"] - fetched_at_start) / elapsed if elapsed > 0 else None
+            remaining = max((job["total"] or 0) - job["fetched"], 0)
+            eta = round(remaining / rate, 1) if rate else None
+            await self._emit(job, "backfill_progress", rate=round(rate, 1) if rate else None, eta_seconds=eta)
+    
+    async def _mark_synced(self, job: Dict[str, Any]) -> None:
+        """Передает синхронизации каналов загруженный непрерывный диапазон до начала канала."""
+        if self.channel_sync is None or not job["top_id"]:
+            return
+        
+        def extend_to_start(state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            if state is None:
+                return {"max_id": job["top_id"], "min_id": 1, "last_edit_date": None, "synced_at": 0}
+            if job["top_id"] >= state["min_id"]:
+                state["min_id"] = 1
+                return state
+            return None
+        
+        await self.channel_sync.update_state(job["channel_id"], extend_to_start)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает количество заданий по состояниям."""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.list():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"running": len(self._tasks), "jobs": counts}
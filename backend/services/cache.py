@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Callable, Hashable, Tuple
+
+from config import settings
+
+class TTLCache:
+    """Ограниченный по размеру кеш с вытеснением LRU и временем жизни записей.
+    
+    Записи старше ttl считаются отсутствующими, а при превышении max_size
+    вытесняется запись, к которой дольше всего не обращались.
+    Значение None не кешируется, чтобы отсутствие данных не запоминалось.
+    """
+    
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        """Инициализация кеша.
+        
+        Args:
+            max_size: Максимальное количество записей (по умолчанию settings.CACHE_MAX_SIZE)
+            ttl: Время жизни записи в секундах (по умолчанию settings.CACHE_TTL)
+        """
+        self.max_size = max_size or settings.CACHE_MAX_SIZE
+        self.ttl = ttl if ttl is not None else settings.CACHE_TTL
+        
+        # Ключ → (время истечения, значение), порядок отражает давность использования
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение из кеша.
+        
+        Args:
+            key: Ключ записи
+            default: Значение, возвращаемое при промахе
+        
+        Returns:
+            Any: Закешированное значение или default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение в кеше.
+        
+        Args:
+            key: Ключ записи
+            value: Значение (None не сохраняется)
+            ttl: Время жизни записи в секундах (по умолчанию ttl кеша)
+        """
+        if value is None:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """Удаляет запись из кеша.
+        
+        Returns:
+            bool: True, если запись была в кеше
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+    
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Удаляет записи, ключи которых удовлетворяют условию.
+        
+        Args:
+            predicate: Функция, принимающая ключ
+        
+        Returns:
+            int: Количество удаленных записей
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+    
+    def clear(self) -> None:
+        """Очищает кеш без сброса счетчиков."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики кеша.
+        
+        Returns:
+            Dict[str, Any]: Размер, попадания, промахи, вытеснения и доля попаданий
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / requests, 4) if requests else None,
+            }
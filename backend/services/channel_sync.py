@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+from config import settings
+from services.pagination import encode_cursor, message_key
+from services.records import to_dicts, telegram_id, message_record_id
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    channel_id TEXT PRIMARY KEY,
+    max_id INTEGER NOT NULL,
+    min_id INTEGER NOT NULL,
+    last_edit_date TEXT,
+    synced_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+def _message_number(message: Dict[str, Any]) -> Optional[int]:
+    """Возвращает ID сообщения Telegram из ID записи (123:m45 → 45)."""
+    return telegram_id(message.get("message_id"))
+
+class SyncState:
+    """Отметки синхронизации каналов.
+    
+    Для каждого канала хранится непрерывный диапазон ID сообщений
+    [min_id, max_id], уже сохраненный в локальном хранилище, дата последнего
+    известного редактирования и время последней синхронизации. min_id = 1
+    означает, что диапазон доходит до начала канала.
+    """
+    
+    def __init__(self, state_path: str):
+        """Инициализация хранилища отметок.
+        
+        Args:
+            state_path: Путь к файлу базы отметок
+        """
+        self.state_path = state_path
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(state_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        
+        # ID канала → отметка; загружаются при первом обращении
+        self._states: Optional[Dict[str, Dict[str, Any]]] = None
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    def _loaded(self) -> Dict[str, Dict[str, Any]]:
+        if self._states is None:
+            rows = self._conn.execute(
+                "SELECT channel_id, max_id, min_id, last_edit_date, synced_at FROM sync_state"
+            )
+            self._states = {
+                row[0]: {"max_id": row[1], "min_id": row[2], "last_edit_date": row[3], "synced_at": row[4]}
+                for row in rows
+            }
+        return self._states
+    
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает отметку канала или None, если канал не синхронизировался."""
+        with self._lock:
+            state = self._loaded().get(channel_id)
+            return dict(state) if state is not None else None
+    
+    def put(self, channel_id: str, state: Dict[str, Any]) -> None:
+        """Сохраняет отметку канала."""
+        with self._lock:
+            self._loaded()[channel_id] = dict(state)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (channel_id, max_id, min_id, last_edit_date, synced_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (channel_id, state["max_id"], state["min_id"], state.get("last_edit_date"), state["synced_at"])
+            )
+            self._conn.commit()
+    
+    def forget(self, channel_id: str) -> None:
+        """Удаляет отметку канала (следующая синхронизация начнется заново)."""
+        with self._lock:
+            self._loaded().pop(channel_id, None)
+            self._conn.execute("DELETE FROM sync_state WHERE channel_id = ?", (channel_id,))
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._loaded())
+
+class ChannelSync:
+    """Инкрементальная синхронизация сообщений каналов с локальным хранилищем.
+    
+    Синхронизация канала запрашивает у Telegram только окно последних
+    сообщений и сообщения новее сохраненного max_id, записывает их пакетом
+    в хранилище и сдвигает отметки. Повторная синхронизация раньше чем через
+    settings.SYNC_MIN_INTERVAL секунд не выполняет запросов. Страницы
+    сообщений канала внутри синхронизированного диапазона отдаются
+    из хранилища; страницы за его пределами загружаются из Telegram,
+    сохраняются и расширяют диапазон.
+    """
+    
+    def __init__(self, telegram_service, async_data_service, state: Optional[SyncState] = None):
+        """Инициализация синхронизации.
+        
+        Args:
+            telegram_service: Сервис Telegram
+            async_data_service: Асинхронный сервис данных
+            state: Отметки синхронизации (по умолчанию data_dir/sync_state.sqlite3)
+        """
+        self.telegram_service = telegram_service
+        self.async_data_service = async_data_service
+        self.state = state or SyncState(
+            os.path.join(async_data_service.data_service.data_dir, "sync_state.sqlite3")
+        )
+        
+        # Одновременная синхронизация одного канала выполняется один раз;
+        # под той же блокировкой изменяются отметки канала
+        self._locks: Dict[str, asyncio.Lock] = {}
+        
+        # Метрики
+        self._stats = {
+            "syncs": 0, "skipped": 0, "failed": 0, "new_messages": 0, "edited_messages": 0,
+            "saved_messages": 0, "pages_from_storage": 0, "pages_from_telegram": 0,
+        }
+    
+    def close(self) -> None:
+        """Закрывает хранилище отметок."""
+        self.state.close()
+    
+    def _lock(self, channel_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(channel_id, asyncio.Lock())
+        
+    async def update_state(self, channel_id: str,
+                           update: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> None:
+        """Изменяет отметку канала под блокировкой его синхронизации.
+        
+        Args:
+            channel_id: ID канала
+            update: Функция, получающая текущую отметку (или None) и возвращающая
+                новую; None — оставить отметку без изменений
+        """
+        async with self._lock(channel_id):
+            state = update(self.state.get(channel_id))
+            if state is not None:
+                self.state.put(channel_id, state)
+    
+    async def _stored_page(self, channel_id: str, limit: int, offset_id: int = 0,
+                           min_id: int = 0) -> Optional[List[Dict[str, Any]]]:
+        """Возвращает страницу сохраненных сообщений канала от новых к старым.
+        
+        Страница читается выборкой диапазона хранилища от ключа сообщения
+        offset_id, поэтому ее стоимость зависит от размера страницы, а не от
+        числа сохраненных сообщений канала. Записи с ID без канала сохранены
+        до перехода на составные ID и пропускаются.
+        
+        Args:
+            channel_id: ID канала
+            limit: Максимальное количество сообщений
+            offset_id: ID сообщения, с которого начинать (0 — с самого нового)
+            min_id: Наименьший ID сообщения страницы
+        
+        Returns:
+            Optional[List[Dict[str, Any]]]: Сообщения страницы или None, если сообщение offset_id не сохранено
+        """
+        cursor = None
+        if offset_id:
+            anchor = await self.async_data_service.get_message(message_record_id(channel_id, offset_id))
+            if not anchor:
+                return None
+            cursor = encode_cursor(message_key(anchor))
+        
+        prefix = f"{channel_id}:"
+        messages: List[Dict[str, Any]] = []
+        while len(messages) < limit:
+            page = await self.async_data_service.search_messages_page(
+                channel_ids=[channel_id], limit=limit - len(messages), cursor=cursor
+            )
+            for message in page["messages"]:
+                number = _message_number(message) if str(message.get("message_id") or "").startswith(prefix) else None
+                if not number or (offset_id and number >= offset_id):
+                    continue
+                # Дальше идут сообщения за пределами синхронизированного диапазона
+                if number < min_id:
+                    return messages
+                messages.append(message)
+            
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        return messages
+    
+    async def sync(self, session_key: str, channel_id: str, force: bool = False) -> Dict[str, Any]:
+        """Синхронизирует сообщения канала с локальным хранилищем.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_id: ID канала
+            force: Синхронизировать, даже если с прошлой синхронизации прошло меньше settings.SYNC_MIN_INTERVAL
+        
+        Returns:
+            Dict[str, Any]: Отметка синхронизации канала
+        
+        Raises:
+            ValueError: Если клиент не найден или канал недоступен
+        """
+        async with self._lock(channel_id):
+            state = self.state.get(channel_id)
+            if state and not force and time.time() - state["synced_at"] < settings.SYNC_MIN_INTERVAL:
+                self._stats["skipped"] += 1
+                return state
+            
+            # Известные количества комментариев позволяют не запрашивать даты последних заново
+            known: Dict[int, Tuple[int, Optional[str]]] = {}
+            if state:
+                for message in await self._stored_page(channel_id, settings.SYNC_REFRESH_WINDOW):
+                    known[_message_number(message)] = (message.get("comments_count") or 0, message.get("last_comment_date"))
+            
+            try:
+                update = await self.telegram_service.fetch_channel_updates(
+                    session_key, channel_id,
+                    min_id=state["max_id"] if state else 0,
+                    edited_after=state["last_edit_date"] if state else None,
+                    known=known
+                )
+            except Exception:
+                self._stats["failed"] += 1
+                raise
+            
+            messages = update["messages"]
+            if messages:
+                self._stats["saved_messages"] += await self.async_data_service.save_messages_bulk(messages)
+            
+            ids = [_message_number(message) for message in to_dicts(messages)]
+            previous_max = state["max_id"] if state else 0
+            if len(ids) < settings.SYNC_REFRESH_WINDOW:
+                # Окно оказалось неполным: получена вся история канала
+                min_id = 1
+            elif state and update["complete"]:
+                # Полученные сообщения примыкают к сохраненному диапазону
+                min_id = min(state["min_id"], min(ids))
+            else:
+                # Между новыми и сохраненными сообщениями остается разрыв
+                min_id = min(ids)
+            
+            new_state = {
+                "max_id": max(ids + [previous_max]),
+                "min_id": min_id,
+                "last_edit_date": update["last_edit_date"],
+                "synced_at": time.time(),
+            }
+            self.state.put(channel_id, new_state)
+            
+            self._stats["syncs"] += 1
+            self._stats["new_messages"] += sum(1 for message_id in ids if message_id > previous_max)
+            self._stats["edited_messages"] += update["edited"]
+            return new_state
+    
+    async def get_channel_messages(
+        self,
+        session_key: str,
+        channel_id: str,
+        limit: int = 50,
+        offset_id: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Получает сообщения канала, синхронизируя их с локальным хранилищем.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_id: ID канала
+            limit: Максимальное количество сообщений
+            offset_id: ID сообщения, с которого начинать
+        
+        Returns:
+            List[Dict[str, Any]]: Сообщения канала от новых к старым
+        """
+        try:
+            state = await self.sync(session_key, channel_id)
+        except Exception as e:
+            logger.error(f"Ошибка синхронизации канала {channel_id}: {str(e)}")
+            state = None
+        
+        # Страница внутри синхронизированного диапазона отдается из хранилища
+        if state and state["max_id"] and (not offset_id or offset_id > state["min_id"]):
+            page = await self._stored_page(channel_id, limit, offset_id, state["min_id"])
+            if page is not None and (len(page) >= limit or state["min_id"] <= 1):
+                self._stats["pages_from_storage"] += 1
+                return page
+        
+        self._stats["pages_from_telegram"] += 1
+        messages = to_dicts(await self.telegram_service.get_channel_messages(session_key, channel_id, limit, offset_id))
+        if not messages or not state:
+            return messages
+        
+        await self.async_data_service.save_messages_bulk(messages)
+        
+        # Страница начинается внутри синхронизированного диапазона или сразу под ним: расширяем его вниз.
+        # Отметка перечитывается под блокировкой, чтобы не откатить результат параллельной синхронизации
+        ids = [_message_number(message) for message in messages]
+        
+        def extend_down(current: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            if current is None or (offset_id and offset_id < current["min_id"]):
+                return None
+            current["min_id"] = 1 if len(messages) < limit else min(min(ids), current["min_id"])
+            return current
+        
+        await self.update_state(channel_id, extend_down)
+        return messages
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики синхронизации."""
+        return {"channels": len(self.state), **self._stats}
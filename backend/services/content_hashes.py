@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Any, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    kind TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    PRIMARY KEY (kind, channel_id, record_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_hashes_record ON hashes (kind, record_id);
+"""
+
+# Поле ID записи по виду
+ID_FIELDS = {"message": "message_id", "comment": "comment_id"}
+
+def content_hash(record: Dict[str, Any]) -> bytes:
+    """Вычисляет хеш содержимого записи, не зависящий от порядка ключей."""
+    raw = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+class ContentHashes:
+    """Хеши содержимого сохраненных сообщений и комментариев.
+    
+    Для каждой записи хранится хеш ее содержимого, а в памяти — множество
+    известных ID канала с хешами, загружаемое из базы SQLite при первом
+    обращении к каналу. Перед записью DataService отбирает только записи,
+    содержимое которых изменилось, поэтому повторная синхронизация канала
+    без изменений не переписывает файлы.
+    """
+    
+    def __init__(self, hashes_path: str):
+        """Инициализация хранилища хешей.
+        
+        Args:
+            hashes_path: Путь к файлу базы хешей
+        """
+        self.hashes_path = hashes_path
+        os.makedirs(os.path.dirname(os.path.abspath(hashes_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(hashes_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        
+        # (вид, канал) → {ID записи: хеш}
+        self._known: Dict[Tuple[str, str], Dict[str, bytes]] = {}
+        self.counters = {kind: {"written": 0, "unchanged": 0} for kind in ID_FIELDS}
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    def _channel(self, kind: str, channel_id: str) -> Dict[str, bytes]:
+        """Возвращает известные записи канала, загружая их из базы."""
+        key = (kind, channel_id)
+        known = self._known.get(key)
+        if known is None:
+            rows = self._conn.execute(
+                "SELECT record_id, hash FROM hashes WHERE kind = ? AND channel_id = ?", key
+            )
+            known = {record_id: bytes(value) for record_id, value in rows}
+            self._known[key] = known
+        return known
+    
+    def select_changed(self, kind: str, records: Iterable[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], bytes]]:
+        """Отбирает записи, содержимое которых отличается от сохраненного.
+        
+        Args:
+            kind: Вид записей: message или comment
+            records: Данные записей
+        
+        Returns:
+            List[Tuple[Dict[str, Any], bytes]]: Измененные и новые записи с хешами их содержимого
+        """
+        id_field = ID_FIELDS[kind]
+        changed = []
+        unchanged = 0
+        with self._lock:
+            for record in records:
+                digest = content_hash(record)
+                known = self._channel(kind, str(record.get("channel_id") or ""))
+                if known.get(record[id_field]) == digest:
+                    unchanged += 1
+                else:
+                    changed.append((record, digest))
+            self.counters[kind]["unchanged"] += unchanged
+        return changed
+    
+    def commit(self, kind: str, records: List[Tuple[Dict[str, Any], bytes]]) -> None:
+        """Запоминает хеши успешно записанных записей.
+        
+        Args:
+            kind: Вид записей: message или comment
+            records: Записи с хешами, возвращенные select_changed
+        """
+        if not records:
+            return
+        
+        id_field = ID_FIELDS[kind]
+        rows = [(kind, str(record.get("channel_id") or ""), record[id_field], digest) for record, digest in records]
+        with self._lock:
+            try:
+                # Запись могла переехать в другой канал: старый хеш удаляем
+                self._conn.executemany(
+                    "DELETE FROM hashes WHERE kind = ? AND record_id = ? AND channel_id != ?",
+                    [(kind, record_id, channel_id) for kind, channel_id, record_id, _ in rows]
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO hashes (kind, channel_id, record_id, hash) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка сохранения хешей записей: {str(e)}")
+                # Без сохраненного хеша запись будет перезаписана при следующем сохранении
+                for _, channel_id, record_id, _ in rows:
+                    self._channel(kind, channel_id).pop(record_id, None)
+                return
+            
+            for (_, channel_id, record_id, digest) in rows:
+                for (known_kind, _), known in self._known.items():
+                    if known_kind == kind:
+                        known.pop(record_id, None)
+                self._channel(kind, channel_id)[record_id] = digest
+            self.counters[kind]["written"] += len(rows)
+    
+    def forget(self, kind: str, record_ids: Iterable[str]) -> None:
+        """Удаляет хеши записей, чтобы следующее сохранение выполнило запись.
+        
+        Args:
+            kind: Вид записей: message или comment
+            record_ids: ID записей
+        """
+        record_ids = list(record_ids)
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM hashes WHERE kind = ? AND record_id = ?",
+                [(kind, record_id) for record_id in record_ids]
+            )
+            self._conn.commit()
+            for (known_kind, _), known in self._known.items():
+                if known_kind == kind:
+                    for record_id in record_ids:
+                        known.pop(record_id, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики записанных и пропущенных без изменений записей."""
+        with self._lock:
+            stats = {}
+            for kind, counters in self.counters.items():
+                total = counters["written"] + counters["unchanged"]
+                stats[kind] = dict(
+                    counters, unchanged_rate=round(counters["unchanged"] / total, 4) if total else None
+                )
+            stats["known_channels"] = len(self._known)
+            return stats
@@ -1,30 +1,281 @@
 import logging
-import json
 import os
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import random
+import threading
+from contextlib import nullcontext
+from itertools import chain
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from config import settings
+from services.cache import TTLCache
+from services.content_hashes import ContentHashes, ID_FIELDS
+from services.engagement_store import EngagementStore
+from services.metadata_index import MetadataIndex, page_after
+from services.pagination import select_page, make_page, decode_cursor, message_key, comment_key, RecordKey
+from services.records import CommentRecord, as_dict, to_dicts
+from services.retention import DailyRollups
+from services.search_index import SearchIndex, tokenize
+from services.summary_stats import SummaryStats
+from services.storage import StorageBackend, PartitionedStorage, STORAGE_BACKENDS, create_storage
+from services.storage.codec import RecordCodec
+from services.storage.migration import copy_storage
+from services.storage.base import message_matches, comment_matches
+from services.dates import to_epoch_ms
 
 logger = logging.getLogger(__name__)
 
 class DataService:
     """Сервис для работы с данными."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: Optional[str] = None, backend: Optional[str] = None,
+                 storage: Optional[StorageBackend] = None):
         """Инициализация сервиса.
         
         Args:
-            data_dir: Директория для хранения данных
+            data_dir: Директория для хранения данных (по умолчанию settings.DATA_DIR)
+            backend: Имя бэкенда хранилища: json, sqlite, segment или partitioned
+                (по умолчанию settings.STORAGE_BACKEND)
+            storage: Готовый экземпляр хранилища (имеет приоритет над backend)
+        """
+        self.data_dir = data_dir or settings.DATA_DIR
+        backend = backend or settings.STORAGE_BACKEND
+        options = {"granularity": settings.PARTITION_GRANULARITY} if backend == PartitionedStorage.name else {}
+        if settings.STORAGE_COMPRESSION != "json":
+            storage_class = STORAGE_BACKENDS.get(backend)
+            if storage_class and storage_class.supports_compression:
+                options["codec"] = RecordCodec(settings.STORAGE_COMPRESSION,
+                                               os.path.join(self.data_dir, "dictionaries"))
+            else:
+                logger.warning(f"Хранилище {backend} не поддерживает сжатие записей, записи не сжимаются")
+        self.storage = storage or create_storage(backend, self.data_dir, **options)
+        
+        # Полнотекстовый индекс сообщений и комментариев
+        self.search_index = SearchIndex(os.path.join(self.data_dir, "search_index.sqlite3"))
+        
+        # Битовый индекс тональности, тегов и закладок комментариев
+        self.metadata_index = MetadataIndex(os.path.join(self.data_dir, "metadata_index.sqlite3"))
+        
+        # Сводная статистика по каналам и сообщениям
+        self.stats = SummaryStats(os.path.join(self.data_dir, "stats.sqlite3"))
+        
+        # Дневные сводки по записям, удаленным политикой хранения
+        self.rollups = DailyRollups(os.path.join(self.data_dir, "rollups.sqlite3"))
+        
+        # Хеши содержимого записей, чтобы не перезаписывать неизмененные записи
+        # (отдельно для каждого бэкенда: после смены бэкенда записи должны быть записаны заново)
+        self.hashes = ContentHashes(os.path.join(self.data_dir, f"content_hashes.{self.storage.name}.sqlite3"))
+        
+        # Кеш чтения каналов, сообщений и комментариев по ID
+        self.cache = TTLCache()
+        
+        # Метаданные комментариев читаются и записываются обратно под одной блокировкой:
+        # обновление пользователем и повторное сохранение комментариев из Telegram
+        # (поток фоновой записи) не должны терять изменения друг друга
+        self._metadata_lock = threading.RLock()
+        
+        # Временные ряды просмотров, пересылок, комментариев и реакций
+        self.engagement = EngagementStore(self.data_dir)
+        
+        logger.info(f"Инициализирован сервис данных (хранилище: {self.storage.name})")
+    
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища."""
+        self.storage.close()
+        self.search_index.close()
+        self.metadata_index.close()
+        self.stats.close()
+        self.hashes.close()
+        self.rollups.close()
+    
+    # Полнотекстовый поиск
+    
+    def _ensure_search_index(self, kind: str) -> None:
+        """Строит полнотекстовый индекс по уже сохраненным данным при первом обращении."""
+        if self.search_index.is_built(kind):
+            return
+        
+        if kind == "message":
+            documents = ((m["message_id"], m.get("text", "")) for m in self.storage.iter_messages()
+                         if m.get("message_id"))
+        else:
+            documents = ((c["comment_id"], c.get("text", "")) for c in self.storage.iter_comments()
+                         if c.get("comment_id"))
+        self.search_index.rebuild(kind, documents)
+    
+    def _search_ranked(self, kind: str, query: str) -> Optional[List[str]]:
+        """Возвращает ID документов, найденных по индексу, в порядке убывания релевантности.
+        
+        Returns:
+            Optional[List[str]]: Список ID или None, если запрос не содержит значимых слов
+        """
+        if not tokenize(query):
+            return None
+        
+        self._ensure_search_index(kind)
+        return [doc_id for doc_id, _ in self.search_index.search(kind, query)]
+    
+    def _commit_hashes(self, kind: str, changed: List[Tuple[Dict[str, Any], bytes]], saved: int) -> None:
+        """Запоминает хеши пакета, если хранилище записало его целиком.
+        
+        Хранилище сообщает только количество записанных записей, поэтому
+        при частичной записи хеши всего пакета сбрасываются, и записи будут
+        перезаписаны при следующем сохранении.
+        """
+        if saved == len(changed):
+            self.hashes.commit(kind, changed)
+        else:
+            self.hashes.forget(kind, [record[ID_FIELDS[kind]] for record, _ in changed])
+    
+    def _cached_get(self, kind: str, record_id: str, loader) -> Optional[Dict[str, Any]]:
+        """Возвращает запись из кеша или загружает ее из хранилища."""
+        key = (kind, record_id)
+        record = self.cache.get(key)
+        if record is None:
+            record = loader(record_id)
+            self.cache.set(key, record)
+        return record
+    
+    # Индекс метаданных комментариев
+    
+    def _ensure_metadata_index(self) -> None:
+        """Строит индекс метаданных по уже сохраненным комментариям при первом обращении."""
+        if not self.metadata_index.is_built():
+            self.metadata_index.rebuild(self.storage.iter_comments())
+    
+    def _select_by_metadata(self, channel_ids: Optional[List[str]], message_ids: Optional[List[str]],
+                            date_from: Optional[str], date_to: Optional[str], sentiment: Optional[str],
+                            user_tags: Optional[List[str]], is_bookmarked: Optional[bool]) -> Optional[List[RecordKey]]:
+        """Отбирает комментарии по индексу метаданных.
+        
+        Returns:
+            Optional[List[RecordKey]]: Ключи найденных комментариев от старых к новым
+                или None, если фильтров по метаданным нет
+        """
+        if not sentiment and not user_tags and is_bookmarked is None:
+            return None
+        
+        self._ensure_metadata_index()
+        return self.metadata_index.select(
+            channel_ids, message_ids, date_from, date_to, sentiment, user_tags, is_bookmarked
+        )
+    
+    def _load_comments(self, keys: List[RecordKey], query: Optional[str] = None,
+                       limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Загружает комментарии по ключам индекса, сохраняя порядок.
+        
+        Args:
+            keys: Ключи комментариев
+            query: Поисковый запрос без значимых слов (проверяется поиском подстроки)
+            limit: Максимальное количество комментариев
+        """
+        results = []
+        for _, comment_id, _ in keys:
+            comment_data = self.storage.get_comment(comment_id)
+            if not comment_data or (query and not comment_matches(comment_data, query)):
+                continue
+            results.append(comment_data)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+    
+    # Сводная статистика
+    
+    def _ensure_stats(self) -> None:
+        """Строит сводную статистику по уже сохраненным данным при первом обращении."""
+        if not self.stats.is_built():
+            self.stats.rebuild(self.storage.iter_messages(), self.storage.iter_comments())
+    
+    def get_channel_stats(self, channel_ids: List[str]) -> Dict[str, Any]:
+        """Возвращает сводную статистику по каналам.
+        
+        Args:
+            channel_ids: Список ID каналов
+        
+        Returns:
+            Dict[str, Any]: Статистика каждого канала и общая статистика по всем
+        """
+        self._ensure_stats()
+        return {
+            "channels": {channel_id: self.stats.get("channel", [channel_id]) for channel_id in channel_ids},
+            "total": self.stats.get("channel", channel_ids)
+        }
+    
+    def get_message_stats(self, message_id: str) -> Dict[str, Any]:
+        """Возвращает сводную статистику по сообщению и его комментариям.
+        
+        Args:
+            message_id: ID сообщения
+        
+        Returns:
+            Dict[str, Any]: Статистика сообщения
+        """
+        self._ensure_stats()
+        return self.stats.get("message", [message_id])
+    
+    def get_daily_rollups(self, channel_id: str, date_from: Optional[str] = None,
+                          date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Возвращает дневные сводки по записям канала, удаленным политикой хранения.
+        
+        Args:
+            channel_id: ID канала
+            date_from: Первый день (YYYY-MM-DD)
+            date_to: Последний день (YYYY-MM-DD, включительно)
+        
+        Returns:
+            List[Dict[str, Any]]: Сводки по дням
+        """
+        return self.rollups.get(channel_id, date_from, date_to)
+    
+    # Сжатие записей
+    
+    def train_compression_dictionary(self, sample_size: int = 1000, seed: Optional[int] = None) -> int:
+        """Обучает словарь сжатия на случайной выборке сохраненных записей.
+        
+        Новые записи сжимаются новым словарем, уже сохраненные остаются
+        читаемыми со своим словарем до перезаписи (см. recompress_records).
+        
+        Args:
+            sample_size: Размер выборки сообщений и комментариев
+            seed: Начальное значение генератора случайных чисел
+        
+        Returns:
+            int: ID нового словаря
+        
+        Raises:
+            ValueError: Если хранилище не использует сжатие zlib
         """
-        self.data_dir = data_dir
+        codec = getattr(self.storage, "codec", None)
+        if codec is None or codec.compression != "zlib":
+            raise ValueError("Словарь сжатия используется только при STORAGE_COMPRESSION=zlib")
+        
+        # Равномерная выборка без загрузки всех записей в память (reservoir sampling)
+        rnd = random.Random(seed)
+        sample: List[Dict[str, Any]] = []
+        for seen, record in enumerate(chain(self.storage.iter_messages(), self.storage.iter_comments())):
+            if seen < sample_size:
+                sample.append(record)
+            else:
+                position = rnd.randint(0, seen)
+                if position < sample_size:
+                    sample[position] = record
+        
+        return codec.train(sample)
+    
+    def recompress_records(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Перезаписывает все записи текущим кодеком хранилища.
         
-        # Создаем директорию, если она не существует
-        os.makedirs(self.data_dir, exist_ok=True)
-        os.makedirs(os.path.join(self.data_dir, "channels"), exist_ok=True)
-        os.makedirs(os.path.join(self.data_dir, "messages"), exist_ok=True)
-        os.makedirs(os.path.join(self.data_dir, "comments"), exist_ok=True)
-        os.makedirs(os.path.join(self.data_dir, "users"), exist_ok=True)
+        Содержимое записей не меняется, поэтому индексы и статистика остаются
+        актуальными.
         
-        logger.info("Инициализирован сервис данных")
+        Args:
+            batch_size: Количество записей в одной пакетной записи
+        
+        Returns:
+            Dict[str, int]: Количество перезаписанных каналов, сообщений и комментариев
+        """
+        counts = copy_storage(self.storage, self.storage, batch_size)
+        self.cache.clear()
+        return counts
     
     # Методы для работы с каналами
     
@@ -33,7 +284,7 @@ class DataService:
         
         Args:
             channel_data: Данные канала
-            
+        
         Returns:
             bool: True, если сохранение успешно
         """
@@ -42,36 +293,20 @@ class DataService:
             logger.error("Отсутствует channel_id в данных канала")
             return False
         
-        file_path = os.path.join(self.data_dir, "channels", f"{channel_id}.json")
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(channel_data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении канала {channel_id}: {str(e)}")
-            return False
+        saved = self.storage.save_channel(channel_data)
+        self.cache.invalidate(("channel", channel_id))
+        return saved
     
     def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
         """Получает информацию о канале.
         
         Args:
             channel_id: ID канала
-            
+        
         Returns:
             Optional[Dict[str, Any]]: Данные канала или None
         """
-        file_path = os.path.join(self.data_dir, "channels", f"{channel_id}.json")
-        
-        if not os.path.exists(file_path):
-            return None
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Ошибка при чтении канала {channel_id}: {str(e)}")
-            return None
+        return self._cached_get("channel", channel_id, self.storage.get_channel)
     
     def get_all_channels(self) -> List[Dict[str, Any]]:
         """Получает информацию о всех каналах.
@@ -79,20 +314,7 @@ class DataService:
         Returns:
             List[Dict[str, Any]]: Список данных каналов
         """
-        channels_dir = os.path.join(self.data_dir, "channels")
-        channels = []
-        
-        for filename in os.listdir(channels_dir):
-            if filename.endswith(".json"):
-                try:
-                    file_path = os.path.join(channels_dir, filename)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        channel_data = json.load(f)
-                        channels.append(channel_data)
-                except Exception as e:
-                    logger.error(f"Ошибка при чтении канала {filename}: {str(e)}")
-        
-        return channels
+        return list(self.storage.iter_channels())
     
     def get_monitored_channels(self) -> List[Dict[str, Any]]:
         """Получает информацию о отслеживаемых каналах.
@@ -108,21 +330,13 @@ class DataService:
         
         Args:
             channel_id: ID канала
-            
+        
         Returns:
             bool: True, если удаление успешно
         """
-        file_path = os.path.join(self.data_dir, "channels", f"{channel_id}.json")
-        
-        if not os.path.exists(file_path):
-            return False
-        
-        try:
-            os.remove(file_path)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при удалении канала {channel_id}: {str(e)}")
-            return False
+        deleted = self.storage.delete_channel(channel_id)
+        self.cache.invalidate(("channel", channel_id))
+        return deleted
     
     # Методы для работы с сообщениями
     
@@ -130,136 +344,199 @@ class DataService:
         """Сохраняет информацию о сообщении.
         
         Args:
-            message_data: Данные сообщения
-            
+            message_data: Данные сообщения (словарь или MessageRecord)
+        
         Returns:
             bool: True, если сохранение успешно
         """
+        message_data = as_dict(message_data)
         message_id = message_data.get("message_id")
         if not message_id:
             logger.error("Отсутствует message_id в данных сообщения")
             return False
         
-        file_path = os.path.join(self.data_dir, "messages", f"{message_id}.json")
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(message_data, f, ensure_ascii=False, indent=2)
+        # Сообщение с тем же содержимым уже сохранено
+        changed = self.hashes.select_changed("message", [message_data])
+        if not changed:
             return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении сообщения {message_id}: {str(e)}")
+        
+        saved = self.storage.save_message(message_data)
+        self.cache.invalidate(("message", message_id))
+        if not saved:
             return False
+        
+        self.hashes.commit("message", changed)
+        self.engagement.record_messages([message_data])
+        if self.search_index.is_built("message"):
+            self.search_index.index_document("message", message_id, message_data.get("text", ""))
+        if self.stats.is_built():
+            self.stats.update("message", [message_data])
+        return True
+    
+    def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        """Сохраняет пакет сообщений одной операцией хранилища.
+        
+        Записываются только новые и измененные сообщения, сообщения с уже
+        сохраненным содержимым считаются сохраненными без записи.
+        
+        Args:
+            messages: Список данных сообщений (словари или MessageRecord)
+        
+        Returns:
+            int: Количество сохраненных сообщений
+        """
+        valid = [message_data for message_data in to_dicts(messages) if message_data.get("message_id")]
+        if len(valid) < len(messages):
+            logger.error(f"Пропущено сообщений без message_id: {len(messages) - len(valid)}")
+        
+        changed = self.hashes.select_changed("message", valid)
+        unchanged = len(valid) - len(changed)
+        valid = [message_data for message_data, _ in changed]
+        if not valid:
+            return unchanged
+        
+        saved = self.storage.save_messages_bulk(valid)
+        self._commit_hashes("message", changed, saved)
+        for message_data in valid:
+            self.cache.invalidate(("message", message_data["message_id"]))
+        self.engagement.record_messages(valid)
+        
+        if self.search_index.is_built("message"):
+            self.search_index.index_documents(
+                "message", [(m["message_id"], m.get("text", "")) for m in valid]
+            )
+        if self.stats.is_built():
+            self.stats.update("message", valid)
+        return saved + unchanged
     
     def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
         """Получает информацию о сообщении.
         
         Args:
             message_id: ID сообщения
-            
+        
         Returns:
             Optional[Dict[str, Any]]: Данные сообщения или None
         """
-        file_path = os.path.join(self.data_dir, "messages", f"{message_id}.json")
-        
-        if not os.path.exists(file_path):
-            return None
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Ошибка при чтении сообщения {message_id}: {str(e)}")
-            return None
+        return self._cached_get("message", message_id, self.storage.get_message)
     
     def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
         """Получает сообщения канала.
         
         Args:
             channel_id: ID канала
-            
+        
         Returns:
             List[Dict[str, Any]]: Список сообщений канала
         """
-        messages_dir = os.path.join(self.data_dir, "messages")
-        messages = []
+        return self.storage.get_channel_messages(channel_id)
+    
+    def get_engagement_series(self, channel_id: str, metric: str = "views", bucket: str = "day",
+                              date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Агрегирует временной ряд вовлеченности канала по интервалам.
+        
+        Args:
+            channel_id: ID канала
+            metric: Метрика: views, forwards, comments_count или reactions_total
+            bucket: Интервал: hour или day
+            date_from: Начальная дата замеров
+            date_to: Конечная дата замеров
         
-        for filename in os.listdir(messages_dir):
-            if filename.endswith(".json"):
-                try:
-                    file_path = os.path.join(messages_dir, filename)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        message_data = json.load(f)
-                        if message_data.get("channel_id") == channel_id:
-                            messages.append(message_data)
-                except Exception as e:
-                    logger.error(f"Ошибка при чтении сообщения {filename}: {str(e)}")
+        Returns:
+            List[Dict[str, Any]]: Интервалы с суммой, приростом, скоростью и перцентилями
         
-        return sorted(messages, key=lambda x: x.get("date", ""), reverse=True)
+        Raises:
+            ValueError: Если метрика или интервал неизвестны
+        """
+        return self.engagement.aggregate(channel_id, metric, bucket, to_epoch_ms(date_from), to_epoch_ms(date_to))
     
-    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None, 
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
         """Поиск сообщений по параметрам.
         
+        Если задан запрос, сообщения ищутся по полнотекстовому индексу с учетом
+        словоформ и упорядочиваются по релевантности (BM25), иначе — по дате.
+        
         Args:
             query: Поисковый запрос
             channel_ids: Список ID каналов
             date_from: Начальная дата
             date_to: Конечная дата
-            
+        
         Returns:
             List[Dict[str, Any]]: Список найденных сообщений
         """
-        messages_dir = os.path.join(self.data_dir, "messages")
+        ranked_ids = self._search_ranked("message", query) if query else None
+        if ranked_ids is None:
+            return self.storage.search_messages(query, channel_ids, date_from, date_to)
+        
         results = []
+        for message_id in ranked_ids:
+            message_data = self.storage.get_message(message_id)
+            if not message_data:
+                continue
+            if message_matches(message_data, None, channel_ids, date_from, date_to):
+                results.append(message_data)
+        
+        return results
+    
+    def search_messages_page(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                             date_from: Optional[str] = None, date_to: Optional[str] = None,
+                             limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Постраничный поиск сообщений от новых к старым.
         
-        for filename in os.listdir(messages_dir):
-            if filename.endswith(".json"):
-                try:
-                    file_path = os.path.join(messages_dir, filename)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        message_data = json.load(f)
-                        
-                        # Фильтрация по каналам
-                        if channel_ids and message_data.get("channel_id") not in channel_ids:
-                            continue
-                        
-                        # Фильтрация по тексту
-                        if query and query.lower() not in message_data.get("text", "").lower():
-                            continue
-                        
-                        # Фильтрация по датам
-                        message_date = message_data.get("date", "")
-                        if date_from and message_date < date_from:
-                            continue
-                        if date_to and message_date > date_to:
-                            continue
-                        
-                        results.append(message_data)
-                except Exception as e:
-                    logger.error(f"Ошибка при чтении сообщения {filename}: {str(e)}")
-        
-        return sorted(results, key=lambda x: x.get("date", ""), reverse=True)
+        Страницы определяются ключом (date, message_id) последней записи,
+        поэтому новые сообщения не сдвигают уже выданные страницы, а стоимость
+        страницы не зависит от ее номера. Результаты поиска по запросу
+        на страницах также упорядочены по дате, а не по релевантности.
+        
+        Args:
+            query: Поисковый запрос
+            channel_ids: Список ID каналов
+            date_from: Начальная дата
+            date_to: Конечная дата
+            limit: Размер страницы
+            cursor: Курсор next_cursor предыдущей страницы
+        
+        Returns:
+            Dict[str, Any]: Сообщения страницы (messages) и курсор следующей страницы (next_cursor)
+        
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+        after = decode_cursor(cursor) if cursor else None
+        
+        ranked_ids = self._search_ranked("message", query) if query else None
+        if ranked_ids is None:
+            messages = self.storage.page_messages(query, channel_ids, date_from, date_to, limit + 1, after)
+        else:
+            candidates = (
+                message_data for message_data in map(self.storage.get_message, ranked_ids)
+                if message_data and message_matches(message_data, None, channel_ids, date_from, date_to)
+            )
+            messages = select_page(candidates, message_key, limit + 1, after, reverse=True)
+        
+        messages, next_cursor = make_page(messages, limit, message_key)
+        return {"messages": messages, "next_cursor": next_cursor}
     
     def delete_message(self, message_id: str) -> bool:
         """Удаляет информацию о сообщении.
         
         Args:
             message_id: ID сообщения
-            
+        
         Returns:
             bool: True, если удаление успешно
         """
-        file_path = os.path.join(self.data_dir, "messages", f"{message_id}.json")
-        
-        if not os.path.exists(file_path):
+        deleted = self.storage.delete_message(message_id)
+        self.cache.invalidate(("message", message_id))
+        if not deleted:
             return False
         
-        try:
-            os.remove(file_path)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при удалении сообщения {message_id}: {str(e)}")
-            return False
+        self.search_index.remove_document("message", message_id)
+        self.stats.remove("message", message_id)
+        self.hashes.forget("message", [message_id])
+        return True
     
     # Методы для работы с комментариями
     
@@ -267,78 +544,141 @@ class DataService:
         """Сохраняет информацию о комментарии.
         
         Args:
-            comment_data: Данные комментария
-            
+            comment_data: Данные комментария (словарь или CommentRecord)
+        
         Returns:
             bool: True, если сохранение успешно
         """
+        comment_data = as_dict(comment_data)
         comment_id = comment_data.get("comment_id")
         if not comment_id:
             logger.error("Отсутствует comment_id в данных комментария")
             return False
         
-        file_path = os.path.join(self.data_dir, "comments", f"{comment_id}.json")
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(comment_data, f, ensure_ascii=False, indent=2)
+        # Комментарий с тем же содержимым уже сохранен
+        changed = self.hashes.select_changed("comment", [comment_data])
+        if not changed:
             return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении комментария {comment_id}: {str(e)}")
+        
+        saved = self.storage.save_comment(comment_data)
+        self.cache.invalidate(("comment", comment_id))
+        if not saved:
             return False
+        
+        self.hashes.commit("comment", changed)
+        if self.search_index.is_built("comment"):
+            self.search_index.index_document("comment", comment_id, comment_data.get("text", ""))
+        if self.metadata_index.is_built():
+            self.metadata_index.update([comment_data])
+        if self.stats.is_built():
+            self.stats.update("comment", [comment_data])
+        return True
+    
+    def save_comments_bulk(self, comments: List[Dict[str, Any]], keep_metadata: bool = False) -> int:
+        """Сохраняет пакет комментариев одной операцией хранилища.
+        
+        Записываются только новые и измененные комментарии, комментарии с уже
+        сохраненным содержимым считаются сохраненными без записи.
+        
+        Args:
+            comments: Список данных комментариев (словари или CommentRecord)
+            keep_metadata: Сохранить метаданные уже сохраненных комментариев
+                (для комментариев, заново полученных из Telegram, где метаданных нет)
+        
+        Returns:
+            int: Количество сохраненных комментариев
+        """
+        valid = [comment_data for comment_data in to_dicts(comments) if comment_data.get("comment_id")]
+        if len(valid) < len(comments):
+            logger.error(f"Пропущено комментариев без comment_id: {len(comments) - len(valid)}")
+        
+        with self._metadata_lock if keep_metadata else nullcontext():
+            if keep_metadata:
+                valid = [self._with_stored_metadata(comment_data) for comment_data in valid]
+            return self._save_valid_comments(valid)
+    
+    def _save_valid_comments(self, valid: List[Dict[str, Any]]) -> int:
+        """Сохраняет комментарии с comment_id, пропуская неизмененные."""
+        changed = self.hashes.select_changed("comment", valid)
+        unchanged = len(valid) - len(changed)
+        valid = [comment_data for comment_data, _ in changed]
+        if not valid:
+            return unchanged
+        
+        saved = self.storage.save_comments_bulk(valid)
+        self._commit_hashes("comment", changed, saved)
+        for comment_data in valid:
+            self.cache.invalidate(("comment", comment_data["comment_id"]))
+        
+        if self.search_index.is_built("comment"):
+            self.search_index.index_documents(
+                "comment", [(c["comment_id"], c.get("text", "")) for c in valid]
+            )
+        if self.metadata_index.is_built():
+            self.metadata_index.update(valid)
+        if self.stats.is_built():
+            self.stats.update("comment", valid)
+        return saved + unchanged
+    
+    def _with_stored_metadata(self, comment_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Переносит в данные комментария метаданные его сохраненной версии."""
+        stored = self.get_comment(comment_data["comment_id"])
+        if not stored or not stored.get("metadata"):
+            return comment_data
+        return {**comment_data, "metadata": dict(stored["metadata"])}
     
     def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
         """Получает информацию о комментарии.
         
         Args:
             comment_id: ID комментария
-            
+        
         Returns:
             Optional[Dict[str, Any]]: Данные комментария или None
         """
-        file_path = os.path.join(self.data_dir, "comments", f"{comment_id}.json")
+        return self._cached_get("comment", comment_id, self.storage.get_comment)
+    
+    def iter_comment_records(self, channel_ids: Optional[List[str]] = None,
+                             message_ids: Optional[List[str]] = None) -> Iterator[CommentRecord]:
+        """Перебирает комментарии в виде компактных записей.
         
-        if not os.path.exists(file_path):
-            return None
+        Записи создаются по одной при чтении хранилища, поэтому для аналитики
+        по десяткам тысяч комментариев в памяти не держатся словари.
         
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Ошибка при чтении комментария {comment_id}: {str(e)}")
-            return None
+        Args:
+            channel_ids: Список ID каналов
+            message_ids: Список ID сообщений
+        
+        Returns:
+            Iterator[CommentRecord]: Записи комментариев
+        """
+        for comment_data in self.storage.iter_comments():
+            if comment_matches(comment_data, None, channel_ids, message_ids):
+                yield CommentRecord.from_dict(comment_data)
     
     def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
         """Получает комментарии сообщения.
         
         Args:
             message_id: ID сообщения
-            
+        
         Returns:
             List[Dict[str, Any]]: Список комментариев сообщения
         """
-        comments_dir = os.path.join(self.data_dir, "comments")
-        comments = []
-        
-        for filename in os.listdir(comments_dir):
-            if filename.endswith(".json"):
-                try:
-                    file_path = os.path.join(comments_dir, filename)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        comment_data = json.load(f)
-                        if comment_data.get("message_id") == message_id:
-                            comments.append(comment_data)
-                except Exception as e:
-                    logger.error(f"Ошибка при чтении комментария {filename}: {str(e)}")
-        
-        return sorted(comments, key=lambda x: x.get("date", ""))
+        return self.storage.get_message_comments(message_id)
     
     def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
-                       user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+                       user_tags: Optional[List[str]] = None,
+                       is_bookmarked: Optional[bool] = None) -> List[Dict[str, Any]]:
         """Поиск комментариев по параметрам.
         
+        Если задан запрос, комментарии ищутся по полнотекстовому индексу с учетом
+        словоформ и упорядочиваются по релевантности (BM25), иначе — по дате.
+        Фильтры по тональности, тегам и закладкам отбираются по индексу
+        метаданных, и загружаются только найденные комментарии.
+        
         Args:
             query: Поисковый запрос
             channel_ids: Список ID каналов
@@ -347,54 +687,87 @@ class DataService:
             date_to: Конечная дата
             sentiment: Тональность комментария
             user_tags: Список тегов
-            
+            is_bookmarked: Признак закладки
+        
         Returns:
             List[Dict[str, Any]]: Список найденных комментариев
         """
-        comments_dir = os.path.join(self.data_dir, "comments")
+        selected = self._select_by_metadata(
+            channel_ids, message_ids, date_from, date_to, sentiment, user_tags, is_bookmarked
+        )
+        ranked_ids = self._search_ranked("comment", query) if query else None
+        if ranked_ids is None:
+            if selected is not None:
+                return self._load_comments(selected, query)
+            return self.storage.search_comments(
+                query, channel_ids, message_ids, date_from, date_to, sentiment, user_tags
+            )
+        
+        if selected is not None:
+            allowed = {comment_id for _, comment_id, _ in selected}
+            ranked_ids = [comment_id for comment_id in ranked_ids if comment_id in allowed]
+        
         results = []
+        for comment_id in ranked_ids:
+            comment_data = self.storage.get_comment(comment_id)
+            if not comment_data:
+                continue
+            if comment_matches(comment_data, None, channel_ids, message_ids,
+                               date_from, date_to, sentiment, user_tags):
+                results.append(comment_data)
+        
+        return results
+    
+    def search_comments_page(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                             message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                             date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                             user_tags: Optional[List[str]] = None, limit: int = 100,
+                             cursor: Optional[str] = None, is_bookmarked: Optional[bool] = None) -> Dict[str, Any]:
+        """Постраничный поиск комментариев от старых к новым.
+        
+        Args:
+            query: Поисковый запрос
+            channel_ids: Список ID каналов
+            message_ids: Список ID сообщений
+            date_from: Начальная дата
+            date_to: Конечная дата
+            sentiment: Тональность комментария
+            user_tags: Список тегов
+            limit: Размер страницы
+            cursor: Курсор next_cursor предыдущей страницы
+            is_bookmarked: Признак закладки
         
-        for filename in os.listdir(comments_dir):
-            if filename.endswith(".json"):
-                try:
-                    file_path = os.path.join(comments_dir, filename)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        comment_data = json.load(f)
-                        
-                        # Фильтрация по каналам
-                        if channel_ids and comment_data.get("channel_id") not in channel_ids:
-                            continue
-                        
-                        # Фильтрация по сообщениям
-                        if message_ids and comment_data.get("message_id") not in message_ids:
-                            continue
-                        
-                        # Фильтрация по тексту
-                        if query and query.lower() not in comment_data.get("text", "").lower():
-                            continue
-                        
-                        # Фильтрация по датам
-                        comment_date = comment_data.get("date", "")
-                        if date_from and comment_date < date_from:
-                            continue
-                        if date_to and comment_date > date_to:
-                            continue
-                        
-                        # Фильтрация по тональности
-                        if sentiment and comment_data.get("metadata", {}).get("sentiment") != sentiment:
-                            continue
-                        
-                        # Фильтрация по тегам
-                        if user_tags:
-                            comment_tags = comment_data.get("metadata", {}).get("user_tags", [])
-                            if not any(tag in comment_tags for tag in user_tags):
-                                continue
-                        
-                        results.append(comment_data)
-                except Exception as e:
-                    logger.error(f"Ошибка при чтении комментария {filename}: {str(e)}")
-        
-        return sorted(results, key=lambda x: x.get("date", ""))
+        Returns:
+            Dict[str, Any]: Комментарии страницы (comments) и курсор следующей страницы (next_cursor)
+        
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+        after = decode_cursor(cursor) if cursor else None
+        
+        selected = self._select_by_metadata(
+            channel_ids, message_ids, date_from, date_to, sentiment, user_tags, is_bookmarked
+        )
+        ranked_ids = self._search_ranked("comment", query) if query else None
+        if ranked_ids is None and selected is not None:
+            comments = self._load_comments(page_after(selected, after), query, limit + 1)
+        elif ranked_ids is None:
+            comments = self.storage.page_comments(
+                query, channel_ids, message_ids, date_from, date_to, sentiment, user_tags, limit + 1, after
+            )
+        else:
+            if selected is not None:
+                allowed = {comment_id for _, comment_id, _ in selected}
+                ranked_ids = [comment_id for comment_id in ranked_ids if comment_id in allowed]
+            candidates = (
+                comment_data for comment_data in map(self.storage.get_comment, ranked_ids)
+                if comment_data and comment_matches(comment_data, None, channel_ids, message_ids,
+                                                    date_from, date_to, sentiment, user_tags)
+            )
+            comments = select_page(candidates, comment_key, limit + 1, after)
+        
+        comments, next_cursor = make_page(comments, limit, comment_key)
+        return {"comments": comments, "next_cursor": next_cursor}
     
     def update_comment_metadata(self, comment_id: str, metadata: Dict[str, Any]) -> bool:
         """Обновляет метаданные комментария.
@@ -402,38 +775,39 @@ class DataService:
         Args:
             comment_id: ID комментария
             metadata: Новые метаданные
-            
+        
         Returns:
             bool: True, если обновление успешно
         """
-        comment_data = self.get_comment(comment_id)
-        if not comment_data:
-            return False
-        
-        # Обновляем метаданные
-        current_metadata = comment_data.get("metadata", {})
-        current_metadata.update(metadata)
-        comment_data["metadata"] = current_metadata
-        
-        return self.save_comment(comment_data)
+        with self._metadata_lock:
+            comment_data = self.get_comment(comment_id)
+            if not comment_data:
+                return False
+        
+            # Обновляем метаданные в копии, чтобы не изменять запись в кеше
+            comment_data = dict(comment_data)
+            current_metadata = dict(comment_data.get("metadata") or {})
+            current_metadata.update(metadata)
+            comment_data["metadata"] = current_metadata
+        
+            return self.save_comment(comment_data)
     
     def delete_comment(self, comment_id: str) -> bool:
         """Удаляет информацию о комментарии.
         
         Args:
             comment_id: ID комментария
-            
+        
         Returns:
             bool: True, если удаление успешно
         """
-        file_path = os.path.join(self.data_dir, "comments", f"{comment_id}.json")
-        
-        if not os.path.exists(file_path):
+        deleted = self.storage.delete_comment(comment_id)
+        self.cache.invalidate(("comment", comment_id))
+        if not deleted:
             return False
         
-        try:
-            os.remove(file_path)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при удалении комментария {comment_id}: {str(e)}")
-            return False
\ No newline at end of file
+        self.search_index.remove_document("comment", comment_id)
+        self.metadata_index.remove(comment_id)
+        self.stats.remove("comment", comment_id)
+        self.hashes.forget("comment", [comment_id])
+        return True
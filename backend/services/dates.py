@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from typing import Optional, Any
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """Приводит дату к числу миллисекунд UTC с начала эпохи.
+    
+    Принимает строки ISO 8601 (с часовым поясом, с суффиксом Z или без пояса —
+    такие считаются UTC), объекты datetime и уже нормализованные числа.
+    
+    Args:
+        value: Исходная дата
+    
+    Returns:
+        Optional[int]: Миллисекунды UTC или None, если дата не распознана
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            value = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+def date_key(value: Any) -> int:
+    """Возвращает ключ сортировки даты записи: миллисекунды UTC.
+    
+    Даты с разными часовыми поясами и точностью сравниваются по моменту
+    времени, а не как строки; записи без даты упорядочиваются первыми.
+    """
+    timestamp = to_epoch_ms(value)
+    return timestamp if timestamp is not None else 0
+
+def epoch_ms_to_datetime(value: int) -> datetime:
+    """Преобразует миллисекунды UTC в datetime с часовым поясом UTC."""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
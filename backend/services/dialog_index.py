@@ -0,0 +1,160 @@
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Минимальное сходство по триграммам для нечеткого совпадения
+FUZZY_THRESHOLD = 0.45
+
+def normalize(text: str) -> str:
+    """Приводит текст к виду для сравнения: нижний регистр, ё → е."""
+    return (text or "").lower().replace("ё", "е")
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DialogIndex:
+    """Индекс каналов из диалогов пользователя для поиска по названию и юзернейму.
+    
+    Индекс строится один раз из списка диалогов и затем обновляется
+    по отдельным каналам (upsert/remove) при событиях Telegram. Поиск:
+    - по префиксу слов названия и юзернейма — двоичным поиском по
+      отсортированному списку слов;
+    - по подстроке названия;
+    - нечетко — по сходству триграмм слов запроса и слов названия,
+      что находит каналы при опечатках.
+    """
+    
+    def __init__(self):
+        # ID канала → данные канала
+        self.channels: Dict[str, Dict[str, Any]] = {}
+        # Отсортированные пары (слово, ID канала)
+        self._words: List[Tuple[str, str]] = []
+        # Триграмма → ID каналов
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._sorted = True
+        self.built_at: Optional[float] = None
+    
+    def __len__(self) -> int:
+        return len(self.channels)
+    
+    def age(self) -> Optional[float]:
+        """Возвращает возраст индекса в секундах (None — индекс не построен)."""
+        return time.monotonic() - self.built_at if self.built_at is not None else None
+    
+    @staticmethod
+    def _words_of(channel: Dict[str, Any]) -> Set[str]:
+        words = set(_WORD_RE.findall(normalize(channel.get("title"))))
+        if channel.get("username"):
+            words.add(normalize(channel["username"]))
+        return words
+    
+    def build(self, channels: Iterable[Dict[str, Any]]) -> None:
+        """Строит индекс заново.
+        
+        Args:
+            channels: Данные каналов (channel_id, title, username и др.)
+        """
+        self.channels = {}
+        self._words = []
+        self._trigrams = {}
+        for channel in channels:
+            self._add(channel)
+        self._words.sort()
+        self._sorted = True
+        self.built_at = time.monotonic()
+    
+    def _add(self, channel: Dict[str, Any]) -> None:
+        channel_id = channel["channel_id"]
+        self.channels[channel_id] = channel
+        for word in self._words_of(channel):
+            self._words.append((word, channel_id))
+            for trigram in _trigrams(word):
+                self._trigrams.setdefault(trigram, set()).add(channel_id)
+        self._sorted = False
+    
+    def upsert(self, channel: Dict[str, Any]) -> None:
+        """Добавляет канал или обновляет его данные."""
+        self.remove(channel["channel_id"])
+        self._add(channel)
+    
+    def remove(self, channel_id: str) -> bool:
+        """Удаляет канал из индекса."""
+        channel = self.channels.pop(channel_id, None)
+        if channel is None:
+            return False
+        
+        words = self._words_of(channel)
+        self._words = [entry for entry in self._words if entry[1] != channel_id]
+        for word in words:
+            for trigram in _trigrams(word):
+                ids = self._trigrams.get(trigram)
+                if ids is not None:
+                    ids.discard(channel_id)
+                    if not ids:
+                        del self._trigrams[trigram]
+        return True
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Ищет каналы по запросу.
+        
+        Каналы, все слова запроса которых совпадают с началом слов названия
+        или юзернейма, идут первыми, затем совпадения по подстроке названия,
+        затем нечеткие совпадения по убыванию сходства.
+        
+        Args:
+            query: Поисковый запрос
+            limit: Максимальное количество результатов
+        
+        Returns:
+            List[Dict[str, Any]]: Данные найденных каналов
+        """
+        text = normalize(query).strip().lstrip("@")
+        terms = _WORD_RE.findall(text)
+        if not terms:
+            return []
+        
+        if not self._sorted:
+            self._words.sort()
+            self._sorted = True
+        
+        # Префиксные совпадения: каждое слово запроса должно быть началом какого-либо слова канала
+        prefix_ids: Optional[Set[str]] = None
+        for term in terms:
+            ids = set()
+            position = bisect_left(self._words, (term, ""))
+            while position < len(self._words) and self._words[position][0].startswith(term):
+                ids.add(self._words[position][1])
+                position += 1
+            prefix_ids = ids if prefix_ids is None else prefix_ids & ids
+        
+        scored: Dict[str, float] = {channel_id: 3.0 for channel_id in prefix_ids or ()}
+        
+        for channel_id, channel in self.channels.items():
+            if channel_id not in scored and text in normalize(channel.get("title")):
+                scored[channel_id] = 2.0
+        
+        # Нечеткие совпадения: среднее по словам запроса лучшее сходство Дайса с триграммами
+        if len(scored) < limit:
+            similarity: Dict[str, float] = {}
+            for term in terms:
+                term_trigrams = _trigrams(term)
+                candidates = set()
+                for trigram in term_trigrams:
+                    candidates |= self._trigrams.get(trigram, set())
+                for channel_id in candidates:
+                    best = max(
+                        (2 * len(term_trigrams & _trigrams(word)) / (len(term_trigrams) + len(_trigrams(word)))
+                         for word in self._words_of(self.channels[channel_id])),
+                        default=0.0
+                    )
+                    similarity[channel_id] = similarity.get(channel_id, 0.0) + best / len(terms)
+            for channel_id, value in similarity.items():
+                if channel_id not in scored and value >= FUZZY_THRESHOLD:
+                    scored[channel_id] = value
+        
+        ranked = sorted(scored.items(), key=lambda item: (-item[1], normalize(self.channels[item[0]].get("title"))))
+        return [self.channels[channel_id] for channel_id, _ in ranked[:limit]]
@@ -0,0 +1,257 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+from services.records import telegram_id
+
+logger = logging.getLogger(__name__)
+
+# Строка временного ряда: момент замера (мс UTC), ID сообщения и значения метрик
+SAMPLE_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("message_id", "<i8"),
+    ("views", "<i8"),
+    ("forwards", "<i8"),
+    ("comments_count", "<i8"),
+    ("reactions_total", "<i8"),
+])
+METRICS = ("views", "forwards", "comments_count", "reactions_total")
+# Длительность интервала агрегации в миллисекундах
+BUCKETS = {"hour": 3600 * 1000, "day": 86400 * 1000}
+
+def numeric_message_id(message_id: Any) -> Optional[int]:
+    """Возвращает числовой ID сообщения Telegram (123:m45 и m45 → 45).
+    
+    Замеры хранятся в файле своего канала, поэтому ID внутри канала достаточно.
+    """
+    if isinstance(message_id, (int, np.integer)):
+        return int(message_id)
+    return telegram_id(message_id)
+
+class EngagementStore:
+    """Колоночное хранилище временных рядов вовлеченности сообщений.
+    
+    Замеры каждого канала дописываются в файл engagement/{channel_id}.bin
+    из строк фиксированного размера (SAMPLE_DTYPE), поэтому файл читается
+    через np.memmap без разбора JSON, а диапазонные выборки и агрегаты
+    считаются векторными операциями NumPy.
+    """
+    
+    def __init__(self, data_dir: str = "data"):
+        """Инициализация хранилища.
+        
+        Args:
+            data_dir: Директория для хранения данных
+        """
+        self.data_dir = os.path.join(data_dir, "engagement")
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def _path(self, channel_id: str) -> str:
+        name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(channel_id))
+        return os.path.join(self.data_dir, f"{name}.bin")
+    
+    # Запись
+    
+    def record(self, channel_id: str, samples: Iterable[Tuple[int, int, int, int, int, int]]) -> int:
+        """Дописывает замеры канала.
+        
+        Args:
+            channel_id: ID канала
+            samples: Кортежи (ts, message_id, views, forwards, comments_count, reactions_total)
+        
+        Returns:
+            int: Количество записанных замеров
+        """
+        rows = np.array(list(samples), dtype=SAMPLE_DTYPE)
+        if not len(rows):
+            return 0
+        
+        with self._lock:
+            with open(self._path(channel_id), "ab") as f:
+                f.write(rows.tobytes())
+        return len(rows)
+    
+    def record_messages(self, messages: Iterable[Dict[str, Any]], timestamp: Optional[int] = None) -> int:
+        """Записывает текущие значения метрик сообщений как замеры.
+        
+        Args:
+            messages: Данные сообщений
+            timestamp: Момент замера в миллисекундах UTC (по умолчанию текущее время)
+        
+        Returns:
+            int: Количество записанных замеров
+        """
+        timestamp = timestamp if timestamp is not None else int(time.time() * 1000)
+        
+        by_channel: Dict[str, List[Tuple[int, ...]]] = {}
+        for message_data in messages:
+            sample = self.message_sample(message_data, timestamp)
+            if sample is not None:
+                by_channel.setdefault(str(message_data["channel_id"]), []).append(sample)
+        
+        return sum(self.record(channel_id, samples) for channel_id, samples in by_channel.items())
+    
+    @staticmethod
+    def message_sample(message_data: Dict[str, Any], timestamp: int) -> Optional[Tuple[int, ...]]:
+        """Формирует замер из данных сообщения.
+        
+        Returns:
+            Optional[Tuple[int, ...]]: Замер или None, если у сообщения нет метрик
+        """
+        if not message_data.get("channel_id"):
+            return None
+        message_id = numeric_message_id(message_data.get("message_id"))
+        if message_id is None:
+            return None
+        
+        views = message_data.get("views")
+        forwards = message_data.get("forwards")
+        if views is None and forwards is None:
+            return None
+        
+        reactions_total = sum(
+            reaction.get("count", 0) for reaction in message_data.get("reactions") or []
+            if isinstance(reaction, dict)
+        )
+        return (timestamp, message_id, views or 0, forwards or 0,
+                message_data.get("comments_count") or 0, reactions_total)
+    
+    # Чтение
+    
+    def load(self, channel_id: str) -> np.ndarray:
+        """Возвращает все замеры канала как отображение файла в память (только чтение)."""
+        path = self._path(channel_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        count = size // SAMPLE_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        return np.memmap(path, dtype=SAMPLE_DTYPE, mode="r", shape=(count,))
+    
+    def query(self, channel_id: str, ts_from: Optional[int] = None, ts_to: Optional[int] = None,
+              message_id: Optional[int] = None) -> np.ndarray:
+        """Выбирает замеры канала за период.
+        
+        Args:
+            channel_id: ID канала
+            ts_from: Начало периода в миллисекундах UTC
+            ts_to: Конец периода в миллисекундах UTC (включительно)
+            message_id: ID сообщения (m123 или 123) для выборки ряда одного сообщения
+        
+        Returns:
+            np.ndarray: Замеры, упорядоченные по времени
+        """
+        samples = self.load(channel_id)
+        mask = np.ones(len(samples), dtype=bool)
+        if ts_from is not None:
+            mask &= samples["ts"] >= ts_from
+        if ts_to is not None:
+            mask &= samples["ts"] <= ts_to
+        if message_id is not None:
+            mask &= samples["message_id"] == numeric_message_id(message_id)
+        
+        selected = samples[mask]
+        return selected[np.argsort(selected["ts"], kind="stable")]
+    
+    def aggregate(self, channel_id: str, metric: str = "views", bucket: str = "day",
+                  ts_from: Optional[int] = None, ts_to: Optional[int] = None,
+                  percentiles: Tuple[float, ...] = (50, 90, 99)) -> List[Dict[str, Any]]:
+        """Агрегирует метрику канала по интервалам времени.
+        
+        Для каждого интервала возвращаются:
+        - total: сумма последних значений метрики по сообщениям в интервале;
+        - growth: суммарный прирост метрики между соседними замерами сообщений;
+        - rate: прирост в час;
+        - percentiles: перцентили последних значений по сообщениям.
+        
+        Args:
+            channel_id: ID канала
+            metric: Метрика: views, forwards, comments_count или reactions_total
+            bucket: Интервал: hour или day
+            ts_from: Начало периода в миллисекундах UTC
+            ts_to: Конец периода в миллисекундах UTC (включительно)
+            percentiles: Перцентили в процентах
+        
+        Returns:
+            List[Dict[str, Any]]: Интервалы в порядке времени
+        
+        Raises:
+            ValueError: Если метрика или интервал неизвестны
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Неизвестная метрика: {metric}")
+        if bucket not in BUCKETS:
+            raise ValueError(f"Неизвестный интервал агрегации: {bucket}")
+        
+        samples = self.query(channel_id, ts_from, ts_to)
+        if not len(samples):
+            return []
+        
+        width = BUCKETS[bucket]
+        # Упорядочиваем по сообщению и времени, чтобы соседние строки были замерами одного сообщения
+        order = np.lexsort((samples["ts"], samples["message_id"]))
+        ts = samples["ts"][order]
+        message_ids = samples["message_id"][order]
+        values = samples[metric][order].astype(np.float64)
+        buckets = ts // width
+        
+        # Прирост относительно предыдущего замера того же сообщения относится к интервалу нового замера
+        same_message = np.empty(len(ts), dtype=bool)
+        same_message[0] = False
+        same_message[1:] = message_ids[1:] == message_ids[:-1]
+        deltas = np.zeros(len(ts))
+        deltas[1:] = np.where(same_message[1:], values[1:] - values[:-1], 0)
+        
+        bucket_keys, bucket_index = np.unique(buckets, return_inverse=True)
+        growth = np.bincount(bucket_index, weights=deltas, minlength=len(bucket_keys))
+        sample_counts = np.bincount(bucket_index, minlength=len(bucket_keys))
+        
+        # Последний замер каждого сообщения в интервале
+        is_last = np.ones(len(ts), dtype=bool)
+        is_last[:-1] = (message_ids[1:] != message_ids[:-1]) | (buckets[1:] != buckets[:-1])
+        last_bucket = bucket_index[is_last]
+        last_values = values[is_last]
+        totals = np.bincount(last_bucket, weights=last_values, minlength=len(bucket_keys))
+        message_counts = np.bincount(last_bucket, minlength=len(bucket_keys))
+        
+        # Перцентили по интервалам: сортируем значения внутри интервалов и берем позиции
+        value_order = np.lexsort((last_values, last_bucket))
+        sorted_values = last_values[value_order]
+        starts = np.concatenate(([0], np.cumsum(message_counts)[:-1]))
+        percentile_values = {}
+        for q in percentiles:
+            positions = starts + np.floor((message_counts - 1) * q / 100).astype(np.int64)
+            percentile_values[q] = sorted_values[positions]
+        
+        hours = width / (3600 * 1000)
+        return [
+            {
+                "start": int(bucket_keys[i] * width),
+                "samples": int(sample_counts[i]),
+                "messages": int(message_counts[i]),
+                "total": float(totals[i]),
+                "growth": float(growth[i]),
+                "rate": float(growth[i] / hours),
+                "percentiles": {f"p{q:g}": float(percentile_values[q][i]) for q in percentiles},
+            }
+            for i in range(len(bucket_keys))
+        ]
+    
+    def latest(self, channel_id: str) -> Dict[int, Dict[str, int]]:
+        """Возвращает последние значения метрик по сообщениям канала."""
+        samples = self.load(channel_id)
+        if not len(samples):
+            return {}
+        
+        order = np.lexsort((samples["ts"], samples["message_id"]))
+        ordered = samples[order]
+        is_last = np.ones(len(ordered), dtype=bool)
+        is_last[:-1] = ordered["message_id"][1:] != ordered["message_id"][:-1]
+        return {
+            int(row["message_id"]): {metric: int(row[metric]) for metric in ("ts",) + METRICS}
+            for row in ordered[is_last]
+        }
@@ -0,0 +1,157 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+from telethon.tl.types import Channel, InputPeerChannel
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peers (
+    session_key TEXT NOT NULL,
+    channel_id INTEGER NOT NULL,
+    access_hash INTEGER NOT NULL,
+    title TEXT,
+    username TEXT,
+    PRIMARY KEY (session_key, channel_id)
+) WITHOUT ROWID;
+"""
+
+class EntityCache:
+    """Постоянный кеш входных сущностей каналов по сессиям.
+    
+    Для обращения к каналу Telegram достаточно его ID и access_hash
+    (InputPeerChannel), но access_hash у каждого аккаунта свой. Кеш хранит
+    их в базе SQLite по ключу сессии и держит в памяти уже загруженные
+    сессии, поэтому методы TelegramService не запрашивают сущность канала
+    перед каждым запросом, а кеш переживает перезапуск приложения.
+    """
+    
+    def __init__(self, cache_path: str):
+        """Инициализация кеша.
+        
+        Args:
+            cache_path: Путь к файлу базы кеша
+        """
+        self.cache_path = cache_path
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        
+        # Ключ сессии → {ID канала: access_hash}
+        self._sessions: Dict[str, Dict[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    def _session(self, session_key: str) -> Dict[int, int]:
+        """Возвращает каналы сессии, загружая их из базы при первом обращении."""
+        peers = self._sessions.get(session_key)
+        if peers is None:
+            rows = self._conn.execute(
+                "SELECT channel_id, access_hash FROM peers WHERE session_key = ?", (session_key,)
+            )
+            peers = dict(rows)
+            self._sessions[session_key] = peers
+        return peers
+    
+    def get(self, session_key: str, channel_ids: Iterable[int]) -> Dict[int, InputPeerChannel]:
+        """Возвращает входные сущности известных каналов.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_ids: ID каналов
+        
+        Returns:
+            Dict[int, InputPeerChannel]: Сущности найденных каналов по ID
+        """
+        found = {}
+        with self._lock:
+            peers = self._session(session_key)
+            for channel_id in channel_ids:
+                access_hash = peers.get(channel_id)
+                if access_hash is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[channel_id] = InputPeerChannel(channel_id, access_hash)
+        return found
+    
+    def put(self, session_key: str, entities: Iterable[Any]) -> int:
+        """Запоминает каналы из полученных от Telegram сущностей.
+        
+        Args:
+            session_key: Ключ сессии
+            entities: Сущности Telegram: каналы или InputPeerChannel (остальные пропускаются)
+        
+        Returns:
+            int: Количество новых или измененных каналов
+        """
+        rows: List[Tuple[str, int, int, Optional[str], Optional[str]]] = []
+        with self._lock:
+            peers = self._session(session_key)
+            for entity in entities:
+                if isinstance(entity, InputPeerChannel):
+                    row = (session_key, entity.channel_id, entity.access_hash, None, None)
+                # Неполные (min) сущности содержат access_hash, пригодный только в контексте сообщения
+                elif isinstance(entity, Channel) and entity.access_hash is not None and not entity.min:
+                    row = (session_key, entity.id, entity.access_hash, entity.title, entity.username)
+                else:
+                    continue
+                
+                if peers.get(row[1]) != row[2]:
+                    peers[row[1]] = row[2]
+                    rows.append(row)
+            
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO peers (session_key, channel_id, access_hash, title, username) "
+                    "VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+        return len(rows)
+    
+    def forget(self, session_key: str, channel_ids: Optional[Iterable[int]] = None) -> None:
+        """Удаляет каналы сессии из кеша.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_ids: ID каналов (None — все каналы сессии)
+        """
+        with self._lock:
+            if channel_ids is None:
+                self._conn.execute("DELETE FROM peers WHERE session_key = ?", (session_key,))
+                self._sessions.pop(session_key, None)
+            else:
+                channel_ids = list(channel_ids)
+                self._conn.executemany(
+                    "DELETE FROM peers WHERE session_key = ? AND channel_id = ?",
+                    [(session_key, channel_id) for channel_id in channel_ids]
+                )
+                peers = self._session(session_key)
+                for channel_id in channel_ids:
+                    peers.pop(channel_id, None)
+            self._conn.commit()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики кеша."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "channels": sum(len(peers) for peers in self._sessions.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+from services.dates import date_key, to_epoch_ms
+from services.pagination import RecordKey
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    comment_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    message_id TEXT,
+    date TEXT,
+    sentiment TEXT,
+    user_tags TEXT NOT NULL DEFAULT '[]',
+    is_bookmarked INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Метаданные комментария в индексе: (тональность, теги, закладка)
+Metadata = Tuple[Optional[str], Tuple[str, ...], bool]
+
+def _metadata(comment_data: Dict[str, Any]) -> Metadata:
+    metadata = comment_data.get("metadata") or {}
+    return (
+        metadata.get("sentiment"),
+        tuple(dict.fromkeys(metadata.get("user_tags") or ())),
+        bool(metadata.get("is_bookmarked", False)),
+    )
+
+def _postings(metadata: Metadata) -> List[Tuple[str, str]]:
+    """Возвращает ключи битовых карт, в которые входит комментарий."""
+    sentiment, user_tags, is_bookmarked = metadata
+    keys = [("tag", tag) for tag in user_tags]
+    if sentiment:
+        keys.append(("sentiment", sentiment))
+    if is_bookmarked:
+        keys.append(("bookmarked", "1"))
+    return keys
+
+def _positions(bits: int) -> np.ndarray:
+    """Возвращает номера установленных битов битовой карты."""
+    if not bits:
+        return np.empty(0, dtype=np.int64)
+    data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little"))
+
+class MetadataIndex:
+    """Битовый индекс метаданных комментариев.
+    
+    Каждому комментарию в памяти присваивается порядковый номер, а для каждой
+    тональности, тега и признака закладки хранится битовая карта (целое число
+    Python) с установленными битами номеров комментариев. Фильтры по
+    метаданным и их пересечения вычисляются побитовыми операциями без чтения
+    текстов комментариев, а для отбора по каналу, сообщению и дате рядом
+    с номерами хранится ключ сортировки комментария.
+    
+    Метаданные каждого комментария сохраняются в отдельной базе SQLite,
+    из которой битовые карты восстанавливаются при первом обращении.
+    """
+    
+    def __init__(self, index_path: str):
+        """Инициализация индекса.
+        
+        Args:
+            index_path: Путь к файлу базы индекса
+        """
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._built = False
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        
+        # Состояние в памяти, загружается из базы при первом обращении
+        self._loaded = False
+        self._ordinals: Dict[str, int] = {}
+        self._keys: List[Optional[RecordKey]] = []
+        self._message_ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Metadata]] = []
+        self._bitmaps: Dict[Tuple[str, str], int] = {}
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    # Служебные методы
+    
+    def is_built(self) -> bool:
+        """Проверяет, был ли индекс построен по существующим данным."""
+        if self._built:
+            return True
+        
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        self._built = bool(row)
+        return self._built
+    
+    def rebuild(self, comments: Iterable[Dict[str, Any]]) -> int:
+        """Полностью перестраивает индекс по всем комментариям.
+        
+        Args:
+            comments: Все комментарии
+        
+        Returns:
+            int: Количество проиндексированных комментариев
+        """
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM comments")
+                self._reset()
+                count = self._upsert(comments)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+                self._conn.commit()
+                self._loaded = True
+                self._built = True
+            except Exception:
+                self._conn.rollback()
+                self._loaded = False
+                raise
+        
+        logger.info(f"Индекс метаданных комментариев перестроен: {count} комментариев")
+        return count
+    
+    def _reset(self) -> None:
+        self._ordinals = {}
+        self._keys = []
+        self._message_ids = []
+        self._metadata = []
+        self._bitmaps = {}
+    
+    def _load(self) -> None:
+        """Восстанавливает битовые карты из базы."""
+        if self._loaded:
+            return
+        
+        self._reset()
+        rows = self._conn.execute(
+            "SELECT comment_id, channel_id, message_id, date, sentiment, user_tags, is_bookmarked FROM comments"
+        )
+        for comment_id, channel_id, message_id, date, sentiment, user_tags, is_bookmarked in rows:
+            self._set(comment_id, channel_id, message_id, date,
+                      (sentiment, tuple(json.loads(user_tags)), bool(is_bookmarked)))
+        self._loaded = True
+    
+    def _set(self, comment_id: str, channel_id: Optional[str], message_id: Optional[str],
+             date: Optional[str], metadata: Metadata) -> None:
+        """Записывает комментарий в битовые карты, снимая биты прежних метаданных."""
+        ordinal = self._ordinals.get(comment_id)
+        if ordinal is None:
+            ordinal = len(self._keys)
+            self._ordinals[comment_id] = ordinal
+            self._keys.append(None)
+            self._message_ids.append(None)
+            self._metadata.append(None)
+        else:
+            self._clear(ordinal)
+        
+        self._keys[ordinal] = (date_key(date), comment_id, channel_id or "")
+        self._message_ids[ordinal] = message_id
+        self._metadata[ordinal] = metadata
+        bit = 1 << ordinal
+        for key in _postings(metadata):
+            self._bitmaps[key] = self._bitmaps.get(key, 0) | bit
+    
+    def _clear(self, ordinal: int) -> None:
+        metadata = self._metadata[ordinal]
+        if metadata is None:
+            return
+        
+        mask = ~(1 << ordinal)
+        for key in _postings(metadata):
+            bits = self._bitmaps.get(key, 0) & mask
+            if bits:
+                self._bitmaps[key] = bits
+            else:
+                self._bitmaps.pop(key, None)
+        self._keys[ordinal] = None
+        self._message_ids[ordinal] = None
+        self._metadata[ordinal] = None
+    
+    def _upsert(self, comments: Iterable[Dict[str, Any]]) -> int:
+        rows = []
+        for comment_data in comments:
+            comment_id = comment_data.get("comment_id")
+            if not comment_id:
+                continue
+            
+            metadata = _metadata(comment_data)
+            channel_id = comment_data.get("channel_id")
+            message_id = comment_data.get("message_id")
+            date = comment_data.get("date") or None
+            self._set(comment_id, channel_id, message_id, date, metadata)
+            rows.append((comment_id, channel_id, message_id, date, metadata[0],
+                         json.dumps(list(metadata[1]), ensure_ascii=False), int(metadata[2])))
+        
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO comments "
+            "(comment_id, channel_id, message_id, date, sentiment, user_tags, is_bookmarked) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        return len(rows)
+    
+    # Обновление индекса
+    
+    def update(self, comments: Iterable[Dict[str, Any]]) -> None:
+        """Добавляет или обновляет комментарии в индексе.
+        
+        Args:
+            comments: Данные комментариев
+        """
+        with self._lock:
+            try:
+                self._load()
+                self._upsert(comments)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                # Состояние в памяти могло разойтись с базой, перечитаем его при следующем обращении
+                self._loaded = False
+                raise
+    
+    def remove(self, comment_id: str) -> None:
+        """Удаляет комментарий из индекса.
+        
+        Args:
+            comment_id: ID комментария
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM comments WHERE comment_id = ?", (comment_id,))
+            self._conn.commit()
+            if self._loaded:
+                ordinal = self._ordinals.pop(comment_id, None)
+                if ordinal is not None:
+                    self._clear(ordinal)
+    
+    # Поиск
+    
+    def select(self, channel_ids: Optional[List[str]] = None, message_ids: Optional[List[str]] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None,
+               sentiment: Optional[str] = None, user_tags: Optional[List[str]] = None,
+               is_bookmarked: Optional[bool] = None) -> List[RecordKey]:
+        """Отбирает комментарии по метаданным без чтения их текстов.
+        
+        Условия объединяются пересечением, теги — объединением (комментарий
+        подходит, если у него есть хотя бы один из тегов), как в comment_matches.
+        
+        Args:
+            channel_ids: Список ID каналов
+            message_ids: Список ID сообщений
+            date_from: Начальная дата
+            date_to: Конечная дата
+            sentiment: Тональность комментария
+            user_tags: Список тегов
+            is_bookmarked: Признак закладки
+        
+        Returns:
+            List[RecordKey]: Ключи (date, comment_id, channel_id) найденных комментариев от старых к новым
+        """
+        with self._lock:
+            self._load()
+            
+            bits = (1 << len(self._keys)) - 1
+            if sentiment:
+                bits &= self._bitmaps.get(("sentiment", sentiment), 0)
+            if user_tags:
+                tag_bits = 0
+                for tag in user_tags:
+                    tag_bits |= self._bitmaps.get(("tag", tag), 0)
+                bits &= tag_bits
+            if is_bookmarked is not None:
+                bookmarked = self._bitmaps.get(("bookmarked", "1"), 0)
+                bits = bits & bookmarked if is_bookmarked else bits & ~bookmarked
+            
+            ts_from = to_epoch_ms(date_from) if date_from else None
+            ts_to = to_epoch_ms(date_to) if date_to else None
+            keys = []
+            for ordinal in _positions(bits).tolist():
+                key = self._keys[ordinal]
+                if key is None:
+                    continue
+                if channel_ids and key[2] not in channel_ids:
+                    continue
+                if message_ids and self._message_ids[ordinal] not in message_ids:
+                    continue
+                if ts_from is not None and key[0] < ts_from:
+                    continue
+                if ts_to is not None and key[0] > ts_to:
+                    continue
+                keys.append(key)
+        
+        keys.sort()
+        return keys
+
+def page_after(keys: List[RecordKey], after: Optional[RecordKey]) -> List[RecordKey]:
+    """Возвращает упорядоченные ключи, следующие за курсором."""
+    start = bisect_right(keys, after) if after is not None else 0
+    return keys[start:]
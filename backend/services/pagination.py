@@ -0,0 +1,121 @@
+import base64
+import heapq
+import json
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from services.dates import date_key, to_epoch_ms
+
+# Ключ сортировки записи: (дата в миллисекундах UTC, ID записи, ID канала).
+# ID канала нужен только для различения записей с одинаковыми ID из разных каналов Telegram.
+RecordKey = Tuple[int, str, str]
+
+def message_key(message_data: Dict[str, Any]) -> RecordKey:
+    """Возвращает ключ сортировки сообщения."""
+    return (
+        date_key(message_data.get("date")),
+        message_data.get("message_id") or "",
+        message_data.get("channel_id") or "",
+    )
+
+def comment_key(comment_data: Dict[str, Any]) -> RecordKey:
+    """Возвращает ключ сортировки комментария."""
+    return (
+        date_key(comment_data.get("date")),
+        comment_data.get("comment_id") or "",
+        comment_data.get("channel_id") or "",
+    )
+
+def encode_cursor(key: RecordKey) -> str:
+    """Кодирует ключ последней записи страницы в непрозрачный курсор.
+    
+    Args:
+        key: Ключ сортировки записи
+    
+    Returns:
+        str: Курсор в кодировке base64 без выравнивания
+    """
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> RecordKey:
+    """Декодирует курсор, полученный от клиента.
+    
+    Args:
+        cursor: Курсор из next_cursor предыдущей страницы
+    
+    Returns:
+        RecordKey: Ключ последней записи предыдущей страницы
+    
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except Exception:
+        raise ValueError("Некорректный курсор пагинации")
+    
+    if not isinstance(key, list) or len(key) != 3 or not all(isinstance(part, str) for part in key[1:]):
+        raise ValueError("Некорректный курсор пагинации")
+    
+    # Курсоры, выданные до перехода на числовые даты, содержат дату строкой ISO
+    timestamp = key[0] if isinstance(key[0], int) and not isinstance(key[0], bool) else None
+    if isinstance(key[0], str):
+        timestamp = to_epoch_ms(key[0]) if key[0] else 0
+    if timestamp is None:
+        raise ValueError("Некорректный курсор пагинации")
+    return (timestamp, key[1], key[2])
+
+def is_after(key: RecordKey, after: Optional[RecordKey], reverse: bool) -> bool:
+    """Проверяет, находится ли ключ за курсором в порядке выдачи.
+    
+    Args:
+        key: Ключ записи
+        after: Ключ курсора (None — начало выдачи)
+        reverse: True для порядка от новых к старым
+    """
+    if after is None:
+        return True
+    return key < after if reverse else key > after
+
+def select_page(records: Iterable[Dict[str, Any]], key: Callable[[Dict[str, Any]], RecordKey], limit: int,
+                after: Optional[RecordKey] = None, reverse: bool = False) -> List[Dict[str, Any]]:
+    """Выбирает страницу записей за курсором с помощью ограниченной кучи.
+    
+    Память и время сортировки зависят от размера страницы, а не от
+    количества записей, поэтому глубокие страницы не дороже первой.
+    
+    Args:
+        records: Записи в произвольном порядке
+        key: Функция ключа сортировки
+        limit: Размер страницы
+        after: Ключ последней записи предыдущей страницы
+        reverse: True для порядка от новых к старым
+    
+    Returns:
+        List[Dict[str, Any]]: Не более limit записей в порядке выдачи
+    """
+    candidates = (record for record in records if is_after(key(record), after, reverse))
+    if reverse:
+        return heapq.nlargest(limit, candidates, key=key)
+    return heapq.nsmallest(limit, candidates, key=key)
+
+def make_page(records: List[Dict[str, Any]], limit: int,
+              key: Callable[[Dict[str, Any]], RecordKey]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Формирует страницу и курсор следующей страницы.
+    
+    Вызывающий код запрашивает limit + 1 запись: наличие лишней записи
+    означает, что следующая страница существует.
+    
+    Args:
+        records: Записи в порядке выдачи (до limit + 1)
+        limit: Размер страницы
+        key: Функция ключа сортировки
+    
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: Записи страницы и next_cursor (None на последней странице)
+    """
+    if len(records) <= limit:
+        return records, None
+    page = records[:limit]
+    return page, encode_cursor(key(page[-1]))
@@ -0,0 +1,191 @@
+from abc import ABC, abstractmethod
+from sys import intern
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Интернирует строку, чтобы повторяющиеся ID хранились в одном экземпляре."""
+    return intern(value) if isinstance(value, str) else value
+
+def message_record_id(channel_id: str, message_id: int) -> str:
+    """ID записи сообщения: ID сообщений Telegram уникальны только внутри канала (123:m45)."""
+    return f"{channel_id}:m{message_id}"
+
+def comment_record_id(channel_id: str, comment_id: int) -> str:
+    """ID записи комментария к сообщению канала (123:c67)."""
+    return f"{channel_id}:c{comment_id}"
+
+def telegram_id(record_id: Any) -> Optional[int]:
+    """Возвращает ID сообщения Telegram из ID записи (123:m45 и m45 → 45)."""
+    local = str(record_id or "").rsplit(":", 1)[-1]
+    return int(local[1:]) if local[1:].isdigit() else None
+
+class _Record(ABC):
+    """Базовый класс компактных записей.
+    
+    Записи хранят поля в __slots__ вместо словаря, а повторяющиеся строки
+    (ID каналов, сообщений, пользователей, тональность и теги) интернируются.
+    Для совместимости с функциями, работающими со словарями (ключи сортировки,
+    фильтры), поддерживается чтение через get() и [].
+    Преобразование в словарь выполняется только на границе API через to_dict().
+    """
+    
+    __slots__ = ()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._field(key)
+        return default if value is None else value
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys():
+            raise KeyError(key)
+        return self._field(key)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+    
+    def _field(self, key: str) -> Any:
+        return getattr(self, key, None) if key in self.__slots__ else None
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+    
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+    
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразует запись в словарь для ответа API."""
+
+class MessageRecord(_Record):
+    """Компактная запись сообщения канала."""
+    
+    __slots__ = (
+        "message_id", "channel_id", "date", "text", "media",
+        "views", "forwards", "comments_count", "last_comment_date",
+    )
+    
+    def __init__(self, message_id: str, channel_id: str, date: str, text: str = "",
+                 media: Iterable[str] = (), views: Optional[int] = None, forwards: Optional[int] = None,
+                 comments_count: int = 0, last_comment_date: Optional[str] = None):
+        self.message_id = _intern(message_id)
+        self.channel_id = _intern(channel_id)
+        self.date = date
+        self.text = text
+        self.media = tuple(media)
+        self.views = views
+        self.forwards = forwards
+        self.comments_count = comments_count
+        self.last_comment_date = last_comment_date
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MessageRecord":
+        return cls(
+            data["message_id"], data["channel_id"], data.get("date", ""), data.get("text", ""),
+            data.get("media") or (), data.get("views"), data.get("forwards"),
+            data.get("comments_count", 0), data.get("last_comment_date"),
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "message_id": self.message_id,
+            "channel_id": self.channel_id,
+            "date": self.date,
+            "text": self.text,
+            "media": list(self.media),
+            "views": self.views,
+            "forwards": self.forwards,
+            "comments_count": self.comments_count,
+            "last_comment_date": self.last_comment_date
+        }
+
+class CommentRecord(_Record):
+    """Компактная запись комментария.
+    
+    Метаданные (тональность, теги, закладка) хранятся плоскими полями,
+    а реакции — кортежем пар (тип, количество).
+    """
+    
+    __slots__ = (
+        "comment_id", "message_id", "channel_id", "user_id", "reply_to_comment_id",
+        "text", "date", "reactions", "media", "is_edited",
+        "sentiment", "user_tags", "is_bookmarked",
+    )
+    
+    def __init__(self, comment_id: str, message_id: str, channel_id: str, user_id: str,
+                 text: str = "", date: str = "", reply_to_comment_id: Optional[str] = None,
+                 reactions: Iterable[Tuple[str, int]] = (), media: Iterable[str] = (),
+                 is_edited: bool = False, sentiment: Optional[str] = "neutral",
+                 user_tags: Iterable[str] = (), is_bookmarked: bool = False):
+        self.comment_id = comment_id
+        self.message_id = _intern(message_id)
+        self.channel_id = _intern(channel_id)
+        self.user_id = _intern(user_id)
+        self.reply_to_comment_id = reply_to_comment_id
+        self.text = text
+        self.date = date
+        self.reactions = tuple((_intern(kind), count) for kind, count in reactions)
+        self.media = tuple(media)
+        self.is_edited = is_edited
+        self.sentiment = _intern(sentiment)
+        self.user_tags = tuple(_intern(tag) for tag in user_tags)
+        self.is_bookmarked = is_bookmarked
+    
+    def _field(self, key: str) -> Any:
+        if key == "metadata":
+            return self.metadata
+        if key == "reactions":
+            return [{"type": kind, "count": count} for kind, count in self.reactions]
+        return super()._field(key)
+    
+    def keys(self) -> Tuple[str, ...]:
+        return COMMENT_KEYS
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "sentiment": self.sentiment,
+            "user_tags": list(self.user_tags),
+            "is_bookmarked": self.is_bookmarked
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CommentRecord":
+        metadata = data.get("metadata") or {}
+        return cls(
+            data["comment_id"], data["message_id"], data["channel_id"], data.get("user_id", "anonymous"),
+            data.get("text", ""), data.get("date", ""), data.get("reply_to_comment_id"),
+            ((reaction.get("type"), reaction.get("count", 0)) for reaction in data.get("reactions") or []),
+            data.get("media") or (), data.get("is_edited", False),
+            metadata.get("sentiment", "neutral"), metadata.get("user_tags") or (),
+            metadata.get("is_bookmarked", False),
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "comment_id": self.comment_id,
+            "message_id": self.message_id,
+            "channel_id": self.channel_id,
+            "user_id": self.user_id,
+            "reply_to_comment_id": self.reply_to_comment_id,
+            "text": self.text,
+            "date": self.date,
+            "reactions": self._field("reactions"),
+            "media": list(self.media),
+            "is_edited": self.is_edited,
+            "metadata": self.metadata
+        }
+
+COMMENT_KEYS = CommentRecord.__slots__[:10] + ("metadata",)
+
+def to_dicts(records: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Преобразует записи в словари на границе API (словари возвращаются как есть)."""
+    return [record.to_dict() if isinstance(record, _Record) else record for record in records]
+
+def as_dict(record: Any) -> Dict[str, Any]:
+    """Преобразует запись в словарь (словарь возвращается как есть)."""
+    return record.to_dict() if isinstance(record, _Record) else record
@@ -0,0 +1,474 @@
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+from config import settings
+from services.pagination import message_key, comment_key
+from services.dates import to_epoch_ms, epoch_ms_to_datetime
+from services.summary_stats import reactions_total
+
+logger = logging.getLogger(__name__)
+
+# Действия с устаревшими записями
+RETENTION_ACTIONS = ("delete", "archive")
+# Вид записи → (поле ID, ключ сортировки)
+RECORD_KINDS = {"message": ("message_id", message_key), "comment": ("comment_id", comment_key)}
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    channel_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0,
+    views_sum INTEGER NOT NULL DEFAULT 0,
+    forwards_sum INTEGER NOT NULL DEFAULT 0,
+    reactions_total INTEGER NOT NULL DEFAULT 0,
+    comments_with_reactions INTEGER NOT NULL DEFAULT 0,
+    text_length_sum INTEGER NOT NULL DEFAULT 0,
+    positive INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS pending (
+    kind TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    PRIMARY KEY (kind, record_id)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_COLUMNS = (
+    "messages", "comments", "views_sum", "forwards_sum", "reactions_total",
+    "comments_with_reactions", "text_length_sum", "positive", "negative", "neutral",
+)
+
+def _day(record: Dict[str, Any]) -> Optional[str]:
+    timestamp = to_epoch_ms(record.get("date"))
+    return epoch_ms_to_datetime(timestamp).strftime("%Y-%m-%d") if timestamp is not None else None
+
+def _rollup_row(kind: str, record: Dict[str, Any]) -> Dict[str, int]:
+    """Вычисляет вклад записи в дневную сводку."""
+    reactions = reactions_total(record)
+    if kind == "message":
+        return {"messages": 1, "views_sum": record.get("views") or 0,
+                "forwards_sum": record.get("forwards") or 0, "reactions_total": reactions}
+    
+    sentiment = (record.get("metadata") or {}).get("sentiment") or "neutral"
+    row = {"comments": 1, "reactions_total": reactions, "comments_with_reactions": int(bool(reactions)),
+           "text_length_sum": len(record.get("text") or "")}
+    if sentiment in ("positive", "negative", "neutral"):
+        row[sentiment] = 1
+    return row
+
+class DailyRollups:
+    """Дневные сводки по каналам для записей, удаленных политикой хранения.
+    
+    Перед удалением исходных записей их вклад добавляется в дневную сводку
+    канала в одной транзакции с пометкой ID записей в таблице pending.
+    Помеченные записи не учитываются повторно, поэтому если удаление
+    прервется, повторный запуск удалит их без двойного учета.
+    """
+    
+    def __init__(self, rollups_path: str):
+        """Инициализация хранилища сводок.
+        
+        Args:
+            rollups_path: Путь к файлу базы сводок
+        """
+        self.rollups_path = rollups_path
+        os.makedirs(os.path.dirname(os.path.abspath(rollups_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(rollups_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(ROLLUP_SCHEMA)
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    def add(self, kind: str, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Добавляет записи в дневные сводки и помечает их как ожидающие удаления.
+        
+        Args:
+            kind: Вид записей: message или comment
+            records: Данные записей
+        
+        Returns:
+            List[str]: ID помеченных записей (уже помеченные ранее не учитываются повторно)
+        """
+        id_field = RECORD_KINDS[kind][0]
+        with self._lock:
+            try:
+                marked = []
+                totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+                for record in records:
+                    record_id = record.get(id_field)
+                    day = _day(record)
+                    if not record_id or day is None:
+                        continue
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO pending (kind, record_id) VALUES (?, ?)", (kind, record_id)
+                    )
+                    marked.append(record_id)
+                    if cursor.rowcount == 0:
+                        continue
+                    
+                    row = totals.setdefault((str(record.get("channel_id") or ""), day), {})
+                    for column, value in _rollup_row(kind, record).items():
+                        row[column] = row.get(column, 0) + value
+                
+                for (channel_id, day), row in totals.items():
+                    columns = list(row)
+                    self._conn.execute(
+                        f"INSERT INTO daily (channel_id, day, {', '.join(columns)}) "
+                        f"VALUES (?, ?, {', '.join('?' for _ in columns)}) "
+                        f"ON CONFLICT (channel_id, day) DO UPDATE SET "
+                        + ", ".join(f"{column} = {column} + excluded.{column}" for column in columns),
+                        (channel_id, day, *row.values())
+                    )
+                self._conn.commit()
+                return marked
+            except Exception:
+                self._conn.rollback()
+                raise
+    
+    def pending(self, kind: str) -> List[str]:
+        """Возвращает ID записей, учтенных в сводках, но еще не удаленных."""
+        with self._lock:
+            rows = self._conn.execute("SELECT record_id FROM pending WHERE kind = ?", (kind,)).fetchall()
+        return [record_id for record_id, in rows]
+    
+    def clear_pending(self, kind: str, record_ids: Iterable[str]) -> None:
+        """Снимает пометку с удаленных записей."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM pending WHERE kind = ? AND record_id = ?",
+                [(kind, record_id) for record_id in record_ids]
+            )
+            self._conn.commit()
+    
+    def get(self, channel_id: str, date_from: Optional[str] = None,
+            date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Возвращает дневные сводки канала.
+        
+        Args:
+            channel_id: ID канала
+            date_from: Первый день (YYYY-MM-DD)
+            date_to: Последний день (YYYY-MM-DD, включительно)
+        
+        Returns:
+            List[Dict[str, Any]]: Сводки по дням в порядке возрастания даты
+        """
+        conditions = ["channel_id = ?"]
+        params: List[Any] = [channel_id]
+        if date_from:
+            conditions.append("day >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("day <= ?")
+            params.append(date_to)
+        
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT day, {', '.join(ROLLUP_COLUMNS)} FROM daily WHERE {' AND '.join(conditions)} ORDER BY day",
+                params
+            ).fetchall()
+        
+        summaries = []
+        for day, *values in rows:
+            summary = dict(zip(ROLLUP_COLUMNS, values))
+            summary["day"] = day
+            summary["sentiment"] = {name: summary.pop(name) for name in ("positive", "negative", "neutral")}
+            summaries.append(summary)
+        return summaries
+
+class RetentionPolicies:
+    """Политики хранения исходных записей по каналам.
+    
+    Политика задает срок хранения исходных сообщений и комментариев
+    в днях (raw_days, None — бессрочно) и действие с устаревшими
+    записями: delete (удалить) или archive (перенести в архив). Политики
+    каналов хранятся в JSON-файле, для остальных каналов действует политика
+    по умолчанию из настроек.
+    """
+    
+    def __init__(self, policies_path: str, default_days: Optional[int] = None,
+                 default_action: Optional[str] = None):
+        """Инициализация политик.
+        
+        Args:
+            policies_path: Путь к JSON-файлу политик
+            default_days: Срок хранения по умолчанию (по умолчанию settings.RETENTION_RAW_DAYS, 0 — бессрочно)
+            default_action: Действие по умолчанию (по умолчанию settings.RETENTION_ACTION)
+        """
+        self.policies_path = policies_path
+        default_days = default_days if default_days is not None else settings.RETENTION_RAW_DAYS
+        self.default = {
+            "raw_days": default_days or None,
+            "action": default_action or settings.RETENTION_ACTION,
+        }
+        self._lock = threading.Lock()
+        self._channels: Dict[str, Dict[str, Any]] = {}
+        
+        if os.path.exists(policies_path):
+            try:
+                with open(policies_path, "r", encoding="utf-8") as f:
+                    self._channels = json.load(f)
+            except Exception as e:
+                logger.error(f"Ошибка чтения политик хранения: {str(e)}")
+    
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.policies_path)), exist_ok=True)
+        tmp_path = f"{self.policies_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._channels, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.policies_path)
+    
+    def get(self, channel_id: str) -> Dict[str, Any]:
+        """Возвращает политику канала (собственную или по умолчанию)."""
+        with self._lock:
+            return dict(self._channels.get(channel_id, self.default))
+    
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает собственные политики каналов."""
+        with self._lock:
+            return {channel_id: dict(policy) for channel_id, policy in self._channels.items()}
+    
+    def set(self, channel_id: str, raw_days: Optional[int], action: str = "delete") -> Dict[str, Any]:
+        """Задает политику канала.
+        
+        Args:
+            channel_id: ID канала
+            raw_days: Срок хранения исходных записей в днях (None — бессрочно)
+            action: delete или archive
+        
+        Returns:
+            Dict[str, Any]: Политика канала
+        
+        Raises:
+            ValueError: Если срок или действие некорректны
+        """
+        if raw_days is not None and raw_days < 1:
+            raise ValueError("Срок хранения должен быть не меньше одного дня")
+        if action not in RETENTION_ACTIONS:
+            raise ValueError(f"Неизвестное действие политики хранения: {action}")
+        
+        policy = {"raw_days": raw_days, "action": action}
+        with self._lock:
+            self._channels[channel_id] = policy
+            self._save()
+        return dict(policy)
+    
+    def remove(self, channel_id: str) -> bool:
+        """Удаляет политику канала, возвращая его к политике по умолчанию."""
+        with self._lock:
+            if self._channels.pop(channel_id, None) is None:
+                return False
+            self._save()
+            return True
+
+class RecordArchive:
+    """Архив удаленных записей в сжатых файлах JSON Lines.
+    
+    Записи дописываются в файлы archive/{kind}/{channel_id}/{YYYY-MM}.jsonl.gz
+    отдельными членами gzip, которые стандартные средства читают как один поток.
+    """
+    
+    def __init__(self, data_dir: str):
+        self.archive_dir = os.path.join(data_dir, "archive")
+        self._lock = threading.Lock()
+    
+    def write(self, kind: str, records: List[Dict[str, Any]]) -> None:
+        """Дописывает записи в архив по каналам и месяцам."""
+        groups: Dict[str, List[str]] = {}
+        for record in records:
+            channel = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(record.get("channel_id") or "_"))
+            month = (_day(record) or "undated")[:7]
+            path = os.path.join(self.archive_dir, f"{kind}s", channel, f"{month}.jsonl.gz")
+            groups.setdefault(path, []).append(json.dumps(record, ensure_ascii=False))
+        
+        with self._lock:
+            for path, lines in groups.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, "ab") as f:
+                    f.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+class RetentionPruner:
+    """Фоновое применение политик хранения.
+    
+    Поток раз в interval секунд выбирает устаревшие сообщения и комментарии
+    пакетами по batch_size записей, добавляет их в дневные сводки, при
+    необходимости архивирует и удаляет через DataService, поэтому
+    полнотекстовый индекс, индекс метаданных, статистика и кеш остаются
+    согласованными. Между пакетами поток делает паузу batch_pause, чтобы
+    ограничить нагрузку на диск.
+    """
+    
+    def __init__(self, data_service, policies: Optional[RetentionPolicies] = None,
+                 interval: Optional[float] = None, batch_size: Optional[int] = None,
+                 batch_pause: Optional[float] = None):
+        """Инициализация фонового удаления.
+        
+        Args:
+            data_service: Сервис данных
+            policies: Политики хранения (по умолчанию data_dir/retention_policies.json)
+            interval: Период запуска в секундах (по умолчанию settings.RETENTION_INTERVAL)
+            batch_size: Размер пакета (по умолчанию settings.RETENTION_BATCH_SIZE)
+            batch_pause: Пауза между пакетами в секундах (по умолчанию settings.RETENTION_BATCH_PAUSE)
+        """
+        self.data_service = data_service
+        self.policies = policies or RetentionPolicies(
+            os.path.join(data_service.data_dir, "retention_policies.json")
+        )
+        self.archive = RecordArchive(data_service.data_dir)
+        self.interval = interval if interval is not None else settings.RETENTION_INTERVAL
+        self.batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        self.batch_pause = batch_pause if batch_pause is not None else settings.RETENTION_BATCH_PAUSE
+        
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        
+        # Метрики
+        self._runs = 0
+        self._deleted = {"message": 0, "comment": 0}
+        self._archived = {"message": 0, "comment": 0}
+        self._last_run: Optional[str] = None
+        self._last_duration: Optional[float] = None
+    
+    # Управление потоком
+    
+    def start(self) -> None:
+        """Запускает поток применения политик."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-pruner", daemon=True)
+        self._thread.start()
+        logger.info(f"Применение политик хранения запущено (период: {self.interval} с, пакет: {self.batch_size})")
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Останавливает поток после текущего пакета."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка применения политик хранения: {str(e)}")
+            self._stop_event.wait(self.interval)
+    
+    # Применение политик
+    
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Применяет политики хранения ко всем каналам.
+        
+        Args:
+            now: Текущий момент (по умолчанию текущее время UTC)
+        
+        Returns:
+            Dict[str, int]: Количество удаленных сообщений и комментариев
+        """
+        with self._run_lock:
+            started = time.perf_counter()
+            now = now or datetime.now(timezone.utc)
+            removed = {"message": 0, "comment": 0}
+            
+            # Записи, учтенные в сводках при прерванном запуске, удаляем без повторного учета
+            for kind in RECORD_KINDS:
+                pending = self.data_service.rollups.pending(kind)
+                self._delete(kind, pending)
+                removed[kind] += len(pending)
+            
+            policies = self.policies.get_all()
+            # Каналы с собственной политикой обрабатываются отдельно от политики по умолчанию
+            targets = [([channel_id], policy, None) for channel_id, policy in policies.items()]
+            targets.append((None, self.policies.default, set(policies)))
+            
+            for channel_ids, policy, excluded in targets:
+                if not policy.get("raw_days"):
+                    continue
+                cutoff = (now - timedelta(days=policy["raw_days"])).isoformat()
+                for kind in RECORD_KINDS:
+                    if self._stop_event.is_set():
+                        break
+                    removed[kind] += self._prune(kind, channel_ids, excluded, cutoff, policy["action"])
+            
+            self._runs += 1
+            self._last_run = now.isoformat()
+            self._last_duration = time.perf_counter() - started
+            if any(removed.values()):
+                logger.info(f"Политики хранения применены: удалено сообщений {removed['message']}, "
+                            f"комментариев {removed['comment']} за {self._last_duration:.1f} с")
+            return removed
+    
+    def _expired_page(self, kind: str, channel_ids: Optional[List[str]], cutoff: str,
+                      after) -> List[Dict[str, Any]]:
+        storage = self.data_service.storage
+        if kind == "message":
+            return storage.page_messages(None, channel_ids, None, cutoff, self.batch_size, after)
+        return storage.page_comments(None, channel_ids, None, None, cutoff, None, None, self.batch_size, after)
+    
+    def _prune(self, kind: str, channel_ids: Optional[List[str]], excluded: Optional[set],
+               cutoff: str, action: str) -> int:
+        """Удаляет устаревшие записи одного вида пакетами."""
+        key = RECORD_KINDS[kind][1]
+        removed = 0
+        after = None
+        while not self._stop_event.is_set():
+            page = self._expired_page(kind, channel_ids, cutoff, after)
+            if not page:
+                break
+            after = key(page[-1])
+            
+            records = [record for record in page if not excluded or record.get("channel_id") not in excluded]
+            if records:
+                if action == "archive":
+                    self.archive.write(kind, records)
+                    self._archived[kind] += len(records)
+                marked = self.data_service.rollups.add(kind, records)
+                self._delete(kind, marked)
+                removed += len(marked)
+            
+            if len(page) < self.batch_size:
+                break
+            self._stop_event.wait(self.batch_pause)
+        return removed
+    
+    def _delete(self, kind: str, record_ids: List[str]) -> None:
+        if not record_ids:
+            return
+        
+        delete = self.data_service.delete_message if kind == "message" else self.data_service.delete_comment
+        for record_id in record_ids:
+            delete(record_id)
+        self.data_service.rollups.clear_pending(kind, record_ids)
+        self._deleted[kind] += len(record_ids)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики применения политик."""
+        return {
+            "runs": self._runs,
+            "last_run": self._last_run,
+            "last_duration": round(self._last_duration, 3) if self._last_duration is not None else None,
+            "deleted": dict(self._deleted),
+            "archived": dict(self._archived),
+            "default_policy": dict(self.policies.default),
+            "channel_policies": len(self.policies.get_all()),
+        }
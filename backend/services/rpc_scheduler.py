@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Tuple
+
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Полосы приоритета: запросы пользователя обслуживаются раньше фоновой синхронизации и экспорта
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+# Полоса текущей задачи; наследуется задачами, созданными внутри нее
+_current_lane: ContextVar[str] = ContextVar("rpc_lane", default=INTERACTIVE)
+
+# Лимиты методов: (запросов в секунду, размер пачки). Для остальных методов
+# действуют settings.RPC_RATE и settings.RPC_BURST
+METHOD_LIMITS: Dict[str, Tuple[float, int]] = {
+    "GetHistoryRequest": (3.0, 10),
+    "SearchRequest": (0.5, 3),
+    "GetRepliesRequest": (2.0, 5),
+    "GetDiscussionMessageRequest": (2.0, 5),
+    "GetFullChannelRequest": (1.0, 5),
+    "GetDialogsRequest": (1.0, 3),
+    "GetChannelsRequest": (2.0, 5),
+    "GetUsersRequest": (2.0, 5),
+}
+
+@contextmanager
+def background_lane():
+    """Выполняет запросы Telegram внутри блока в фоновой полосе."""
+    token = _current_lane.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+class TokenBucket:
+    """Маркерная корзина: rate маркеров в секунду, не больше burst в запасе.
+    
+    reserve() списывает маркер сразу и возвращает время ожидания до его
+    появления, поэтому одновременные запросы выстраиваются в очередь без
+    повторных проверок.
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+class RpcScheduler:
+    """Планировщик запросов к Telegram одного клиента.
+    
+    Все запросы клиента проходят через call():
+    - ожидают свободного слота; среди ожидающих первыми получают слот
+      запросы интерактивной полосы, а фоновая полоса никогда не занимает
+      последние settings.RPC_INTERACTIVE_SLOTS слотов;
+    - ограничиваются маркерной корзиной своего метода;
+    - после FloodWaitError метод блокируется на указанное Telegram время,
+      слот освобождается, и запрос повторяется после ожидания (не более
+      settings.RPC_FLOOD_RETRIES раз и если ожидание не превышает
+      settings.RPC_MAX_FLOOD_WAIT). Запросы других методов при этом
+      продолжают выполняться.
+    """
+    
+    def __init__(self, concurrency: Optional[int] = None, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 interactive_slots: Optional[int] = None):
+        """Инициализация планировщика.
+        
+        Args:
+            concurrency: Количество одновременных запросов (по умолчанию settings.RPC_CONCURRENCY)
+            limits: Лимиты методов (по умолчанию METHOD_LIMITS)
+            interactive_slots: Слотов только для интерактивных запросов
+                (по умолчанию settings.RPC_INTERACTIVE_SLOTS)
+        
+        Raises:
+            ValueError: Если фоновой полосе не остается ни одного слота
+        """
+        self.concurrency = concurrency or settings.RPC_CONCURRENCY
+        self.interactive_slots = interactive_slots if interactive_slots is not None else settings.RPC_INTERACTIVE_SLOTS
+        if not 0 <= self.interactive_slots < self.concurrency:
+            raise ValueError(
+                f"Слотов только для интерактивных запросов ({self.interactive_slots}) должно быть "
+                f"не меньше 0 и меньше числа одновременных запросов ({self.concurrency})"
+            )
+        self.limits = limits if limits is not None else METHOD_LIMITS
+        
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Метод → момент (time.monotonic), до которого Telegram запретил запросы
+        self._blocked_until: Dict[str, float] = {}
+        
+        # Очередь ожидающих слота: (полоса, порядковый номер, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._active = {lane: 0 for lane in LANES}
+        
+        # Метрики
+        self._stats = {
+            lane: {"calls": 0, "queue_wait": 0.0, "max_queue_wait": 0.0, "throttle_wait": 0.0}
+            for lane in LANES
+        }
+        self._flood_waits = 0
+        self._flood_wait_seconds = 0
+        self._retries = 0
+        self._methods: Dict[str, int] = {}
+    
+    # Слоты
+    
+    def _can_start(self, lane: str) -> bool:
+        limit = self.concurrency if lane == INTERACTIVE else self.concurrency - self.interactive_slots
+        return sum(self._active.values()) < self.concurrency and self._active[lane] < limit
+    
+    def _wake(self) -> None:
+        """Передает освободившиеся слоты ожидающим в порядке приоритета."""
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_start(LANES[priority]):
+                # Интерактивные запросы стоят в очереди раньше фоновых,
+                # поэтому остальным ожидающим слот тоже недоступен
+                break
+            heapq.heappop(self._waiters)
+            self._active[LANES[priority]] += 1
+            future.set_result(None)
+    
+    async def _acquire(self, lane: str) -> None:
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (LANES.index(lane), next(self._sequence), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(lane)
+            raise
+        
+        waited = time.monotonic() - started
+        stats = self._stats[lane]
+        stats["calls"] += 1
+        stats["queue_wait"] += waited
+        stats["max_queue_wait"] = max(stats["max_queue_wait"], waited)
+    
+    def _release(self, lane: str) -> None:
+        self._active[lane] -= 1
+        self._wake()
+    
+    # Ограничение частоты
+    
+    def _bucket(self, method: str) -> TokenBucket:
+        bucket = self._buckets.get(method)
+        if bucket is None:
+            rate, burst = self.limits.get(method, (settings.RPC_RATE, settings.RPC_BURST))
+            bucket = self._buckets[method] = TokenBucket(rate, burst)
+        return bucket
+    
+    def _flood_delay(self, method: str) -> float:
+        return max(0.0, self._blocked_until.get(method, 0.0) - time.monotonic())
+    
+    async def _throttle(self, method: str, lane: str) -> None:
+        delay = self._flood_delay(method) + self._bucket(method).reserve()
+        if delay > 0:
+            self._stats[lane]["throttle_wait"] += delay
+            await asyncio.sleep(delay)
+    
+    # Выполнение
+    
+    async def call(self, method: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет запрос с учетом приоритета, лимитов и ожиданий FloodWait.
+        
+        Args:
+            method: Имя метода Telegram API (имя класса запроса)
+            send: Функция, отправляющая запрос (вызывается заново при повторе)
+        
+        Returns:
+            Any: Результат запроса
+        
+        Raises:
+            FloodWaitError: Если ожидание слишком долгое или повторы исчерпаны
+        """
+        lane = _current_lane.get()
+        self._methods[method] = self._methods.get(method, 0) + 1
+        
+        for attempt in range(settings.RPC_FLOOD_RETRIES + 1):
+            # Пока метод заблокирован FloodWait, ждем без слота, чтобы не задерживать другие методы
+            if self._flood_delay(method) > 0:
+                await asyncio.sleep(self._flood_delay(method))
+            await self._acquire(lane)
+            try:
+                await self._throttle(method, lane)
+                return await send()
+            except FloodWaitError as e:
+                self._flood_waits += 1
+                self._flood_wait_seconds += e.seconds
+                self._blocked_until[method] = max(self._blocked_until.get(method, 0.0), time.monotonic() + e.seconds)
+                logger.warning(f"FloodWait {e.seconds} с для {method} (полоса {lane}, попытка {attempt + 1})")
+                if attempt >= settings.RPC_FLOOD_RETRIES or e.seconds > settings.RPC_MAX_FLOOD_WAIT:
+                    raise
+            finally:
+                self._release(lane)
+            
+            self._retries += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики ожидания в очереди, ограничения частоты и FloodWait."""
+        lanes = {}
+        for lane, stats in self._stats.items():
+            calls = stats["calls"]
+            lanes[lane] = {
+                "calls": calls,
+                "active": self._active[lane],
+                "avg_queue_wait": round(stats["queue_wait"] / calls, 4) if calls else None,
+                "max_queue_wait": round(stats["max_queue_wait"], 4),
+                "throttle_wait": round(stats["throttle_wait"], 3),
+            }
+        return {
+            "lanes": lanes,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            "flood_waits": self._flood_waits,
+            "flood_wait_seconds": self._flood_wait_seconds,
+            "retries": self._retries,
+            "blocked_methods": {
+                method: round(self._flood_delay(method), 1)
+                for method in self._blocked_until if self._flood_delay(method) > 0
+            },
+            "methods": dict(self._methods),
+        }
+
+class ScheduledTelegramClient(TelegramClient):
+    """Клиент Telethon, отправляющий все запросы через RpcScheduler.
+    
+    Высокоуровневые методы Telethon (get_messages, iter_messages, get_dialogs
+    и др.) отправляют запросы через __call__, поэтому планировщик видит все
+    запросы клиента. Автоматическое ожидание FloodWait в Telethon отключено:
+    его выполняет планировщик.
+    """
+    
+    def __init__(self, *args, scheduler: Optional[RpcScheduler] = None, **kwargs):
+        kwargs.setdefault("flood_sleep_threshold", 0)
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler or RpcScheduler()
+    
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        send = partial(TelegramClient.__call__, self, request, ordered, flood_sleep_threshold)
+        # Список запросов отправляется одним контейнером и учитывается как один запрос
+        method = type(request[0] if isinstance(request, (list, tuple)) and request else request).__name__
+        return await self.scheduler.call(method, send)
@@ -0,0 +1,357 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Iterable, Tuple
+
+import nltk
+from nltk.stem.snowball import SnowballStemmer
+
+logger = logging.getLogger(__name__)
+
+# Параметры ранжирования BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+_russian_stemmer = SnowballStemmer("russian")
+_english_stemmer = SnowballStemmer("english")
+
+def _load_stopwords() -> frozenset:
+    """Загружает стоп-слова NLTK, если корпус доступен."""
+    try:
+        return frozenset(nltk.corpus.stopwords.words("english") + nltk.corpus.stopwords.words("russian"))
+    except LookupError:
+        return frozenset()
+
+_STOPWORDS = _load_stopwords()
+
+@lru_cache(maxsize=100000)
+def stem_word(word: str) -> str:
+    """Приводит слово к основе стеммером Snowball нужного языка.
+    
+    Args:
+        word: Слово в нижнем регистре
+    
+    Returns:
+        str: Основа слова
+    """
+    if _CYRILLIC_RE.search(word):
+        return _russian_stemmer.stem(word.replace("ё", "е"))
+    return _english_stemmer.stem(word)
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на основы слов без стоп-слов.
+    
+    Args:
+        text: Исходный текст
+    
+    Returns:
+        List[str]: Список основ в порядке появления
+    """
+    if not text:
+        return []
+    
+    terms = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        terms.append(stem_word(word))
+    return terms
+
+def matches_query(query: str, text: str) -> bool:
+    """Проверяет, содержит ли текст все слова запроса с учетом словоформ.
+    
+    Используется для фильтрации данных, не попавших в индекс
+    (например, результатов, полученных напрямую из Telegram).
+    
+    Args:
+        query: Поисковый запрос
+        text: Проверяемый текст
+    
+    Returns:
+        bool: True, если все основы запроса встречаются в тексте
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        # Запрос только из стоп-слов или знаков: используем поиск подстроки
+        return query.lower() in (text or "").lower()
+    return query_terms.issubset(tokenize(text))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (kind, term, doc_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS documents (
+    kind TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    terms TEXT NOT NULL,
+    PRIMARY KEY (kind, doc_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS stats (
+    kind TEXT PRIMARY KEY,
+    doc_count INTEGER NOT NULL DEFAULT 0,
+    total_length INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class SearchIndex:
+    """Постоянный инвертированный индекс для полнотекстового поиска с ранжированием BM25.
+    
+    Индекс хранится в отдельной базе SQLite и обновляется инкрементально
+    при каждом сохранении и удалении записи. Документы разделены по видам
+    (message, comment), у каждого вида своя статистика для BM25.
+    """
+    
+    def __init__(self, index_path: str):
+        """Инициализация индекса.
+        
+        Args:
+            index_path: Путь к файлу индекса
+        """
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._built_kinds = set()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+    
+    # Служебные методы
+    
+    def is_built(self, kind: str) -> bool:
+        """Проверяет, был ли индекс вида построен по существующим данным."""
+        if kind in self._built_kinds:
+            return True
+        
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (f"built:{kind}",)).fetchone()
+        if row:
+            self._built_kinds.add(kind)
+        return bool(row)
+    
+    def rebuild(self, kind: str, documents: Iterable[Tuple[str, str]]) -> int:
+        """Полностью перестраивает индекс вида.
+        
+        Args:
+            kind: Вид документов (message, comment)
+            documents: Пары (ID документа, текст)
+        
+        Returns:
+            int: Количество проиндексированных документов
+        """
+        count = 0
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM postings WHERE kind = ?", (kind,))
+                self._conn.execute("DELETE FROM documents WHERE kind = ?", (kind,))
+                self._conn.execute("DELETE FROM stats WHERE kind = ?", (kind,))
+                for doc_id, text in documents:
+                    self._add(kind, doc_id, text)
+                    count += 1
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", (f"built:{kind}",))
+                self._conn.commit()
+                self._built_kinds.add(kind)
+            except Exception:
+                self._conn.rollback()
+                raise
+        
+        logger.info(f"Полнотекстовый индекс {kind} перестроен: {count} документов")
+        return count
+    
+    def _update_stats(self, kind: str, doc_delta: int, length_delta: int) -> None:
+        self._conn.execute(
+            "INSERT INTO stats (kind, doc_count, total_length) VALUES (?, ?, ?) "
+            "ON CONFLICT(kind) DO UPDATE SET doc_count = doc_count + excluded.doc_count, "
+            "total_length = total_length + excluded.total_length",
+            (kind, doc_delta, length_delta)
+        )
+    
+    def _remove(self, kind: str, doc_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT length, terms FROM documents WHERE kind = ? AND doc_id = ?", (kind, doc_id)
+        ).fetchone()
+        if not row:
+            return False
+        
+        length, terms = row
+        self._conn.executemany(
+            "DELETE FROM postings WHERE kind = ? AND term = ? AND doc_id = ?",
+            [(kind, term, doc_id) for term in terms.split(" ") if term]
+        )
+        self._conn.execute("DELETE FROM documents WHERE kind = ? AND doc_id = ?", (kind, doc_id))
+        self._update_stats(kind, -1, -length)
+        return True
+    
+    def _add(self, kind: str, doc_id: str, text: str) -> None:
+        terms = tokenize(text)
+        frequencies = Counter(terms)
+        
+        self._conn.execute(
+            "INSERT INTO documents (kind, doc_id, length, terms) VALUES (?, ?, ?, ?)",
+            (kind, doc_id, len(terms), " ".join(frequencies))
+        )
+        self._conn.executemany(
+            "INSERT INTO postings (kind, term, doc_id, tf) VALUES (?, ?, ?, ?)",
+            [(kind, term, doc_id, tf) for term, tf in frequencies.items()]
+        )
+        self._update_stats(kind, 1, len(terms))
+    
+    # Обновление индекса
+    
+    def index_document(self, kind: str, doc_id: str, text: str) -> None:
+        """Добавляет или обновляет документ в индексе.
+        
+        Args:
+            kind: Вид документа (message, comment)
+            doc_id: ID документа
+            text: Текст документа
+        """
+        with self._lock:
+            try:
+                self._remove(kind, doc_id)
+                self._add(kind, doc_id, text or "")
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка индексации документа {kind}/{doc_id}: {str(e)}")
+    
+    def index_documents(self, kind: str, documents: Iterable[Tuple[str, str]]) -> int:
+        """Добавляет или обновляет пакет документов одной транзакцией.
+        
+        Args:
+            kind: Вид документов (message, comment)
+            documents: Пары (ID документа, текст)
+        
+        Returns:
+            int: Количество проиндексированных документов
+        """
+        count = 0
+        with self._lock:
+            try:
+                for doc_id, text in documents:
+                    self._remove(kind, doc_id)
+                    self._add(kind, doc_id, text or "")
+                    count += 1
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка пакетной индексации документов {kind}: {str(e)}")
+                return 0
+        return count
+    
+    def remove_document(self, kind: str, doc_id: str) -> bool:
+        """Удаляет документ из индекса.
+        
+        Args:
+            kind: Вид документа (message, comment)
+            doc_id: ID документа
+        
+        Returns:
+            bool: True, если документ был в индексе
+        """
+        with self._lock:
+            try:
+                removed = self._remove(kind, doc_id)
+                self._conn.commit()
+                return removed
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка удаления документа {kind}/{doc_id} из индекса: {str(e)}")
+                return False
+    
+    # Поиск
+    
+    def search(self, kind: str, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Ищет документы, содержащие все слова запроса, и ранжирует их по BM25.
+        
+        Стоимость поиска определяется длиной списков вхождений слов запроса,
+        а не общим размером корпуса.
+        
+        Args:
+            kind: Вид документов (message, comment)
+            query: Поисковый запрос
+            limit: Максимальное количество результатов
+        
+        Returns:
+            List[Tuple[str, float]]: Пары (ID документа, оценка) по убыванию оценки
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+        
+        with self._lock:
+            stats = self._conn.execute(
+                "SELECT doc_count, total_length FROM stats WHERE kind = ?", (kind,)
+            ).fetchone()
+            if not stats or not stats[0]:
+                return []
+            doc_count, total_length = stats
+            avg_length = total_length / doc_count or 1.0
+            
+            # Начинаем с самого редкого слова, чтобы пересечение было минимальным
+            postings: Dict[str, Dict[str, int]] = {}
+            for term in query_terms:
+                rows = self._conn.execute(
+                    "SELECT doc_id, tf FROM postings WHERE kind = ? AND term = ?", (kind, term)
+                ).fetchall()
+                if not rows:
+                    return []
+                postings[term] = dict(rows)
+            
+            ordered_terms = sorted(query_terms, key=lambda t: len(postings[t]))
+            candidates = set(postings[ordered_terms[0]])
+            for term in ordered_terms[1:]:
+                candidates.intersection_update(postings[term])
+                if not candidates:
+                    return []
+            
+            lengths = {}
+            candidate_list = list(candidates)
+            for start in range(0, len(candidate_list), 500):
+                chunk = candidate_list[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                lengths.update(self._conn.execute(
+                    f"SELECT doc_id, length FROM documents WHERE kind = ? AND doc_id IN ({placeholders})",
+                    (kind, *chunk)
+                ).fetchall())
+        
+        scores = {}
+        for doc_id in candidates:
+            length_norm = 1 - BM25_B + BM25_B * lengths.get(doc_id, avg_length) / avg_length
+            score = 0.0
+            for term in ordered_terms:
+                document_frequency = len(postings[term])
+                idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                tf = postings[term][doc_id]
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+            scores[doc_id] = score
+        
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+    
+    def close(self) -> None:
+        """Закрывает файл индекса."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,44 @@
+from typing import Dict, Type
+
+from services.storage.base import StorageBackend
+from services.storage.json_storage import JsonStorage
+from services.storage.sqlite_storage import SqliteStorage
+from services.storage.segment_storage import SegmentLogStorage
+from services.storage.partitioned_storage import PartitionedStorage
+
+# Доступные бэкенды хранилища по имени из настройки STORAGE_BACKEND
+STORAGE_BACKENDS: Dict[str, Type[StorageBackend]] = {
+    JsonStorage.name: JsonStorage,
+    SqliteStorage.name: SqliteStorage,
+    SegmentLogStorage.name: SegmentLogStorage,
+    PartitionedStorage.name: PartitionedStorage,
+}
+
+def create_storage(backend: str, data_dir: str = "data", **options) -> StorageBackend:
+    """Создает хранилище по имени бэкенда.
+    
+    Args:
+        backend: Имя бэкенда (json, sqlite, segment, partitioned)
+        data_dir: Директория для хранения данных
+        **options: Дополнительные параметры конструктора бэкенда
+    
+    Returns:
+        StorageBackend: Экземпляр хранилища
+    
+    Raises:
+        ValueError: Если бэкенд неизвестен
+    """
+    storage_class = STORAGE_BACKENDS.get(backend)
+    if storage_class is None:
+        raise ValueError(f"Неизвестный бэкенд хранилища: {backend}")
+    return storage_class(data_dir, **options)
+
+__all__ = [
+    "StorageBackend",
+    "JsonStorage",
+    "SqliteStorage",
+    "SegmentLogStorage",
+    "PartitionedStorage",
+    "STORAGE_BACKENDS",
+    "create_storage",
+]
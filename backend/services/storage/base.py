@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Any, Iterator
+
+from services.dates import to_epoch_ms
+from services.pagination import RecordKey, select_page, message_key, comment_key
+
+def _in_date_range(date: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> bool:
+    """Сравнивает дату записи с границами как моменты времени, а не как строки ISO."""
+    ts_from = to_epoch_ms(date_from) if date_from else None
+    ts_to = to_epoch_ms(date_to) if date_to else None
+    if ts_from is None and ts_to is None:
+        return True
+    
+    timestamp = to_epoch_ms(date)
+    if ts_from is not None and (timestamp is None or timestamp < ts_from):
+        return False
+    if ts_to is not None and timestamp is not None and timestamp > ts_to:
+        return False
+    return True
+
+def message_matches(message_data: Dict[str, Any], query: Optional[str] = None,
+                    channel_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None) -> bool:
+    """Проверяет, удовлетворяет ли сообщение параметрам поиска.
+    
+    Args:
+        message_data: Данные сообщения
+        query: Поисковый запрос (поиск подстроки без учета регистра)
+        channel_ids: Список ID каналов
+        date_from: Начальная дата
+        date_to: Конечная дата
+    
+    Returns:
+        bool: True, если сообщение подходит
+    """
+    # Фильтрация по каналам
+    if channel_ids and message_data.get("channel_id") not in channel_ids:
+        return False
+    
+    # Фильтрация по тексту
+    if query and query.lower() not in message_data.get("text", "").lower():
+        return False
+    
+    # Фильтрация по датам
+    if not _in_date_range(message_data.get("date"), date_from, date_to):
+        return False
+    
+    return True
+
+def comment_matches(comment_data: Dict[str, Any], query: Optional[str] = None,
+                    channel_ids: Optional[List[str]] = None, message_ids: Optional[List[str]] = None,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None,
+                    sentiment: Optional[str] = None, user_tags: Optional[List[str]] = None) -> bool:
+    """Проверяет, удовлетворяет ли комментарий параметрам поиска.
+    
+    Args:
+        comment_data: Данные комментария
+        query: Поисковый запрос (поиск подстроки без учета регистра)
+        channel_ids: Список ID каналов
+        message_ids: Список ID сообщений
+        date_from: Начальная дата
+        date_to: Конечная дата
+        sentiment: Тональность комментария
+        user_tags: Список тегов
+    
+    Returns:
+        bool: True, если комментарий подходит
+    """
+    # Фильтрация по каналам
+    if channel_ids and comment_data.get("channel_id") not in channel_ids:
+        return False
+    
+    # Фильтрация по сообщениям
+    if message_ids and comment_data.get("message_id") not in message_ids:
+        return False
+    
+    # Фильтрация по тексту
+    if query and query.lower() not in comment_data.get("text", "").lower():
+        return False
+    
+    # Фильтрация по датам
+    if not _in_date_range(comment_data.get("date"), date_from, date_to):
+        return False
+    
+    # Фильтрация по тональности
+    if sentiment and comment_data.get("metadata", {}).get("sentiment") != sentiment:
+        return False
+    
+    # Фильтрация по тегам
+    if user_tags:
+        comment_tags = comment_data.get("metadata", {}).get("user_tags", [])
+        if not any(tag in comment_tags for tag in user_tags):
+            return False
+    
+    return True
+
+class StorageBackend(ABC):
+    """Базовый класс хранилища данных для DataService.
+    
+    Хранилище отвечает только за ввод-вывод записей. Проверка входных данных
+    и логика поверх хранилища (например, обновление метаданных) остаются в DataService.
+    """
+    
+    # Имя бэкенда, используемое в настройках STORAGE_BACKEND
+    name: str = ""
+    # Принимает ли бэкенд кодек записей (параметр codec) для сжатия
+    supports_compression: bool = False
+    
+    # Методы для работы с каналами
+    
+    @abstractmethod
+    def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        """Сохраняет информацию о канале."""
+    
+    @abstractmethod
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """Получает информацию о канале."""
+    
+    @abstractmethod
+    def iter_channels(self) -> Iterator[Dict[str, Any]]:
+        """Последовательно возвращает все каналы хранилища."""
+    
+    @abstractmethod
+    def delete_channel(self, channel_id: str) -> bool:
+        """Удаляет информацию о канале."""
+    
+    # Методы для работы с сообщениями
+    
+    @abstractmethod
+    def save_message(self, message_data: Dict[str, Any]) -> bool:
+        """Сохраняет информацию о сообщении."""
+    
+    @abstractmethod
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Получает информацию о сообщении."""
+    
+    @abstractmethod
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        """Последовательно возвращает все сообщения хранилища."""
+    
+    @abstractmethod
+    def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        """Получает сообщения канала, отсортированные от новых к старым."""
+    
+    @abstractmethod
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Поиск сообщений по параметрам, от новых к старым."""
+    
+    def page_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      limit: int = 50, after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        """Страница результатов поиска сообщений от новых к старым.
+        
+        Реализация по умолчанию просматривает все сообщения, удерживая в памяти
+        только limit лучших; бэкенды с индексами переопределяют ее выборкой диапазона.
+        
+        Args:
+            limit: Размер страницы
+            after: Ключ (date, message_id, channel_id) последней записи предыдущей страницы
+        
+        Returns:
+            List[Dict[str, Any]]: Не более limit сообщений
+        """
+        candidates = (
+            message_data for message_data in self.iter_messages()
+            if message_matches(message_data, query, channel_ids, date_from, date_to)
+        )
+        return select_page(candidates, message_key, limit, after, reverse=True)
+    
+    @abstractmethod
+    def delete_message(self, message_id: str) -> bool:
+        """Удаляет информацию о сообщении."""
+    
+    def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        """Сохраняет пакет сообщений.
+        
+        Реализация по умолчанию сохраняет записи по одной, бэкенды
+        переопределяют ее для фиксации пакета одной операцией.
+        
+        Returns:
+            int: Количество сохраненных сообщений
+        """
+        return sum(1 for message_data in messages if self.save_message(message_data))
+    
+    # Методы для работы с комментариями
+    
+    @abstractmethod
+    def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        """Сохраняет информацию о комментарии."""
+    
+    @abstractmethod
+    def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        """Получает информацию о комментарии."""
+    
+    @abstractmethod
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        """Последовательно возвращает все комментарии хранилища."""
+    
+    @abstractmethod
+    def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        """Получает комментарии сообщения, отсортированные от старых к новым."""
+    
+    @abstractmethod
+    def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                        user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Поиск комментариев по параметрам, от старых к новым."""
+    
+    def page_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                      user_tags: Optional[List[str]] = None, limit: int = 100,
+                      after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        """Страница результатов поиска комментариев от старых к новым.
+        
+        Args:
+            limit: Размер страницы
+            after: Ключ (date, comment_id, channel_id) последней записи предыдущей страницы
+        
+        Returns:
+            List[Dict[str, Any]]: Не более limit комментариев
+        """
+        candidates = (
+            comment_data for comment_data in self.iter_comments()
+            if comment_matches(comment_data, query, channel_ids, message_ids,
+                               date_from, date_to, sentiment, user_tags)
+        )
+        return select_page(candidates, comment_key, limit, after)
+    
+    @abstractmethod
+    def delete_comment(self, comment_id: str) -> bool:
+        """Удаляет информацию о комментарии."""
+    
+    def save_comments_bulk(self, comments: List[Dict[str, Any]]) -> int:
+        """Сохраняет пакет комментариев.
+        
+        Returns:
+            int: Количество сохраненных комментариев
+        """
+        return sum(1 for comment_data in comments if self.save_comment(comment_data))
+    
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища."""
@@ -0,0 +1,290 @@
+import json
+import logging
+import lzma
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Any, Iterable, Union
+
+logger = logging.getLogger(__name__)
+
+# Доступные способы кодирования записей
+COMPRESSIONS = ("json", "zlib", "lzma")
+
+# Заголовок записи zlib: 2 байта метки и 4 байта ID словаря (0 — без словаря).
+# Нулевой байт не может начинать JSON, поэтому формат определяется по первому байту
+ZLIB_MAGIC = b"\x00Z"
+ZLIB_HEADER_SIZE = len(ZLIB_MAGIC) + 4
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Максимальный полезный размер словаря: окно deflate составляет 32 КБ
+DICTIONARY_SIZE = 32 * 1024
+ZLIB_LEVEL = 6
+
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[^"]+')
+_WORD_RE = re.compile(r"\w{4,}", re.UNICODE)
+
+def _compact(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _fragments(record: bytes) -> set:
+    """Возвращает фрагменты записи — кандидаты в словарь.
+    
+    Кандидаты: последовательности из 1–4 соседних лексем JSON (ключи
+    вместе с разделителями и повторяющимися значениями), отдельные строки
+    текстов (подписи и шаблоны каналов) и длинные слова.
+    """
+    text = record.decode("utf-8")
+    tokens = _TOKEN_RE.findall(text)
+    fragments = set()
+    for n in range(1, 5):
+        for i in range(len(tokens) - n + 1):
+            fragment = "".join(tokens[i:i + n])
+            if 3 <= len(fragment) <= 256:
+                fragments.add(fragment)
+    
+    for token in tokens:
+        if token.startswith('"') and len(token) > 40:
+            fragments.update(line for line in token[1:-1].split("\\n") if len(line) >= 8)
+            fragments.update(_WORD_RE.findall(token))
+    return fragments
+
+def train_dictionary(samples: Iterable[Dict[str, Any]], size: int = DICTIONARY_SIZE) -> bytes:
+    """Обучает словарь zlib на выборке записей.
+    
+    Фрагменты оцениваются как (число записей с фрагментом) × (длина в байтах)
+    и набираются по убыванию оценки до заданного размера. Самые ценные
+    фрагменты помещаются в конец словаря: deflate кодирует ближние
+    совпадения короче.
+    
+    Args:
+        samples: Выборка записей
+        size: Максимальный размер словаря в байтах
+    
+    Returns:
+        bytes: Словарь
+    """
+    document_frequency: Counter = Counter()
+    total = 0
+    for sample in samples:
+        document_frequency.update(_fragments(_compact(sample)))
+        total += 1
+    
+    min_frequency = max(2, total // 100)
+    scored = sorted(
+        ((count * len(fragment.encode("utf-8")), fragment)
+         for fragment, count in document_frequency.items() if count >= min_frequency),
+        reverse=True
+    )
+    
+    selected: List[bytes] = []
+    joined = bytearray()
+    for _, fragment in scored:
+        encoded = fragment.encode("utf-8")
+        # Фрагменты, уже вошедшие в выбранные целиком, не добавляют совпадений
+        if len(joined) + len(encoded) > size or encoded in joined:
+            continue
+        selected.append(encoded)
+        joined += encoded
+        if len(joined) >= size:
+            break
+    
+    return b"".join(reversed(selected))
+
+class RecordCodec:
+    """Кодирование записей хранилища в байты.
+    
+    Поддерживаются три формата:
+    - json: JSON в UTF-8 (с отступами или компактный);
+    - zlib: компактный JSON, сжатый deflate с предустановленным словарем,
+      обученным на выборке записей (или без словаря, пока он не обучен);
+    - lzma: компактный JSON, сжатый xz.
+    
+    Формат сохраненной записи определяется по ее первым байтам, поэтому
+    decode читает записи любого формата, и смена настройки сжатия не требует
+    миграции: записи перекодируются по мере перезаписи.
+    
+    Словари хранятся в каталоге dictionary_dir в файлах {id}.zdict; ID словаря
+    записывается в заголовок каждой записи, поэтому после обучения нового
+    словаря старые записи остаются читаемыми.
+    """
+    
+    def __init__(self, compression: str = "json", dictionary_dir: Optional[str] = None,
+                 indent: Optional[int] = None):
+        """Инициализация кодека.
+        
+        Args:
+            compression: Способ кодирования: json, zlib или lzma
+            dictionary_dir: Каталог словарей zlib (None — словари только в памяти)
+            indent: Отступ JSON для формата json (None — компактная запись)
+        
+        Raises:
+            ValueError: Если способ кодирования неизвестен
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Неизвестный способ сжатия записей: {compression}")
+        
+        self.compression = compression
+        self.dictionary_dir = dictionary_dir
+        self.indent = indent
+        
+        self._lock = threading.Lock()
+        self._dictionaries: Dict[int, bytes] = {}
+        self._compressors: Dict[int, Any] = {}
+        self._decompressors: Dict[int, Any] = {}
+        self._current_id = 0
+        if dictionary_dir:
+            self._load_current()
+    
+    @property
+    def is_compressed(self) -> bool:
+        return self.compression != "json"
+    
+    @property
+    def dictionary_id(self) -> int:
+        """ID словаря, которым сжимаются новые записи (0 — без словаря)."""
+        return self._current_id
+    
+    # Словари
+    
+    def _dictionary_path(self, dictionary_id: int) -> str:
+        return os.path.join(self.dictionary_dir, f"{dictionary_id:08x}.zdict")
+    
+    def _load_current(self) -> None:
+        current_path = os.path.join(self.dictionary_dir, "current")
+        if not os.path.exists(current_path):
+            return
+        
+        try:
+            with open(current_path, "r", encoding="utf-8") as f:
+                self._current_id = int(f.read().strip(), 16)
+            self._dictionary(self._current_id)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки словаря сжатия: {str(e)}")
+            self._current_id = 0
+    
+    def _dictionary(self, dictionary_id: int) -> bytes:
+        """Возвращает словарь по ID, загружая его с диска при необходимости."""
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            if not self.dictionary_dir:
+                raise ValueError(f"Словарь сжатия {dictionary_id:08x} не найден")
+            with open(self._dictionary_path(dictionary_id), "rb") as f:
+                dictionary = f.read()
+            self._dictionaries[dictionary_id] = dictionary
+        return dictionary
+    
+    def add_dictionary(self, dictionary: bytes) -> int:
+        """Сохраняет словарь и делает его текущим для новых записей.
+        
+        Args:
+            dictionary: Словарь zlib
+        
+        Returns:
+            int: ID словаря (контрольная сумма CRC32 его содержимого)
+        """
+        dictionary_id = zlib.crc32(dictionary) or 1
+        with self._lock:
+            self._dictionaries[dictionary_id] = dictionary
+            if self.dictionary_dir:
+                os.makedirs(self.dictionary_dir, exist_ok=True)
+                with open(self._dictionary_path(dictionary_id), "wb") as f:
+                    f.write(dictionary)
+                current_path = os.path.join(self.dictionary_dir, "current")
+                with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+                    f.write(f"{dictionary_id:08x}")
+                os.replace(f"{current_path}.tmp", current_path)
+            self._current_id = dictionary_id
+        
+        logger.info(f"Новый словарь сжатия {dictionary_id:08x}: {len(dictionary)} байт")
+        return dictionary_id
+    
+    def train(self, samples: Iterable[Dict[str, Any]], size: int = DICTIONARY_SIZE) -> int:
+        """Обучает словарь на выборке записей и делает его текущим.
+        
+        Args:
+            samples: Выборка записей
+            size: Максимальный размер словаря в байтах
+        
+        Returns:
+            int: ID словаря
+        """
+        return self.add_dictionary(train_dictionary(samples, size))
+    
+    # Кодирование
+    
+    def _compressor(self, dictionary_id: int):
+        """Возвращает копию компрессора, уже заполненного словарем."""
+        template = self._compressors.get(dictionary_id)
+        if template is None:
+            if dictionary_id:
+                template = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY,
+                                            self._dictionary(dictionary_id))
+            else:
+                template = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15)
+            self._compressors[dictionary_id] = template
+        return template.copy()
+    
+    def _decompressor(self, dictionary_id: int):
+        template = self._decompressors.get(dictionary_id)
+        if template is None:
+            if dictionary_id:
+                template = zlib.decompressobj(-15, self._dictionary(dictionary_id))
+            else:
+                template = zlib.decompressobj(-15)
+            self._decompressors[dictionary_id] = template
+        return template.copy()
+    
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        """Кодирует запись.
+        
+        Args:
+            data: Запись
+        
+        Returns:
+            bytes: Закодированная запись
+        """
+        if self.compression == "json":
+            return json.dumps(data, ensure_ascii=False, indent=self.indent,
+                              separators=None if self.indent else (",", ":")).encode("utf-8")
+        
+        raw = _compact(data)
+        if self.compression == "lzma":
+            return lzma.compress(raw, preset=6)
+        
+        with self._lock:
+            dictionary_id = self._current_id
+            compressor = self._compressor(dictionary_id)
+        return ZLIB_MAGIC + dictionary_id.to_bytes(4, "big") + compressor.compress(raw) + compressor.flush()
+    
+    def decode(self, raw: Union[bytes, str]) -> Dict[str, Any]:
+        """Декодирует запись любого поддерживаемого формата.
+        
+        Args:
+            raw: Закодированная запись
+        
+        Returns:
+            Dict[str, Any]: Запись
+        
+        Raises:
+            ValueError: Если запись повреждена или ее словарь не найден
+        """
+        if isinstance(raw, str):
+            return json.loads(raw)
+        
+        if raw.startswith(ZLIB_MAGIC):
+            dictionary_id = int.from_bytes(raw[len(ZLIB_MAGIC):ZLIB_HEADER_SIZE], "big")
+            with self._lock:
+                decompressor = self._decompressor(dictionary_id)
+            try:
+                payload = decompressor.decompress(raw[ZLIB_HEADER_SIZE:]) + decompressor.flush()
+            except zlib.error as e:
+                raise ValueError(f"Поврежденная запись zlib: {str(e)}")
+            return json.loads(payload)
+        
+        if raw.startswith(XZ_MAGIC):
+            return json.loads(lzma.decompress(raw))
+        
+        return json.loads(raw)
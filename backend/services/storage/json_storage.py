@@ -0,0 +1,422 @@
+import logging
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from services.pagination import RecordKey, message_key, comment_key
+from services.storage.base import StorageBackend, message_matches, comment_matches
+from services.storage.codec import RecordCodec
+from services.storage.record_index import RecordIndex
+
+logger = logging.getLogger(__name__)
+
+class JsonStorage(StorageBackend):
+    """Хранилище в виде отдельных JSON-файлов для каждой записи.
+    
+    Формат совместим с исходной структурой каталога data/:
+    channels/, messages/, comments/ и users/.
+    
+    Для выборок по каналу и сообщению поддерживаются вторичные индексы в памяти
+    (канал → сообщения, сообщение → комментарии). Они строятся лениво при первом
+    обращении или загружаются из снимка, сохраненного при штатном завершении.
+    
+    Содержимое файлов кодируется кодеком записей: по умолчанию это JSON
+    с отступами, при включенном сжатии — сжатый компактный JSON.
+    """
+    
+    name = "json"
+    supports_compression = True
+    
+    def __init__(self, data_dir: str = "data", codec: Optional[RecordCodec] = None):
+        """Инициализация хранилища.
+        
+        Args:
+            data_dir: Директория для хранения данных
+            codec: Кодек записей (по умолчанию JSON с отступами)
+        """
+        self.data_dir = data_dir
+        self.codec = codec or RecordCodec(indent=2)
+        
+        # Создаем директорию, если она не существует
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(os.path.join(self.data_dir, "channels"), exist_ok=True)
+        os.makedirs(os.path.join(self.data_dir, "messages"), exist_ok=True)
+        os.makedirs(os.path.join(self.data_dir, "comments"), exist_ok=True)
+        os.makedirs(os.path.join(self.data_dir, "users"), exist_ok=True)
+        
+        # Вторичные индексы (строятся лениво)
+        self.snapshot_path = os.path.join(self.data_dir, "index_snapshot.json")
+        self._message_index = RecordIndex()
+        self._comment_index = RecordIndex()
+        self._indexes_loaded = False
+        self._index_lock = threading.Lock()
+    
+    # Вспомогательные методы
+    
+    def _record_path(self, kind: str, record_id: str) -> str:
+        """Возвращает путь к файлу записи.
+        
+        Двоеточие составных ID (123:m45) недопустимо в именах файлов Windows
+        и заменяется на подчеркивание; ID записи хранится в самом файле.
+        """
+        return os.path.join(self.data_dir, kind, f"{str(record_id).replace(':', '_')}.json")
+    
+    def _write_record(self, kind: str, record_id: str, data: Dict[str, Any]) -> bool:
+        """Записывает запись в отдельный JSON-файл."""
+        return bool(self._write_records(kind, [(record_id, data)]))
+    
+    def _write_records(self, kind: str, records: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Записывает пакет записей через временные файлы.
+        
+        Сначала все записи пакета пишутся во временные файлы и только затем
+        переименовываются в целевые, поэтому читатели никогда не видят
+        частично записанный файл.
+        
+        Returns:
+            List[str]: ID успешно записанных записей
+        """
+        prepared = []
+        for record_id, data in records:
+            file_path = self._record_path(kind, record_id)
+            tmp_path = f"{file_path}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(self.codec.encode(data))
+                prepared.append((record_id, tmp_path, file_path))
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении записи {kind}/{record_id}: {str(e)}")
+        
+        written = []
+        for record_id, tmp_path, file_path in prepared:
+            try:
+                os.replace(tmp_path, file_path)
+                written.append(record_id)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении записи {kind}/{record_id}: {str(e)}")
+        return written
+    
+    def _read_record(self, kind: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """Читает запись из JSON-файла."""
+        file_path = self._record_path(kind, record_id)
+        
+        if not os.path.exists(file_path):
+            return None
+        
+        try:
+            with open(file_path, "rb") as f:
+                return self.codec.decode(f.read())
+        except Exception as e:
+            logger.error(f"Ошибка при чтении записи {kind}/{record_id}: {str(e)}")
+            return None
+    
+    def _iter_records(self, kind: str) -> Iterator[Dict[str, Any]]:
+        """Последовательно читает все записи каталога."""
+        records_dir = os.path.join(self.data_dir, kind)
+        
+        for filename in os.listdir(records_dir):
+            if filename.endswith(".json"):
+                try:
+                    file_path = os.path.join(records_dir, filename)
+                    with open(file_path, "rb") as f:
+                        record = self.codec.decode(f.read())
+                except Exception as e:
+                    logger.error(f"Ошибка при чтении записи {kind}/{filename}: {str(e)}")
+                    continue
+                yield record
+    
+    def _dir_signature(self) -> Dict[str, int]:
+        """Возвращает время изменения каталогов записей для проверки снимка."""
+        return {
+            kind: os.stat(os.path.join(self.data_dir, kind)).st_mtime_ns
+            for kind in ("messages", "comments")
+        }
+    
+    def _ensure_indexes(self) -> None:
+        """Загружает индексы из снимка или строит их сканированием каталогов."""
+        if self._indexes_loaded:
+            return
+        
+        with self._index_lock:
+            if self._indexes_loaded:
+                return
+            if not self._load_index_snapshot():
+                self._rebuild_indexes()
+            self._indexes_loaded = True
+    
+    def _load_index_snapshot(self) -> bool:
+        """Загружает индексы из снимка.
+        
+        Снимок удаляется после загрузки: он действителен только до первой
+        записи, поэтому после аварийного завершения индексы будут перестроены.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return False
+        
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            os.remove(self.snapshot_path)
+            
+            if snapshot.get("dirs") != self._dir_signature():
+                logger.info("Снимок индексов устарел, индексы будут перестроены")
+                return False
+            
+            self._message_index = RecordIndex.from_dict(snapshot["messages"])
+            self._comment_index = RecordIndex.from_dict(snapshot["comments"])
+            logger.info(f"Индексы загружены из снимка: сообщений {len(self._message_index)}, "
+                        f"комментариев {len(self._comment_index)}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке снимка индексов: {str(e)}")
+            return False
+    
+    def _rebuild_indexes(self) -> None:
+        """Строит индексы полным сканированием каталогов."""
+        message_index = RecordIndex()
+        for message_data in self._iter_records("messages"):
+            if message_data.get("message_id"):
+                message_index.add(message_data.get("message_id"), message_data.get("channel_id"),
+                                  message_data.get("date"))
+        
+        comment_index = RecordIndex()
+        for comment_data in self._iter_records("comments"):
+            if comment_data.get("comment_id"):
+                comment_index.add(comment_data.get("comment_id"), comment_data.get("message_id"),
+                                  comment_data.get("date"))
+        
+        self._message_index = message_index
+        self._comment_index = comment_index
+        logger.info(f"Индексы перестроены: сообщений {len(message_index)}, комментариев {len(comment_index)}")
+    
+    def save_index_snapshot(self) -> bool:
+        """Сохраняет снимок индексов для быстрого старта.
+        
+        Returns:
+            bool: True, если снимок сохранен
+        """
+        if not self._indexes_loaded:
+            return False
+        
+        snapshot = {
+            "dirs": self._dir_signature(),
+            "messages": self._message_index.to_dict(),
+            "comments": self._comment_index.to_dict(),
+        }
+        
+        try:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении снимка индексов: {str(e)}")
+            return False
+    
+    def _read_many(self, kind: str, record_ids: List[str]) -> List[Dict[str, Any]]:
+        """Читает записи по списку ID, пропуская отсутствующие."""
+        records = []
+        for record_id in record_ids:
+            record = self._read_record(kind, record_id)
+            if record is not None:
+                records.append(record)
+        return records
+    
+    def _delete_record(self, kind: str, record_id: str) -> bool:
+        """Удаляет файл записи."""
+        file_path = self._record_path(kind, record_id)
+        
+        if not os.path.exists(file_path):
+            return False
+        
+        try:
+            os.remove(file_path)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при удалении записи {kind}/{record_id}: {str(e)}")
+            return False
+    
+    # Методы для работы с каналами
+    
+    def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        return self._write_record("channels", channel_data["channel_id"], channel_data)
+    
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        return self._read_record("channels", channel_id)
+    
+    def iter_channels(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_records("channels")
+    
+    def delete_channel(self, channel_id: str) -> bool:
+        return self._delete_record("channels", channel_id)
+    
+    # Методы для работы с сообщениями
+    
+    def save_message(self, message_data: Dict[str, Any]) -> bool:
+        self._ensure_indexes()
+        
+        message_id = message_data["message_id"]
+        if not self._write_record("messages", message_id, message_data):
+            return False
+        
+        self._message_index.add(message_id, message_data.get("channel_id"), message_data.get("date"))
+        return True
+    
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        return self._read_record("messages", message_id)
+    
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_records("messages")
+    
+    def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        self._ensure_indexes()
+        return self._read_many("messages", self._message_index.children(channel_id, reverse=True))
+    
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Если каналы указаны, читаем только их сообщения из нужного диапазона дат
+        if channel_ids:
+            self._ensure_indexes()
+            candidates = []
+            for channel_id in set(channel_ids):
+                candidates.extend(self._read_many("messages", self._message_index.children(
+                    channel_id, date_from=date_from, date_to=date_to
+                )))
+        else:
+            candidates = self.iter_messages()
+        
+        results = [
+            message_data for message_data in candidates
+            if message_matches(message_data, query, channel_ids, date_from, date_to)
+        ]
+        
+        return sorted(results, key=message_key, reverse=True)
+    
+    def page_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      limit: int = 50, after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        if not channel_ids:
+            return super().page_messages(query, channel_ids, date_from, date_to, limit, after)
+        
+        # Перебираем индекс каналов от курсора и читаем файлы только до заполнения страницы
+        self._ensure_indexes()
+        results = []
+        for _, message_id, _ in self._message_index.scan(
+            channel_ids, reverse=True, date_from=date_from, date_to=date_to,
+            after=after[:2] if after else None
+        ):
+            message_data = self._read_record("messages", message_id)
+            if message_data and message_matches(message_data, query, channel_ids, date_from, date_to):
+                results.append(message_data)
+                if len(results) >= limit:
+                    break
+        return results
+    
+    def delete_message(self, message_id: str) -> bool:
+        self._ensure_indexes()
+        
+        if not self._delete_record("messages", message_id):
+            return False
+        
+        self._message_index.remove(message_id)
+        return True
+    
+    def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        self._ensure_indexes()
+        
+        by_id = {message_data["message_id"]: message_data for message_data in messages}
+        written = self._write_records("messages", list(by_id.items()))
+        for message_id in written:
+            message_data = by_id[message_id]
+            self._message_index.add(message_id, message_data.get("channel_id"), message_data.get("date"))
+        return len(written)
+    
+    # Методы для работы с комментариями
+    
+    def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        self._ensure_indexes()
+        
+        comment_id = comment_data["comment_id"]
+        if not self._write_record("comments", comment_id, comment_data):
+            return False
+        
+        self._comment_index.add(comment_id, comment_data.get("message_id"), comment_data.get("date"))
+        return True
+    
+    def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        return self._read_record("comments", comment_id)
+    
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_records("comments")
+    
+    def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        self._ensure_indexes()
+        return self._read_many("comments", self._comment_index.children(message_id))
+    
+    def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                        user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # Если сообщения указаны, читаем только их комментарии из нужного диапазона дат
+        if message_ids:
+            self._ensure_indexes()
+            candidates = []
+            for message_id in set(message_ids):
+                candidates.extend(self._read_many("comments", self._comment_index.children(
+                    message_id, date_from=date_from, date_to=date_to
+                )))
+        else:
+            candidates = self.iter_comments()
+        
+        results = [
+            comment_data for comment_data in candidates
+            if comment_matches(comment_data, query, channel_ids, message_ids,
+                               date_from, date_to, sentiment, user_tags)
+        ]
+        
+        return sorted(results, key=comment_key)
+    
+    def page_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                      user_tags: Optional[List[str]] = None, limit: int = 100,
+                      after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        if not message_ids:
+            return super().page_comments(query, channel_ids, message_ids, date_from, date_to,
+                                         sentiment, user_tags, limit, after)
+        
+        self._ensure_indexes()
+        results = []
+        for _, comment_id, _ in self._comment_index.scan(
+            message_ids, date_from=date_from, date_to=date_to, after=after[:2] if after else None
+        ):
+            comment_data = self._read_record("comments", comment_id)
+            if comment_data and comment_matches(comment_data, query, channel_ids, message_ids,
+                                                date_from, date_to, sentiment, user_tags):
+                results.append(comment_data)
+                if len(results) >= limit:
+                    break
+        return results
+    
+    def delete_comment(self, comment_id: str) -> bool:
+        self._ensure_indexes()
+        
+        if not self._delete_record("comments", comment_id):
+            return False
+        
+        self._comment_index.remove(comment_id)
+        return True
+    
+    def save_comments_bulk(self, comments: List[Dict[str, Any]]) -> int:
+        self._ensure_indexes()
+        
+        by_id = {comment_data["comment_id"]: comment_data for comment_data in comments}
+        written = self._write_records("comments", list(by_id.items()))
+        for comment_id in written:
+            comment_data = by_id[comment_id]
+            self._comment_index.add(comment_id, comment_data.get("message_id"), comment_data.get("date"))
+        return len(written)
+    
+    def close(self) -> None:
+        self.save_index_snapshot()
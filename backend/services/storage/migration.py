@@ -0,0 +1,82 @@
+import logging
+from typing import Dict, Optional
+
+from services.storage.base import StorageBackend
+from services.storage.json_storage import JsonStorage
+from services.storage.sqlite_storage import SqliteStorage
+from services.storage.partitioned_storage import PartitionedStorage
+
+logger = logging.getLogger(__name__)
+
+def copy_storage(source: StorageBackend, target: StorageBackend, batch_size: int = 1000) -> Dict[str, int]:
+    """Копирует все записи из одного хранилища в другое пачками.
+    
+    Исходное хранилище не изменяется, поэтому копирование можно безопасно
+    повторить: записи с уже существующими ID будут перезаписаны.
+    
+    Args:
+        source: Исходное хранилище
+        target: Целевое хранилище
+        batch_size: Количество записей в одной пакетной записи
+    
+    Returns:
+        Dict[str, int]: Количество перенесенных каналов, сообщений и комментариев
+    """
+    counts = {"channels": 0, "messages": 0, "comments": 0}
+    sources = [
+        ("channels", source.iter_channels, lambda chunk: sum(1 for record in chunk if target.save_channel(record))),
+        ("messages", source.iter_messages, target.save_messages_bulk),
+        ("comments", source.iter_comments, target.save_comments_bulk),
+    ]
+    
+    for kind, iterate, save in sources:
+        chunk = []
+        for record in iterate():
+            chunk.append(record)
+            if len(chunk) >= batch_size:
+                counts[kind] += save(chunk)
+                chunk = []
+        if chunk:
+            counts[kind] += save(chunk)
+        
+        logger.info(f"Перенесено записей {kind}: {counts[kind]}")
+    
+    return counts
+
+def migrate_json_to_sqlite(data_dir: str = "data", db_path: Optional[str] = None,
+                           batch_size: int = 1000) -> Dict[str, int]:
+    """Переносит данные из дерева JSON-файлов в базу SQLite.
+    
+    Args:
+        data_dir: Директория с JSON-данными
+        db_path: Путь к файлу базы данных (по умолчанию data_dir/storage.sqlite3)
+        batch_size: Количество записей в одной транзакции
+    
+    Returns:
+        Dict[str, int]: Количество перенесенных каналов, сообщений и комментариев
+    """
+    target = SqliteStorage(data_dir, db_path=db_path)
+    try:
+        return copy_storage(JsonStorage(data_dir), target, batch_size)
+    finally:
+        target.close()
+
+def migrate_json_to_partitioned(data_dir: str = "data", granularity: str = "day",
+                                batch_size: int = 1000) -> Dict[str, int]:
+    """Переносит данные из плоского дерева JSON-файлов в разделы по каналам и датам.
+    
+    Даты записей при переносе нормализуются в миллисекунды UTC.
+    
+    Args:
+        data_dir: Директория с JSON-данными
+        granularity: Размер раздела: day или month
+        batch_size: Количество записей в одной пакетной записи
+    
+    Returns:
+        Dict[str, int]: Количество перенесенных каналов, сообщений и комментариев
+    """
+    target = PartitionedStorage(data_dir, granularity=granularity)
+    try:
+        return copy_storage(JsonStorage(data_dir), target, batch_size)
+    finally:
+        target.close()
@@ -0,0 +1,349 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Any, Iterator
+
+from services.pagination import RecordKey, select_page, message_key, comment_key
+from services.storage.base import StorageBackend, message_matches, comment_matches
+from services.storage.codec import RecordCodec
+from services.dates import to_epoch_ms, epoch_ms_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Поле с нормализованной датой записи (миллисекунды UTC)
+TIMESTAMP_FIELD = "date_ts"
+# Раздел для записей без даты
+UNDATED_PARTITION = "undated"
+# Формат имени раздела в зависимости от гранулярности
+PARTITION_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def _bound(choose, *values: Optional[int]) -> Optional[int]:
+    """Выбирает более строгую из заданных границ диапазона."""
+    values = [value for value in values if value is not None]
+    return choose(values) if values else None
+
+class PartitionedStorage(StorageBackend):
+    """Хранилище JSON-файлов, разбитых по каналам и периодам.
+    
+    Сообщения и комментарии лежат в каталогах
+    partitioned/{messages|comments}/{channel_id}/{период}/{record_id}.json,
+    где период — день или месяц по UTC. Выборки с диапазоном дат читают
+    только каталоги периодов, пересекающихся с диапазоном, а границы
+    сравниваются по нормализованному полю date_ts, а не по строкам ISO.
+    """
+    
+    name = "partitioned"
+    supports_compression = True
+    
+    def __init__(self, data_dir: str = "data", granularity: str = "day", codec: Optional[RecordCodec] = None):
+        """Инициализация хранилища.
+        
+        Args:
+            data_dir: Директория для хранения данных
+            granularity: Размер раздела: day или month
+            codec: Кодек записей (по умолчанию JSON с отступами)
+        """
+        if granularity not in PARTITION_FORMATS:
+            raise ValueError(f"Неизвестная гранулярность разделов: {granularity}")
+        
+        self.data_dir = data_dir
+        self.root_dir = os.path.join(data_dir, "partitioned")
+        self.granularity = granularity
+        self.codec = codec or RecordCodec(indent=2)
+        self._partition_format = PARTITION_FORMATS[granularity]
+        
+        for kind in ("channels", "messages", "comments"):
+            os.makedirs(os.path.join(self.root_dir, kind), exist_ok=True)
+        
+        # Расположение записей: вид → ID → относительный каталог раздела.
+        # Строится по именам файлов без их чтения
+        self._locations: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.RLock()
+    
+    # Разделы
+    
+    def partition_name(self, timestamp: Optional[int]) -> str:
+        """Возвращает имя раздела для даты в миллисекундах UTC."""
+        if timestamp is None:
+            return UNDATED_PARTITION
+        return epoch_ms_to_datetime(timestamp).strftime(self._partition_format)
+    
+    @staticmethod
+    def _safe_name(value: Optional[str]) -> str:
+        name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(value or ""))
+        return name or "_"
+    
+    def _normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет к записи нормализованную дату."""
+        record = dict(record)
+        record[TIMESTAMP_FIELD] = to_epoch_ms(record.get("date"))
+        return record
+    
+    def _location(self, kind: str, record: Dict[str, Any]) -> str:
+        return os.path.join(self._safe_name(record.get("channel_id")),
+                            self.partition_name(record.get(TIMESTAMP_FIELD)))
+    
+    def _partition_dirs(self, kind: str, channel_ids: Optional[List[str]] = None,
+                        ts_from: Optional[int] = None, ts_to: Optional[int] = None) -> List[str]:
+        """Возвращает каталоги разделов, пересекающихся с диапазоном дат.
+        
+        Имена разделов упорядочены так же, как периоды, поэтому отбор
+        выполняется сравнением имен без чтения файлов.
+        """
+        kind_dir = os.path.join(self.root_dir, kind)
+        if channel_ids:
+            channels = [self._safe_name(channel_id) for channel_id in dict.fromkeys(channel_ids)]
+        else:
+            channels = sorted(os.listdir(kind_dir))
+        
+        first = self.partition_name(ts_from) if ts_from is not None else None
+        last = self.partition_name(ts_to) if ts_to is not None else None
+        
+        result = []
+        for channel in channels:
+            channel_dir = os.path.join(kind_dir, channel)
+            if not os.path.isdir(channel_dir):
+                continue
+            for partition in sorted(os.listdir(channel_dir)):
+                if partition == UNDATED_PARTITION:
+                    # Записи без даты, как и в остальных бэкендах, не проходят
+                    # только нижнюю границу диапазона
+                    if first:
+                        continue
+                elif (first and partition < first) or (last and partition > last):
+                    continue
+                result.append(os.path.join(channel_dir, partition))
+        return result
+    
+    # Вспомогательные методы
+    
+    def _ensure_locations(self, kind: str) -> Dict[str, str]:
+        """Строит карту расположения записей по именам файлов."""
+        locations = self._locations.get(kind)
+        if locations is not None:
+            return locations
+        
+        with self._lock:
+            if kind in self._locations:
+                return self._locations[kind]
+            
+            kind_dir = os.path.join(self.root_dir, kind)
+            locations = {}
+            for channel in os.listdir(kind_dir):
+                channel_dir = os.path.join(kind_dir, channel)
+                if not os.path.isdir(channel_dir):
+                    continue
+                for partition in os.listdir(channel_dir):
+                    partition_dir = os.path.join(channel_dir, partition)
+                    for filename in os.listdir(partition_dir):
+                        if filename.endswith(".json"):
+                            locations[filename[:-5]] = os.path.join(channel, partition)
+            self._locations[kind] = locations
+            return locations
+    
+    def _write_json(self, file_path: str, data: Dict[str, Any]) -> bool:
+        """Записывает файл через временный файл и переименование."""
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.codec.encode(data))
+            os.replace(tmp_path, file_path)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении файла {file_path}: {str(e)}")
+            return False
+    
+    def _read_json(self, file_path: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(file_path):
+            return None
+        
+        try:
+            with open(file_path, "rb") as f:
+                return self.codec.decode(f.read())
+        except Exception as e:
+            logger.error(f"Ошибка при чтении файла {file_path}: {str(e)}")
+            return None
+    
+    def _iter_dir(self, directory: str) -> Iterator[Dict[str, Any]]:
+        for filename in os.listdir(directory):
+            if filename.endswith(".json"):
+                record = self._read_json(os.path.join(directory, filename))
+                if record is not None:
+                    yield record
+    
+    def _save_record(self, kind: str, record_id: str, record: Dict[str, Any]) -> bool:
+        record = self._normalize(record)
+        location = self._location(kind, record)
+        locations = self._ensure_locations(kind)
+        
+        with self._lock:
+            if not self._write_json(os.path.join(self.root_dir, kind, location, f"{record_id}.json"), record):
+                return False
+            
+            # Если дата или канал изменились, удаляем старую копию
+            previous = locations.get(record_id)
+            if previous and previous != location:
+                try:
+                    os.remove(os.path.join(self.root_dir, kind, previous, f"{record_id}.json"))
+                except OSError:
+                    pass
+            locations[record_id] = location
+            return True
+    
+    def _get_record(self, kind: str, record_id: str) -> Optional[Dict[str, Any]]:
+        location = self._ensure_locations(kind).get(record_id)
+        if location is None:
+            return None
+        return self._read_json(os.path.join(self.root_dir, kind, location, f"{record_id}.json"))
+    
+    def _delete_record(self, kind: str, record_id: str) -> bool:
+        with self._lock:
+            location = self._ensure_locations(kind).pop(record_id, None)
+            if location is None:
+                return False
+            
+            try:
+                os.remove(os.path.join(self.root_dir, kind, location, f"{record_id}.json"))
+                return True
+            except Exception as e:
+                logger.error(f"Ошибка при удалении записи {kind}/{record_id}: {str(e)}")
+                return False
+    
+    def _iter_records(self, kind: str) -> Iterator[Dict[str, Any]]:
+        for partition_dir in self._partition_dirs(kind):
+            yield from self._iter_dir(partition_dir)
+    
+    @staticmethod
+    def _in_range(record: Dict[str, Any], ts_from: Optional[int], ts_to: Optional[int]) -> bool:
+        """Проверяет попадание нормализованной даты записи в диапазон."""
+        timestamp = record.get(TIMESTAMP_FIELD)
+        if timestamp is None:
+            return ts_from is None
+        if ts_from is not None and timestamp < ts_from:
+            return False
+        if ts_to is not None and timestamp > ts_to:
+            return False
+        return True
+    
+    # Методы для работы с каналами
+    
+    def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        file_path = os.path.join(self.root_dir, "channels", f"{self._safe_name(channel_data['channel_id'])}.json")
+        return self._write_json(file_path, channel_data)
+    
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        return self._read_json(os.path.join(self.root_dir, "channels", f"{self._safe_name(channel_id)}.json"))
+    
+    def iter_channels(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_dir(os.path.join(self.root_dir, "channels"))
+    
+    def delete_channel(self, channel_id: str) -> bool:
+        file_path = os.path.join(self.root_dir, "channels", f"{self._safe_name(channel_id)}.json")
+        if not os.path.exists(file_path):
+            return False
+        os.remove(file_path)
+        return True
+    
+    # Методы для работы с сообщениями
+    
+    def save_message(self, message_data: Dict[str, Any]) -> bool:
+        return self._save_record("messages", message_data["message_id"], message_data)
+    
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        return self._get_record("messages", message_id)
+    
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_records("messages")
+    
+    def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        results = []
+        for partition_dir in self._partition_dirs("messages", [channel_id]):
+            results.extend(self._iter_dir(partition_dir))
+        return sorted(results, key=lambda x: x.get(TIMESTAMP_FIELD) or 0, reverse=True)
+    
+    def _message_candidates(self, query: Optional[str], channel_ids: Optional[List[str]],
+                            ts_from: Optional[int], ts_to: Optional[int]) -> Iterator[Dict[str, Any]]:
+        """Перебирает сообщения только из разделов, пересекающихся с диапазоном."""
+        for partition_dir in self._partition_dirs("messages", channel_ids, ts_from, ts_to):
+            for message_data in self._iter_dir(partition_dir):
+                if self._in_range(message_data, ts_from, ts_to) and \
+                        message_matches(message_data, query, channel_ids):
+                    yield message_data
+    
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        results = list(self._message_candidates(query, channel_ids, to_epoch_ms(date_from), to_epoch_ms(date_to)))
+        return sorted(results, key=lambda x: x.get(TIMESTAMP_FIELD) or 0, reverse=True)
+    
+    def page_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      limit: int = 50, after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        # Разделы новее курсора не содержат записей следующей страницы
+        ts_to = _bound(min, to_epoch_ms(date_to), to_epoch_ms(after[0]) if after else None)
+        candidates = self._message_candidates(query, channel_ids, to_epoch_ms(date_from), ts_to)
+        return select_page(candidates, message_key, limit, after, reverse=True)
+    
+    def delete_message(self, message_id: str) -> bool:
+        return self._delete_record("messages", message_id)
+    
+    # Методы для работы с комментариями
+    
+    def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        return self._save_record("comments", comment_data["comment_id"], comment_data)
+    
+    def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        return self._get_record("comments", comment_id)
+    
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_records("comments")
+    
+    def _comment_candidates(self, query: Optional[str], channel_ids: Optional[List[str]],
+                            message_ids: Optional[List[str]], ts_from: Optional[int],
+                            ts_to: Optional[int], sentiment: Optional[str],
+                            user_tags: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+        """Перебирает комментарии только из разделов, пересекающихся с диапазоном."""
+        # Комментарии лежат в разделах канала сообщения, поэтому по ID сообщений
+        # можно определить каналы и не читать остальные
+        partition_channels = channel_ids
+        if message_ids and not channel_ids:
+            messages = self._ensure_locations("messages")
+            if all(message_id in messages for message_id in message_ids):
+                partition_channels = [
+                    os.path.dirname(messages[message_id]) for message_id in message_ids
+                ]
+        
+        for partition_dir in self._partition_dirs("comments", partition_channels, ts_from, ts_to):
+            for comment_data in self._iter_dir(partition_dir):
+                if self._in_range(comment_data, ts_from, ts_to) and \
+                        comment_matches(comment_data, query, channel_ids, message_ids,
+                                        sentiment=sentiment, user_tags=user_tags):
+                    yield comment_data
+    
+    def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        results = list(self._comment_candidates(None, None, [message_id], None, None, None, None))
+        return sorted(results, key=lambda x: x.get(TIMESTAMP_FIELD) or 0)
+    
+    def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                        user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        results = list(self._comment_candidates(
+            query, channel_ids, message_ids, to_epoch_ms(date_from), to_epoch_ms(date_to), sentiment, user_tags
+        ))
+        return sorted(results, key=lambda x: x.get(TIMESTAMP_FIELD) or 0)
+    
+    def page_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                      user_tags: Optional[List[str]] = None, limit: int = 100,
+                      after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        # Разделы старше курсора не содержат записей следующей страницы
+        ts_from = _bound(max, to_epoch_ms(date_from), to_epoch_ms(after[0]) if after else None)
+        candidates = self._comment_candidates(
+            query, channel_ids, message_ids, ts_from, to_epoch_ms(date_to), sentiment, user_tags
+        )
+        return select_page(candidates, comment_key, limit, after)
+    
+    def delete_comment(self, comment_id: str) -> bool:
+        return self._delete_record("comments", comment_id)
@@ -0,0 +1,182 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from services.dates import date_key, to_epoch_ms
+
+# Верхняя граница для ID при поиске по диапазону дат (включительно)
+_MAX_ID = chr(0x10FFFF)
+
+class RecordIndex:
+    """Вторичный индекс parent_id → отсортированный по дате список дочерних ID.
+    
+    Используется для отображений канал → сообщения и сообщение → комментарии.
+    Внутри каждого родителя записи хранятся как пары (date, child_id), где
+    date — миллисекунды UTC, поэтому выборка уже упорядочена по моменту
+    времени и диапазон дат находится двоичным поиском.
+    """
+    
+    def __init__(self):
+        """Инициализация индекса."""
+        self._children: Dict[str, List[Tuple[int, str]]] = {}
+        self._keys: Dict[str, Tuple[str, int]] = {}
+        self._lock = threading.RLock()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def __contains__(self, child_id: str) -> bool:
+        return child_id in self._keys
+    
+    def add(self, child_id: str, parent_id: Optional[str], date: Optional[str]) -> None:
+        """Добавляет или перемещает запись в индексе.
+        
+        Args:
+            child_id: ID дочерней записи
+            parent_id: ID родителя (канала или сообщения)
+            date: Дата записи в формате ISO
+        """
+        parent_id = parent_id or ""
+        date = date_key(date)
+        
+        with self._lock:
+            if self._keys.get(child_id) == (parent_id, date):
+                return
+            self.remove(child_id)
+            insort(self._children.setdefault(parent_id, []), (date, child_id))
+            self._keys[child_id] = (parent_id, date)
+    
+    def remove(self, child_id: str) -> bool:
+        """Удаляет запись из индекса.
+        
+        Args:
+            child_id: ID дочерней записи
+        
+        Returns:
+            bool: True, если запись была в индексе
+        """
+        with self._lock:
+            key = self._keys.pop(child_id, None)
+            if key is None:
+                return False
+            
+            parent_id, date = key
+            entries = self._children.get(parent_id, [])
+            position = bisect_left(entries, (date, child_id))
+            if position < len(entries) and entries[position] == (date, child_id):
+                entries.pop(position)
+            if not entries:
+                self._children.pop(parent_id, None)
+            return True
+    
+    def parent_of(self, child_id: str) -> Optional[str]:
+        """Возвращает ID родителя записи."""
+        key = self._keys.get(child_id)
+        return key[0] if key else None
+    
+    def date_of(self, child_id: str) -> Optional[int]:
+        """Возвращает дату записи в миллисекундах UTC."""
+        key = self._keys.get(child_id)
+        return key[1] if key else None
+    
+    def children(self, parent_id: str, reverse: bool = False,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[str]:
+        """Возвращает ID дочерних записей, упорядоченные по дате.
+        
+        Args:
+            parent_id: ID родителя
+            reverse: True для порядка от новых к старым
+            date_from: Начальная дата (включительно)
+            date_to: Конечная дата (включительно)
+        
+        Returns:
+            List[str]: Список ID
+        """
+        with self._lock:
+            entries = self._children.get(parent_id, [])
+            start, end = self._bounds(entries, date_from, date_to)
+            selected = [child_id for _, child_id in entries[start:end]]
+        
+        if reverse:
+            selected.reverse()
+        return selected
+    
+    def scan(self, parent_ids: List[str], reverse: bool = False, date_from: Optional[str] = None,
+             date_to: Optional[str] = None, after: Optional[Tuple[str, str]] = None) -> Iterator[Tuple[str, str, str]]:
+        """Лениво перебирает записи нескольких родителей в общем порядке (date, child_id).
+        
+        Используется для постраничной выборки: чтение останавливается, как только
+        набрана страница, а позиция курсора находится двоичным поиском.
+        
+        Args:
+            parent_ids: ID родителей
+            reverse: True для порядка от новых к старым
+            date_from: Начальная дата (включительно)
+            date_to: Конечная дата (включительно)
+            after: Пара (date, child_id) последней записи предыдущей страницы (дата в миллисекундах UTC)
+        
+        Returns:
+            Iterator[Tuple[int, str, str]]: Тройки (date, child_id, parent_id)
+        """
+        streams = [
+            self._scan_parent(parent_id, reverse, date_from, date_to, after)
+            for parent_id in dict.fromkeys(parent_ids)
+        ]
+        return heapq.merge(*streams, reverse=reverse)
+    
+    @staticmethod
+    def _bounds(entries: List[Tuple[int, str]], date_from: Optional[str], date_to: Optional[str]) -> Tuple[int, int]:
+        """Возвращает позиции записей с датами в диапазоне [date_from, date_to]."""
+        ts_from = to_epoch_ms(date_from) if date_from else None
+        ts_to = to_epoch_ms(date_to) if date_to else None
+        start = bisect_left(entries, (ts_from, "")) if ts_from is not None else 0
+        end = bisect_right(entries, (ts_to, _MAX_ID)) if ts_to is not None else len(entries)
+        return start, end
+    
+    def _scan_parent(self, parent_id: str, reverse: bool, date_from: Optional[str], date_to: Optional[str],
+                     after: Optional[Tuple[int, str]]) -> Iterator[Tuple[int, str, str]]:
+        with self._lock:
+            entries = self._children.get(parent_id, [])
+            start, end = self._bounds(entries, date_from, date_to)
+            if after is not None:
+                if reverse:
+                    end = min(end, bisect_left(entries, tuple(after)))
+                else:
+                    start = max(start, bisect_right(entries, tuple(after)))
+        
+        positions = range(end - 1, start - 1, -1) if reverse else range(start, end)
+        for position in positions:
+            # Список может измениться между итерациями, поэтому проверяем границы
+            if position >= len(entries):
+                continue
+            date, child_id = entries[position]
+            yield date, child_id, parent_id
+    
+    def parents(self) -> List[str]:
+        """Возвращает список всех родителей в индексе."""
+        with self._lock:
+            return list(self._children.keys())
+    
+    def clear(self) -> None:
+        """Очищает индекс."""
+        with self._lock:
+            self._children.clear()
+            self._keys.clear()
+    
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """Сериализует индекс для сохранения снимка."""
+        with self._lock:
+            return {child_id: [parent_id, date] for child_id, (parent_id, date) in self._keys.items()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RecordIndex":
+        """Восстанавливает индекс из снимка (даты снимков прежнего формата хранятся строками ISO)."""
+        index = cls()
+        for child_id, (parent_id, date) in data.items():
+            date = date_key(date)
+            index._keys[child_id] = (parent_id, date)
+            index._children.setdefault(parent_id, []).append((date, child_id))
+        for entries in index._children.values():
+            entries.sort()
+        return index
@@ -0,0 +1,728 @@
+import logging
+import json
+import mmap
+import os
+import threading
+from typing import Dict, List, Optional, Any, Iterator, Tuple, BinaryIO
+
+from services.pagination import RecordKey, message_key, comment_key
+from services.storage.base import StorageBackend, message_matches, comment_matches
+from services.storage.record_index import RecordIndex
+
+logger = logging.getLogger(__name__)
+
+# Максимальный размер одного сегмента перед переходом к следующему
+DEFAULT_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+# Интервал фонового уплотнения в секундах
+DEFAULT_COMPACTION_INTERVAL = 300
+# Доля устаревших данных в разделе, при которой запускается уплотнение
+DEFAULT_COMPACTION_RATIO = 0.5
+# Минимальный объем устаревших данных для уплотнения раздела
+MIN_COMPACTION_GARBAGE_BYTES = 64 * 1024
+
+class SegmentLog:
+    """Журнал записей одного вида, разбитый на сегменты по разделам.
+    
+    Записи дописываются в конец активного сегмента раздела в виде компактных
+    JSON-строк. Индекс смещений (ID → раздел, сегмент, смещение, длина)
+    хранится в памяти и сохраняется в снимок, поэтому при старте читаются
+    только снимок и хвосты сегментов, дописанные после него.
+    """
+    
+    def __init__(self, root_dir: str, kind: str, segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        """Инициализация журнала.
+        
+        Args:
+            root_dir: Корневая директория сегментов
+            kind: Вид записей (channels, messages, comments)
+            segment_max_bytes: Максимальный размер сегмента
+        """
+        self.kind = kind
+        self.log_dir = os.path.join(root_dir, kind)
+        self.index_path = os.path.join(root_dir, f"{kind}.index.json")
+        self.segment_max_bytes = segment_max_bytes
+        
+        # Индекс смещений: ID → [раздел, сегмент, смещение, длина]
+        self._locations: Dict[str, List[Any]] = {}
+        # Порядок записей внутри родителя (канала или сообщения) по дате
+        self.order = RecordIndex()
+        self._partition_ids: Dict[str, set] = {}
+        self._segments: Dict[str, List[int]] = {}
+        self._sizes: Dict[Tuple[str, int], int] = {}
+        self._garbage: Dict[str, int] = {}
+        self._writers: Dict[str, BinaryIO] = {}
+        self._maps: Dict[Tuple[str, int], mmap.mmap] = {}
+        self._lock = threading.RLock()
+        
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self._locations)
+    
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._locations
+    
+    # Пути и файлы
+    
+    def _segment_path(self, partition: str, seq: int) -> str:
+        return os.path.join(self.log_dir, partition, f"{seq:06d}.log")
+    
+    @staticmethod
+    def _partition_name(value: Optional[str]) -> str:
+        """Преобразует ID раздела в безопасное имя каталога."""
+        name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(value or ""))
+        return name or "_"
+    
+    def _writer(self, partition: str, size_needed: int) -> Tuple[BinaryIO, int]:
+        """Возвращает файл активного сегмента раздела, при необходимости открывая новый."""
+        seqs = self._segments.setdefault(partition, [])
+        if not seqs:
+            seqs.append(1)
+            os.makedirs(os.path.join(self.log_dir, partition), exist_ok=True)
+        seq = seqs[-1]
+        size = self._sizes.get((partition, seq), 0)
+        
+        if size and size + size_needed > self.segment_max_bytes:
+            self._close_writer(partition)
+            seq += 1
+            seqs.append(seq)
+            size = 0
+        
+        writer = self._writers.get(partition)
+        if writer is None:
+            writer = open(self._segment_path(partition, seq), "ab")
+            self._writers[partition] = writer
+        self._sizes[(partition, seq)] = size
+        return writer, seq
+    
+    def _close_writer(self, partition: str) -> None:
+        writer = self._writers.pop(partition, None)
+        if writer is not None:
+            writer.close()
+    
+    def _map(self, partition: str, seq: int, needed: int) -> mmap.mmap:
+        """Возвращает отображение сегмента в память, обновляя его, если сегмент вырос."""
+        key = (partition, seq)
+        mapped = self._maps.get(key)
+        if mapped is None or len(mapped) < needed:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(partition, seq), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[key] = mapped
+        return mapped
+    
+    def _unmap(self, partition: str, seq: int) -> None:
+        mapped = self._maps.pop((partition, seq), None)
+        if mapped is not None:
+            mapped.close()
+    
+    # Применение операций к индексу
+    
+    def _apply_put(self, record_id: str, partition: str, seq: int, offset: int, length: int,
+                   parent: Optional[str], date: Optional[str]) -> None:
+        previous = self._locations.get(record_id)
+        if previous is not None:
+            self._garbage[previous[0]] = self._garbage.get(previous[0], 0) + previous[3]
+            self._partition_ids.get(previous[0], set()).discard(record_id)
+        
+        self._locations[record_id] = [partition, seq, offset, length]
+        self._partition_ids.setdefault(partition, set()).add(record_id)
+        self.order.add(record_id, parent, date)
+    
+    def _apply_delete(self, record_id: str, partition: str, tombstone_length: int) -> bool:
+        self._garbage[partition] = self._garbage.get(partition, 0) + tombstone_length
+        
+        previous = self._locations.pop(record_id, None)
+        if previous is None:
+            return False
+        
+        self._garbage[previous[0]] = self._garbage.get(previous[0], 0) + previous[3]
+        self._partition_ids.get(previous[0], set()).discard(record_id)
+        self.order.remove(record_id)
+        return True
+    
+    # Загрузка и снимок индекса
+    
+    def _disk_segments(self) -> Dict[str, List[int]]:
+        segments = {}
+        for partition in os.listdir(self.log_dir):
+            partition_dir = os.path.join(self.log_dir, partition)
+            if not os.path.isdir(partition_dir):
+                continue
+            seqs = sorted(
+                int(filename[:-4]) for filename in os.listdir(partition_dir)
+                if filename.endswith(".log") and filename[:-4].isdigit()
+            )
+            if seqs:
+                segments[partition] = seqs
+        return segments
+    
+    def _load(self) -> None:
+        """Восстанавливает индекс из снимка и дочитывает хвосты сегментов."""
+        disk_segments = self._disk_segments()
+        disk_sizes = {
+            (partition, seq): os.path.getsize(self._segment_path(partition, seq))
+            for partition, seqs in disk_segments.items() for seq in seqs
+        }
+        
+        snapshot_sizes = self._load_snapshot(disk_sizes)
+        
+        replayed = 0
+        for partition, seqs in disk_segments.items():
+            self._segments[partition] = seqs
+            for seq in seqs:
+                start = snapshot_sizes.get((partition, seq), 0)
+                replayed += self._replay(partition, seq, start, disk_sizes[(partition, seq)])
+        
+        if replayed:
+            logger.info(f"Журнал {self.kind}: дочитано {replayed} записей после снимка")
+    
+    def _load_snapshot(self, disk_sizes: Dict[Tuple[str, int], int]) -> Dict[Tuple[str, int], int]:
+        """Загружает снимок индекса, если он согласован с сегментами на диске.
+        
+        Returns:
+            Dict[Tuple[str, int], int]: Размеры сегментов, покрытые снимком
+        """
+        if not os.path.exists(self.index_path):
+            return {}
+        
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            
+            sizes = {}
+            for key, size in snapshot["segments"].items():
+                partition, seq = key.rsplit("/", 1)
+                sizes[(partition, int(seq))] = size
+            
+            # Снимок недействителен, если сегменты были удалены или усечены
+            for key, size in sizes.items():
+                if disk_sizes.get(key, -1) < size:
+                    logger.info(f"Снимок индекса журнала {self.kind} устарел, журнал будет перечитан")
+                    return {}
+            
+            for record_id, (partition, seq, offset, length, parent, date) in snapshot["entries"].items():
+                self._locations[record_id] = [partition, seq, offset, length]
+                self._partition_ids.setdefault(partition, set()).add(record_id)
+            self.order = RecordIndex.from_dict({
+                record_id: [entry[4] or "", entry[5]]
+                for record_id, entry in snapshot["entries"].items()
+            })
+            self._garbage = dict(snapshot.get("garbage", {}))
+            self._sizes.update(sizes)
+            return sizes
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке снимка индекса журнала {self.kind}: {str(e)}")
+            self._locations.clear()
+            self._partition_ids.clear()
+            self.order = RecordIndex()
+            self._garbage = {}
+            return {}
+    
+    def _replay(self, partition: str, seq: int, start: int, size: int) -> int:
+        """Применяет к индексу записи сегмента, начиная со смещения start."""
+        self._sizes[(partition, seq)] = size
+        if start >= size:
+            return 0
+        
+        path = self._segment_path(partition, seq)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        
+        count = 0
+        offset = start
+        position = 0
+        while position < len(data):
+            end = data.find(b"\n", position)
+            if end < 0:
+                break
+            line = data[position:end + 1]
+            try:
+                envelope = json.loads(line)
+            except ValueError:
+                break
+            
+            if envelope.get("del"):
+                self._apply_delete(envelope["id"], partition, len(line))
+            else:
+                self._apply_put(envelope["id"], partition, seq, offset, len(line),
+                                envelope.get("p"), envelope.get("d"))
+            count += 1
+            offset += len(line)
+            position = end + 1
+        
+        # Недописанная запись после аварийного завершения отбрасывается
+        if offset < size:
+            logger.warning(f"Сегмент {path} усечен до {offset} байт после неполной записи")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+            self._sizes[(partition, seq)] = offset
+        
+        return count
+    
+    def save_snapshot(self) -> bool:
+        """Сохраняет снимок индекса смещений.
+        
+        Returns:
+            bool: True, если снимок сохранен
+        """
+        with self._lock:
+            for writer in self._writers.values():
+                writer.flush()
+            
+            snapshot = {
+                "segments": {f"{partition}/{seq}": size for (partition, seq), size in self._sizes.items()},
+                "entries": {
+                    record_id: [*location, self.order.parent_of(record_id), self.order.date_of(record_id)]
+                    for record_id, location in self._locations.items()
+                },
+                "garbage": self._garbage,
+            }
+            
+            try:
+                tmp_path = f"{self.index_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.index_path)
+                return True
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении снимка индекса журнала {self.kind}: {str(e)}")
+                return False
+    
+    # Операции с записями
+    
+    def put(self, record_id: str, data: Dict[str, Any], partition: Optional[str],
+            parent: Optional[str] = None, date: Optional[str] = None) -> bool:
+        """Дописывает новую версию записи в журнал.
+        
+        Args:
+            record_id: ID записи
+            data: Данные записи
+            partition: Раздел (обычно ID канала)
+            parent: ID родителя для упорядоченного индекса
+            date: Дата записи
+        
+        Returns:
+            bool: True, если запись сохранена
+        """
+        return self.put_many([(record_id, data, partition, parent, date)]) == 1
+    
+    def put_many(self, records: List[Tuple[str, Dict[str, Any], Optional[str], Optional[str], Optional[str]]]) -> int:
+        """Дописывает пакет записей, сбрасывая буфер каждого раздела один раз.
+        
+        Args:
+            records: Кортежи (ID записи, данные, раздел, ID родителя, дата)
+        
+        Returns:
+            int: Количество сохраненных записей
+        """
+        by_partition: Dict[str, List[Tuple[str, bytes, Optional[str], Optional[str]]]] = {}
+        for record_id, data, partition, parent, date in records:
+            envelope = {"id": record_id, "p": parent, "d": date, "r": data}
+            line = (json.dumps(envelope, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            by_partition.setdefault(self._partition_name(partition), []).append((record_id, line, parent, date))
+        
+        saved = 0
+        with self._lock:
+            for partition, lines in by_partition.items():
+                appended = []
+                try:
+                    for record_id, line, parent, date in lines:
+                        writer, seq = self._writer(partition, len(line))
+                        offset = self._sizes[(partition, seq)]
+                        writer.write(line)
+                        self._sizes[(partition, seq)] = offset + len(line)
+                        appended.append((record_id, seq, offset, len(line), parent, date))
+                    writer = self._writers.get(partition)
+                    if writer is not None:
+                        writer.flush()
+                except Exception as e:
+                    logger.error(f"Ошибка записи в журнал {self.kind}/{partition}: {str(e)}")
+                    continue
+                
+                # Индекс обновляется только после успешной записи всего пакета раздела
+                for record_id, seq, offset, length, parent, date in appended:
+                    self._apply_put(record_id, partition, seq, offset, length, parent, date)
+                saved += len(appended)
+        
+        return saved
+    
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Читает запись по ID через отображение сегмента в память.
+        
+        Args:
+            record_id: ID записи
+        
+        Returns:
+            Optional[Dict[str, Any]]: Данные записи или None
+        """
+        with self._lock:
+            location = self._locations.get(record_id)
+            if location is None:
+                return None
+            
+            partition, seq, offset, length = location
+            try:
+                mapped = self._map(partition, seq, offset + length)
+                raw = mapped[offset:offset + length]
+            except Exception as e:
+                logger.error(f"Ошибка чтения записи {self.kind}/{record_id}: {str(e)}")
+                return None
+        
+        return json.loads(raw)["r"]
+    
+    def get_many(self, record_ids: List[str]) -> List[Dict[str, Any]]:
+        """Читает записи по списку ID, пропуская отсутствующие."""
+        records = []
+        for record_id in record_ids:
+            record = self.get(record_id)
+            if record is not None:
+                records.append(record)
+        return records
+    
+    def delete(self, record_id: str) -> bool:
+        """Удаляет запись, дописывая в журнал отметку об удалении.
+        
+        Args:
+            record_id: ID записи
+        
+        Returns:
+            bool: True, если запись существовала
+        """
+        with self._lock:
+            location = self._locations.get(record_id)
+            if location is None:
+                return False
+            
+            partition = location[0]
+            line = (json.dumps({"id": record_id, "del": True}, ensure_ascii=False,
+                               separators=(",", ":")) + "\n").encode("utf-8")
+            try:
+                writer, seq = self._writer(partition, len(line))
+                writer.write(line)
+                writer.flush()
+                self._sizes[(partition, seq)] += len(line)
+            except Exception as e:
+                logger.error(f"Ошибка записи в журнал {self.kind}/{partition}: {str(e)}")
+                return False
+            
+            return self._apply_delete(record_id, partition, len(line))
+    
+    def ids(self) -> List[str]:
+        """Возвращает ID всех записей в порядке расположения в сегментах."""
+        with self._lock:
+            return sorted(self._locations, key=lambda record_id: self._locations[record_id])
+    
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Последовательно возвращает все актуальные записи."""
+        for record_id in self.ids():
+            record = self.get(record_id)
+            if record is not None:
+                yield record
+    
+    # Уплотнение
+    
+    def partitions_to_compact(self, ratio: float = DEFAULT_COMPACTION_RATIO) -> List[str]:
+        """Возвращает разделы, в которых доля устаревших данных превышает порог."""
+        with self._lock:
+            result = []
+            for partition, seqs in self._segments.items():
+                total = sum(self._sizes.get((partition, seq), 0) for seq in seqs)
+                garbage = self._garbage.get(partition, 0)
+                if garbage >= MIN_COMPACTION_GARBAGE_BYTES and total and garbage / total >= ratio:
+                    result.append(partition)
+            return result
+    
+    def compact(self, partition: str) -> int:
+        """Переписывает сегменты раздела, оставляя только актуальные версии записей.
+        
+        Args:
+            partition: Имя раздела
+        
+        Returns:
+            int: Количество освобожденных байт
+        """
+        with self._lock:
+            old_seqs = list(self._segments.get(partition, []))
+            if not old_seqs:
+                return 0
+            
+            old_total = sum(self._sizes.get((partition, seq), 0) for seq in old_seqs)
+            self._close_writer(partition)
+            
+            live_ids = sorted(self._partition_ids.get(partition, set()), key=lambda rid: self._locations[rid])
+            new_seq = old_seqs[-1] + 1
+            new_seqs = [new_seq]
+            new_locations = {}
+            size = 0
+            
+            output = open(self._segment_path(partition, new_seq), "wb")
+            try:
+                for record_id in live_ids:
+                    _, seq, offset, length = self._locations[record_id]
+                    raw = self._map(partition, seq, offset + length)[offset:offset + length]
+                    
+                    if size and size + length > self.segment_max_bytes:
+                        output.flush()
+                        os.fsync(output.fileno())
+                        output.close()
+                        self._sizes[(partition, new_seq)] = size
+                        new_seq += 1
+                        new_seqs.append(new_seq)
+                        output = open(self._segment_path(partition, new_seq), "wb")
+                        size = 0
+                    
+                    output.write(raw)
+                    new_locations[record_id] = [partition, new_seq, size, length]
+                    size += length
+                
+                output.flush()
+                os.fsync(output.fileno())
+            finally:
+                output.close()
+            self._sizes[(partition, new_seq)] = size
+            
+            # Переключаем индекс на новые сегменты и удаляем старые
+            self._locations.update(new_locations)
+            self._segments[partition] = new_seqs
+            self._garbage[partition] = 0
+            for seq in old_seqs:
+                self._unmap(partition, seq)
+                self._sizes.pop((partition, seq), None)
+                try:
+                    os.remove(self._segment_path(partition, seq))
+                except OSError as e:
+                    logger.error(f"Ошибка при удалении сегмента {partition}/{seq}: {str(e)}")
+            
+            self.save_snapshot()
+            
+            new_total = sum(self._sizes.get((partition, seq), 0) for seq in new_seqs)
+            logger.info(f"Журнал {self.kind}/{partition} уплотнен: {old_total} → {new_total} байт")
+            return old_total - new_total
+    
+    def close(self) -> None:
+        """Сохраняет снимок и закрывает файлы."""
+        with self._lock:
+            self.save_snapshot()
+            for partition in list(self._writers):
+                self._close_writer(partition)
+            for partition, seq in list(self._maps):
+                self._unmap(partition, seq)
+
+class SegmentLogStorage(StorageBackend):
+    """Хранилище в виде журналов с дозаписью, разбитых на сегменты по каналам.
+    
+    Вместо файла на каждую запись сообщения и комментарии дописываются
+    в сегменты своего канала. Чтение по ID выполняется за O(1) через индекс
+    смещений и отображение сегментов в память, а фоновое уплотнение удаляет
+    устаревшие и удаленные версии записей.
+    """
+    
+    name = "segment"
+    
+    def __init__(self, data_dir: str = "data", segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES,
+                 compaction_interval: float = DEFAULT_COMPACTION_INTERVAL,
+                 compaction_ratio: float = DEFAULT_COMPACTION_RATIO):
+        """Инициализация хранилища.
+        
+        Args:
+            data_dir: Директория для хранения данных
+            segment_max_bytes: Максимальный размер сегмента
+            compaction_interval: Интервал фонового уплотнения в секундах (0 — отключено)
+            compaction_ratio: Доля устаревших данных, при которой раздел уплотняется
+        """
+        self.data_dir = data_dir
+        self.segments_dir = os.path.join(data_dir, "segments")
+        os.makedirs(self.segments_dir, exist_ok=True)
+        
+        self.channels = SegmentLog(self.segments_dir, "channels", segment_max_bytes)
+        self.messages = SegmentLog(self.segments_dir, "messages", segment_max_bytes)
+        self.comments = SegmentLog(self.segments_dir, "comments", segment_max_bytes)
+        
+        # Фоновое уплотнение
+        self.compaction_ratio = compaction_ratio
+        self._stop_event = threading.Event()
+        self._compaction_thread = None
+        if compaction_interval > 0:
+            self._compaction_thread = threading.Thread(
+                target=self._compaction_loop, args=(compaction_interval,),
+                name="segment-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+    
+    def _compaction_loop(self, interval: float) -> None:
+        while not self._stop_event.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Ошибка фонового уплотнения журналов: {str(e)}")
+    
+    def compact(self, force: bool = False) -> int:
+        """Уплотняет разделы с большой долей устаревших данных.
+        
+        Args:
+            force: Уплотнить все разделы независимо от порога
+        
+        Returns:
+            int: Количество освобожденных байт
+        """
+        freed = 0
+        for log in (self.channels, self.messages, self.comments):
+            partitions = list(log._segments) if force else log.partitions_to_compact(self.compaction_ratio)
+            for partition in partitions:
+                freed += log.compact(partition)
+        return freed
+    
+    # Методы для работы с каналами
+    
+    def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        return self.channels.put(channel_data["channel_id"], channel_data, partition="all")
+    
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        return self.channels.get(channel_id)
+    
+    def iter_channels(self) -> Iterator[Dict[str, Any]]:
+        return self.channels.iter_records()
+    
+    def delete_channel(self, channel_id: str) -> bool:
+        return self.channels.delete(channel_id)
+    
+    # Методы для работы с сообщениями
+    
+    def save_message(self, message_data: Dict[str, Any]) -> bool:
+        channel_id = message_data.get("channel_id")
+        return self.messages.put(message_data["message_id"], message_data, partition=channel_id,
+                                 parent=channel_id, date=message_data.get("date"))
+    
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        return self.messages.get(message_id)
+    
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        return self.messages.iter_records()
+    
+    def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        return self.messages.get_many(self.messages.order.children(channel_id, reverse=True))
+    
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        if channel_ids:
+            candidates = []
+            for channel_id in set(channel_ids):
+                candidates.extend(self.messages.get_many(self.messages.order.children(
+                    channel_id, date_from=date_from, date_to=date_to
+                )))
+        else:
+            candidates = self.iter_messages()
+        
+        results = [
+            message_data for message_data in candidates
+            if message_matches(message_data, query, channel_ids, date_from, date_to)
+        ]
+        
+        return sorted(results, key=message_key, reverse=True)
+    
+    def page_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      limit: int = 50, after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        if not channel_ids:
+            return super().page_messages(query, channel_ids, date_from, date_to, limit, after)
+        
+        results = []
+        for _, message_id, _ in self.messages.order.scan(
+            channel_ids, reverse=True, date_from=date_from, date_to=date_to,
+            after=after[:2] if after else None
+        ):
+            message_data = self.messages.get(message_id)
+            if message_data and message_matches(message_data, query, channel_ids, date_from, date_to):
+                results.append(message_data)
+                if len(results) >= limit:
+                    break
+        return results
+    
+    def delete_message(self, message_id: str) -> bool:
+        return self.messages.delete(message_id)
+    
+    def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        return self.messages.put_many([
+            (message_data["message_id"], message_data, message_data.get("channel_id"),
+             message_data.get("channel_id"), message_data.get("date"))
+            for message_data in messages
+        ])
+    
+    # Методы для работы с комментариями
+    
+    def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        return self.comments.put(comment_data["comment_id"], comment_data,
+                                 partition=comment_data.get("channel_id"),
+                                 parent=comment_data.get("message_id"), date=comment_data.get("date"))
+    
+    def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        return self.comments.get(comment_id)
+    
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        return self.comments.iter_records()
+    
+    def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        return self.comments.get_many(self.comments.order.children(message_id))
+    
+    def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                        user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        if message_ids:
+            candidates = []
+            for message_id in set(message_ids):
+                candidates.extend(self.comments.get_many(self.comments.order.children(
+                    message_id, date_from=date_from, date_to=date_to
+                )))
+        else:
+            candidates = self.iter_comments()
+        
+        results = [
+            comment_data for comment_data in candidates
+            if comment_matches(comment_data, query, channel_ids, message_ids,
+                               date_from, date_to, sentiment, user_tags)
+        ]
+        
+        return sorted(results, key=comment_key)
+    
+    def page_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                      user_tags: Optional[List[str]] = None, limit: int = 100,
+                      after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        if not message_ids:
+            return super().page_comments(query, channel_ids, message_ids, date_from, date_to,
+                                         sentiment, user_tags, limit, after)
+        
+        results = []
+        for _, comment_id, _ in self.comments.order.scan(
+            message_ids, date_from=date_from, date_to=date_to, after=after[:2] if after else None
+        ):
+            comment_data = self.comments.get(comment_id)
+            if comment_data and comment_matches(comment_data, query, channel_ids, message_ids,
+                                                date_from, date_to, sentiment, user_tags):
+                results.append(comment_data)
+                if len(results) >= limit:
+                    break
+        return results
+    
+    def delete_comment(self, comment_id: str) -> bool:
+        return self.comments.delete(comment_id)
+    
+    def save_comments_bulk(self, comments: List[Dict[str, Any]]) -> int:
+        return self.comments.put_many([
+            (comment_data["comment_id"], comment_data, comment_data.get("channel_id"),
+             comment_data.get("message_id"), comment_data.get("date"))
+            for comment_data in comments
+        ])
+    
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join(timeout=5)
+        for log in (self.channels, self.messages, self.comments):
+            log.close()
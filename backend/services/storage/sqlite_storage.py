@@ -0,0 +1,416 @@
+import logging
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from services.dates import date_key, to_epoch_ms
+from services.pagination import RecordKey, message_key, comment_key
+from services.storage.base import StorageBackend
+from services.storage.codec import RecordCodec
+
+logger = logging.getLogger(__name__)
+
+# Схема базы данных. Полная запись хранится в поле data, а поля,
+# по которым выполняется фильтрация, вынесены в отдельные индексируемые колонки.
+# Даты сравниваются и сортируются по колонке date_ts (миллисекунды UTC), так как
+# строки ISO с разными часовыми поясами и точностью нельзя сравнивать как текст.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    is_monitored INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    date TEXT NOT NULL DEFAULT '',
+    date_ts INTEGER NOT NULL DEFAULT 0,
+    text TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS comments (
+    comment_id TEXT PRIMARY KEY,
+    message_id TEXT,
+    channel_id TEXT,
+    date TEXT NOT NULL DEFAULT '',
+    date_ts INTEGER NOT NULL DEFAULT 0,
+    text TEXT NOT NULL DEFAULT '',
+    sentiment TEXT,
+    is_bookmarked INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS comment_tags (
+    tag TEXT NOT NULL,
+    comment_id TEXT NOT NULL,
+    PRIMARY KEY (tag, comment_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_comment_tags_comment ON comment_tags (comment_id);
+"""
+
+# Индексы создаются после миграции, когда колонка date_ts уже есть в таблицах
+INDEXES = """
+DROP INDEX IF EXISTS idx_messages_channel_date;
+DROP INDEX IF EXISTS idx_messages_date;
+DROP INDEX IF EXISTS idx_messages_channel_keyset;
+DROP INDEX IF EXISTS idx_messages_keyset;
+CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages (channel_id, date_ts, message_id);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (date_ts, message_id);
+
+DROP INDEX IF EXISTS idx_comments_message_date;
+DROP INDEX IF EXISTS idx_comments_channel_date;
+DROP INDEX IF EXISTS idx_comments_date;
+DROP INDEX IF EXISTS idx_comments_message_keyset;
+DROP INDEX IF EXISTS idx_comments_channel_keyset;
+DROP INDEX IF EXISTS idx_comments_keyset;
+DROP INDEX IF EXISTS idx_comments_sentiment;
+CREATE INDEX IF NOT EXISTS idx_comments_message_ts ON comments (message_id, date_ts, comment_id);
+CREATE INDEX IF NOT EXISTS idx_comments_channel_ts ON comments (channel_id, date_ts, comment_id);
+CREATE INDEX IF NOT EXISTS idx_comments_ts ON comments (date_ts, comment_id);
+CREATE INDEX IF NOT EXISTS idx_comments_sentiment_ts ON comments (sentiment, date_ts);
+"""
+
+class SqliteStorage(StorageBackend):
+    """Хранилище на основе встроенной базы SQLite с индексами.
+    
+    Индексы по channel_id, message_id, date_ts, sentiment и тегам позволяют
+    выбирать записи одного канала или сообщения без чтения всего набора данных.
+    
+    Поле data хранит компактный JSON, а при включенном сжатии — сжатую запись
+    (BLOB). Строки обоих видов читаются одинаково.
+    """
+    
+    name = "sqlite"
+    supports_compression = True
+    
+    def __init__(self, data_dir: str = "data", db_path: Optional[str] = None,
+                 codec: Optional[RecordCodec] = None):
+        """Инициализация хранилища.
+        
+        Args:
+            data_dir: Директория для хранения данных
+            db_path: Путь к файлу базы данных (по умолчанию data_dir/storage.sqlite3)
+            codec: Кодек записей (по умолчанию компактный JSON)
+        """
+        self.data_dir = data_dir
+        self.codec = codec or RecordCodec()
+        os.makedirs(self.data_dir, exist_ok=True)
+        
+        self.db_path = db_path or os.path.join(self.data_dir, "storage.sqlite3")
+        
+        # Одно соединение на хранилище, доступ к нему сериализуется блокировкой
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Встроенная функция lower() в SQLite работает только с ASCII,
+        # поэтому для кириллицы регистрируем питоновскую
+        self._conn.create_function("py_lower", 1, lambda value: value.lower() if value else "",
+                                   deterministic=True)
+        self._conn.create_function("py_epoch_ms", 1, to_epoch_ms, deterministic=True)
+        self._conn.executescript(SCHEMA)
+        self._migrate_date_ts()
+        self._conn.executescript(INDEXES)
+        self._conn.commit()
+    
+    def _migrate_date_ts(self) -> None:
+        """Добавляет колонку date_ts в базы, созданные до ее появления, и заполняет ее по date."""
+        for table in ("messages", "comments"):
+            columns = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if "date_ts" in columns:
+                continue
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN date_ts INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(f"UPDATE {table} SET date_ts = COALESCE(py_epoch_ms(date), 0)")
+            logger.info(f"Таблица {table} переведена на сравнение дат по date_ts")
+    
+    # Вспомогательные методы
+    
+    @contextmanager
+    def batch(self):
+        """Объединяет несколько операций записи в одну транзакцию.
+        
+        Внутри блока методы save_* и delete_* не фиксируют изменения,
+        фиксация выполняется один раз при выходе из внешнего блока.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.rollback()
+                raise
+            else:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.commit()
+    
+    def _execute_write(self, statements: List[Tuple[str, tuple]]) -> bool:
+        """Выполняет набор изменяющих запросов как одну операцию."""
+        with self._lock:
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                if self._batch_depth == 0:
+                    self._conn.commit()
+                return True
+            except Exception as e:
+                if self._batch_depth == 0:
+                    self._conn.rollback()
+                logger.error(f"Ошибка записи в SQLite: {str(e)}")
+                return False
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """Выполняет запрос и декодирует поле data найденных строк."""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self.codec.decode(row["data"]) for row in rows]
+    
+    def _delete(self, sql: str, params: tuple, extra: Optional[List[Tuple[str, tuple]]] = None) -> bool:
+        """Удаляет запись и возвращает True, если она существовала."""
+        with self._lock:
+            try:
+                cursor = self._conn.execute(sql, params)
+                for extra_sql, extra_params in extra or []:
+                    self._conn.execute(extra_sql, extra_params)
+                if self._batch_depth == 0:
+                    self._conn.commit()
+                return cursor.rowcount > 0
+            except Exception as e:
+                if self._batch_depth == 0:
+                    self._conn.rollback()
+                logger.error(f"Ошибка удаления из SQLite: {str(e)}")
+                return False
+    
+    @staticmethod
+    def _in_clause(column: str, values: List[str]) -> Tuple[str, tuple]:
+        """Формирует условие column IN (...) с параметрами."""
+        placeholders = ",".join("?" for _ in values)
+        return f"{column} IN ({placeholders})", tuple(values)
+    
+    def _dump(self, data: Dict[str, Any]) -> Any:
+        if self.codec.is_compressed:
+            return self.codec.encode(data)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    
+    @staticmethod
+    def _common_conditions(query: Optional[str], date_from: Optional[str],
+                           date_to: Optional[str]) -> Tuple[List[str], tuple]:
+        """Формирует условия по датам и тексту, общие для сообщений и комментариев."""
+        conditions = []
+        params: tuple = ()
+        
+        ts_from = to_epoch_ms(date_from) if date_from else None
+        ts_to = to_epoch_ms(date_to) if date_to else None
+        if ts_from is not None:
+            conditions.append("date_ts >= ?")
+            params += (ts_from,)
+        if ts_to is not None:
+            conditions.append("date_ts <= ?")
+            params += (ts_to,)
+        if query:
+            conditions.append("instr(py_lower(text), ?) > 0")
+            params += (query.lower(),)
+        
+        return conditions, params
+    
+    def _keyset_page(self, table: str, id_column: str, conditions: List[str], params: tuple,
+                     limit: int, after: Optional[RecordKey], reverse: bool) -> List[Dict[str, Any]]:
+        """Выбирает страницу диапазоном индекса (date_ts, id) начиная с курсора."""
+        if after:
+            conditions = conditions + [f"(date_ts, {id_column}) {'<' if reverse else '>'} (?, ?)"]
+            params = params + (after[0], after[1])
+        
+        order = "DESC" if reverse else "ASC"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(
+            f"SELECT data FROM {table} {where} ORDER BY date_ts {order}, {id_column} {order} LIMIT ?",
+            params + (limit,)
+        )
+    
+    # Методы для работы с каналами
+    
+    def save_channel(self, channel_data: Dict[str, Any]) -> bool:
+        return self._execute_write([(
+            "INSERT OR REPLACE INTO channels (channel_id, is_monitored, data) VALUES (?, ?, ?)",
+            (channel_data["channel_id"], int(bool(channel_data.get("is_monitored", False))),
+             self._dump(channel_data))
+        )])
+    
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM channels WHERE channel_id = ?", (channel_id,))
+        return rows[0] if rows else None
+    
+    def iter_channels(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._query("SELECT data FROM channels"))
+    
+    def delete_channel(self, channel_id: str) -> bool:
+        return self._delete("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+    
+    # Методы для работы с сообщениями
+    
+    def save_message(self, message_data: Dict[str, Any]) -> bool:
+        return self._execute_write([(
+            "INSERT OR REPLACE INTO messages (message_id, channel_id, date, date_ts, text, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (message_data["message_id"], message_data.get("channel_id"), message_data.get("date") or "",
+             date_key(message_data.get("date")), message_data.get("text") or "", self._dump(message_data))
+        )])
+    
+    def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM messages WHERE message_id = ?", (message_id,))
+        return rows[0] if rows else None
+    
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._query("SELECT data FROM messages"))
+    
+    def get_channel_messages(self, channel_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT data FROM messages WHERE channel_id = ? ORDER BY date_ts DESC, message_id DESC",
+            (channel_id,)
+        )
+    
+    def search_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        conditions, params = self._common_conditions(query, date_from, date_to)
+        
+        if channel_ids:
+            clause, values = self._in_clause("channel_id", channel_ids)
+            conditions.append(clause)
+            params += values
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"SELECT data FROM messages {where} ORDER BY date_ts DESC, message_id DESC", params)
+    
+    def page_messages(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      limit: int = 50, after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        conditions, params = self._common_conditions(query, date_from, date_to)
+        
+        if not channel_ids:
+            return self._keyset_page("messages", "message_id", conditions, params, limit, after, reverse=True)
+        
+        # По каждому каналу читается не больше страницы, затем страницы сливаются по ключу
+        pages = [
+            self._keyset_page("messages", "message_id", conditions + ["channel_id = ?"], params + (channel_id,),
+                              limit, after, reverse=True)
+            for channel_id in dict.fromkeys(channel_ids)
+        ]
+        return list(islice(heapq.merge(*pages, key=message_key, reverse=True), limit))
+    
+    def delete_message(self, message_id: str) -> bool:
+        return self._delete("DELETE FROM messages WHERE message_id = ?", (message_id,))
+    
+    def save_messages_bulk(self, messages: List[Dict[str, Any]]) -> int:
+        with self.batch():
+            return sum(1 for message_data in messages if self.save_message(message_data))
+    
+    # Методы для работы с комментариями
+    
+    def save_comment(self, comment_data: Dict[str, Any]) -> bool:
+        comment_id = comment_data["comment_id"]
+        metadata = comment_data.get("metadata") or {}
+        
+        statements = [
+            (
+                "INSERT OR REPLACE INTO comments "
+                "(comment_id, message_id, channel_id, date, date_ts, text, sentiment, is_bookmarked, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (comment_id, comment_data.get("message_id"), comment_data.get("channel_id"),
+                 comment_data.get("date") or "", date_key(comment_data.get("date")), comment_data.get("text") or "",
+                 metadata.get("sentiment"), int(bool(metadata.get("is_bookmarked", False))),
+                 self._dump(comment_data))
+            ),
+            ("DELETE FROM comment_tags WHERE comment_id = ?", (comment_id,)),
+        ]
+        for tag in set(metadata.get("user_tags") or []):
+            statements.append(("INSERT INTO comment_tags (tag, comment_id) VALUES (?, ?)", (tag, comment_id)))
+        
+        return self._execute_write(statements)
+    
+    def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM comments WHERE comment_id = ?", (comment_id,))
+        return rows[0] if rows else None
+    
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._query("SELECT data FROM comments"))
+    
+    def get_message_comments(self, message_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT data FROM comments WHERE message_id = ? ORDER BY date_ts, comment_id",
+            (message_id,)
+        )
+    
+    def _comment_conditions(self, query: Optional[str], channel_ids: Optional[List[str]],
+                            date_from: Optional[str], date_to: Optional[str], sentiment: Optional[str],
+                            user_tags: Optional[List[str]]) -> Tuple[List[str], tuple]:
+        conditions, params = self._common_conditions(query, date_from, date_to)
+        
+        if channel_ids:
+            clause, values = self._in_clause("channel_id", channel_ids)
+            conditions.append(clause)
+            params += values
+        if sentiment:
+            conditions.append("sentiment = ?")
+            params += (sentiment,)
+        if user_tags:
+            clause, values = self._in_clause("tag", user_tags)
+            conditions.append(f"comment_id IN (SELECT comment_id FROM comment_tags WHERE {clause})")
+            params += values
+        
+        return conditions, params
+    
+    def search_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                        message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                        user_tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        conditions, params = self._comment_conditions(query, channel_ids, date_from, date_to, sentiment, user_tags)
+        
+        if message_ids:
+            clause, values = self._in_clause("message_id", message_ids)
+            conditions.append(clause)
+            params += values
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"SELECT data FROM comments {where} ORDER BY date_ts, comment_id", params)
+    
+    def page_comments(self, query: Optional[str] = None, channel_ids: Optional[List[str]] = None,
+                      message_ids: Optional[List[str]] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, sentiment: Optional[str] = None,
+                      user_tags: Optional[List[str]] = None, limit: int = 100,
+                      after: Optional[RecordKey] = None) -> List[Dict[str, Any]]:
+        conditions, params = self._comment_conditions(query, channel_ids, date_from, date_to, sentiment, user_tags)
+        
+        if not message_ids:
+            return self._keyset_page("comments", "comment_id", conditions, params, limit, after, reverse=False)
+        
+        pages = [
+            self._keyset_page("comments", "comment_id", conditions + ["message_id = ?"], params + (message_id,),
+                              limit, after, reverse=False)
+            for message_id in dict.fromkeys(message_ids)
+        ]
+        return list(islice(heapq.merge(*pages, key=comment_key), limit))
+    
+    def delete_comment(self, comment_id: str) -> bool:
+        return self._delete(
+            "DELETE FROM comments WHERE comment_id = ?", (comment_id,),
+            extra=[("DELETE FROM comment_tags WHERE comment_id = ?", (comment_id,))]
+        )
+    
+    def save_comments_bulk(self, comments: List[Dict[str, Any]]) -> int:
+        with self.batch():
+            return sum(1 for comment_data in comments if self.save_comment(comment_data))
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
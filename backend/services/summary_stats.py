@@ -0,0 +1,405 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    kind TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    channel_id TEXT,
+    message_id TEXT,
+    date TEXT,
+    views INTEGER NOT NULL DEFAULT 0,
+    forwards INTEGER NOT NULL DEFAULT 0,
+    reactions INTEGER NOT NULL DEFAULT 0,
+    text_length INTEGER NOT NULL DEFAULT 0,
+    sentiment TEXT,
+    user_id TEXT,
+    PRIMARY KEY (kind, record_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_records_channel_date ON records (kind, channel_id, date);
+CREATE INDEX IF NOT EXISTS idx_records_message_date ON records (kind, message_id, date);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0,
+    views_sum INTEGER NOT NULL DEFAULT 0,
+    forwards_sum INTEGER NOT NULL DEFAULT 0,
+    reactions_total INTEGER NOT NULL DEFAULT 0,
+    comments_with_reactions INTEGER NOT NULL DEFAULT 0,
+    text_length_sum INTEGER NOT NULL DEFAULT 0,
+    message_date_min TEXT,
+    message_date_max TEXT,
+    comment_date_min TEXT,
+    comment_date_max TEXT,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS histograms (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (scope, key, dimension, bucket)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_histograms_count ON histograms (scope, key, dimension, count);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Счетчики сводной строки, которые складываются при объединении строк
+COUNTERS = (
+    "messages", "comments", "views_sum", "forwards_sum",
+    "reactions_total", "comments_with_reactions", "text_length_sum",
+)
+# Границы дат: (колонка сводки, вид записи, функция агрегации)
+DATE_BOUNDS = (
+    ("message_date_min", "message", "MIN"),
+    ("message_date_max", "message", "MAX"),
+    ("comment_date_min", "comment", "MIN"),
+    ("comment_date_max", "comment", "MAX"),
+)
+TOP_AUTHORS = 5
+
+def reactions_total(record: Dict[str, Any]) -> int:
+    """Возвращает суммарное количество реакций записи."""
+    return sum(
+        reaction.get("count", 0) for reaction in record.get("reactions") or []
+        if isinstance(reaction, dict)
+    )
+
+def _hour(date: Optional[str]) -> Optional[str]:
+    try:
+        return f"{datetime.fromisoformat(date).hour:02d}"
+    except (TypeError, ValueError):
+        return None
+
+class SummaryStats:
+    """Материализованная сводная статистика по каналам и сообщениям.
+    
+    Сводные строки (количество сообщений и комментариев, суммы просмотров,
+    пересылок и реакций, границы дат, распределения по тональности, часам
+    и авторам) хранятся в отдельной базе SQLite и обновляются инкрементально
+    при каждом сохранении и удалении записи, поэтому чтение статистики
+    не требует обхода записей.
+    
+    Вклад каждой записи сохраняется в таблице records: при обновлении
+    или удалении старый вклад вычитается точно, а границы дат пересчитываются
+    по индексу только если удалялась граничная запись.
+    """
+    
+    def __init__(self, stats_path: str):
+        """Инициализация статистики.
+        
+        Args:
+            stats_path: Путь к файлу базы статистики
+        """
+        self.stats_path = stats_path
+        os.makedirs(os.path.dirname(os.path.abspath(stats_path)), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._built = False
+        self._conn = sqlite3.connect(stats_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+    
+    # Служебные методы
+    
+    def is_built(self) -> bool:
+        """Проверяет, была ли статистика построена по существующим данным."""
+        if self._built:
+            return True
+        
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        self._built = bool(row)
+        return self._built
+    
+    def rebuild(self, messages: Iterable[Dict[str, Any]], comments: Iterable[Dict[str, Any]]) -> int:
+        """Полностью перестраивает статистику по всем записям.
+        
+        Args:
+            messages: Все сообщения
+            comments: Все комментарии
+        
+        Returns:
+            int: Количество учтенных записей
+        """
+        count = 0
+        with self._lock:
+            try:
+                for table in ("records", "summaries", "histograms"):
+                    self._conn.execute(f"DELETE FROM {table}")
+                for kind, records in (("message", messages), ("comment", comments)):
+                    for record in records:
+                        if self._add(kind, record):
+                            count += 1
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+                self._conn.commit()
+                self._built = True
+            except Exception:
+                self._conn.rollback()
+                raise
+        
+        logger.info(f"Сводная статистика перестроена: {count} записей")
+        return count
+    
+    @staticmethod
+    def _contribution(kind: str, record: Dict[str, Any]) -> Optional[Tuple]:
+        """Вычисляет вклад записи в сводные строки."""
+        record_id = record.get("message_id" if kind == "message" else "comment_id")
+        if not record_id:
+            return None
+        
+        if kind == "message":
+            return (kind, record_id, record.get("channel_id"), record_id, record.get("date") or None,
+                    record.get("views") or 0, record.get("forwards") or 0, reactions_total(record),
+                    0, None, None)
+        
+        metadata = record.get("metadata") or {}
+        return (kind, record_id, record.get("channel_id"), record.get("message_id"), record.get("date") or None,
+                0, 0, reactions_total(record), len(record.get("text") or ""),
+                metadata.get("sentiment") or "neutral", record.get("user_id"))
+    
+    def _scopes(self, channel_id: Optional[str], message_id: Optional[str]) -> List[Tuple[str, str]]:
+        scopes = []
+        if channel_id:
+            scopes.append(("channel", channel_id))
+        if message_id:
+            scopes.append(("message", message_id))
+        return scopes
+    
+    def _apply(self, row: Tuple, sign: int) -> None:
+        """Прибавляет (sign=1) или вычитает (sign=-1) вклад записи."""
+        kind, _, channel_id, message_id, date, views, forwards, reactions, text_length, sentiment, user_id = row
+        is_message = kind == "message"
+        
+        deltas = {
+            "messages": sign if is_message else 0,
+            "comments": 0 if is_message else sign,
+            "views_sum": sign * views,
+            "forwards_sum": sign * forwards,
+            "reactions_total": sign * reactions,
+            "comments_with_reactions": sign if not is_message and reactions else 0,
+            "text_length_sum": sign * text_length,
+        }
+        # Новая запись может только расширить границы дат
+        bounds = {column: date if sign > 0 and bound_kind == kind else None
+                  for column, bound_kind, _ in DATE_BOUNDS}
+        
+        buckets = []
+        if not is_message:
+            buckets = [("sentiment", sentiment), ("hour", _hour(date)), ("author", user_id)]
+        
+        for scope, key in self._scopes(channel_id, message_id):
+            self._conn.execute(
+                f"INSERT INTO summaries (scope, key, {', '.join(COUNTERS)}, {', '.join(c for c, _, _ in DATE_BOUNDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * (len(COUNTERS) + len(DATE_BOUNDS)))}) "
+                f"ON CONFLICT(scope, key) DO UPDATE SET "
+                + ", ".join(f"{c} = {c} + excluded.{c}" for c in COUNTERS) + ", "
+                + ", ".join(
+                    f"{c} = CASE WHEN excluded.{c} IS NULL THEN {c} "
+                    f"WHEN {c} IS NULL OR excluded.{c} {'<' if agg == 'MIN' else '>'} {c} THEN excluded.{c} "
+                    f"ELSE {c} END"
+                    for c, _, agg in DATE_BOUNDS
+                ),
+                (scope, key, *(deltas[c] for c in COUNTERS), *(bounds[c] for c, _, _ in DATE_BOUNDS))
+            )
+            
+            for dimension, bucket in buckets:
+                if bucket is None:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO histograms (scope, key, dimension, bucket, count) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(scope, key, dimension, bucket) DO UPDATE SET count = count + excluded.count",
+                    (scope, key, dimension, bucket, sign)
+                )
+            
+            if sign < 0:
+                self._after_remove(scope, key, kind, date)
+    
+    def _after_remove(self, scope: str, key: str, kind: str, date: Optional[str]) -> None:
+        """Удаляет опустевшие строки и пересчитывает границы дат после вычитания."""
+        self._conn.execute(
+            "DELETE FROM histograms WHERE scope = ? AND key = ? AND count <= 0", (scope, key)
+        )
+        row = self._conn.execute(
+            "SELECT messages, comments, message_date_min, message_date_max, comment_date_min, comment_date_max "
+            "FROM summaries WHERE scope = ? AND key = ?", (scope, key)
+        ).fetchone()
+        if not row:
+            return
+        if row[0] <= 0 and row[1] <= 0:
+            self._conn.execute("DELETE FROM summaries WHERE scope = ? AND key = ?", (scope, key))
+            self._conn.execute("DELETE FROM histograms WHERE scope = ? AND key = ?", (scope, key))
+            return
+        
+        current = dict(zip([c for c, _, _ in DATE_BOUNDS], row[2:]))
+        key_column = "channel_id" if scope == "channel" else "message_id"
+        for column, bound_kind, agg in DATE_BOUNDS:
+            if bound_kind != kind or date is None or current[column] != date:
+                continue
+            # Удалена граничная запись: берем новую границу по индексу
+            value = self._conn.execute(
+                f"SELECT {agg}(date) FROM records WHERE kind = ? AND {key_column} = ?", (kind, key)
+            ).fetchone()[0]
+            self._conn.execute(
+                f"UPDATE summaries SET {column} = ? WHERE scope = ? AND key = ?", (value, scope, key)
+            )
+    
+    def _remove(self, kind: str, record_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT kind, record_id, channel_id, message_id, date, views, forwards, reactions, "
+            "text_length, sentiment, user_id FROM records WHERE kind = ? AND record_id = ?", (kind, record_id)
+        ).fetchone()
+        if not row:
+            return False
+        
+        self._conn.execute("DELETE FROM records WHERE kind = ? AND record_id = ?", (kind, record_id))
+        self._apply(row, -1)
+        return True
+    
+    def _add(self, kind: str, record: Dict[str, Any]) -> bool:
+        row = self._contribution(kind, record)
+        if row is None:
+            return False
+        
+        self._remove(kind, row[1])
+        self._conn.execute(
+            "INSERT INTO records (kind, record_id, channel_id, message_id, date, views, forwards, reactions, "
+            "text_length, sentiment, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+        )
+        self._apply(row, 1)
+        return True
+    
+    # Обновление статистики
+    
+    def update(self, kind: str, records: Iterable[Dict[str, Any]]) -> int:
+        """Учитывает новые или измененные записи одной транзакцией.
+        
+        Args:
+            kind: Вид записей (message, comment)
+            records: Данные записей
+        
+        Returns:
+            int: Количество учтенных записей
+        """
+        count = 0
+        with self._lock:
+            try:
+                for record in records:
+                    if self._add(kind, record):
+                        count += 1
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка обновления сводной статистики {kind}: {str(e)}")
+                return 0
+        return count
+    
+    def remove(self, kind: str, record_id: str) -> bool:
+        """Вычитает вклад удаленной записи.
+        
+        Args:
+            kind: Вид записи (message, comment)
+            record_id: ID записи
+        
+        Returns:
+            bool: True, если запись была учтена
+        """
+        with self._lock:
+            try:
+                removed = self._remove(kind, record_id)
+                self._conn.commit()
+                return removed
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Ошибка удаления записи {kind}/{record_id} из статистики: {str(e)}")
+                return False
+    
+    # Чтение
+    
+    def get(self, scope: str, keys: List[str]) -> Dict[str, Any]:
+        """Возвращает сводку по одной или нескольким строкам.
+        
+        Для нескольких ключей счетчики и распределения складываются,
+        границы дат объединяются, а авторы считаются без повторов.
+        
+        Args:
+            scope: Область: channel или message
+            keys: ID каналов или сообщений
+        
+        Returns:
+            Dict[str, Any]: Сводная статистика
+        """
+        keys = list(dict.fromkeys(keys))
+        placeholders = ", ".join("?" * len(keys))
+        
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(f'COALESCE(SUM({c}), 0)' for c in COUNTERS)}, "
+                f"MIN(message_date_min), MAX(message_date_max), MIN(comment_date_min), MAX(comment_date_max) "
+                f"FROM summaries WHERE scope = ? AND key IN ({placeholders})", (scope, *keys)
+            ).fetchone()
+            histogram_rows = self._conn.execute(
+                f"SELECT dimension, bucket, SUM(count) FROM histograms "
+                f"WHERE scope = ? AND key IN ({placeholders}) AND dimension != 'author' "
+                f"GROUP BY dimension, bucket", (scope, *keys)
+            ).fetchall()
+            unique_authors = self._conn.execute(
+                f"SELECT COUNT(DISTINCT bucket) FROM histograms "
+                f"WHERE scope = ? AND key IN ({placeholders}) AND dimension = 'author'", (scope, *keys)
+            ).fetchone()[0]
+            if len(keys) == 1:
+                # Для одной строки топ авторов берется по индексу без группировки
+                top_authors = self._conn.execute(
+                    "SELECT bucket, count FROM histograms WHERE scope = ? AND key = ? AND dimension = 'author' "
+                    "ORDER BY count DESC LIMIT ?", (scope, keys[0], TOP_AUTHORS)
+                ).fetchall()
+            else:
+                top_authors = self._conn.execute(
+                    f"SELECT bucket, SUM(count) AS total FROM histograms "
+                    f"WHERE scope = ? AND key IN ({placeholders}) AND dimension = 'author' "
+                    f"GROUP BY bucket ORDER BY total DESC LIMIT ?", (scope, *keys, TOP_AUTHORS)
+                ).fetchall()
+        
+        summary = dict(zip(COUNTERS, row[:len(COUNTERS)]))
+        summary.update(zip([c for c, _, _ in DATE_BOUNDS], row[len(COUNTERS):]))
+        
+        sentiment = {"positive": 0, "negative": 0, "neutral": 0}
+        hours = [0] * 24
+        for dimension, bucket, count in histogram_rows:
+            if dimension == "sentiment":
+                sentiment[bucket] = count
+            elif dimension == "hour":
+                hours[int(bucket)] = count
+        
+        summary.update({
+            "avg_views": summary["views_sum"] / summary["messages"] if summary["messages"] else 0.0,
+            "avg_comment_length": summary["text_length_sum"] / summary["comments"] if summary["comments"] else 0.0,
+            "sentiment": sentiment,
+            "comments_by_hour": hours,
+            "unique_authors": unique_authors,
+            "top_authors": [{"user_id": user_id, "count": count} for user_id, count in top_authors],
+        })
+        return summary
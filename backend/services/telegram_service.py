@@ -1,21 +1,58 @@
 import os
 import logging
 import asyncio
+import heapq
 import json
+import time
 import uuid
-from typing import Dict, List, Optional, Any, Callable, Tuple
-from datetime import datetime, timedelta
-from telethon import TelegramClient, events
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Iterable, Tuple
+from datetime import datetime, timedelta, timezone
+from telethon import TelegramClient, events, utils
 from telethon.errors import SessionPasswordNeededError, FloodWaitError, PhoneNumberInvalidError
-from telethon.tl.types import Channel, Message, User, PeerChannel, Dialog
+from telethon.tl.types import Channel, Message, User, PeerChannel, PeerUser, Dialog, InputChannel, InputPeerChannel, InputPeerUser, UpdateChannel
 from telethon.tl.functions.channels import GetFullChannelRequest, GetChannelsRequest
 from telethon.tl.functions.messages import GetDiscussionMessageRequest, GetRepliesRequest
-from telethon.tl.functions.users import GetFullUserRequest
+from telethon.tl.functions.users import GetFullUserRequest, GetUsersRequest
+from telethon.tl.functions.contacts import SearchRequest
 
 from config import settings
+from services.cache import TTLCache
+from services.dialog_index import DialogIndex, normalize
+from services.entity_cache import EntityCache
+from services.rpc_scheduler import ScheduledTelegramClient, background_lane
+from services.dates import epoch_ms_to_datetime
+from services.pagination import decode_cursor, is_after, select_page, message_key, comment_key
+from services.search_index import matches_query
+from services.records import MessageRecord, CommentRecord, to_dicts, message_record_id, comment_record_id, telegram_id
 
 logger = logging.getLogger(__name__)
 
+# Порция истории, для которой количество комментариев запрашивается сразу
+HISTORY_CHUNK_SIZE = 100
+
+def _author_id(peer: Any) -> Optional[int]:
+    """Возвращает ID автора (пользователя или канала) из from_id сообщения."""
+    return getattr(peer, "user_id", None) or getattr(peer, "channel_id", None) or getattr(peer, "chat_id", None)
+
+class _Newest:
+    """Элемент кучи слияния, у которого вершиной становится запись с наибольшим ключом."""
+    
+    __slots__ = ("key", "channel_id", "record")
+    
+    def __init__(self, key: Tuple[str, str], channel_id: str, record: MessageRecord):
+        self.key = key
+        self.channel_id = channel_id
+        self.record = record
+    
+    def __lt__(self, other: "_Newest") -> bool:
+        return self.key > other.key
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Приводит дату без часового пояса к UTC для сравнения с датами Telegram."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 class TelegramService:
     """Сервис для работы с Telegram API через Telethon."""
     
@@ -26,9 +63,38 @@ class TelegramService:
         self.websocket_connections: Dict[str, Any] = {}
         self.channel_watchers: Dict[str, Dict[str, Any]] = {}
         
+        # Кеш результатов запросов только на чтение; ключи начинаются с вида данных и ключа сессии
+        self.cache = TTLCache()
+        
+        # Общий для всех сессий кеш авторов: ID автора (u12345) → имя и юзернейм
+        self.users = TTLCache(ttl=settings.USER_CACHE_TTL)
+        
+        # Индексы каналов из диалогов по сессиям и обработчики их обновлений
+        self.dialog_indexes: Dict[str, DialogIndex] = {}
+        self._dialog_handlers: Dict[str, Callable] = {}
+        self._dialog_locks: Dict[str, asyncio.Lock] = {}
+        # Время (time.monotonic) последней загрузки диалогов по сессиям
+        self._dialogs_loaded_at: Dict[str, float] = {}
+        
+        # Общий кеш количества подписчиков каналов и задачи его заполнения
+        self.subscribers = TTLCache(ttl=settings.SUBSCRIBERS_CACHE_TTL)
+        # ID групп обсуждения каналов из полной информации о канале (0 — комментарии отключены)
+        self.discussions = TTLCache(ttl=settings.SUBSCRIBERS_CACHE_TTL)
+        self._subscribers_pending: set = set()
+        self._background_tasks: set = set()
+        
+        # Источники количества комментариев: сведения об ответах в сообщении или отдельный запрос
+        self.replies_stats = {
+            "from_metadata": 0, "fallback_requests": 0, "last_comment_requests": 0,
+            "full_channel_requests": 0, "without_discussion": 0,
+        }
+        
         # Создаем директорию для сессий, если она не существует
         os.makedirs(settings.SESSION_DIR, exist_ok=True)
         
+        # Входные сущности каналов (ID и access_hash) по сессиям, сохраняются между перезапусками
+        self.entities = EntityCache(os.path.join(settings.SESSION_DIR, "entities.sqlite3"))
+        
         logger.info("Инициализирован сервис Telegram")
     
     async def create_client(self, phone: str) -> Tuple[str, TelegramClient]:
@@ -47,8 +113,8 @@ class TelegramService:
         session_key = str(uuid.uuid4())
         session_path = os.path.join(settings.SESSION_DIR, f"{session_key}.session")
         
-        # Инициализируем клиент
-        client = TelegramClient(
+        # Инициализируем клиент; все его запросы проходят через планировщик
+        client = ScheduledTelegramClient(
             session_path,
             api_id=int(settings.TELEGRAM_API_ID),
             api_hash=settings.TELEGRAM_API_HASH
@@ -102,6 +168,7 @@ class TelegramService:
             # Пытаемся войти с кодом
             await client.sign_in(self.active_sessions[session_key]["phone"], code)
             self.active_sessions[session_key]["is_authorized"] = True
+            await self._load_dialogs(session_key, client)
             return True
             
         except SessionPasswordNeededError:
@@ -109,6 +176,7 @@ class TelegramService:
             if password:
                 await client.sign_in(password=password)
                 self.active_sessions[session_key]["is_authorized"] = True
+                await self._load_dialogs(session_key, client)
                 return True
             else:
                 # Если пароль требуется, но не предоставлен
@@ -150,6 +218,14 @@ class TelegramService:
             if session_key in self.channel_watchers:
                 del self.channel_watchers[session_key]
             
+            # Удаляем закешированные данные сессии
+            self.cache.invalidate_where(lambda key: key[1] == session_key)
+            self.entities.forget(session_key)
+            self.dialog_indexes.pop(session_key, None)
+            self._dialog_handlers.pop(session_key, None)
+            self._dialog_locks.pop(session_key, None)
+            self._dialogs_loaded_at.pop(session_key, None)
+            
             return True
             
         except Exception as e:
@@ -172,6 +248,8 @@ class TelegramService:
                 
             except Exception as e:
                 logger.error(f"Ошибка при закрытии клиента {session_key}: {str(e)}")
+        
+        self.entities.close()
     
     def get_client(self, session_key: str) -> Optional[TelegramClient]:
         """Получает клиент по ключу сессии.
@@ -197,9 +275,340 @@ class TelegramService:
             return False
         return self.active_sessions[session_key].get("is_authorized", False)
     
+    def get_rpc_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики планировщиков запросов активных клиентов по ключам сессий."""
+        return {
+            session_key: client.scheduler.get_stats()
+            for session_key, client in self.active_clients.items()
+            if isinstance(client, ScheduledTelegramClient)
+        }
+    
+    # Сущности каналов
+    
+    @staticmethod
+    def _channel_data(entity: Channel) -> Dict[str, Any]:
+        """Формирует данные канала для индекса и ответов API."""
+        return {
+            "channel_id": str(entity.id),
+            "title": entity.title,
+            "username": getattr(entity, "username", None),
+            "description": getattr(entity, "about", None),
+            "subscribers_count": None,
+            "category": "news",  # По умолчанию все каналы в категории "news"
+            "is_monitored": False
+        }
+    
+    async def _load_dialogs(self, session_key: str, client: TelegramClient) -> int:
+        """Загружает диалоги пользователя в кеш сущностей и индекс каналов.
+        
+        Один запрос диалогов возвращает до 100 каналов вместе с access_hash,
+        поэтому после входа каналы пользователя не требуют отдельного разрешения,
+        а поиск каналов идет по индексу без обращения к Telegram. Дальше индекс
+        обновляется по событиям UpdateChannel.
+        
+        Args:
+            session_key: Ключ сессии
+            client: Клиент Telegram
+            
+        Returns:
+            int: Количество новых каналов в кеше сущностей
+        """
+        # Неудачная загрузка тоже считается: повтор не раньше чем через settings.DIALOG_INDEX_TTL
+        self._dialogs_loaded_at[session_key] = time.monotonic()
+        try:
+            dialogs = await client.get_dialogs(limit=settings.ENTITY_WARM_DIALOGS or None)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке диалогов: {str(e)}")
+            return 0
+        
+        channels = [dialog.entity for dialog in dialogs if isinstance(dialog.entity, Channel)]
+        index = self.dialog_indexes.setdefault(session_key, DialogIndex())
+        index.build(self._channel_data(channel) for channel in channels)
+        self._remember_subscribers(channels)
+        
+        if session_key not in self._dialog_handlers:
+            async def channel_update_handler(update):
+                await self._on_channel_update(session_key, update)
+            
+            client.add_event_handler(channel_update_handler, events.Raw(types=[UpdateChannel]))
+            self._dialog_handlers[session_key] = channel_update_handler
+        
+        return self.entities.put(session_key, channels)
+    
+    async def _on_channel_update(self, session_key: str, update: UpdateChannel) -> None:
+        """Обновляет индекс каналов при вступлении в канал, выходе из него или его изменении."""
+        index = self.dialog_indexes.get(session_key)
+        if index is None:
+            return
+        
+        channel_id = str(update.channel_id)
+        self.cache.invalidate(("unresolved_channel", session_key, update.channel_id))
+        try:
+            channels = await self.refresh_channels(session_key, [channel_id])
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении канала {channel_id} в индексе: {str(e)}")
+            return
+        
+        channel = channels.get(channel_id)
+        if channel is None or channel.left:
+            index.remove(channel_id)
+        else:
+            index.upsert(self._channel_data(channel))
+    
+    async def _dialog_index(self, session_key: str, client: TelegramClient) -> DialogIndex:
+        """Возвращает индекс каналов сессии, строя его при отсутствии или устаревании."""
+        lock = self._dialog_locks.setdefault(session_key, asyncio.Lock())
+        async with lock:
+            index = self.dialog_indexes.get(session_key)
+            if index is None or index.age() is None or index.age() > settings.DIALOG_INDEX_TTL:
+                await self._load_dialogs(session_key, client)
+            return self.dialog_indexes.setdefault(session_key, DialogIndex())
+    
+    async def _warm_dialogs(self, session_key: str, client: TelegramClient) -> bool:
+        """Загружает диалоги, если они не загружались в течение settings.DIALOG_INDEX_TTL.
+        
+        Returns:
+            bool: True, если диалоги загружены сейчас
+        """
+        lock = self._dialog_locks.setdefault(session_key, asyncio.Lock())
+        async with lock:
+            loaded_at = self._dialogs_loaded_at.get(session_key)
+            if loaded_at is not None and time.monotonic() - loaded_at < settings.DIALOG_INDEX_TTL:
+                return False
+            await self._load_dialogs(session_key, client)
+            return True
+    
+    async def _resolve_channels(
+        self,
+        session_key: str,
+        client: TelegramClient,
+        channel_ids: List[str]
+    ) -> Dict[str, InputPeerChannel]:
+        """Возвращает входные сущности каналов, обращаясь к Telegram только при промахе кеша.
+        
+        Порядок поиска: кеш сущностей, кеш сессии Telethon (без запросов),
+        один запрос диалогов для всех оставшихся каналов и, в последнюю
+        очередь, один запрос GetChannelsRequest для всех каналов, которых нет
+        в диалогах. Диалоги загружаются не чаще раза в settings.DIALOG_INDEX_TTL
+        на сессию (дальше кеш сущностей обновляется по событиям UpdateChannel),
+        поэтому после первой загрузки недостающие каналы запрашиваются по ID.
+        Каналы, которые не удалось найти, не запрашиваются повторно в течение
+        settings.CACHE_TTL.
+        
+        Args:
+            session_key: Ключ сессии
+            client: Клиент Telegram
+            channel_ids: ID каналов
+            
+        Returns:
+            Dict[str, InputPeerChannel]: Сущности найденных каналов по ID (каналы, которые
+                не удалось найти, отсутствуют)
+        """
+        ids = {}
+        for channel_id in channel_ids:
+            try:
+                ids[int(channel_id)] = channel_id
+            except ValueError:
+                logger.error(f"Некорректный ID канала: {channel_id}")
+        found = self.entities.get(session_key, ids)
+        
+        missing = [channel_id for channel_id in ids if channel_id not in found]
+        if missing:
+            from_session = []
+            for channel_id in missing:
+                try:
+                    peer = client.session.get_input_entity(PeerChannel(channel_id))
+                except Exception:
+                    continue
+                if isinstance(peer, InputPeerChannel):
+                    from_session.append(peer)
+            self.entities.put(session_key, from_session)
+            found.update((peer.channel_id, peer) for peer in from_session)
+            missing = [channel_id for channel_id in missing if channel_id not in found]
+        
+        missing = [
+            channel_id for channel_id in missing
+            if self.cache.get(("unresolved_channel", session_key, channel_id)) is None
+        ]
+        if missing and await self._warm_dialogs(session_key, client):
+            found.update(self.entities.get(session_key, missing))
+            missing = [channel_id for channel_id in missing if channel_id not in found]
+        
+        if missing:
+            self.entities.put(session_key, await self._request_channels(client, missing))
+            found.update(self.entities.get(session_key, missing))
+        
+        for channel_id in missing:
+            if channel_id not in found:
+                logger.error(f"Не удалось найти канал {channel_id}")
+                self.cache.set(("unresolved_channel", session_key, channel_id), True)
+        
+        return {ids[channel_id]: peer for channel_id, peer in found.items()}
+    
+    async def _request_channels(self, client: TelegramClient, channel_ids: List[int]) -> List[Any]:
+        """Запрашивает каналы, которых нет в кешах и диалогах, по ID.
+        
+        Все каналы запрашиваются одним GetChannelsRequest без access_hash.
+        Если Telegram отклоняет запрос целиком (например, из-за одного
+        недоступного канала), каналы разрешаются по одному, не более
+        settings.RESOLVE_CONCURRENCY одновременно.
+        
+        Args:
+            client: Клиент Telegram
+            channel_ids: ID каналов
+        
+        Returns:
+            List[Any]: Найденные каналы (Channel или InputPeerChannel)
+        """
+        try:
+            result = await client(GetChannelsRequest([InputChannel(channel_id, 0) for channel_id in channel_ids]))
+            return [chat for chat in result.chats if isinstance(chat, Channel)]
+        except Exception as e:
+            logger.debug(f"Не удалось получить каналы {channel_ids} одним запросом: {str(e)}")
+            if len(channel_ids) == 1:
+                return []
+        
+        semaphore = asyncio.Semaphore(settings.RESOLVE_CONCURRENCY)
+        
+        async def resolve(channel_id: int) -> Optional[Any]:
+            async with semaphore:
+                try:
+                    return await client.get_input_entity(PeerChannel(channel_id))
+                except Exception as e:
+                    logger.debug(f"Не удалось получить канал {channel_id}: {str(e)}")
+                    return None
+        
+        peers = await asyncio.gather(*(resolve(channel_id) for channel_id in channel_ids))
+        return [peer for peer in peers if isinstance(peer, InputPeerChannel)]
+    
+    async def _resolve_channel(self, session_key: str, client: TelegramClient, channel_id: str) -> InputPeerChannel:
+        """Возвращает входную сущность одного канала.
+        
+        Raises:
+            ValueError: Если канал не найден
+        """
+        peers = await self._resolve_channels(session_key, client, [channel_id])
+        if channel_id not in peers:
+            raise ValueError(f"Канал {channel_id} не найден")
+        return peers[channel_id]
+    
+    async def refresh_channels(self, session_key: str, channel_ids: List[str]) -> Dict[str, Channel]:
+        """Загружает актуальные сущности каналов одним запросом GetChannelsRequest.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_ids: ID каналов
+            
+        Returns:
+            Dict[str, Channel]: Доступные каналы по ID
+        """
+        client = self.get_client(session_key)
+        if not client:
+            return {}
+        
+        peers = await self._resolve_channels(session_key, client, channel_ids)
+        if not peers:
+            return {}
+        
+        result = await client(GetChannelsRequest([
+            InputChannel(peer.channel_id, peer.access_hash) for peer in peers.values()
+        ]))
+        channels = {str(chat.id): chat for chat in result.chats if isinstance(chat, Channel)}
+        self.entities.put(session_key, channels.values())
+        
+        # Каналы, недоступные по сохраненному access_hash, при следующем обращении разрешаются заново
+        stale = [int(channel_id) for channel_id in peers if channel_id not in channels]
+        if stale:
+            self.entities.forget(session_key, stale)
+        return channels
+    
+    # Подписчики каналов
+    
+    def _remember_full_channel(self, channel_id: str, full_channel: Any) -> int:
+        """Запоминает количество подписчиков и группу обсуждения из полной информации о канале.
+        
+        Returns:
+            int: ID группы обсуждения (0, если комментарии отключены)
+        """
+        self.subscribers.set(channel_id, full_channel.full_chat.participants_count)
+        discussion_id = getattr(full_channel.full_chat, "linked_chat_id", None) or 0
+        self.discussions.set(channel_id, discussion_id)
+        return discussion_id
+    
+    def _remember_subscribers(self, channels: Iterable[Channel]) -> None:
+        """Запоминает количество подписчиков, если Telegram передал его вместе с каналом."""
+        for channel in channels:
+            if getattr(channel, "participants_count", None) is not None:
+                self.subscribers.set(str(channel.id), channel.participants_count)
+    
+    async def _fill_subscribers(self, session_key: str, client: TelegramClient, channel_ids: List[str]) -> None:
+        """Загружает количество подписчиков каналов в кеш.
+        
+        Запросы GetFullChannelRequest выполняются параллельно, не более
+        settings.SUBSCRIBERS_CONCURRENCY одновременно.
+        
+        Args:
+            session_key: Ключ сессии
+            client: Клиент Telegram
+            channel_ids: ID каналов
+        """
+        peers = await self._resolve_channels(session_key, client, channel_ids)
+        semaphore = asyncio.Semaphore(settings.SUBSCRIBERS_CONCURRENCY)
+        
+        async def fetch(channel_id: str, peer: InputPeerChannel) -> None:
+            async with semaphore:
+                try:
+                    full_channel = await client(GetFullChannelRequest(InputChannel(peer.channel_id, peer.access_hash)))
+                    self._remember_full_channel(channel_id, full_channel)
+                except Exception as e:
+                    logger.debug(f"Не удалось получить количество подписчиков канала {channel_id}: {str(e)}")
+                finally:
+                    self._subscribers_pending.discard(channel_id)
+        
+        await asyncio.gather(*(fetch(channel_id, peer) for channel_id, peer in peers.items()))
+        for channel_id in channel_ids:
+            self._subscribers_pending.discard(channel_id)
+    
+    def _schedule_subscribers(self, session_key: str, client: TelegramClient, channel_ids: List[str]) -> None:
+        """Запускает фоновую загрузку подписчиков каналов, которых нет в кеше."""
+        missing = [
+            channel_id for channel_id in channel_ids
+            if channel_id not in self.subscribers and channel_id not in self._subscribers_pending
+        ]
+        if not missing:
+            return
+        
+        self._subscribers_pending.update(missing)
+        with background_lane():
+            task = asyncio.create_task(self._fill_subscribers(session_key, client, missing))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _search_global(self, session_key: str, client: TelegramClient, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Ищет публичные каналы через глобальный поиск Telegram (contacts.Search)."""
+        cache_key = ("channel_search", session_key, normalize(query).strip(), limit)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        found = await client(SearchRequest(q=query, limit=limit))
+        channels = [chat for chat in found.chats if isinstance(chat, Channel)]
+        self.entities.put(session_key, channels)
+        self._remember_subscribers(channels)
+        
+        results = [self._channel_data(channel) for channel in channels]
+        self.cache.set(cache_key, results)
+        return results
+    
     async def search_channels(self, session_key: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Поиск каналов по запросу.
         
+        Каналы ищутся по индексу диалогов пользователя (префиксы слов, подстрока,
+        нечеткое совпадение). Если в диалогах найдено меньше limit каналов,
+        результаты дополняются глобальным поиском Telegram. Количество
+        подписчиков берется из кеша; недостающие значения загружаются в фоне
+        и появляются в следующих ответах.
+        
         Args:
             session_key: Ключ сессии
             query: Поисковый запрос
@@ -212,39 +621,23 @@ class TelegramService:
         if not client:
             return []
         
-        results = []
-        
         try:
-            # Получаем все диалоги (медленно, но надежно)
-            dialogs = await client.get_dialogs(limit=100)
-            
-            # Фильтруем только каналы по запросу
-            for dialog in dialogs:
-                entity = dialog.entity
-                if isinstance(entity, Channel) and query.lower() in dialog.title.lower():
-                    # Получаем дополнительную информацию о канале
-                    try:
-                        full_channel = await client(GetFullChannelRequest(entity))
-                        participants_count = full_channel.full_chat.participants_count
-                    except Exception:
-                        participants_count = None
-                    
-                    # Формируем данные канала
-                    channel_data = {
-                        "channel_id": str(entity.id),
-                        "title": entity.title,
-                        "username": getattr(entity, "username", None),
-                        "description": getattr(entity, "about", None),
-                        "subscribers_count": participants_count,
-                        "category": "news",  # По умолчанию все каналы в категории "news"
-                        "is_monitored": False
-                    }
-                    
-                    results.append(channel_data)
-                    
-                    # Ограничиваем количество результатов
-                    if len(results) >= limit:
-                        break
+            index = await self._dialog_index(session_key, client)
+            results = [dict(channel) for channel in index.search(query, limit)]
+            
+            # Каналы вне диалогов пользователя ищем глобальным поиском
+            if len(results) < limit and len(query.strip()) >= settings.GLOBAL_SEARCH_MIN_LENGTH:
+                try:
+                    known = {channel["channel_id"] for channel in results}
+                    for channel in await self._search_global(session_key, client, query, limit):
+                        if channel["channel_id"] not in known and len(results) < limit:
+                            results.append(dict(channel))
+                except Exception as e:
+                    logger.error(f"Ошибка глобального поиска каналов: {str(e)}")
+            
+            for channel in results:
+                channel["subscribers_count"] = self.subscribers.get(channel["channel_id"])
+            self._schedule_subscribers(session_key, client, [channel["channel_id"] for channel in results])
             
             return results
             
@@ -266,13 +659,21 @@ class TelegramService:
         if not client:
             return None
         
+        cache_key = ("channel_info", session_key, channel_username)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Получаем сущность канала
             entity = await client.get_entity(channel_username)
             
             if isinstance(entity, Channel):
+                self.entities.put(session_key, [entity])
+                
                 # Получаем полную информацию о канале
                 full_channel = await client(GetFullChannelRequest(entity))
+                self._remember_full_channel(str(entity.id), full_channel)
                 
                 # Формируем данные канала
                 channel_data = {
@@ -285,6 +686,7 @@ class TelegramService:
                     "is_monitored": False
                 }
                 
+                self.cache.set(cache_key, channel_data)
                 return channel_data
             
             return None
@@ -293,13 +695,128 @@ class TelegramService:
             logger.error(f"Ошибка при получении информации о канале: {str(e)}")
             return None
     
+    async def _has_discussion(self, client: TelegramClient, channel: Any) -> bool:
+        """Проверяет, подключена ли к каналу группа обсуждения (включены ли комментарии).
+        
+        Группа берется из кеша полной информации о канале, при промахе
+        выполняется один GetFullChannelRequest. Если проверить не удалось,
+        считается, что группа подключена.
+        """
+        if not isinstance(channel, InputPeerChannel):
+            return True
+        
+        channel_id = str(channel.channel_id)
+        discussion_id = self.discussions.get(channel_id)
+        if discussion_id is None:
+            self.replies_stats["full_channel_requests"] += 1
+            try:
+                full_channel = await client(GetFullChannelRequest(InputChannel(channel.channel_id, channel.access_hash)))
+            except Exception as e:
+                logger.debug(f"Не удалось получить группу обсуждения канала {channel_id}: {str(e)}")
+                return True
+            discussion_id = self._remember_full_channel(channel_id, full_channel)
+        return bool(discussion_id)
+    
+    async def _fetch_comment_counts(
+        self,
+        client: TelegramClient,
+        channel: Any,
+        messages: List[Message],
+        known: Optional[Dict[int, Tuple[int, Optional[str]]]] = None
+    ) -> Dict[int, Tuple[int, Optional[str]]]:
+        """Определяет количество комментариев и дату последнего комментария сообщений.
+        
+        Количество берется из сведений об ответах (msg.replies), которые Telegram
+        возвращает вместе с сообщениями. Даты последних комментариев загружаются
+        одним запросом на каждую группу обсуждения по ID последних комментариев
+        (replies.max_id); для сообщений, количество комментариев которых совпадает
+        с известным (known), дата берется из known без запроса. Отдельный
+        GetRepliesRequest выполняется только для сообщений без сведений
+        об ответах в каналах с группой обсуждения, не более
+        settings.REPLIES_FALLBACK_CONCURRENCY запросов одновременно; у каналов
+        без группы обсуждения комментариев нет, и запросы не выполняются.
+        
+        Args:
+            client: Клиент Telegram
+            channel: Сущность канала
+            messages: Сообщения канала
+            known: Уже известные количество комментариев и дата последнего по ID сообщения
+            
+        Returns:
+            Dict[int, Tuple[int, Optional[str]]]: ID сообщения → (количество комментариев, дата последнего)
+        """
+        counts: Dict[int, Tuple[int, Optional[str]]] = {}
+        # ID группы обсуждения → {ID последнего комментария: ID сообщений канала}
+        last_comments: Dict[int, Dict[int, List[int]]] = {}
+        missing = []
+        
+        for msg in messages:
+            replies = getattr(msg, "replies", None)
+            if replies is None:
+                missing.append(msg)
+                continue
+            
+            counts[msg.id] = (replies.replies or 0, None)
+            previous = (known or {}).get(msg.id)
+            if previous is not None and previous[0] == counts[msg.id][0]:
+                counts[msg.id] = previous
+            elif replies.replies and replies.max_id and replies.channel_id:
+                last_comments.setdefault(replies.channel_id, {}).setdefault(replies.max_id, []).append(msg.id)
+        self.replies_stats["from_metadata"] += len(counts)
+        
+        for discussion_id, by_comment in last_comments.items():
+            try:
+                self.replies_stats["last_comment_requests"] += 1
+                comments = await client.get_messages(PeerChannel(discussion_id), ids=list(by_comment))
+                for comment in comments:
+                    if comment and comment.date:
+                        for msg_id in by_comment.get(comment.id, []):
+                            counts[msg_id] = (counts[msg_id][0], comment.date.isoformat())
+            except Exception as e:
+                # Количество комментариев уже известно, без даты последнего можно обойтись
+                logger.debug(f"Не удалось получить последние комментарии группы обсуждения: {str(e)}")
+        
+        if missing and not await self._has_discussion(client, channel):
+            # Комментарии в канале отключены
+            self.replies_stats["without_discussion"] += len(missing)
+            missing = []
+        
+        if missing:
+            semaphore = asyncio.Semaphore(settings.REPLIES_FALLBACK_CONCURRENCY)
+            
+            async def fetch_replies(msg: Message) -> None:
+                async with semaphore:
+                    self.replies_stats["fallback_requests"] += 1
+                    try:
+                        replies = await client(GetRepliesRequest(
+                            peer=channel,
+                            msg_id=msg.id,
+                            offset_id=0,
+                            offset_date=None,
+                            add_offset=0,
+                            limit=1,
+                            max_id=0,
+                            min_id=0,
+                            hash=0
+                        ))
+                    except Exception:
+                        # Игнорируем ошибки, если комментарии недоступны
+                        return
+                    
+                    last_date = replies.messages[0].date.isoformat() if replies.messages and replies.messages[0].date else None
+                    counts[msg.id] = (replies.count, last_date)
+            
+            await asyncio.gather(*(fetch_replies(msg) for msg in missing))
+        
+        return counts
+    
     async def get_channel_messages(
         self, 
         session_key: str, 
         channel_id: str, 
         limit: int = 50, 
         offset_id: int = 0
-    ) -> List[Dict[str, Any]]:
+    ) -> List[MessageRecord]:
         """Получает сообщения канала.
         
         Args:
@@ -309,18 +826,15 @@ class TelegramService:
             offset_id: ID сообщения, с которого начинать
             
         Returns:
-            List[Dict[str, Any]]: Список сообщений
+            List[MessageRecord]: Список сообщений
         """
         client = self.get_client(session_key)
         if not client:
             return []
         
         try:
-            # Преобразуем строковый ID в число
-            channel_id_int = int(channel_id)
-            
             # Получаем сущность канала
-            channel = await client.get_entity(channel_id_int)
+            channel = await self._resolve_channel(session_key, client, channel_id)
             
             # Получаем сообщения
             messages = await client.get_messages(
@@ -329,59 +843,314 @@ class TelegramService:
                 offset_id=offset_id
             )
             
-            results = []
-            for msg in messages:
-                if not msg:
+            return await self._message_records(client, channel, channel_id, [msg for msg in messages if msg])
+            
+        except Exception as e:
+            logger.error(f"Ошибка при получении сообщений канала: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _message_record(
+        channel_id: str,
+        msg: Message,
+        comment_counts: Optional[Dict[int, Tuple[int, Optional[str]]]] = None
+    ) -> MessageRecord:
+        """Формирует запись сообщения из сообщения Telegram."""
+        # Обрабатываем медиа
+        media_urls = []
+        if msg.media:
+            # В реальном приложении здесь будет логика сохранения и получения медиа
+            media_urls.append(f"media_placeholder_{msg.id}")
+        
+        comments_count, last_comment_date = (comment_counts or {}).get(msg.id, (0, None))
+        return MessageRecord(
+            message_record_id(channel_id, msg.id), channel_id, msg.date.isoformat(), msg.text or "", media_urls,
+            getattr(msg, "views", None), getattr(msg, "forwards", None),
+            comments_count, last_comment_date
+        )
+    
+    async def _message_records(
+        self,
+        client: TelegramClient,
+        channel: Any,
+        channel_id: str,
+        messages: List[Message],
+        known: Optional[Dict[int, Tuple[int, Optional[str]]]] = None
+    ) -> List[MessageRecord]:
+        """Формирует записи сообщений с количеством комментариев, полученным для всех сообщений сразу."""
+        comment_counts = await self._fetch_comment_counts(client, channel, messages, known) if messages else {}
+        return [self._message_record(channel_id, msg, comment_counts) for msg in messages]
+    
+    async def fetch_channel_updates(
+        self,
+        session_key: str,
+        channel_id: str,
+        min_id: int = 0,
+        edited_after: Optional[str] = None,
+        known: Optional[Dict[int, Tuple[int, Optional[str]]]] = None
+    ) -> Dict[str, Any]:
+        """Получает новые сообщения канала и обновляет недавние.
+        
+        Одним запросом загружаются settings.SYNC_REFRESH_WINDOW последних
+        сообщений: это и новые сообщения (ID больше min_id), и недавние,
+        у которых могли измениться текст, просмотры или комментарии. Если
+        новее min_id оказались все сообщения окна, остальные новые сообщения
+        догружаются с min_id, не более settings.SYNC_MAX_NEW.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_id: ID канала
+            min_id: ID последнего уже полученного сообщения (0 — канал не синхронизировался)
+            edited_after: Дата последнего известного редактирования
+            known: Известные количество комментариев и дата последнего по ID сообщения
+            
+        Returns:
+            Dict[str, Any]: messages — записи сообщений от новых к старым,
+                last_edit_date — дата последнего редактирования, edited — количество
+                сообщений, отредактированных после edited_after, complete — True,
+                если получены все сообщения новее min_id
+        
+        Raises:
+            ValueError: Если клиент не найден или канал недоступен
+        """
+        client = self.get_client(session_key)
+        if not client:
+            raise ValueError("Клиент Telegram не найден")
+        
+        channel = await self._resolve_channel(session_key, client, channel_id)
+        
+        messages = [msg for msg in await client.get_messages(channel, limit=settings.SYNC_REFRESH_WINDOW) if msg]
+        complete = len(messages) < settings.SYNC_REFRESH_WINDOW or (min_id and messages[-1].id <= min_id)
+        
+        if min_id and not complete:
+            # Новые сообщения не поместились в окно: догружаем только более новые, чем min_id
+            async for msg in client.iter_messages(channel, min_id=min_id, offset_id=messages[-1].id, wait_time=0):
+                if len(messages) >= settings.SYNC_MAX_NEW:
+                    break
+                messages.append(msg)
+            else:
+                complete = True
+        
+        last_edit_date = edited_after
+        edited = 0
+        for msg in messages:
+            edit_date = msg.edit_date.isoformat() if getattr(msg, "edit_date", None) else None
+            if edit_date and (edited_after is None or edit_date > edited_after):
+                edited += 1
+            if edit_date and (last_edit_date is None or edit_date > last_edit_date):
+                last_edit_date = edit_date
+        
+        return {
+            "messages": await self._message_records(client, channel, channel_id, messages, known),
+            "last_edit_date": last_edit_date,
+            "edited": edited,
+            "complete": bool(complete)
+        }
+    
+    async def fetch_history_chunk(
+        self,
+        session_key: str,
+        channel_id: str,
+        offset_id: int = 0
+    ) -> Dict[str, Any]:
+        """Получает очередную порцию истории канала для полной загрузки.
+        
+        Порция содержит HISTORY_CHUNK_SIZE сообщений (максимум Telegram)
+        старше offset_id вместе с количеством комментариев.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_id: ID канала
+            offset_id: ID сообщения, старше которого загружается порция (0 — с последнего)
+            
+        Returns:
+            Dict[str, Any]: messages — записи сообщений от новых к старым,
+                total — количество сообщений в канале по данным Telegram,
+                next_offset_id — offset_id следующей порции (0 — история загружена полностью)
+        
+        Raises:
+            ValueError: Если клиент не найден или канал недоступен
+        """
+        client = self.get_client(session_key)
+        if not client:
+            raise ValueError("Клиент Telegram не найден")
+        
+        channel = await self._resolve_channel(session_key, client, channel_id)
+        
+        chunk = await client.get_messages(channel, limit=HISTORY_CHUNK_SIZE, offset_id=offset_id)
+        messages = [msg for msg in chunk if msg]
+        
+        # Порция меньше максимальной или дошла до первого сообщения: история загружена
+        done = len(chunk) < HISTORY_CHUNK_SIZE or not messages or messages[-1].id <= 1
+        return {
+            "messages": await self._message_records(client, channel, channel_id, messages),
+            "total": getattr(chunk, "total", None),
+            "next_offset_id": 0 if done else messages[-1].id
+        }
+    
+    @staticmethod
+    async def iter_history(
+        client: TelegramClient,
+        channel: Any,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[Message]:
+        """Перебирает сообщения канала за период от новых к старым.
+        
+        Выборка начинается сразу с date_to (offset_date), история
+        запрашивается максимальными для Telegram порциями по 100 сообщений,
+        а перебор прекращается на первом сообщении раньше date_from. Поэтому
+        количество запросов зависит от числа сообщений в периоде, а не от
+        того, насколько давно он был.
+        
+        Args:
+            client: Клиент Telegram
+            channel: Сущность канала
+            date_from: Начальная дата (включительно)
+            date_to: Конечная дата (включительно)
+            search: Поисковый запрос
+            limit: Максимальное количество сообщений
+            
+        Returns:
+            AsyncIterator[Message]: Сообщения периода
+        """
+        date_from = _as_utc(date_from)
+        date_to = _as_utc(date_to)
+        
+        # offset_date в Telegram не включает саму дату, поэтому добавляем секунду
+        offset_date = date_to + timedelta(seconds=1) if date_to else None
+        
+        count = 0
+        async for msg in client.iter_messages(channel, search=search or None, offset_date=offset_date, wait_time=0):
+            if not msg:
+                continue
+            
+            # Дальше идут только более ранние сообщения
+            if date_from and msg.date < date_from:
+                break
+            if date_to and msg.date > date_to:
+                continue
+            
+            yield msg
+            count += 1
+            if limit and count >= limit:
+                break
+    
+    async def get_messages_in_range(
+        self,
+        session_key: str,
+        channel_ids: List[str],
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[MessageRecord]:
+        """Получает сообщения каналов за период.
+        
+        История каналов читается через iter_history в фоновой полосе
+        запросов; количество комментариев запрашивается для каждой порции
+        из HISTORY_CHUNK_SIZE сообщений.
+        
+        Args:
+            session_key: Ключ сессии
+            channel_ids: Список ID каналов
+            date_from: Начальная дата
+            date_to: Конечная дата
+            limit: Максимальное количество сообщений одного канала
+                (по умолчанию settings.EXPORT_MAX_MESSAGES)
+            
+        Returns:
+            List[MessageRecord]: Сообщения каналов от новых к старым
+        """
+        client = self.get_client(session_key)
+        if not client:
+            return []
+        
+        limit = limit or settings.EXPORT_MAX_MESSAGES
+        results = []
+        
+        with background_lane():
+            peers = await self._resolve_channels(session_key, client, channel_ids)
+            
+            for channel_id in channel_ids:
+                channel = peers.get(channel_id)
+                if channel is None:
                     continue
                 
-                # Обрабатываем медиа
-                media_urls = []
-                if msg.media:
-                    # В реальном приложении здесь будет логика сохранения и получения медиа
-                    media_urls.append(f"media_placeholder_{msg.id}")
-                
-                # Формируем данные сообщения
-                message_data = {
-                    "message_id": f"m{msg.id}",
-                    "channel_id": channel_id,
-                    "date": msg.date.isoformat(),
-                    "text": msg.text or "",
-                    "media": media_urls,
-                    "views": getattr(msg, "views", None),
-                    "forwards": getattr(msg, "forwards", None),
-                    "comments_count": 0,  # Будет заполнено отдельным запросом
-                    "last_comment_date": None
-                }
-                
-                # Пытаемся получить количество комментариев
                 try:
-                    replies = await client(GetRepliesRequest(
-                        peer=channel,
-                        msg_id=msg.id,
-                        offset_id=0,
-                        offset_date=None,
-                        add_offset=0,
-                        limit=1,
-                        max_id=0,
-                        min_id=0,
-                        hash=0
-                    ))
-                    
-                    message_data["comments_count"] = replies.count
-                    
-                    if replies.messages and replies.messages[0].date:
-                        message_data["last_comment_date"] = replies.messages[0].date.isoformat()
+                    chunk = []
+                    async for msg in self.iter_history(client, channel, date_from, date_to, limit=limit):
+                        chunk.append(msg)
+                        if len(chunk) >= HISTORY_CHUNK_SIZE:
+                            results.extend(await self._message_records(client, channel, channel_id, chunk))
+                            chunk = []
+                    results.extend(await self._message_records(client, channel, channel_id, chunk))
+                except Exception as e:
+                    logger.error(f"Ошибка при получении сообщений канала {channel_id} за период: {str(e)}")
+        
+        return results
+    
+    # Авторы комментариев
+    
+    def _remember_authors(self, entities: Iterable[Any]) -> None:
+        """Запоминает имена авторов из сущностей, полученных вместе с сообщениями."""
+        for entity in entities:
+            if isinstance(entity, (User, Channel)):
+                self.users.set(f"u{entity.id}", {
+                    "user_id": f"u{entity.id}",
+                    "name": utils.get_display_name(entity) or None,
+                    "username": getattr(entity, "username", None)
+                })
+    
+    async def get_author_names(self, session_key: str, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Возвращает имена авторов комментариев.
+        
+        Авторы, уже встречавшиеся в загруженных комментариях, берутся из кеша.
+        Остальные пользователи, известные сессии Telethon, загружаются одним
+        запросом GetUsersRequest; неизвестные авторы возвращаются без имени.
+        
+        Args:
+            session_key: Ключ сессии
+            user_ids: ID авторов в формате u12345
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Сведения об авторах по ID
+        """
+        authors = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            author = self.users.get(user_id)
+            if author is not None:
+                authors[user_id] = author
+            elif user_id[1:].isdigit():
+                missing.append(user_id)
+        
+        client = self.get_client(session_key)
+        if client and missing:
+            peers = []
+            for user_id in missing:
+                try:
+                    peer = client.session.get_input_entity(PeerUser(int(user_id[1:])))
                 except Exception:
-                    # Игнорируем ошибки, если комментарии недоступны
-                    pass
-                
-                results.append(message_data)
+                    continue
+                if isinstance(peer, InputPeerUser):
+                    peers.append(utils.get_input_user(peer))
             
-            return results
+            if peers:
+                try:
+                    self._remember_authors(await client(GetUsersRequest(peers)))
+                except Exception as e:
+                    logger.error(f"Ошибка при получении авторов комментариев: {str(e)}")
             
-        except Exception as e:
-            logger.error(f"Ошибка при получении сообщений канала: {str(e)}")
-            return []
+            for user_id in missing:
+                author = self.users.get(user_id)
+                if author is not None:
+                    authors[user_id] = author
+        
+        for user_id in user_ids:
+            authors.setdefault(user_id, {"user_id": user_id, "name": None, "username": None})
+        return authors
     
     async def get_message_comments(
         self, 
@@ -389,7 +1158,7 @@ class TelegramService:
         channel_id: str, 
         message_id: str, 
         limit: int = 100
-    ) -> List[Dict[str, Any]]:
+    ) -> List[CommentRecord]:
         """Получает комментарии к сообщению.
         
         Args:
@@ -399,19 +1168,21 @@ class TelegramService:
             limit: Максимальное количество комментариев
             
         Returns:
-            List[Dict[str, Any]]: Список комментариев
+            List[CommentRecord]: Список комментариев
         """
         client = self.get_client(session_key)
         if not client:
             return []
         
         try:
-            # Извлекаем числовой ID из строки формата "m12345"
-            msg_id = int(message_id.replace("m", ""))
-            channel_id_int = int(channel_id)
+            # Извлекаем числовой ID из ID записи ("123:m45" или "m45")
+            msg_id = telegram_id(message_id)
+            if msg_id is None:
+                raise ValueError(f"Некорректный ID сообщения: {message_id}")
+            message_id = message_record_id(channel_id, msg_id)
             
             # Получаем сущность канала
-            channel = await client.get_entity(channel_id_int)
+            channel = await self._resolve_channel(session_key, client, channel_id)
             
             # Получаем обсуждение
             discussion = None
@@ -444,53 +1215,38 @@ class TelegramService:
                     limit=limit
                 )
             
+            # Авторы приходят в том же ответе, что и комментарии: запоминаем их без отдельных запросов
+            comments = [comment for comment in comments if comment]
+            self._remember_authors(comment.sender for comment in comments)
+            
             results = []
             for comment in comments:
-                if not comment:
-                    continue
-                
                 # Обрабатываем медиа
                 media_urls = []
                 if comment.media:
                     # В реальном приложении здесь будет логика сохранения и получения медиа
                     media_urls.append(f"media_placeholder_{comment.id}")
                 
-                # Получаем информацию о авторе комментария
-                user_id = "anonymous"
-                if comment.from_id:
-                    try:
-                        author = await client.get_entity(comment.from_id)
-                        user_id = f"u{author.id}"
-                    except:
-                        pass
+                # ID автора комментария берем из from_id
+                author_id = _author_id(comment.from_id)
+                user_id = f"u{author_id}" if author_id else "anonymous"
                 
                 # Обрабатываем реакции
                 reactions = []
                 if hasattr(comment, "reactions") and comment.reactions:
                     for reaction in comment.reactions.results:
-                        reactions.append({
-                            "type": reaction.reaction.emoticon,
-                            "count": reaction.count
-                        })
+                        reactions.append((reaction.reaction.emoticon, reaction.count))
                 
-                # Формируем данные комментария
-                comment_data = {
-                    "comment_id": f"c{comment.id}",
-                    "message_id": message_id,
-                    "channel_id": channel_id,
-                    "user_id": user_id,
-                    "reply_to_comment_id": f"c{comment.reply_to_msg_id}" if comment.reply_to_msg_id else None,
-                    "text": comment.text or "",
-                    "date": comment.date.isoformat(),
-                    "reactions": reactions,
-                    "media": media_urls,
-                    "is_edited": bool(comment.edit_date),
-                    "metadata": {
-                        "sentiment": "neutral",  # По умолчанию
-                        "user_tags": [],
-                        "is_bookmarked": False
-                    }
-                }
+                # Формируем запись комментария (тональность по умолчанию — neutral)
+                comment_data = CommentRecord(
+                    comment_record_id(channel_id, comment.id), message_id, channel_id, user_id,
+                    text=comment.text or "",
+                    date=comment.date.isoformat(),
+                    reply_to_comment_id=comment_record_id(channel_id, comment.reply_to_msg_id) if comment.reply_to_msg_id else None,
+                    reactions=reactions,
+                    media=media_urls,
+                    is_edited=bool(comment.edit_date)
+                )
                 
                 results.append(comment_data)
             
@@ -504,7 +1260,7 @@ class TelegramService:
         self, 
         session_key: str, 
         channel_ids: List[str], 
-        callback: Callable[[Dict[str, Any]], None]
+        callback: Callable[[Dict[str, Any]], Any]
     ) -> Dict[str, bool]:
         """Запускает мониторинг каналов.
         
@@ -526,22 +1282,33 @@ class TelegramService:
         
         results = {}
         
+        # Проверяем доступность всех новых каналов одним запросом
+        watchers = self.channel_watchers[session_key]
+        pending = [
+            channel_id for channel_id in channel_ids
+            if not (channel_id in watchers and watchers[channel_id].get("task") and not watchers[channel_id]["task"].done())
+        ]
+        try:
+            channels = await self.refresh_channels(session_key, pending) if pending else {}
+        except Exception as e:
+            logger.error(f"Ошибка при получении каналов для мониторинга: {str(e)}")
+            channels = {}
+        
         for channel_id in channel_ids:
             try:
                 # Проверяем, не запущен ли уже мониторинг
-                if channel_id in self.channel_watchers[session_key]:
-                    watcher = self.channel_watchers[session_key][channel_id]
-                    if watcher.get("task") and not watcher["task"].done():
-                        # Мониторинг уже запущен
-                        results[channel_id] = True
-                        continue
+                if channel_id not in pending:
+                    # Мониторинг уже запущен
+                    results[channel_id] = True
+                    continue
                 
                 # Получаем сущность канала
-                channel_id_int = int(channel_id)
-                channel = await client.get_entity(channel_id_int)
+                channel = channels.get(channel_id)
+                if channel is None:
+                    raise ValueError("канал недоступен")
                 
                 # Создаем обработчик новых сообщений
-                @client.on(events.NewMessage(chats=[channel_id_int]))
+                @client.on(events.NewMessage(chats=[channel]))
                 async def new_message_handler(event):
                     try:
                         message = event.message
@@ -555,7 +1322,7 @@ class TelegramService:
                         message_data = {
                             "type": "new_message",
                             "data": {
-                                "message_id": f"m{message.id}",
+                                "message_id": message_record_id(channel_id, message.id),
                                 "channel_id": channel_id,
                                 "date": message.date.isoformat(),
                                 "text": message.text or "",
@@ -567,8 +1334,10 @@ class TelegramService:
                             }
                         }
                         
-                        # Вызываем функцию обратного вызова
-                        callback(message_data)
+                        # Вызываем функцию обратного вызова (асинхронную дожидаемся)
+                        result = callback(message_data)
+                        if asyncio.iscoroutine(result):
+                            await result
                     except Exception as e:
                         logger.error(f"Ошибка обработки нового сообщения: {str(e)}")
                 
@@ -714,6 +1483,11 @@ class TelegramService:
         if not client:
             return None
         
+        cache_key = ("user_info", session_key)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Получаем информацию о текущем пользователе
             me = await client.get_me()
@@ -728,6 +1502,7 @@ class TelegramService:
                 "photo_url": None  # Telethon не предоставляет URL фото напрямую
             }
             
+            self.cache.set(cache_key, user_data)
             return user_data
             
         except Exception as e:
@@ -754,13 +1529,19 @@ class TelegramService:
         if not client:
             return None
         
+        cache_key = ("message", session_key, channel_id, message_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Извлекаем числовой ID из строки формата "m12345"
-            msg_id = int(message_id.replace("m", ""))
-            channel_id_int = int(channel_id)
+            # Извлекаем числовой ID из ID записи ("123:m45" или "m45")
+            msg_id = telegram_id(message_id)
+            if msg_id is None:
+                return None
             
             # Получаем сущность канала
-            channel = await client.get_entity(channel_id_int)
+            channel = await self._resolve_channel(session_key, client, channel_id)
             
             # Получаем сообщение
             message = await client.get_messages(
@@ -779,45 +1560,65 @@ class TelegramService:
             
             # Формируем данные сообщения
             message_data = {
-                "message_id": f"m{message.id}",
+                "message_id": message_record_id(channel_id, message.id),
                 "channel_id": channel_id,
                 "date": message.date.isoformat(),
                 "text": message.text or "",
                 "media": media_urls,
                 "views": getattr(message, "views", None),
                 "forwards": getattr(message, "forwards", None),
-                "comments_count": 0,  # Будет заполнено отдельным запросом
+                "comments_count": 0,
                 "last_comment_date": None
             }
             
-            # Пытаемся получить количество комментариев
-            try:
-                replies = await client(GetRepliesRequest(
-                    peer=channel,
-                    msg_id=message.id,
-                    offset_id=0,
-                    offset_date=None,
-                    add_offset=0,
-                    limit=1,
-                    max_id=0,
-                    min_id=0,
-                    hash=0
-                ))
-                
-                message_data["comments_count"] = replies.count
-                
-                if replies.messages and replies.messages[0].date:
-                    message_data["last_comment_date"] = replies.messages[0].date.isoformat()
-            except Exception:
-                # Игнорируем ошибки, если комментарии недоступны
-                pass
+            comment_counts = await self._fetch_comment_counts(client, channel, [message])
+            if message.id in comment_counts:
+                message_data["comments_count"], message_data["last_comment_date"] = comment_counts[message.id]
             
+            self.cache.set(cache_key, message_data)
             return message_data
             
         except Exception as e:
             logger.error(f"Ошибка при получении сообщения: {str(e)}")
             return None
     
+    async def _message_stream(
+        self,
+        client: TelegramClient,
+        channel_id: str,
+        channel: InputPeerChannel,
+        query: Optional[str],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        after: Optional[Tuple[int, str, str]]
+    ) -> AsyncIterator[MessageRecord]:
+        """Отдает сообщения канала от новых к старым в порядке ключа (date, message_id).
+        
+        Telegram возвращает сообщения по убыванию ID, поэтому сообщения
+        с одинаковой датой накапливаются и отдаются отсортированными по ключу.
+        Следующая порция запрашивается у Telegram, только когда потребитель
+        дочитал предыдущую.
+        """
+        group: List[MessageRecord] = []
+        group_date = None
+        
+        async for msg in self.iter_history(client, channel, date_from, date_to, search=query):
+            message_data = self._message_record(channel_id, msg)
+            if not is_after(message_key(message_data), after, reverse=True):
+                continue
+            
+            if group and msg.date != group_date:
+                group.sort(key=message_key, reverse=True)
+                for record in group:
+                    yield record
+                group = []
+            group.append(message_data)
+            group_date = msg.date
+        
+        group.sort(key=message_key, reverse=True)
+        for record in group:
+            yield record
+    
     async def search_messages(
         self, 
         session_key: str, 
@@ -826,10 +1627,26 @@ class TelegramService:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        channel_status: Optional[Dict[str, str]] = None
+    ) -> List[MessageRecord]:
         """Поиск сообщений по параметрам.
         
+        Сообщения всех каналов возвращаются от новых к старым в порядке ключа
+        (date, message_id). Первые порции всех каналов запрашиваются
+        параллельно (не более settings.SEARCH_CONCURRENCY одновременно),
+        затем потоки каналов сливаются через кучу: следующая порция канала
+        запрашивается, только когда его сообщения дошли до вершины кучи,
+        и чтение прекращается, как только набрано offset + limit сообщений.
+        При постраничном обходе выборка каждого канала начинается с даты
+        курсора, поэтому глубокие страницы не требуют повторной загрузки
+        предыдущих.
+        
+        Ошибка в одном канале не прерывает поиск: возвращаются сообщения
+        остальных каналов, а статус каждого канала (ok, not_found или error)
+        записывается в channel_status.
+        
         Args:
             session_key: Ключ сессии
             query: Поисковый запрос
@@ -838,108 +1655,133 @@ class TelegramService:
             date_to: Конечная дата
             limit: Максимальное количество результатов
             offset: Смещение для пагинации
+            cursor: Курсор последней записи предыдущей страницы
+            channel_status: Словарь, в который записывается статус каждого канала
             
         Returns:
-            List[Dict[str, Any]]: Список найденных сообщений
+            List[MessageRecord]: Список найденных сообщений
+        
+        Raises:
+            ValueError: Если курсор поврежден
         """
         client = self.get_client(session_key)
         if not client:
             return []
         
-        results = []
-        
         # Если не указаны каналы и запрос, возвращаем пустой список
         if not channel_ids and not query:
             return []
         
-        try:
-            # Обрабатываем каждый канал отдельно
-            for channel_id in channel_ids or []:
+        after = decode_cursor(cursor) if cursor else None
+        date_from = _as_utc(date_from)
+        date_to = _as_utc(date_to)
+        status = channel_status if channel_status is not None else {}
+        
+        # Достаточно набрать столько сообщений, сколько нужно для страницы
+        page_size = offset + limit
+        
+        # Верхняя граница выборки: дата курсора или date_to
+        upper_date = date_to
+        if after:
+            cursor_date = epoch_ms_to_datetime(after[0])
+            upper_date = min(upper_date, cursor_date) if upper_date else cursor_date
+        
+        # Сущности всех каналов разрешаются сразу
+        peers = await self._resolve_channels(session_key, client, channel_ids or [])
+        
+        streams = {}
+        for channel_id in channel_ids or []:
+            if channel_id in peers:
+                streams[channel_id] = self._message_stream(
+                    client, channel_id, peers[channel_id], query, date_from, upper_date, after
+                )
+                status[channel_id] = "ok"
+            else:
+                status[channel_id] = "not_found"
+        
+        semaphore = asyncio.Semaphore(settings.SEARCH_CONCURRENCY)
+        
+        async def pull(channel_id: str) -> Optional[MessageRecord]:
+            """Возвращает следующее сообщение канала или None, если канал исчерпан или недоступен."""
+            async with semaphore:
                 try:
-                    # Преобразуем строковый ID в число
-                    channel_id_int = int(channel_id)
-                    
-                    # Получаем сущность канала
-                    channel = await client.get_entity(channel_id_int)
-                    
-                    # Формируем параметры поиска
-                    search_params = {
-                        "entity": channel,
-                        "limit": limit,
-                        "offset_id": 0,
-                        "reverse": True  # Сначала новые сообщения
-                    }
-                    
-                    # Добавляем поисковый запрос, если указан
-                    if query:
-                        search_params["search"] = query
-                    
-                    # Фильтруем по дате
-                    if date_from or date_to:
-                        # Telethon не поддерживает фильтрацию по дате в API,
-                        # поэтому мы получаем сообщения и фильтруем их вручную
-                        messages = await client.get_messages(**search_params)
-                        
-                        filtered_messages = []
-                        for msg in messages:
-                            # Проверяем дату сообщения
-                            if date_from and msg.date < date_from:
-                                continue
-                            if date_to and msg.date > date_to:
-                                continue
-                            
-                            filtered_messages.append(msg)
-                        
-                        messages = filtered_messages
-                    else:
-                        # Если нет фильтрации по дате, просто получаем сообщения
-                        messages = await client.get_messages(**search_params)
-                    
-                    # Применяем смещение
-                    messages = messages[offset:offset+limit]
-                    
-                    # Обрабатываем полученные сообщения
-                    for msg in messages:
-                        if not msg:
-                            continue
-                        
-                        # Обрабатываем медиа
-                        media_urls = []
-                        if msg.media:
-                            media_urls.append(f"media_placeholder_{msg.id}")
-                        
-                        # Формируем данные сообщения
-                        message_data = {
-                            "message_id": f"m{msg.id}",
-                            "channel_id": channel_id,
-                            "date": msg.date.isoformat(),
-                            "text": msg.text or "",
-                            "media": media_urls,
-                            "views": getattr(msg, "views", None),
-                            "forwards": getattr(msg, "forwards", None),
-                            "comments_count": 0,
-                            "last_comment_date": None
-                        }
-                        
-                        results.append(message_data)
-                        
-                        # Ограничиваем количество результатов
-                        if len(results) >= limit:
-                            break
-                
+                    return await streams[channel_id].__anext__()
+                except StopAsyncIteration:
+                    return None
                 except Exception as e:
                     logger.error(f"Ошибка при поиске сообщений в канале {channel_id}: {str(e)}")
+                    status[channel_id] = "error"
+                    return None
+        
+        # Вершина кучи — сообщение с наибольшим ключом; ключи сравниваются с обратным знаком через _Newest
+        heap = []
+        channel_order = list(streams)
+        heads = await asyncio.gather(*(pull(channel_id) for channel_id in channel_order))
+        for channel_id, head in zip(channel_order, heads):
+            if head is not None:
+                heapq.heappush(heap, _Newest(message_key(head), channel_id, head))
+        
+        results: List[MessageRecord] = []
+        try:
+            while heap and len(results) < page_size:
+                newest = heapq.heappop(heap)
+                results.append(newest.record)
+                following = await pull(newest.channel_id)
+                if following is not None:
+                    heapq.heappush(heap, _Newest(message_key(following), newest.channel_id, following))
+        finally:
+            # Прекращаем чтение каналов, сообщения которых больше не нужны
+            for stream in streams.values():
+                await stream.aclose()
+        
+        return results[offset:offset + limit]
+    
+    @staticmethod
+    def _filter_comments(
+        comments: List[CommentRecord],
+        query: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        sentiment: Optional[str] = None,
+        user_tags: Optional[List[str]] = None
+    ) -> List[CommentRecord]:
+        """Фильтрует комментарии по запросу, дате, тональности и тегам."""
+        # Фильтруем по запросу
+        if query:
+            comments = [
+                comment for comment in comments
+                if matches_query(query, comment.get("text", ""))
+            ]
+        
+        # Фильтруем по дате
+        if date_from or date_to:
+            filtered_comments = []
+            for comment in comments:
+                comment_date = datetime.fromisoformat(comment.get("date", ""))
+                if date_from and comment_date < date_from:
                     continue
-                
-                # Ограничиваем количество результатов
-                if len(results) >= limit:
-                    break
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Ошибка при поиске сообщений: {str(e)}")
-            return []
+                if date_to and comment_date > date_to:
+                    continue
+                filtered_comments.append(comment)
+            comments = filtered_comments
+        
+        # Фильтруем по тональности
+        if sentiment:
+            comments = [
+                comment for comment in comments
+                if comment.get("metadata", {}).get("sentiment") == sentiment
+            ]
+        
+        # Фильтруем по тегам пользователя
+        if user_tags:
+            filtered_comments = []
+            for comment in comments:
+                comment_tags = comment.get("metadata", {}).get("user_tags", [])
+                if any(tag in comment_tags for tag in user_tags):
+                    filtered_comments.append(comment)
+            comments = filtered_comments
+        
+        return comments
     
     async def search_comments(
         self,
@@ -952,10 +1794,15 @@ class TelegramService:
         sentiment: Optional[str] = None,
         user_tags: Optional[List[str]] = None,
         limit: int = 100,
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[CommentRecord]:
         """Поиск комментариев по параметрам.
         
+        Комментарии возвращаются от старых к новым в порядке ключа
+        (date, comment_id). Найденные комментарии накапливаются в ограниченной
+        куче размером со страницу, а не в полном списке.
+        
         Args:
             session_key: Ключ сессии
             query: Поисковый запрос
@@ -967,20 +1814,29 @@ class TelegramService:
             user_tags: Список тегов пользователя
             limit: Максимальное количество результатов
             offset: Смещение для пагинации
+            cursor: Курсор последней записи предыдущей страницы
             
         Returns:
-            List[Dict[str, Any]]: Список найденных комментариев
+            List[CommentRecord]: Список найденных комментариев
+        
+        Raises:
+            ValueError: Если курсор поврежден
         """
         client = self.get_client(session_key)
         if not client:
             return []
         
-        results = []
-        
         # Если не указаны каналы, сообщения и запрос, возвращаем пустой список
         if not channel_ids and not message_ids and not query:
             return []
         
+        after = decode_cursor(cursor) if cursor else None
+        date_from = _as_utc(date_from)
+        date_to = _as_utc(date_to)
+        page_size = offset + limit
+        
+        results = []
+        
         try:
             # Если указаны конкретные сообщения, ищем комментарии к ним
             if message_ids:
@@ -1000,121 +1856,36 @@ class TelegramService:
                     comments = await self.get_message_comments(
                         session_key, message_channel_id, message_id, limit=limit
                     )
+                    comments = self._filter_comments(comments, query, date_from, date_to, sentiment, user_tags)
                     
-                    # Фильтруем по запросу
-                    if query:
-                        comments = [
-                            comment for comment in comments
-                            if query.lower() in comment.get("text", "").lower()
-                        ]
-                    
-                    # Фильтруем по дате
-                    if date_from or date_to:
-                        filtered_comments = []
-                        for comment in comments:
-                            comment_date = datetime.fromisoformat(comment.get("date", ""))
-                            if date_from and comment_date < date_from:
-                                continue
-                            if date_to and comment_date > date_to:
-                                continue
-                            filtered_comments.append(comment)
-                        comments = filtered_comments
-                    
-                    # Фильтруем по тональности
-                    if sentiment:
-                        comments = [
-                            comment for comment in comments
-                            if comment.get("metadata", {}).get("sentiment") == sentiment
-                        ]
-                    
-                    # Фильтруем по тегам пользователя
-                    if user_tags:
-                        filtered_comments = []
-                        for comment in comments:
-                            comment_tags = comment.get("metadata", {}).get("user_tags", [])
-                            if any(tag in comment_tags for tag in user_tags):
-                                filtered_comments.append(comment)
-                        comments = filtered_comments
-                    
-                    # Добавляем результаты
-                    results.extend(comments)
-                    
-                    # Ограничиваем количество результатов
-                    if len(results) >= limit:
-                        results = results[:limit]
-                        break
+                    # Оставляем только лучшие page_size комментариев за курсором
+                    results = select_page(results + comments, comment_key, page_size, after)
             
-            # Если указаны каналы, ищем комментарии в них
+            # Если указаны каналы, ищем комментарии в них (обход комментариев идет в фоновой полосе)
             elif channel_ids:
-                for channel_id in channel_ids:
-                    # Получаем сообщения канала
-                    messages = await self.get_channel_messages(
-                        session_key, channel_id, limit=20, offset_id=0
-                    )
-                    
-                    # Для каждого сообщения получаем комментарии
-                    for message in messages:
-                        message_id = message.get("message_id")
-                        if not message_id:
-                            continue
-                        
-                        # Получаем комментарии к сообщению
-                        comments = await self.get_message_comments(
-                            session_key, channel_id, message_id, limit=limit
+                with background_lane():
+                    for channel_id in channel_ids:
+                        # Получаем сообщения канала
+                        messages = await self.get_channel_messages(
+                            session_key, channel_id, limit=20, offset_id=0
                         )
                         
-                        # Применяем те же фильтры, что и выше
-                        if query:
-                            comments = [
-                                comment for comment in comments
-                                if query.lower() in comment.get("text", "").lower()
-                            ]
-                        
-                        if date_from or date_to:
-                            filtered_comments = []
-                            for comment in comments:
-                                comment_date = datetime.fromisoformat(comment.get("date", ""))
-                                if date_from and comment_date < date_from:
-                                    continue
-                                if date_to and comment_date > date_to:
-                                    continue
-                                filtered_comments.append(comment)
-                            comments = filtered_comments
-                        
-                        if sentiment:
-                            comments = [
-                                comment for comment in comments
-                                if comment.get("metadata", {}).get("sentiment") == sentiment
-                            ]
-                        
-                        if user_tags:
-                            filtered_comments = []
-                            for comment in comments:
-                                comment_tags = comment.get("metadata", {}).get("user_tags", [])
-                                if any(tag in comment_tags for tag in user_tags):
-                                    filtered_comments.append(comment)
-                            comments = filtered_comments
-                        
-                        # Добавляем результаты
-                        results.extend(comments)
-                        
-                        # Ограничиваем количество результатов
-                        if len(results) >= limit:
-                            results = results[:limit]
-                            break
-                    
-                    # Ограничиваем количество результатов
-                    if len(results) >= limit:
-                        results = results[:limit]
-                        break
+                        # Для каждого сообщения получаем комментарии
+                        for message in messages:
+                            message_id = message.get("message_id")
+                            if not message_id:
+                                continue
+                            
+                            # Получаем комментарии к сообщению
+                            comments = await self.get_message_comments(
+                                session_key, channel_id, message_id, limit=limit
+                            )
+                            comments = self._filter_comments(comments, query, date_from, date_to, sentiment, user_tags)
+                            
+                            results = select_page(results + comments, comment_key, page_size, after)
             
             # Применяем смещение
-            if offset > 0:
-                results = results[offset:offset+limit]
-            else:
-                results = results[:limit]
-            
-            return results
+            return results[offset:offset + limit]
             
         except Exception as e:
             logger.error(f"Ошибка при поиске комментариев: {str(e)}")
@@ -1144,8 +1915,8 @@ class TelegramService:
             return None
         
         try:
-            # Извлекаем числовой ID из строки формата "c12345"
-            comment_id_int = int(comment_id.replace("c", ""))
+            # Извлекаем числовой ID из ID записи ("123:c45" или "c45")
+            comment_id_int = telegram_id(comment_id)
             
             # В реальном приложении мы бы получили комментарий из базы данных и обновили его
             # Здесь мы просто возвращаем примерный объект с обновленными метаданными
@@ -1187,25 +1958,8 @@ class TelegramService:
         Returns:
             Optional[bytes]: Данные в выбранном формате или None
         """
-        # Получаем сообщения для экспорта
-        messages = []
-        for channel_id in channel_ids:
-            channel_messages = await self.get_channel_messages(
-                session_key, channel_id, limit=100, offset_id=0
-            )
-            messages.extend(channel_messages)
-        
-        # Фильтруем по дате
-        if date_from or date_to:
-            filtered_messages = []
-            for message in messages:
-                message_date = datetime.fromisoformat(message.get("date", ""))
-                if date_from and message_date < date_from:
-                    continue
-                if date_to and message_date > date_to:
-                    continue
-                filtered_messages.append(message)
-            messages = filtered_messages
+        # Получаем сообщения за период; история читается только в его пределах
+        messages = await self.get_messages_in_range(session_key, channel_ids, date_from, date_to)
         
         # Если сообщений нет, возвращаем None
         if not messages:
@@ -1214,7 +1968,7 @@ class TelegramService:
         # Экспортируем в выбранном формате
         if format == "json":
             # Экспорт в JSON
-            return json.dumps(messages, ensure_ascii=False, indent=2).encode('utf-8')
+            return json.dumps(to_dicts(messages), ensure_ascii=False, indent=2).encode('utf-8')
         elif format == "csv":
             # Экспорт в CSV
             csv_data = "message_id,channel_id,date,text,views,forwards,comments_count\n"
@@ -1251,17 +2005,18 @@ class TelegramService:
         Returns:
             Optional[bytes]: Данные в выбранном формате или None
         """
-        # Получаем комментарии для экспорта
-        comments = await self.search_comments(
-            session_key=session_key,
-            channel_ids=channel_ids,
-            message_ids=message_ids,
-            date_from=date_from,
-            date_to=date_to,
-            sentiment=sentiment,
-            user_tags=user_tags,
-            limit=1000  # Экспортируем больше комментариев
-        )
+        # Получаем комментарии для экспорта в фоновой полосе запросов
+        with background_lane():
+            comments = await self.search_comments(
+                session_key=session_key,
+                channel_ids=channel_ids,
+                message_ids=message_ids,
+                date_from=date_from,
+                date_to=date_to,
+                sentiment=sentiment,
+                user_tags=user_tags,
+                limit=1000  # Экспортируем больше комментариев
+            )
         
         # Если комментариев нет, возвращаем None
         if not comments:
@@ -1270,7 +2025,7 @@ class TelegramService:
         # Экспортируем в выбранном формате
         if format == "json":
             # Экспорт в JSON
-            return json.dumps(comments, ensure_ascii=False, indent=2).encode('utf-8')
+            return json.dumps(to_dicts(comments), ensure_ascii=False, indent=2).encode('utf-8')
         elif format == "csv":
             # Экспорт в CSV
             csv_data = "comment_id,message_id,channel_id,user_id,text,date,is_edited,sentiment\n"
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Dict, List, Optional, Any, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class BackgroundWriter:
+    """Фоновая пакетная запись сообщений и комментариев.
+    
+    Записи помещаются в ограниченную очередь и сохраняются отдельным потоком:
+    поток накапливает записи в течение окна flush_interval или до batch_size
+    записей и фиксирует пакет одним вызовом save_*_bulk, поэтому поток
+    событий не блокируется на файловых операциях.
+    
+    Через очередь сохраняются данные, полученные из Telegram: комментарии
+    и новые сообщения отслеживаемых каналов. В Telegram нет метаданных
+    комментариев, поэтому у уже сохраненных комментариев метаданные
+    (тональность, теги, закладка) сохраняются прежними; они читаются и
+    записываются под той же блокировкой DataService, что и при обновлении
+    метаданных пользователем.
+    """
+    
+    def __init__(self, data_service, max_queue_size: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        """Инициализация фоновой записи.
+        
+        Args:
+            data_service: Сервис данных, в который сохраняются пакеты
+            max_queue_size: Максимальный размер очереди (по умолчанию settings.WRITE_QUEUE_SIZE)
+            batch_size: Максимальный размер пакета (по умолчанию settings.WRITE_BATCH_SIZE)
+            flush_interval: Окно накопления пакета в секундах (по умолчанию settings.WRITE_FLUSH_INTERVAL)
+        """
+        self.data_service = data_service
+        self.max_queue_size = max_queue_size or settings.WRITE_QUEUE_SIZE
+        self.batch_size = batch_size or settings.WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.WRITE_FLUSH_INTERVAL
+        
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(maxsize=self.max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # Количество принятых, но еще не зафиксированных записей
+        self._pending = 0
+        self._pending_condition = threading.Condition()
+        
+        # Метрики
+        self._batches = 0
+        self._records = 0
+        self._rejected = 0
+        self._failed = 0
+        self._last_batch_size = 0
+        self._latencies = deque(maxlen=1000)
+    
+    # Управление потоком
+    
+    def start(self) -> None:
+        """Запускает поток записи."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Фоновая запись запущена (очередь: {self.max_queue_size}, пакет: {self.batch_size}, "
+                    f"окно: {self.flush_interval} с)")
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ожидает фиксации всех принятых записей.
+        
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        
+        Returns:
+            bool: True, если все записи зафиксированы
+        """
+        with self._pending_condition:
+            return self._pending_condition.wait_for(lambda: self._pending == 0, timeout)
+    
+    async def wait_flushed(self, timeout: Optional[float] = None) -> bool:
+        """Ожидает фиксации всех принятых записей, не блокируя цикл событий.
+        
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        
+        Returns:
+            bool: True, если все записи зафиксированы
+        """
+        with self._pending_condition:
+            if self._pending == 0:
+                return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.flush, timeout))
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Останавливает поток записи, предварительно сохранив очередь."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        
+        # Если поток не запускался, сохраняем остаток очереди синхронно
+        self._drain()
+    
+    # Постановка в очередь
+    
+    def submit_message(self, message_data: Dict[str, Any], timeout: float = 0) -> bool:
+        """Ставит сообщение в очередь на запись.
+        
+        Args:
+            message_data: Данные сообщения
+            timeout: Время ожидания места в очереди (0 — не ждать)
+        
+        Returns:
+            bool: True, если сообщение принято
+        """
+        return self._submit("message", message_data, timeout)
+    
+    def submit_comment(self, comment_data: Dict[str, Any], timeout: float = 0) -> bool:
+        """Ставит комментарий в очередь на запись.
+        
+        Args:
+            comment_data: Данные комментария
+            timeout: Время ожидания места в очереди (0 — не ждать)
+        
+        Returns:
+            bool: True, если комментарий принят
+        """
+        return self._submit("comment", comment_data, timeout)
+    
+    def _submit(self, kind: str, data: Dict[str, Any], timeout: float) -> bool:
+        with self._pending_condition:
+            self._pending += 1
+        
+        try:
+            if timeout:
+                self._queue.put((kind, data), timeout=timeout)
+            else:
+                self._queue.put_nowait((kind, data))
+            return True
+        except queue.Full:
+            with self._pending_condition:
+                self._pending -= 1
+                self._rejected += 1
+                self._pending_condition.notify_all()
+            logger.warning(f"Очередь записи переполнена ({self.max_queue_size}), запись {kind} отклонена")
+            return False
+    
+    # Фиксация пакетов
+    
+    def _run(self) -> None:
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._commit(batch)
+    
+    def _drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._commit(batch)
+                batch = []
+        if batch:
+            self._commit(batch)
+    
+    def _commit(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Сохраняет пакет и обновляет метрики."""
+        messages = [data for kind, data in batch if kind == "message"]
+        comments = [data for kind, data in batch if kind == "comment"]
+        
+        started = time.perf_counter()
+        saved = 0
+        try:
+            # Сообщения сохраняются первыми, чтобы комментарии не опережали их
+            if messages:
+                saved += self.data_service.save_messages_bulk(messages)
+            if comments:
+                saved += self.data_service.save_comments_bulk(comments, keep_metadata=True)
+        except Exception as e:
+            logger.error(f"Ошибка при фиксации пакета из {len(batch)} записей: {str(e)}")
+        latency = (time.perf_counter() - started) * 1000
+        
+        with self._pending_condition:
+            self._batches += 1
+            self._records += saved
+            self._failed += len(batch) - saved
+            self._last_batch_size = len(batch)
+            self._latencies.append(latency)
+            self._pending -= len(batch)
+            self._pending_condition.notify_all()
+    
+    # Метрики
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики очереди записи.
+        
+        Returns:
+            Dict[str, Any]: Глубина очереди, число пакетов и записей, задержки фиксации в мс
+        """
+        with self._pending_condition:
+            last_latency = self._latencies[-1] if self._latencies else None
+            latencies = sorted(self._latencies)
+            stats = {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue_size,
+                "pending": self._pending,
+                "batches": self._batches,
+                "records": self._records,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "last_batch_size": self._last_batch_size,
+            }
+        
+        if latencies:
+            stats["commit_latency_ms"] = {
+                "last": round(last_latency, 2),
+                "avg": round(sum(latencies) / len(latencies), 2),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+                "max": round(latencies[-1], 2),
+            }
+        else:
+            stats["commit_latency_ms"] = None
+        return stats
@@ -0,0 +1,197 @@
+"""Поддельные клиент и сообщения Telegram для тестов сервисов.
+
+Клиент хранит сообщения каналов в памяти, повторяет семантику смещений
+Telethon (offset_id и offset_date исключают границу, сообщения отдаются
+от новых к старым) и записывает каждый запрос в calls.
+"""
+import importlib
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Any, Callable
+from unittest import mock
+
+from telethon.helpers import TotalList
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.types import Channel, ChatPhotoEmpty, InputPeerChannel
+
+from config import settings
+
+BASE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+SESSION_KEY = "test-session"
+
+class FakeMessage:
+    """Сообщение канала с полями, которые читает TelegramService."""
+    
+    def __init__(self, message_id: int, date: Optional[datetime] = None, text: Optional[str] = None,
+                 replies: Any = None):
+        self.id = message_id
+        self.date = date or BASE_DATE + timedelta(minutes=message_id)
+        self.text = text if text is not None else f"Сообщение {message_id}"
+        self.media = None
+        self.views = message_id
+        self.forwards = 0
+        self.replies = replies
+        self.edit_date = None
+
+def make_messages(first_id: int, last_id: int, **kwargs) -> List[FakeMessage]:
+    """Сообщения с ID от first_id до last_id включительно, по минуте между соседними."""
+    return [FakeMessage(message_id, **kwargs) for message_id in range(first_id, last_id + 1)]
+
+def make_channel(channel_id: int, title: Optional[str] = None) -> Channel:
+    """Канал, каким его возвращает Telegram в диалогах и результатах поиска."""
+    return Channel(id=channel_id, title=title or f"Канал {channel_id}", photo=ChatPhotoEmpty(),
+                   date=BASE_DATE, access_hash=channel_id * 10)
+
+def _channel_id(entity: Any) -> int:
+    return getattr(entity, "channel_id", entity)
+
+class FakeClient:
+    """Клиент Telegram, отдающий сообщения каналов из памяти.
+    
+    Args:
+        channels: ID канала → сообщения канала
+        requests: Тип запроса → функция, возвращающая ответ на запрос
+            (или бросающая исключение); запросы без обработчика, кроме GetChannelsRequest
+            по каналам dialogs и public, завершаются ошибкой
+        dialogs: Каналы из диалогов пользователя
+        public: Каналы вне диалогов, которые находятся по ID
+    """
+    
+    def __init__(self, channels: Optional[Dict[int, List[FakeMessage]]] = None,
+                 requests: Optional[Dict[type, Callable[[Any], Any]]] = None,
+                 dialogs: List[Channel] = (), public: List[Channel] = ()):
+        self.channels = channels or {}
+        self.requests = requests or {}
+        self.dialogs = list(dialogs)
+        self.public = list(public)
+        self.calls: List[tuple] = []
+        
+        # Кеш сессии Telethon пуст: сущности приходят только из запросов
+        self.session = SimpleNamespace(get_input_entity=self._not_in_session)
+        
+        # ID канала → исключение, которое бросит следующее обращение к его истории
+        self.failures: Dict[int, Exception] = {}
+        
+        # Сообщений, отданных iter_messages: сколько истории прочитал вызывающий код
+        self.yielded = 0
+    
+    def _newest_first(self, entity: Any) -> List[FakeMessage]:
+        channel_id = _channel_id(entity)
+        if channel_id in self.failures:
+            raise self.failures.pop(channel_id)
+        return sorted(self.channels.get(channel_id, []), key=lambda msg: msg.id, reverse=True)
+    
+    async def get_messages(self, entity: Any, limit: Optional[int] = None, offset_id: int = 0,
+                           ids: Optional[List[int]] = None, **kwargs) -> List[FakeMessage]:
+        self.calls.append(("get_messages", _channel_id(entity), limit, offset_id))
+        messages = self._newest_first(entity)
+        if ids is not None:
+            by_id = {msg.id: msg for msg in messages}
+            return [by_id.get(message_id) for message_id in ids]
+        
+        # Как и Telethon, вместе со страницей возвращаем общее количество сообщений канала
+        page = TotalList([msg for msg in messages if not offset_id or msg.id < offset_id][:limit])
+        page.total = len(messages)
+        return page
+    
+    async def iter_messages(self, entity: Any, limit: Optional[int] = None, min_id: int = 0, offset_id: int = 0,
+                            offset_date: Optional[datetime] = None, search: Optional[str] = None, **kwargs):
+        self.calls.append(("iter_messages", _channel_id(entity), offset_id, offset_date))
+        messages = [
+            msg for msg in self._newest_first(entity)
+            if msg.id > min_id
+            and (not offset_id or msg.id < offset_id)
+            and (offset_date is None or msg.date < offset_date)
+            and (not search or search.lower() in msg.text.lower())
+        ]
+        for msg in messages[:limit]:
+            self.yielded += 1
+            yield msg
+    
+    @staticmethod
+    def _not_in_session(peer: Any) -> Any:
+        raise ValueError("Сущность не найдена в кеше сессии")
+    
+    async def get_dialogs(self, limit: Optional[int] = None, **kwargs) -> List[Any]:
+        self.calls.append(("get_dialogs", limit))
+        return [SimpleNamespace(entity=channel) for channel in self.dialogs[:limit]]
+    
+    async def get_input_entity(self, peer: Any) -> InputPeerChannel:
+        self.calls.append(("get_input_entity", _channel_id(peer)))
+        for channel in self.dialogs + self.public:
+            if channel.id == _channel_id(peer):
+                return InputPeerChannel(channel.id, channel.access_hash)
+        raise ValueError(f"Канал {_channel_id(peer)} не найден")
+    
+    def add_event_handler(self, callback: Callable, event: Any = None) -> None:
+        pass
+    
+    def _get_channels(self, request: GetChannelsRequest) -> Any:
+        # Как и для пользователя Telegram, запрос целиком отклоняется, если хотя бы один канал не найден
+        known = {channel.id: channel for channel in self.dialogs + self.public}
+        missing = [channel.channel_id for channel in request.id if channel.channel_id not in known]
+        if missing:
+            raise ValueError(f"CHANNEL_INVALID: {missing}")
+        return SimpleNamespace(chats=[known[channel.channel_id] for channel in request.id])
+    
+    async def __call__(self, request: Any) -> Any:
+        self.calls.append((type(request).__name__,))
+        handler = self.requests.get(type(request))
+        if handler is None and isinstance(request, GetChannelsRequest):
+            handler = self._get_channels
+        if handler is None:
+            raise RuntimeError(f"Неожиданный запрос {type(request).__name__}")
+        return handler(request)
+    
+    def count(self, name: str) -> int:
+        """Количество выполненных запросов с указанным именем."""
+        return sum(1 for call in self.calls if call[0] == name)
+
+def make_telegram_service(test_case, client: FakeClient, channel_ids: List[int] = ()):
+    """Создает TelegramService с поддельным клиентом в сессии SESSION_KEY.
+    
+    Сессии и кеш сущностей размещаются во временной директории, удаляемой
+    после теста; каналы channel_ids заранее записываются в кеш сущностей,
+    поэтому разрешаются без запросов.
+    """
+    from services.telegram_service import TelegramService
+    
+    session_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(session_dir.cleanup)
+    patcher = mock.patch.object(settings, "SESSION_DIR", session_dir.name)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    
+    service = TelegramService()
+    test_case.addCleanup(service.entities.close)
+    service.active_clients[SESSION_KEY] = client
+    service.entities.put(SESSION_KEY, [InputPeerChannel(channel_id, channel_id * 10) for channel_id in channel_ids])
+    return service
+
+def make_data_service(test_case, backend: str = "sqlite"):
+    """Создает DataService и AsyncDataService с хранилищем во временной директории."""
+    from services.data_service import DataService
+    from services.async_data_service import AsyncDataService
+    
+    data_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(data_dir.cleanup)
+    data_service = DataService(data_dir=data_dir.name, backend=backend)
+    test_case.addCleanup(data_service.close)
+    async_data_service = AsyncDataService(data_service)
+    test_case.addCleanup(async_data_service.close)
+    return data_service, async_data_service
+
+def import_router(name: str):
+    """Импортирует модуль роутера (вызывается из setUpModule).
+    
+    При первом импорте роутера создаются глобальные сервисы из dependencies,
+    их данные и сессии размещаются во временной директории.
+    """
+    directory = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(directory.cleanup)
+    with mock.patch.object(settings, "DATA_DIR", directory.name), \
+            mock.patch.object(settings, "SESSION_DIR", directory.name):
+        return importlib.import_module(f"routers.{name}")
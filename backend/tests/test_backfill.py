@@ -0,0 +1,141 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from telethon.errors import FloodWaitError
+
+from config import settings
+from services.backfill import BackfillManager
+from services.channel_sync import ChannelSync
+from tests.fakes import FakeClient, SESSION_KEY, make_data_service, make_messages, make_telegram_service
+
+CHANNEL_ID = 100
+
+class InterruptingClient(FakeClient):
+    """Клиент, запрос порции которого со смещением interrupt_at не завершается."""
+    
+    def __init__(self, *args, interrupt_at: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interrupt_at = interrupt_at
+        self.interrupted = asyncio.Event()
+    
+    async def get_messages(self, entity, limit=None, offset_id=0, **kwargs):
+        if self.interrupt_at and offset_id == self.interrupt_at:
+            self.interrupt_at = 0
+            self.interrupted.set()
+            await asyncio.Event().wait()
+        return await super().get_messages(entity, limit=limit, offset_id=offset_id, **kwargs)
+
+class BackfillTest(unittest.IsolatedAsyncioTestCase):
+    
+    def make_manager(self, client, with_sync=False):
+        telegram_service = make_telegram_service(self, client, [CHANNEL_ID])
+        data_service, async_data_service = make_data_service(self)
+        channel_sync = ChannelSync(telegram_service, async_data_service) if with_sync else None
+        if channel_sync is not None:
+            self.addCleanup(channel_sync.close)
+        return telegram_service, data_service, async_data_service, channel_sync
+    
+    @staticmethod
+    async def finish(manager):
+        await asyncio.gather(*manager._tasks.values())
+    
+    async def test_resumes_from_checkpoint_after_interrupted_chunk(self):
+        client = InterruptingClient({CHANNEL_ID: make_messages(1, 250)}, interrupt_at=151)
+        telegram_service, data_service, async_data_service, _ = self.make_manager(client)
+        
+        manager = BackfillManager(telegram_service, async_data_service)
+        job = manager.start(SESSION_KEY, str(CHANNEL_ID))
+        await client.interrupted.wait()
+        await manager.close()
+        
+        # Первая порция сохранена и зафиксирована, прерванная — нет
+        saved = BackfillManager(telegram_service, async_data_service)
+        job = saved.get(job["job_id"])
+        self.assertEqual((job["status"], job["offset_id"], job["fetched"]), ("running", 151, 100))
+        
+        client.calls.clear()
+        self.assertEqual(len(saved.resume(SESSION_KEY)), 1)
+        await self.finish(saved)
+        
+        job = saved.get(job["job_id"])
+        self.assertEqual((job["status"], job["fetched"], job["offset_id"]), ("completed", 250, 0))
+        offsets = [call[3] for call in client.calls if call[0] == "get_messages"]
+        self.assertEqual(offsets, [151, 51])
+        self.assertEqual(len(data_service.get_channel_messages(str(CHANNEL_ID))), 250)
+        await saved.close()
+    
+    async def test_flood_wait_moves_job_to_waiting(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 150)})
+        telegram_service, data_service, async_data_service, _ = self.make_manager(client)
+        manager = BackfillManager(telegram_service, async_data_service)
+        
+        events = []
+        
+        async def listener(event):
+            stored = manager.jobs.get(event["job"]["job_id"])
+            events.append((event["type"], stored["status"], stored["offset_id"]))
+            if event["type"] == "backfill_progress":
+                client.failures[CHANNEL_ID] = FloodWaitError(request=None, capture=0)
+        
+        manager.set_listener(SESSION_KEY, listener)
+        job = manager.start(SESSION_KEY, str(CHANNEL_ID))
+        await self.finish(manager)
+        
+        self.assertEqual(events, [
+            ("backfill_started", "running", 0),
+            ("backfill_progress", "running", 51),
+            ("backfill_waiting", "waiting", 51),
+            ("backfill_completed", "completed", 0),
+        ])
+        self.assertEqual(manager.get(job["job_id"])["fetched"], 150)
+        self.assertEqual(len(data_service.get_channel_messages(str(CHANNEL_ID))), 150)
+        await manager.close()
+    
+    async def test_completion_extends_sync_state(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 250)})
+        telegram_service, _, async_data_service, channel_sync = self.make_manager(client, with_sync=True)
+        
+        with mock.patch.object(settings, "SYNC_REFRESH_WINDOW", 20):
+            state = await channel_sync.sync(SESSION_KEY, str(CHANNEL_ID))
+        self.assertEqual((state["max_id"], state["min_id"]), (250, 231))
+        
+        manager = BackfillManager(telegram_service, async_data_service, channel_sync)
+        manager.start(SESSION_KEY, str(CHANNEL_ID))
+        await self.finish(manager)
+        
+        # Загруженная история примыкает к синхронизированному диапазону и доходит до начала канала
+        state = channel_sync.state.get(str(CHANNEL_ID))
+        self.assertEqual((state["max_id"], state["min_id"]), (250, 1))
+        
+        client.calls.clear()
+        page = await channel_sync.get_channel_messages(SESSION_KEY, str(CHANNEL_ID), limit=10, offset_id=11)
+        self.assertEqual(len(page), 10)
+        self.assertEqual(client.calls, [])
+        await manager.close()
+    
+    async def test_completion_creates_sync_state(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 120)})
+        telegram_service, _, async_data_service, channel_sync = self.make_manager(client, with_sync=True)
+        
+        manager = BackfillManager(telegram_service, async_data_service, channel_sync)
+        manager.start(SESSION_KEY, str(CHANNEL_ID))
+        await self.finish(manager)
+        
+        state = channel_sync.state.get(str(CHANNEL_ID))
+        self.assertEqual((state["max_id"], state["min_id"]), (120, 1))
+        await manager.close()
+    
+    async def test_channels_with_overlapping_ids_are_stored_apart(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 150), CHANNEL_ID + 1: make_messages(1, 150)})
+        telegram_service = make_telegram_service(self, client, [CHANNEL_ID, CHANNEL_ID + 1])
+        data_service, async_data_service = make_data_service(self)
+        
+        manager = BackfillManager(telegram_service, async_data_service)
+        for channel_id in (CHANNEL_ID, CHANNEL_ID + 1):
+            manager.start(SESSION_KEY, str(channel_id))
+        await self.finish(manager)
+        
+        for channel_id in (CHANNEL_ID, CHANNEL_ID + 1):
+            self.assertEqual(len(data_service.get_channel_messages(str(channel_id))), 150)
+        await manager.close()
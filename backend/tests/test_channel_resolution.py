@@ -0,0 +1,62 @@
+import unittest
+
+from tests.fakes import FakeClient, SESSION_KEY, make_channel, make_telegram_service
+
+class ChannelResolutionTest(unittest.IsolatedAsyncioTestCase):
+    """Разрешение каналов, которых нет в кеше сущностей."""
+    
+    def setUp(self):
+        self.client = FakeClient(dialogs=[make_channel(100), make_channel(200)],
+                                 public=[make_channel(300), make_channel(301), make_channel(302)])
+        self.service = make_telegram_service(self, self.client)
+    
+    async def resolve(self, *channel_ids):
+        return await self.service._resolve_channels(SESSION_KEY, self.client, [str(i) for i in channel_ids])
+    
+    async def test_dialogs_are_loaded_once_per_session(self):
+        self.assertEqual(set(await self.resolve(100)), {"100"})
+        self.assertEqual(self.client.calls, [("get_dialogs", 200)])
+        
+        # Каналы из диалогов уже в кеше сущностей, остальные запрашиваются по ID без повторной загрузки диалогов
+        self.client.calls.clear()
+        self.assertEqual(set(await self.resolve(200, 300)), {"200", "300"})
+        self.assertEqual(self.client.calls, [("GetChannelsRequest",)])
+        
+        self.client.calls.clear()
+        await self.resolve(100, 200, 300)
+        self.assertEqual(self.client.calls, [])
+    
+    async def test_missing_channel_is_not_requested_again(self):
+        self.assertEqual(await self.resolve(999), {})
+        self.assertEqual(self.client.calls, [("get_dialogs", 200), ("GetChannelsRequest",)])
+        
+        self.client.calls.clear()
+        with self.assertRaises(ValueError):
+            await self.service._resolve_channel(SESSION_KEY, self.client, "999")
+        self.assertEqual(self.client.calls, [])
+        
+        # Другой неизвестный канал запрашивается по ID, диалоги не загружаются заново
+        self.assertEqual(set(await self.resolve(300)), {"300"})
+        self.assertEqual(self.client.calls, [("GetChannelsRequest",)])
+
+    async def test_channels_outside_dialogs_are_requested_together(self):
+        await self.resolve(100)
+        self.client.calls.clear()
+        
+        self.assertEqual(set(await self.resolve(300, 301, 302)), {"300", "301", "302"})
+        self.assertEqual(self.client.calls, [("GetChannelsRequest",)])
+    
+    async def test_rejected_batch_is_resolved_channel_by_channel(self):
+        await self.resolve(100)
+        self.client.calls.clear()
+        
+        # Один недоступный канал отклоняет общий запрос: каналы разрешаются по одному
+        self.assertEqual(set(await self.resolve(301, 302, 999)), {"301", "302"})
+        self.assertEqual(self.client.calls[0], ("GetChannelsRequest",))
+        self.assertEqual(sorted(self.client.calls[1:]),
+                         [("get_input_entity", 301), ("get_input_entity", 302), ("get_input_entity", 999)])
+        
+        # Недоступный канал запомнен: повторный запрос обходится без обращений к Telegram
+        self.client.calls.clear()
+        self.assertEqual(set(await self.resolve(301, 302, 999)), {"301", "302"})
+        self.assertEqual(self.client.calls, [])
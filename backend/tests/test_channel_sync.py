@@ -0,0 +1,103 @@
+import time
+import unittest
+from unittest import mock
+
+from config import settings
+from services.channel_sync import ChannelSync
+from services.records import message_record_id, telegram_id
+from services.telegram_service import TelegramService
+from tests.fakes import FakeClient, SESSION_KEY, make_data_service, make_messages, make_telegram_service
+
+class OverlappingMessageIdsTest(unittest.IsolatedAsyncioTestCase):
+    """ID сообщений Telegram совпадают в разных каналах, записи не должны перезаписывать друг друга."""
+    
+    def test_storage_backends_keep_channels_apart(self):
+        for backend in ("json", "sqlite", "segment", "partitioned"):
+            with self.subTest(backend=backend):
+                data_service, _ = make_data_service(self, backend)
+                for channel_id in ("100", "200"):
+                    data_service.save_messages_bulk([
+                        TelegramService._message_record(channel_id, msg).to_dict()
+                        for msg in make_messages(1, 5, text=f"Канал {channel_id}")
+                    ])
+                
+                for channel_id in ("100", "200"):
+                    messages = data_service.get_channel_messages(channel_id)
+                    self.assertEqual(sorted(telegram_id(m["message_id"]) for m in messages), [1, 2, 3, 4, 5])
+                    self.assertEqual({m["text"] for m in messages}, {f"Канал {channel_id}"})
+                    self.assertEqual(
+                        data_service.get_message(message_record_id(channel_id, 3))["channel_id"], channel_id
+                    )
+    
+    async def test_sync_pages_keep_channels_apart(self):
+        client = FakeClient({100: make_messages(1, 30), 200: make_messages(1, 30)})
+        telegram_service = make_telegram_service(self, client, [100, 200])
+        _, async_data_service = make_data_service(self)
+        sync = ChannelSync(telegram_service, async_data_service)
+        self.addCleanup(sync.close)
+        
+        with mock.patch.object(settings, "SYNC_REFRESH_WINDOW", 10):
+            for channel_id in ("100", "200"):
+                await sync.sync(SESSION_KEY, channel_id)
+            client.calls.clear()
+            
+            for channel_id in ("100", "200"):
+                page = await sync.get_channel_messages(SESSION_KEY, channel_id, limit=5)
+                self.assertEqual([m["message_id"] for m in page], [message_record_id(channel_id, i) for i in range(30, 25, -1)])
+                self.assertEqual({m["channel_id"] for m in page}, {channel_id})
+        
+        # Обе страницы отданы из хранилища: каналы не затерли записи друг друга
+        self.assertEqual(client.calls, [])
+        self.assertEqual(sync.get_stats()["pages_from_storage"], 2)
+
+class ChannelPagesTest(unittest.IsolatedAsyncioTestCase):
+    """Страницы сообщений канала и отметки синхронизации."""
+    
+    def setUp(self):
+        self.client = FakeClient({100: make_messages(1, 30)})
+        self.telegram_service = make_telegram_service(self, self.client, [100])
+        self.data_service, self.async_data_service = make_data_service(self)
+        self.sync = ChannelSync(self.telegram_service, self.async_data_service)
+        self.addCleanup(self.sync.close)
+    
+    async def test_stored_page_reads_only_its_range(self):
+        self.data_service.save_messages_bulk([
+            TelegramService._message_record("100", msg).to_dict() for msg in make_messages(1, 200)
+        ])
+        self.sync.state.put("100", {"max_id": 200, "min_id": 1, "last_edit_date": None, "synced_at": time.time()})
+        
+        limits = []
+        page_messages = self.data_service.storage.page_messages
+        
+        def counted_page_messages(*args, **kwargs):
+            limits.append(kwargs.get("limit", args[4] if len(args) > 4 else None))
+            return page_messages(*args, **kwargs)
+        
+        with mock.patch.object(self.data_service.storage, "page_messages", counted_page_messages), \
+                mock.patch.object(self.data_service.storage, "get_channel_messages", side_effect=AssertionError):
+            page = await self.sync.get_channel_messages(SESSION_KEY, "100", limit=10, offset_id=101)
+        
+        self.assertEqual([m["message_id"] for m in page], [message_record_id("100", i) for i in range(100, 90, -1)])
+        self.assertEqual(self.sync.get_stats()["pages_from_storage"], 1)
+        self.assertEqual(limits, [11])
+        self.assertEqual(self.client.calls, [])
+    
+    async def test_page_from_telegram_keeps_concurrent_sync_marks(self):
+        with mock.patch.object(settings, "SYNC_REFRESH_WINDOW", 10):
+            state = await self.sync.sync(SESSION_KEY, "100")
+            self.assertEqual((state["max_id"], state["min_id"]), (30, 21))
+            
+            # Пока страница загружается из Telegram, синхронизация получает новые сообщения
+            get_channel_messages = self.telegram_service.get_channel_messages
+            
+            async def page_during_sync(*args, **kwargs):
+                self.client.channels[100].extend(make_messages(31, 35))
+                await self.sync.sync(SESSION_KEY, "100", force=True)
+                return await get_channel_messages(*args, **kwargs)
+            
+            with mock.patch.object(self.telegram_service, "get_channel_messages", page_during_sync):
+                page = await self.sync.get_channel_messages(SESSION_KEY, "100", limit=10, offset_id=21)
+        
+        self.assertEqual([telegram_id(m["message_id"]) for m in page], list(range(20, 10, -1)))
+        state = self.sync.state.get("100")
+        self.assertEqual((state["max_id"], state["min_id"]), (35, 11))
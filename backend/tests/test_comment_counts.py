@@ -0,0 +1,70 @@
+import unittest
+from datetime import timedelta
+from types import SimpleNamespace
+
+from telethon.tl.functions.channels import GetFullChannelRequest
+from telethon.tl.functions.messages import GetRepliesRequest
+from telethon.tl.types import MessageReplies
+
+from tests.fakes import BASE_DATE, FakeClient, FakeMessage, SESSION_KEY, make_messages, make_telegram_service
+
+CHANNEL_ID = 100
+DISCUSSION_ID = 900
+
+def full_channel(linked_chat_id=None):
+    return lambda request: SimpleNamespace(
+        full_chat=SimpleNamespace(participants_count=1000, linked_chat_id=linked_chat_id)
+    )
+
+def replies(count: int = 0):
+    return lambda request: SimpleNamespace(count=count, messages=[])
+
+class CommentCountRequestsTest(unittest.IsolatedAsyncioTestCase):
+    """Количество запросов к Telegram на одну страницу сообщений канала."""
+    
+    async def test_channel_without_discussion_skips_replies_fallback(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 50)}, requests={
+            GetFullChannelRequest: full_channel(None), GetRepliesRequest: replies(),
+        })
+        service = make_telegram_service(self, client, [CHANNEL_ID])
+        
+        messages = await service.get_channel_messages(SESSION_KEY, str(CHANNEL_ID), limit=50)
+        
+        self.assertEqual(len(messages), 50)
+        self.assertEqual({m.comments_count for m in messages}, {0})
+        self.assertEqual(client.count("get_messages"), 1)
+        self.assertEqual(client.count("GetFullChannelRequest"), 1)
+        self.assertEqual(client.count("GetRepliesRequest"), 0)
+        
+        # Отсутствие группы обсуждения запоминается: следующая страница стоит один запрос
+        client.calls.clear()
+        await service.get_channel_messages(SESSION_KEY, str(CHANNEL_ID), limit=20, offset_id=30)
+        self.assertEqual([call[0] for call in client.calls], ["get_messages"])
+    
+    async def test_replies_metadata_needs_one_request_per_discussion(self):
+        messages = make_messages(1, 50)
+        for msg in messages:
+            msg.replies = MessageReplies(replies=2, replies_pts=0, comments=True,
+                                         channel_id=DISCUSSION_ID, max_id=1000 + msg.id)
+        last_comments = [FakeMessage(1000 + msg.id, date=msg.date + timedelta(hours=1)) for msg in messages]
+        client = FakeClient({CHANNEL_ID: messages, DISCUSSION_ID: last_comments})
+        service = make_telegram_service(self, client, [CHANNEL_ID])
+        
+        page = await service.get_channel_messages(SESSION_KEY, str(CHANNEL_ID), limit=50)
+        
+        self.assertEqual({m.comments_count for m in page}, {2})
+        self.assertEqual(page[0].last_comment_date, (BASE_DATE + timedelta(minutes=50, hours=1)).isoformat())
+        self.assertEqual(client.count("get_messages"), 2)
+        self.assertEqual(len(client.calls), 2)
+    
+    async def test_channel_with_discussion_falls_back_per_message(self):
+        client = FakeClient({CHANNEL_ID: make_messages(1, 10)}, requests={
+            GetFullChannelRequest: full_channel(DISCUSSION_ID), GetRepliesRequest: replies(3),
+        })
+        service = make_telegram_service(self, client, [CHANNEL_ID])
+        
+        page = await service.get_channel_messages(SESSION_KEY, str(CHANNEL_ID), limit=10)
+        
+        self.assertEqual({m.comments_count for m in page}, {3})
+        self.assertEqual(client.count("GetFullChannelRequest"), 1)
+        self.assertEqual(client.count("GetRepliesRequest"), 10)
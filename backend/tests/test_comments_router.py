@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+from models.comment import CommentMetadataUpdate
+from services.records import CommentRecord, comment_record_id, message_record_id
+from services.write_queue import BackgroundWriter
+from tests.fakes import SESSION_KEY, import_router, make_data_service
+
+comments = None
+
+def setUpModule():
+    global comments
+    comments = import_router("comments")
+
+class CommentMetadataRouteTest(unittest.IsolatedAsyncioTestCase):
+    
+    def setUp(self):
+        self.data_service, async_data_service = make_data_service(self)
+        self.writer = BackgroundWriter(self.data_service, flush_interval=0.2)
+        self.writer.start()
+        self.addCleanup(self.writer.close)
+        
+        self.telegram_service = mock.Mock()
+        self.telegram_service.is_authorized.return_value = True
+        for name, value in (("telegram_service", self.telegram_service), ("data_writer", self.writer),
+                            ("async_data_service", async_data_service)):
+            patcher = mock.patch.object(comments, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    async def test_fetched_comment_metadata_can_be_updated_right_away(self):
+        comment = CommentRecord(comment_record_id("100", 7), message_record_id("100", 3), "100", "u1",
+                                text="Комментарий", date="2024-01-01T00:07:00+00:00")
+        self.telegram_service.get_message_comments = mock.AsyncMock(return_value=[comment])
+        
+        fetched = await comments.get_message_comments(
+            channel_id="100", message_id=message_record_id("100", 3), session_key=SESSION_KEY, limit=100
+        )
+        self.assertEqual([c["comment_id"] for c in fetched], [comment.comment_id])
+        
+        # Очередь записи еще не зафиксирована: обновление дожидается ее
+        updated = await comments.update_comment_metadata(
+            comment_id=comment.comment_id,
+            update=CommentMetadataUpdate(sentiment="positive", is_bookmarked=True),
+            session_key=SESSION_KEY
+        )
+        self.assertEqual(updated["metadata"], {"sentiment": "positive", "user_tags": [], "is_bookmarked": True})
+        self.assertEqual(self.data_service.get_comment(comment.comment_id)["metadata"]["sentiment"], "positive")
+    
+    async def test_unknown_comment_is_not_found(self):
+        with self.assertRaises(comments.HTTPException) as raised:
+            await comments.update_comment_metadata(
+                comment_id=comment_record_id("100", 999), update=CommentMetadataUpdate(sentiment="positive"),
+                session_key=SESSION_KEY
+            )
+        self.assertEqual(raised.exception.status_code, 404)
+
+    async def test_local_search_uses_full_text_index(self):
+        texts = ["Согласен с выводами", "Какие выводы?", "Спасибо за пост"]
+        self.data_service.save_comments_bulk([
+            CommentRecord(comment_record_id("100", i), message_record_id("100", 3), "100", "u1",
+                          text=text, date=f"2024-01-01T00:0{i}:00+00:00")
+            for i, text in enumerate(texts, start=1)
+        ])
+        
+        found = await comments.search_comments(
+            query="вывод", channels=None, messages=None, date_from=None, date_to=None, sentiment=None,
+            user_tags=None, limit=100, offset=0, cursor=None, source="local", session_key=SESSION_KEY
+        )
+        self.assertEqual([c.comment_id for c in found.comments],
+                         [comment_record_id("100", 1), comment_record_id("100", 2)])
+        self.telegram_service.search_comments.assert_not_called()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from telethon.tl.functions.channels import GetFullChannelRequest
+
+from services.records import message_record_id
+from tests.fakes import BASE_DATE, FakeClient, FakeMessage, SESSION_KEY, make_telegram_service
+
+CHANNEL_ID = 100
+
+# Период со 2 по 4 января включительно
+DATE_FROM = datetime(2024, 1, 3)
+DATE_TO = datetime(2024, 1, 5, 23, 59, 59)
+
+def channel_history():
+    """Сообщения за 10 дней через каждые 6 часов и одно в последнюю секунду периода."""
+    dates = [BASE_DATE + timedelta(hours=6 * i) for i in range(40)]
+    dates.append(DATE_TO.replace(tzinfo=timezone.utc))
+    return [FakeMessage(message_id, date=date) for message_id, date in enumerate(sorted(dates), start=1)]
+
+def no_discussion(request):
+    return SimpleNamespace(full_chat=SimpleNamespace(participants_count=1000, linked_chat_id=None))
+
+class HistoryRangeTest(unittest.IsolatedAsyncioTestCase):
+    """Чтение истории канала за период."""
+    
+    def setUp(self):
+        self.history = channel_history()
+        self.client = FakeClient({CHANNEL_ID: self.history}, requests={GetFullChannelRequest: no_discussion})
+        self.service = make_telegram_service(self, self.client, [CHANNEL_ID])
+    
+    def in_range(self):
+        date_from, date_to = (value.replace(tzinfo=timezone.utc) for value in (DATE_FROM, DATE_TO))
+        return [msg for msg in reversed(self.history) if date_from <= msg.date <= date_to]
+    
+    async def test_range_includes_first_and_last_second(self):
+        expected = self.in_range()
+        self.assertEqual(expected[0].date, DATE_TO.replace(tzinfo=timezone.utc))
+        self.assertEqual(expected[-1].date, DATE_FROM.replace(tzinfo=timezone.utc))
+        
+        # Даты без часового пояса считаются датами UTC
+        bounds = {
+            "naive": (DATE_FROM, DATE_TO),
+            "utc": (DATE_FROM.replace(tzinfo=timezone.utc), DATE_TO.replace(tzinfo=timezone.utc)),
+            "moscow": (DATE_FROM.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=3))),
+                       DATE_TO.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=3)))),
+        }
+        for name, (date_from, date_to) in bounds.items():
+            with self.subTest(name):
+                self.client.calls.clear()
+                records = await self.service.get_messages_in_range(SESSION_KEY, [str(CHANNEL_ID)], date_from, date_to)
+                
+                self.assertEqual([r.message_id for r in records],
+                                 [message_record_id(str(CHANNEL_ID), msg.id) for msg in expected])
+                
+                # offset_date исключает границу, поэтому выборка начинается на секунду позже date_to
+                offset_dates = [call[3] for call in self.client.calls if call[0] == "iter_messages"]
+                self.assertEqual(offset_dates, [datetime(2024, 1, 6, tzinfo=timezone.utc)])
+    
+    async def test_reading_stops_after_date_from(self):
+        messages = [msg async for msg in self.service.iter_history(self.client, CHANNEL_ID, DATE_FROM, DATE_TO)]
+        
+        self.assertEqual(messages, self.in_range())
+        # Более новые сообщения не запрашиваются, из более ранних читается только первое
+        self.assertEqual(self.client.yielded, len(messages) + 1)
+    
+    async def test_limit_stops_reading(self):
+        messages = [msg async for msg in self.service.iter_history(self.client, CHANNEL_ID, DATE_FROM, DATE_TO, limit=5)]
+        
+        self.assertEqual(messages, self.in_range()[:5])
+        self.assertEqual(self.client.yielded, 5)
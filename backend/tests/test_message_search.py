@@ -0,0 +1,109 @@
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from services.records import message_record_id
+from tests.fakes import (BASE_DATE, FakeClient, FakeMessage, SESSION_KEY, import_router, make_data_service,
+                         make_telegram_service)
+
+messages = None
+
+def setUpModule():
+    global messages
+    messages = import_router("messages")
+
+def channel_messages(offset_minutes: int):
+    """30 сообщений канала через каждые 2 минуты со сдвигом offset_minutes."""
+    return [FakeMessage(i, date=BASE_DATE + timedelta(minutes=2 * i + offset_minutes)) for i in range(1, 31)]
+
+class MessageSearchTest(unittest.IsolatedAsyncioTestCase):
+    """Слияние потоков каналов в поиске сообщений."""
+    
+    def setUp(self):
+        # Сообщения каналов 100 и 200 чередуются по времени, канал 300 отвечает ошибкой, канала 999 нет
+        self.client = FakeClient({100: channel_messages(0), 200: channel_messages(1), 300: channel_messages(0)})
+        self.client.failures[300] = RuntimeError("Канал недоступен")
+        service = make_telegram_service(self, self.client, [100, 200, 300])
+        for target, name, value in ((service, "is_authorized", lambda session_key: True),
+                                    (messages, "telegram_service", service)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    async def search(self, cursor=None):
+        return await messages.search_messages(
+            query=None, channels="100,200,300,999", date_from=None, date_to=None,
+            limit=10, offset=0, cursor=cursor, session_key=SESSION_KEY
+        )
+    
+    def expected(self, newest_minute: int, count: int):
+        """Ожидаемые ID записей от сообщения с минутой newest_minute к более ранним."""
+        minutes = range(newest_minute, newest_minute - count, -1)
+        return [message_record_id("200" if minute % 2 else "100", minute // 2) for minute in minutes]
+    
+    async def test_pages_merge_channels_and_resume_from_cursor(self):
+        first = await self.search()
+        
+        self.assertEqual([m.message_id for m in first.messages], self.expected(61, 10))
+        self.assertEqual(first.channel_status, {"100": "ok", "200": "ok", "300": "error", "999": "not_found"})
+        self.assertTrue(first.partial)
+        self.assertIsNotNone(first.next_cursor)
+        
+        # Вторая страница начинает выборку каждого канала с даты курсора, а не с начала
+        self.client.calls.clear()
+        self.client.failures[300] = RuntimeError("Канал недоступен")
+        second = await self.search(first.next_cursor)
+        
+        self.assertEqual([m.message_id for m in second.messages], self.expected(51, 10))
+        cursor_date = BASE_DATE + timedelta(minutes=52)
+        offset_dates = {call[1]: call[3] for call in self.client.calls if call[0] == "iter_messages"}
+        self.assertEqual(offset_dates[100], cursor_date + timedelta(seconds=1))
+        self.assertEqual(offset_dates[200], cursor_date + timedelta(seconds=1))
+        self.assertTrue(second.partial)
+    
+    async def test_complete_when_all_channels_answer(self):
+        result = await messages.search_messages(
+            query=None, channels="100,200", date_from=None, date_to=None,
+            limit=5, offset=0, cursor=None, session_key=SESSION_KEY
+        )
+        self.assertEqual([m.message_id for m in result.messages], self.expected(61, 5))
+        self.assertEqual(result.channel_status, {"100": "ok", "200": "ok"})
+        self.assertFalse(result.partial)
+
+class LocalMessageSearchTest(unittest.IsolatedAsyncioTestCase):
+    """Поиск по сохраненным сообщениям через полнотекстовый индекс."""
+    
+    def setUp(self):
+        self.data_service, async_data_service = make_data_service(self)
+        telegram_service = mock.Mock()
+        telegram_service.is_authorized.return_value = True
+        for name, value in (("telegram_service", telegram_service), ("async_data_service", async_data_service)):
+            patcher = mock.patch.object(messages, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    async def search(self, query, cursor=None, offset=0):
+        return await messages.search_messages(
+            query=query, channels="100", date_from=None, date_to=None,
+            limit=2, offset=offset, cursor=cursor, source="local", session_key=SESSION_KEY
+        )
+    
+    async def test_finds_word_forms_and_pages_by_cursor(self):
+        texts = ["Итоги выборов", "Погода на выходные", "О выборах в регионе", "Выборы завершились"]
+        self.data_service.save_messages_bulk([
+            {"message_id": message_record_id("100", i), "channel_id": "100",
+             "date": (BASE_DATE + timedelta(minutes=i)).isoformat(), "text": text}
+            for i, text in enumerate(texts, start=1)
+        ])
+        
+        first = await self.search("выборы")
+        second = await self.search("выборы", cursor=first.next_cursor)
+        
+        self.assertEqual([m.message_id for m in first.messages + second.messages],
+                         [message_record_id("100", i) for i in (4, 3, 1)])
+        self.assertIsNone(second.next_cursor)
+    
+    async def test_offset_is_rejected(self):
+        with self.assertRaises(messages.HTTPException) as raised:
+            await self.search("выборы", offset=10)
+        self.assertEqual(raised.exception.status_code, 400)
@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+from typing import Dict, List
+
+from telethon.errors import FloodWaitError
+
+from services.rpc_scheduler import RpcScheduler, background_lane
+
+class GatedRequests:
+    """Запросы, которые начинаются сразу, а завершаются по release(tag)."""
+    
+    def __init__(self):
+        self.started: List[str] = []
+        self._gates: Dict[str, asyncio.Event] = {}
+    
+    def send(self, tag: str):
+        async def send():
+            self.started.append(tag)
+            await self._gates.setdefault(tag, asyncio.Event()).wait()
+            return tag
+        return send
+    
+    def release(self, tag: str) -> None:
+        self._gates.setdefault(tag, asyncio.Event()).set()
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+class RpcSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    
+    def spawn(self, scheduler, requests, tag, background=False):
+        if background:
+            with background_lane():
+                return asyncio.create_task(scheduler.call("GetHistoryRequest", requests.send(tag)))
+        return asyncio.create_task(scheduler.call("GetChannelsRequest", requests.send(tag)))
+    
+    async def test_interactive_lane_is_served_first(self):
+        scheduler = RpcScheduler(concurrency=2, limits={}, interactive_slots=1)
+        requests = GatedRequests()
+        
+        tasks = [self.spawn(scheduler, requests, f"bg{i}", background=True) for i in range(3)]
+        await settle()
+        # Последний слот фоновой полосе недоступен
+        self.assertEqual(requests.started, ["bg0"])
+        
+        tasks.append(self.spawn(scheduler, requests, "it0"))
+        await settle()
+        self.assertEqual(requests.started, ["bg0", "it0"])
+        
+        # Интерактивный запрос, поставленный позже фоновых, получает слот первым
+        tasks.append(self.spawn(scheduler, requests, "it1"))
+        await settle()
+        requests.release("it0")
+        await settle()
+        self.assertEqual(requests.started, ["bg0", "it0", "it1"])
+        
+        for tag in ("bg0", "it1", "bg1", "bg2"):
+            requests.release(tag)
+            await settle()
+        self.assertEqual(requests.started, ["bg0", "it0", "it1", "bg1", "bg2"])
+        self.assertEqual(sorted(await asyncio.gather(*tasks)), ["bg0", "bg1", "bg2", "it0", "it1"])
+        
+        stats = scheduler.get_stats()
+        self.assertEqual((stats["lanes"]["interactive"]["calls"], stats["lanes"]["background"]["calls"]), (2, 3))
+        self.assertEqual(stats["waiting"], 0)
+    
+    async def test_flood_wait_is_retried_without_blocking_other_methods(self):
+        scheduler = RpcScheduler(concurrency=2, limits={}, interactive_slots=1)
+        attempts = []
+        
+        async def history():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise FloodWaitError(request=None, capture=1)
+            return "history"
+        
+        async def channels():
+            return "channels"
+        
+        started = time.monotonic()
+        history_task = asyncio.create_task(scheduler.call("GetHistoryRequest", history))
+        await settle()
+        
+        # Пока метод заблокирован, запросы других методов выполняются сразу
+        self.assertEqual(await scheduler.call("GetChannelsRequest", channels), "channels")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertIn("GetHistoryRequest", scheduler.get_stats()["blocked_methods"])
+        
+        self.assertEqual(await history_task, "history")
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.9)
+        
+        stats = scheduler.get_stats()
+        self.assertEqual((stats["flood_waits"], stats["flood_wait_seconds"], stats["retries"]), (1, 1, 1))
+        self.assertEqual(stats["lanes"]["interactive"]["active"], 0)
+    
+    async def test_too_long_flood_wait_is_raised(self):
+        scheduler = RpcScheduler(concurrency=2, limits={}, interactive_slots=1)
+        attempts = []
+        
+        async def history():
+            attempts.append(1)
+            raise FloodWaitError(request=None, capture=3600)
+        
+        with self.assertRaises(FloodWaitError):
+            await scheduler.call("GetHistoryRequest", history)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(scheduler.get_stats()["retries"], 0)
+    
+    def test_rejects_configuration_without_background_slots(self):
+        with self.assertRaises(ValueError):
+            RpcScheduler(concurrency=2, interactive_slots=2)
+        self.assertEqual(RpcScheduler(concurrency=1, interactive_slots=0).interactive_slots, 0)
@@ -0,0 +1,103 @@
+import sqlite3
+import tempfile
+import unittest
+
+from services.pagination import comment_key, message_key
+from services.records import comment_record_id, message_record_id
+from services.storage import STORAGE_BACKENDS, create_storage
+
+CHANNEL_ID = "100"
+PARENT_ID = message_record_id(CHANNEL_ID, 1)
+
+# Даты в разных часовых поясах и с разной точностью: как строки они
+# упорядочены иначе, чем по моменту времени
+DATES = {
+    1: "2024-01-01T10:00:00+03:00",         # 07:00 UTC
+    2: "2024-01-01T08:00:00Z",              # 08:00 UTC
+    3: "2024-01-01T07:30:00.500000+00:00",  # 07:30:00.5 UTC
+    4: "2024-01-01T09:00:00",               # 09:00 UTC, дата без пояса считается UTC
+}
+# Период с 07:15 до 08:30 UTC
+DATE_FROM = "2024-01-01T07:15:00+00:00"
+DATE_TO = "2024-01-01T11:30:00+03:00"
+
+def make_message(number: int) -> dict:
+    return {"message_id": message_record_id(CHANNEL_ID, number), "channel_id": CHANNEL_ID,
+            "date": DATES[number], "text": f"Сообщение {number}"}
+
+def make_comment(number: int) -> dict:
+    return {"comment_id": comment_record_id(CHANNEL_ID, number), "message_id": PARENT_ID,
+            "channel_id": CHANNEL_ID, "date": DATES[number], "text": f"Комментарий {number}", "metadata": {}}
+
+class StorageDatesTest(unittest.TestCase):
+    """Даты записей сравниваются как моменты времени во всех бэкендах."""
+    
+    def data_dir(self) -> str:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return directory.name
+    
+    def backends(self):
+        for name in STORAGE_BACKENDS:
+            with self.subTest(name):
+                storage = create_storage(name, self.data_dir())
+                self.addCleanup(storage.close)
+                storage.save_messages_bulk([make_message(number) for number in DATES])
+                storage.save_comments_bulk([make_comment(number) for number in DATES])
+                yield storage
+    
+    def test_messages_sorted_and_filtered_by_utc_time(self):
+        newest_first = [message_record_id(CHANNEL_ID, number) for number in (4, 2, 3, 1)]
+        for storage in self.backends():
+            for channel_ids in (None, [CHANNEL_ID]):
+                self.assertEqual([m["message_id"] for m in storage.search_messages(channel_ids=channel_ids)],
+                                 newest_first)
+                self.assertEqual(
+                    [m["message_id"] for m in storage.search_messages(channel_ids=channel_ids,
+                                                                      date_from=DATE_FROM, date_to=DATE_TO)],
+                    newest_first[1:3]
+                )
+    
+    def test_message_pages_resume_from_cursor(self):
+        newest_first = [message_record_id(CHANNEL_ID, number) for number in (4, 2, 3, 1)]
+        for storage in self.backends():
+            for channel_ids in (None, [CHANNEL_ID]):
+                first = storage.page_messages(channel_ids=channel_ids, limit=2)
+                second = storage.page_messages(channel_ids=channel_ids, limit=2, after=message_key(first[-1]))
+                self.assertEqual([m["message_id"] for m in first + second], newest_first)
+    
+    def test_comments_sorted_and_filtered_by_utc_time(self):
+        oldest_first = [comment_record_id(CHANNEL_ID, number) for number in (1, 3, 2, 4)]
+        for storage in self.backends():
+            for message_ids in (None, [PARENT_ID]):
+                self.assertEqual([c["comment_id"] for c in storage.search_comments(message_ids=message_ids)],
+                                 oldest_first)
+                self.assertEqual(
+                    [c["comment_id"] for c in storage.search_comments(message_ids=message_ids,
+                                                                      date_from=DATE_FROM, date_to=DATE_TO)],
+                    oldest_first[1:3]
+                )
+                
+                first = storage.page_comments(message_ids=message_ids, limit=2)
+                second = storage.page_comments(message_ids=message_ids, limit=2, after=comment_key(first[-1]))
+                self.assertEqual([c["comment_id"] for c in first + second], oldest_first)
+    
+    def test_sqlite_database_without_date_ts_is_migrated(self):
+        data_dir = self.data_dir()
+        conn = sqlite3.connect(f"{data_dir}/storage.sqlite3")
+        conn.execute("CREATE TABLE messages (message_id TEXT PRIMARY KEY, channel_id TEXT, "
+                     "date TEXT NOT NULL DEFAULT '', text TEXT NOT NULL DEFAULT '', data TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO messages (message_id, channel_id, date, text, data) VALUES (?, ?, ?, ?, ?)",
+            [(m["message_id"], CHANNEL_ID, m["date"], m["text"], f'{{"message_id": "{m["message_id"]}"}}')
+             for m in map(make_message, DATES)]
+        )
+        conn.commit()
+        conn.close()
+        
+        storage = create_storage("sqlite", data_dir)
+        self.addCleanup(storage.close)
+        self.assertEqual(
+            [m["message_id"] for m in storage.search_messages(date_from=DATE_FROM, date_to=DATE_TO)],
+            [message_record_id(CHANNEL_ID, number) for number in (2, 3)]
+        )
@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from services.records import CommentRecord, comment_record_id, message_record_id
+from services.write_queue import BackgroundWriter
+from tests.fakes import make_data_service
+
+def make_comment(text: str = "Комментарий") -> CommentRecord:
+    return CommentRecord(comment_record_id("100", 7), message_record_id("100", 3), "100", "u1",
+                         text=text, date="2024-01-01T00:07:00+00:00")
+
+class BackgroundWriterTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.data_service, _ = make_data_service(self)
+        self.writer = BackgroundWriter(self.data_service, flush_interval=0.01)
+        self.writer.start()
+        self.addCleanup(self.writer.close)
+    
+    def test_saves_submitted_records(self):
+        message = {"message_id": message_record_id("100", 3), "channel_id": "100",
+                   "date": "2024-01-01T00:03:00+00:00", "text": "Новое сообщение"}
+        self.assertTrue(self.writer.submit_message(message))
+        self.assertTrue(self.writer.submit_comment(make_comment()))
+        self.assertTrue(self.writer.flush(timeout=5))
+        
+        self.assertEqual(self.data_service.get_message(message_record_id("100", 3))["text"], "Новое сообщение")
+        self.assertEqual(self.data_service.get_comment(comment_record_id("100", 7))["text"], "Комментарий")
+    
+    def test_refetched_comment_keeps_stored_metadata(self):
+        self.writer.submit_comment(make_comment())
+        self.writer.flush(timeout=5)
+        self.assertTrue(self.data_service.update_comment_metadata(
+            comment_record_id("100", 7), {"sentiment": "negative", "user_tags": ["важное"], "is_bookmarked": True}
+        ))
+        
+        # Повторно полученный из Telegram комментарий приходит с метаданными по умолчанию
+        self.writer.submit_comment(make_comment("Исправленный комментарий"))
+        self.writer.flush(timeout=5)
+        
+        comment = self.data_service.get_comment(comment_record_id("100", 7))
+        self.assertEqual(comment["text"], "Исправленный комментарий")
+        self.assertEqual(comment["metadata"], {"sentiment": "negative", "user_tags": ["важное"], "is_bookmarked": True})
+
+    def test_metadata_update_during_flush_is_not_lost(self):
+        self.writer.submit_comment(make_comment())
+        self.writer.flush(timeout=5)
+        
+        # Пакет повторно полученных комментариев останавливается перед записью в хранилище
+        storage = self.data_service.storage
+        save_comments_bulk = storage.save_comments_bulk
+        entered, release = threading.Event(), threading.Event()
+        
+        def blocked_save(comments):
+            entered.set()
+            release.wait(5)
+            return save_comments_bulk(comments)
+        
+        storage.save_comments_bulk = blocked_save
+        self.addCleanup(setattr, storage, "save_comments_bulk", save_comments_bulk)
+        self.writer.submit_comment(make_comment("Исправленный комментарий"))
+        self.assertTrue(entered.wait(5))
+        
+        # Обновление метаданных ждет фиксации пакета, а не записывается между чтением и записью пакета
+        update = threading.Thread(target=self.data_service.update_comment_metadata,
+                                  args=(comment_record_id("100", 7), {"sentiment": "negative", "is_bookmarked": True}))
+        update.start()
+        update.join(0.2)
+        self.assertTrue(update.is_alive())
+        
+        release.set()
+        update.join(5)
+        self.assertTrue(self.writer.flush(timeout=5))
+        
+        comment = self.data_service.get_comment(comment_record_id("100", 7))
+        self.assertEqual(comment["text"], "Исправленный комментарий")
+        self.assertEqual(comment["metadata"]["sentiment"], "negative")
+        self.assertTrue(comment["metadata"]["is_bookmarked"])
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Channel, Message, Comment } from '../types';
+import { Channel, Message, Comment, EngagementMetric, EngagementSeries, ChannelStatsResponse, SummaryStatistics, CommentAuthor } from '../types';
 
 const API_BASE_URL = 'http://localhost:8000';
 
@@ -257,6 +257,50 @@ export const searchComments = async (
   }
 };
 
+export const getSavedComments = async (filter: {
+  channels?: string[];
+  sentiment?: string;
+  userTags?: string[];
+  isBookmarked?: boolean;
+  limit?: number;
+  cursor?: string | null;
+}): Promise<{ comments: Comment[]; next_cursor: string | null }> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/comments/saved`, {
+      params: {
+        channels: filter.channels?.join(','),
+        sentiment: filter.sentiment,
+        user_tags: filter.userTags?.join(','),
+        is_bookmarked: filter.isBookmarked,
+        limit: filter.limit ?? 100,
+        cursor: filter.cursor ?? undefined,
+        session_key: getSessionKey(),
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error getting saved comments:', error);
+    throw error;
+  }
+};
+
+export const getCommentAuthors = async (
+  userIds: string[]
+): Promise<Record<string, CommentAuthor>> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/comments/authors`, {
+      params: {
+        user_ids: userIds.join(','),
+        session_key: getSessionKey(),
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error getting comment authors:', error);
+    throw error;
+  }
+};
+
 export const updateCommentMetadata = async (
   commentId: string,
   metadata: {
@@ -266,9 +310,10 @@ export const updateCommentMetadata = async (
   }
 ): Promise<Comment> => {
   try {
-    const response = await axios.patch(`${API_BASE_URL}/comments/${commentId}/metadata`, {
-      metadata,
-      session_key: getSessionKey(),
+    const response = await axios.patch(`${API_BASE_URL}/comments/${commentId}/metadata`, metadata, {
+      params: {
+        session_key: getSessionKey(),
+      },
     });
     return response.data;
   } catch (error) {
@@ -455,6 +500,59 @@ export const extractKeywords = async (text: string, limit: number = 5): Promise<
   }
 };
 
+export const getEngagementSeries = async (
+  channelId: string,
+  metric: EngagementMetric = 'views',
+  bucket: 'hour' | 'day' = 'day',
+  dateFrom?: string,
+  dateTo?: string
+): Promise<EngagementSeries> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/analysis/engagement/${channelId}`, {
+      params: {
+        metric,
+        bucket,
+        date_from: dateFrom,
+        date_to: dateTo,
+        session_key: getSessionKey(),
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error getting engagement series:', error);
+    throw error;
+  }
+};
+
+export const getChannelStats = async (channelIds: string[]): Promise<ChannelStatsResponse> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/analysis/stats/channels`, {
+      params: {
+        channel_ids: channelIds.join(','),
+        session_key: getSessionKey(),
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error getting channel stats:', error);
+    throw error;
+  }
+};
+
+export const getMessageStats = async (messageId: string): Promise<SummaryStatistics> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/analysis/stats/messages/${messageId}`, {
+      params: {
+        session_key: getSessionKey(),
+      },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error getting message stats:', error);
+    throw error;
+  }
+};
+
 // Пользовательские настройки
 export const updateSettings = async (settings: {
   theme?: 'light' | 'dark';
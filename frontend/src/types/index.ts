@@ -50,6 +50,12 @@ export interface Comment {
   metadata: CommentMetadata;
 }
 
+export interface CommentAuthor {
+  user_id: string;
+  name: string | null;
+  username: string | null;
+}
+
 // Типы пользователей
 export interface UserSettings {
   theme: 'light' | 'dark';
@@ -148,6 +154,50 @@ export interface SentimentAnalysis {
   score: number;
 }
 
+export type EngagementMetric = 'views' | 'forwards' | 'comments_count' | 'reactions_total';
+
+export interface EngagementBucket {
+  start: number; // начало интервала, мс UTC
+  samples: number;
+  messages: number;
+  total: number;
+  growth: number;
+  rate: number; // прирост в час
+  percentiles: Record<string, number>;
+}
+
+export interface EngagementSeries {
+  channel_id: string;
+  metric: EngagementMetric;
+  bucket: 'hour' | 'day';
+  buckets: EngagementBucket[];
+}
+
+export interface SummaryStatistics {
+  messages: number;
+  comments: number;
+  views_sum: number;
+  forwards_sum: number;
+  reactions_total: number;
+  comments_with_reactions: number;
+  text_length_sum: number;
+  message_date_min: string | null;
+  message_date_max: string | null;
+  comment_date_min: string | null;
+  comment_date_max: string | null;
+  avg_views: number;
+  avg_comment_length: number;
+  sentiment: Record<'positive' | 'negative' | 'neutral', number>;
+  comments_by_hour: number[]; // 24 значения, часы UTC
+  unique_authors: number;
+  top_authors: { user_id: string; count: number }[];
+}
+
+export interface ChannelStatsResponse {
+  channels: Record<string, SummaryStatistics>;
+  total: SummaryStatistics;
+}
+
 // Типы для уведомлений
 export interface Notification {
   id: string;